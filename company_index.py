@@ -0,0 +1,195 @@
+"""
+Persistent company identity index over csv_output
+
+Maps stock codes to every company name they were filed under, with the first
+and last filing each (code, name) pair appeared in, plus the latest sector.
+The index is stored in INDEX_FILE and updated incrementally: only CSV files
+that are not in the index yet are scanned. If an indexed file changed or was
+removed the index is rebuilt from scratch, since first/last-seen values cannot
+be taken back out.
+
+All parsers get their name -> code ([null]-code resolution) and code -> latest
+name lookups from here instead of rescanning every CSV file on each run.
+
+Usage:
+    python company_index.py             # update the index and print a summary
+    python company_index.py --rebuild   # rebuild from scratch
+"""
+import os
+import sys
+import json
+
+from dart_corpus import iter_rows, clean_header, filing_sort_key, source_stat
+from source_catalog import SourceCatalog
+
+# CONFIGURATION
+SOURCE_DIR = "csv_output"
+INDEX_FILE = "company_index.json"
+INDEX_VERSION = 1
+
+def index_code(raw_code):
+    """[005930] -> '005930'; None for [null] or codes with letters (e.g. 0008Z0)"""
+    raw_code = raw_code.strip()
+    if not raw_code or raw_code == '[null]':
+        return None
+    cleaned_code = raw_code.replace('[', '').replace(']', '').replace(' ', '').strip()
+    if not cleaned_code.isdigit():
+        return None
+    return cleaned_code.zfill(6)
+
+class CompanyIndex:
+    """code <-> names index with first/last seen filing per (code, name)"""
+
+    def __init__(self, source_dir=SOURCE_DIR):
+        self.source_dir = source_dir
+        self.files = {}  # filename -> {'size', 'mtime_ns'}
+        # code -> {'names': {name: {'first_seen', 'last_seen', 'last_row'}}, 'sector', 'sector_seen'}
+        self.codes = {}
+        self._build_lookups()
+
+    # --- persistence -------------------------------------------------------
+
+    @classmethod
+    def load(cls, path=INDEX_FILE, source_dir=SOURCE_DIR):
+        index = cls(source_dir)
+        if os.path.exists(path):
+            with open(path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            if data.get('version') == INDEX_VERSION and data.get('source_dir') == source_dir:
+                index.files = data['files']
+                index.codes = data['codes']
+                index._build_lookups()
+        return index
+
+    def save(self, path=INDEX_FILE):
+        data = {
+            'version': INDEX_VERSION,
+            'source_dir': self.source_dir,
+            'files': self.files,
+            'codes': self.codes,
+        }
+        with open(path + '.tmp', 'w', encoding='utf-8') as f:
+            json.dump(data, f, ensure_ascii=False, indent=1, sort_keys=True)
+        os.replace(path + '.tmp', path)
+
+    # --- updating ----------------------------------------------------------
+
+    def update(self, rebuild=False):
+        """Scan new current CSV filings of source_dir (and archive filings of an active corpus); returns the number scanned"""
+        current = {}
+        # Superseded versions of a filing are left out, as in every parser (see source_catalog.py)
+        for filename in SourceCatalog(self.source_dir).filenames():
+            size, mtime_ns = source_stat(os.path.join(self.source_dir, filename))
+            current[filename] = {'size': size, 'mtime_ns': mtime_ns}
+
+        stale = [f for f, info in self.files.items() if current.get(f) != info]
+        if rebuild or stale:
+            self.files = {}
+            self.codes = {}
+
+        new_files = sorted(f for f in current if f not in self.files)
+        for filename in new_files:
+            self._add_file(filename)
+            self.files[filename] = current[filename]
+
+        if new_files:
+            self._build_lookups()
+        return len(new_files)
+
+    def _add_file(self, filename):
+        rows = iter_rows(os.path.join(self.source_dir, filename))
+        header = next(rows, None)
+        if header is None:
+            return
+
+        col_map = {}
+        for idx, h in enumerate(header):
+            h = clean_header(h)
+            if h:
+                col_map[h] = idx
+        col_code = col_map.get('종목코드')
+        col_name = col_map.get('회사명')
+        col_sector = col_map.get('업종명', col_map.get('업종'))
+        if col_code is None or col_name is None:
+            return
+
+        file_key = filing_sort_key(filename)
+        seen = set()
+        for row_idx, row in enumerate(rows):
+            if len(row) <= max(col_code, col_name):
+                continue
+            company_name = row[col_name].strip()
+            code = index_code(row[col_code])
+            if not company_name or not code or (code, company_name) in seen:
+                continue
+            seen.add((code, company_name))
+
+            entry = self.codes.setdefault(code, {'names': {}, 'sector': None, 'sector_seen': None})
+            pair = entry['names'].get(company_name)
+            if pair is None:
+                entry['names'][company_name] = {'first_seen': filename, 'last_seen': filename, 'last_row': row_idx}
+            else:
+                if file_key > filing_sort_key(pair['last_seen']):
+                    pair['last_seen'] = filename
+                    pair['last_row'] = row_idx
+                if file_key < filing_sort_key(pair['first_seen']):
+                    pair['first_seen'] = filename
+
+            if col_sector is not None and col_sector < len(row):
+                seen_at = entry['sector_seen']
+                if seen_at is None or (file_key, -row_idx) > (filing_sort_key(seen_at[0]), -seen_at[1]):
+                    entry['sector'] = row[col_sector].strip()
+                    entry['sector_seen'] = [filename, row_idx]
+
+    # --- lookups -----------------------------------------------------------
+
+    def _build_lookups(self):
+        """name -> code and code -> name, both resolved to the latest filing"""
+        self.name_to_code = {}
+        self.code_to_name = {}
+        best_for_name = {}
+        for code, entry in self.codes.items():
+            best = None
+            for name, pair in entry['names'].items():
+                key = (filing_sort_key(pair['last_seen']), -pair['last_row'])
+                if best is None or key > best[0]:
+                    best = (key, name)
+                if name not in best_for_name or key > best_for_name[name]:
+                    best_for_name[name] = key
+                    self.name_to_code[name] = code
+            if best is not None:
+                self.code_to_name[code] = best[1]
+
+    def resolve(self, company_name):
+        """Stock code last filed under this company name, or None"""
+        return self.name_to_code.get(company_name)
+
+    def latest_name(self, code):
+        return self.code_to_name.get(code)
+
+    def latest_sector(self, code):
+        entry = self.codes.get(code)
+        return entry['sector'] if entry else None
+
+    def names(self, code):
+        """All names of a code as {name: {'first_seen', 'last_seen', ...}}"""
+        entry = self.codes.get(code)
+        return entry['names'] if entry else {}
+
+def load_company_index(source_dir=SOURCE_DIR, path=INDEX_FILE, rebuild=False):
+    """Load the index, scan any new files in source_dir and save it if it changed"""
+    index = CompanyIndex.load(path, source_dir)
+    scanned = index.update(rebuild)
+    if scanned:
+        index.save(path)
+        print(f"Company index: scanned {scanned} new files ({len(index.codes)} codes)")
+    return index
+
+def main():
+    index = load_company_index(rebuild='--rebuild' in sys.argv)
+    renamed = sum(1 for entry in index.codes.values() if len(entry['names']) > 1)
+    print(f"{INDEX_FILE}: {len(index.files)} files, {len(index.codes)} codes, "
+          f"{len(index.name_to_code)} names, {renamed} codes with more than one name")
+
+if __name__ == '__main__':
+    main()
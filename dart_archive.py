@@ -0,0 +1,143 @@
+"""
+Read DART bulk downloads (.zip / .txt.gz) without extracting them
+
+A refresh used to unzip the DART bulk downloads into 손익계산서/, convert
+them with 손익계산서/txt_to_csv.py into csv_output/ and only then parse,
+leaving the same text on disk three times. iter_archive_filings() streams each
+member through zipfile / gzip decompression and yields the rows that
+txt_to_csv.py would have written to csv_output: tab-separated, universal
+newlines, first encoding of TXT_ENCODING_CANDIDATES that decodes the member.
+
+Filing metadata comes from the member name (the DART filename, e.g.
+2024_3분기보고서_02_손익계산서_연결_20250605.txt), so each filing is served
+under the csv_output name the parsers already understand. Zip members whose
+name is not UTF-8 flagged are stored in cp949 by Korean archivers and are
+decoded accordingly.
+
+Usage:
+    python process_all.py --archives downloads/          # every .zip / .txt.gz in a directory
+    python process_all.py eps --archives a.zip b.txt.gz  # selected consumers and archives
+    python dart_archive.py <archive or directory> ...     # list the filings found
+"""
+import io
+import os
+import csv
+import sys
+import gzip
+import codecs
+import zipfile
+
+from dart_corpus import TXT_ENCODING_CANDIDATES, DETECT_CHUNK_SIZE
+from source_catalog import parse_filing
+
+ARCHIVE_SUFFIXES = ('.zip', '.txt.gz')
+# Only income statements are read by the parsers; other statements in a bulk zip are skipped
+STATEMENT_KEYWORD = '손익계산서'
+
+# Zip flag bit 11: the member name is UTF-8
+ZIP_UTF8_FLAG = 0x800
+
+def is_archive(path):
+    return path.endswith(ARCHIVE_SUFFIXES)
+
+def find_archives(paths):
+    """Archives among the given files and directories (directories are listed, not recursed)"""
+    archives = []
+    for path in paths:
+        if os.path.isdir(path):
+            archives.extend(os.path.join(path, f) for f in sorted(os.listdir(path)) if is_archive(f))
+        elif is_archive(path):
+            archives.append(path)
+        else:
+            print(f"Not a DART archive (.zip / .txt.gz): {path}")
+    return archives
+
+def member_name(info):
+    """Basename of a zip member, with cp949 names (stored without the UTF-8 flag) decoded"""
+    name = info.filename
+    if not info.flag_bits & ZIP_UTF8_FLAG:
+        try:
+            name = name.encode('cp437').decode('cp949')
+        except (UnicodeEncodeError, UnicodeDecodeError):
+            pass
+    return name.replace('\\', '/').rsplit('/', 1)[-1]
+
+def describe_member(name):
+    """Filing (see source_catalog.py) of a raw DART member name under its csv_output name, or None"""
+    if name.endswith('.gz'):
+        name = name[:-3]
+    stem, ext = os.path.splitext(name)
+    if ext.lower() != '.txt':
+        return None
+    return parse_filing(stem + '.csv')
+
+def _detect_encoding(open_member, candidates=TXT_ENCODING_CANDIDATES):
+    """First candidate that decodes the whole member (one streaming pass), or None"""
+    decoders = {enc: codecs.getincrementaldecoder(enc)() for enc in candidates}
+    with open_member() as f:
+        while decoders:
+            chunk = f.read(DETECT_CHUNK_SIZE)
+            final = not chunk
+            for enc in list(decoders):
+                try:
+                    decoders[enc].decode(chunk, final)
+                except UnicodeDecodeError:
+                    del decoders[enc]
+            if final:
+                break
+    return next((enc for enc in candidates if enc in decoders), None)
+
+def _iter_member_rows(name, open_member):
+    encoding = _detect_encoding(open_member)
+    if encoding is None:
+        print(f"  Cannot decode {name}")
+        return
+    with open_member() as raw:
+        # newline=None: universal newlines, as txt_to_csv.py reads the downloads
+        text = io.TextIOWrapper(raw, encoding=encoding, newline=None)
+        yield from csv.reader(text, delimiter='\t')
+
+def _members(archive_path):
+    """(member name, uncompressed size or None, opener) for each file in the archive"""
+    if archive_path.endswith('.zip'):
+        with zipfile.ZipFile(archive_path) as zf:
+            infos = [info for info in zf.infolist() if not info.is_dir()]
+        for info in infos:
+            # An open member keeps the archive's file handle alive on its own
+            yield member_name(info), info.file_size, lambda info=info: zipfile.ZipFile(archive_path).open(info)
+    else:
+        yield os.path.basename(archive_path), None, lambda: gzip.open(archive_path, 'rb')
+
+def archive_filings(archive_path, statement=STATEMENT_KEYWORD):
+    """Yield (Filing, size, read) per income statement filing in a DART archive
+
+    read() returns a fresh lazy iterator over the filing's rows (see
+    iter_archive_filings), so a filing can be read again after the archive
+    has been listed. size is the uncompressed size (None for .txt.gz).
+    """
+    for name, size, open_member in _members(archive_path):
+        filing = describe_member(name)
+        if filing is None or statement not in filing.statement:
+            continue
+        yield filing, size, lambda name=name, open_member=open_member: _iter_member_rows(name, open_member)
+
+def iter_archive_filings(archive_path, statement=STATEMENT_KEYWORD):
+    """Yield (Filing, size, rows) per income statement filing in a DART archive
+
+    rows lazily decompresses the member (one pass to detect the encoding, one
+    to read) and yields the header first; nothing if no candidate encoding
+    decodes it. size is the uncompressed size (None for .txt.gz).
+    """
+    for filing, size, read in archive_filings(archive_path, statement):
+        yield filing, size, read()
+
+def main():
+    for archive_path in find_archives(sys.argv[1:]):
+        print(f"{archive_path}:")
+        for filing, size, rows in iter_archive_filings(archive_path):
+            kind = '연결' if filing.consolidated else '별도'
+            print(f"  {filing.filename}  {filing.year} {filing.report_type} {kind} "
+                  f"(published {filing.published or '?'})")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,459 @@
+"""
+Typed columnar cache of DART filings
+
+`손익계산서/txt_to_csv.py --columnar` writes one store per converted filing
+next to the CSV output. process_data.py and process_eps_data.py read a filing
+from its store instead of re-parsing the CSV text when the store was written
+together with that exact CSV (open_current_filing): amounts are int64/float64
+arrays and the descriptor columns (item code, item name, company, ...) are
+dictionary-encoded, so codes and names are resolved once per distinct value.
+
+Only those two parsers read stores. process_data_separate.py reads the raw
+.txt downloads, which have no CSV a store could be matched against. The
+other csv_output parsers (process_annual_data.py, process_data_gem.py,
+parse_income_statement_*.py, find_revenue_from_income_statement.py) keep
+their own row loops, with their own metric rules and per-row metadata
+updates. Each would need its own store loop, checked against its CSV
+output, so they still read the CSV text.
+
+Each non-descriptor column is typed once from its first SAMPLE_ROWS rows:
+'int' columns convert a cell with int()/float() and only fall back to the
+parsers' regex rules for cells that are not plain integers, 'decimal' columns
+apply both rules to every cell, and 'text' columns are dictionary-encoded.
+
+File layout (<CACHE_DIR>/<sha256 of source file>.dcol):
+    MAGIC (8 bytes) | header length (8 bytes, little endian) | JSON header
+    | column blocks, each aligned to 8 bytes
+
+Blocks are native-endian arrays, so the file can be mmap'ed and read through
+memoryview.cast() without copying. <CACHE_DIR>/index.json maps each filing name
+(filename without extension) to its hash.
+"""
+import os
+import re
+import sys
+import json
+import mmap
+import array
+import struct
+import hashlib
+
+from dart_corpus import clean_header, SHARED_COLUMNS
+
+# CONFIGURATION
+CACHE_DIR = "columnar_cache"
+INDEX_FILE = "index.json"
+
+MAGIC = b'DCOL2\n\0\0'
+ALIGNMENT = 8
+
+# Derived dictionary column holding the normalized 6-digit stock code ('' if invalid)
+STOCK_CODE_COLUMN = 'stock_code'
+
+# Rows buffered to type the non-descriptor columns
+SAMPLE_ROWS = 256
+INT64_MIN, INT64_MAX = -(1 << 63), (1 << 63) - 1
+
+def file_sha256(filepath):
+    """SHA-256 of a file, read in 1MB blocks"""
+    h = hashlib.sha256()
+    with open(filepath, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            h.update(block)
+    return h.hexdigest()
+
+def normalize_stock_code(code):
+    """[005930] -> '005930'; '' for [null] or codes with letters (e.g. 0008Z0)"""
+    code = code.strip()
+    if not code or code == '[null]':
+        return ''
+    cleaned_code = code.replace('[', '').replace(']', '').replace(' ', '').strip()
+    if not cleaned_code.isdigit():
+        return ''
+    return cleaned_code.zfill(6)
+
+def parse_int_amount(v):
+    """Same rules as parse_value in process_data.py"""
+    if not v or v.strip() == '': return None
+    clean = re.sub(r'[^\d\-]', '', v)
+    if not clean or clean == '-': return None
+    try:
+        return int(clean)
+    except ValueError:
+        return None
+
+def parse_float_amount(v):
+    """Same rules as parse_value in process_eps_data.py (decimal EPS values)"""
+    if not v or v.strip() == '': return None
+    clean = re.sub(r'[^\d\-.]', '', v)
+    if not clean or clean == '-': return None
+    try:
+        return float(clean)
+    except ValueError:
+        return None
+
+def column_type(cells):
+    """'int', 'decimal' or 'text' for a sample of one column's cells (blank cells are ignored)
+
+    Thousands separators are allowed: both regex rules drop commas anyway.
+    """
+    kind = 'int'
+    for cell in cells:
+        if not cell.strip():
+            continue
+        cell = cell.replace(',', '')
+        try:
+            int(cell)
+            continue
+        except ValueError:
+            pass
+        try:
+            float(cell)
+            kind = 'decimal'
+        except ValueError:
+            return 'text'
+    return kind
+
+class ColumnarBuilder:
+    """Accumulates rows of one filing into typed columns"""
+
+    def __init__(self, header):
+        self.header = [clean_header(h) for h in header]
+        self.n_rows = 0
+        self.n_cells = array.array('B')
+
+        self.dict_columns = {}  # name -> (source idx, codes, dictionary, lookup)
+        self.amount_columns = {}  # name -> (source idx, type, int64 values, valid mask, float64 values, overflow)
+        self._untyped = []  # (name, source idx) of the columns typed from the sample
+
+        seen = set()
+        for idx, name in enumerate(self.header):
+            if not name or name in seen:
+                continue
+            seen.add(name)
+            if name in SHARED_COLUMNS:
+                self.dict_columns[name] = (idx, array.array('i'), [], {})
+            else:
+                self._untyped.append((name, idx))
+        self._sample = []
+
+    def add_row(self, row):
+        if self._sample is None:
+            self._add(row)
+            return
+        self._sample.append(row)
+        if len(self._sample) >= SAMPLE_ROWS:
+            self._type_columns()
+
+    def _type_columns(self):
+        sample, self._sample = self._sample, None
+        for name, idx in self._untyped:
+            kind = column_type(row[idx] for row in sample if idx < len(row))
+            if kind == 'text':
+                self.dict_columns[name] = (idx, array.array('i'), [], {})
+            else:
+                self.amount_columns[name] = (idx, kind, array.array('q'), array.array('B'), array.array('d'), [0])
+        for row in sample:
+            self._add(row)
+
+    def _add(self, row):
+        n = len(row)
+        self.n_rows += 1
+        self.n_cells.append(min(n, 255))
+
+        for idx, codes, dictionary, lookup in self.dict_columns.values():
+            value = row[idx].strip() if idx < n else ''
+            pos = lookup.get(value)
+            if pos is None:
+                pos = lookup[value] = len(dictionary)
+                dictionary.append(value)
+            codes.append(pos)
+
+        for idx, kind, values, mask, floats, overflow in self.amount_columns.values():
+            cell = row[idx] if idx < n else ''
+            if kind == 'int':
+                try:
+                    # An integer cell (with or without commas) parses the same under both regex rules
+                    plain = cell.replace(',', '')
+                    val, fval = int(plain), float(plain)
+                except ValueError:
+                    val, fval = parse_int_amount(cell), parse_float_amount(cell)
+            else:
+                val, fval = parse_int_amount(cell), parse_float_amount(cell)
+            if val is None:
+                values.append(0)
+                mask.append(0)
+            elif INT64_MIN <= val <= INT64_MAX:
+                values.append(val)
+                mask.append(1)
+            else:
+                values.append(0)
+                mask.append(0)
+                overflow[0] += 1
+            floats.append(fval if fval is not None else float('nan'))
+
+    def write(self, path, source_sha256, source_name, csv_sha256=None):
+        if self._sample is not None:
+            self._type_columns()
+
+        blocks = []
+        columns = []
+
+        def add_block(name, kind, arr, **extra):
+            columns.append(dict(name=name, kind=kind, typecode=arr.typecode, **extra))
+            blocks.append(arr.tobytes())
+
+        add_block('_n_cells', 'raw', self.n_cells)
+        for name, (idx, codes, dictionary, _) in self.dict_columns.items():
+            add_block(name, 'dict', codes, source_index=idx, dictionary=dictionary)
+        if '종목코드' in self.dict_columns:
+            # Normalized once per distinct raw code, then remapped row by row
+            _, raw_codes, raw_dictionary, _ = self.dict_columns['종목코드']
+            dictionary, lookup, remap = [], {}, array.array('i')
+            for raw in raw_dictionary:
+                code = normalize_stock_code(raw)
+                if code not in lookup:
+                    lookup[code] = len(dictionary)
+                    dictionary.append(code)
+                remap.append(lookup[code])
+            add_block(STOCK_CODE_COLUMN, 'dict', array.array('i', (remap[c] for c in raw_codes)), dictionary=dictionary)
+        for name, (idx, kind, values, mask, floats, overflow) in self.amount_columns.items():
+            add_block(name, 'int64', values, source_index=idx, type=kind, overflow=overflow[0])
+            add_block(name, 'mask', mask, source_index=idx)
+            add_block(name, 'float64', floats, source_index=idx)
+
+        # Offsets are relative to the start of the data section, which is aligned
+        offset = 0
+        for col, block in zip(columns, blocks):
+            col['offset'] = offset
+            col['length'] = len(block)
+            offset += len(block) + (-len(block)) % ALIGNMENT
+
+        header = {
+            'source_name': source_name,
+            'source_sha256': source_sha256,
+            'csv_sha256': csv_sha256,
+            'byteorder': sys.byteorder,
+            'n_rows': self.n_rows,
+            'header': self.header,
+            'columns': columns,
+        }
+        header_bytes = json.dumps(header, ensure_ascii=False).encode('utf-8')
+        data_start = len(MAGIC) + 8 + len(header_bytes)
+        header_pad = (-data_start) % ALIGNMENT
+
+        tmp_path = path + '.tmp'
+        with open(tmp_path, 'wb') as f:
+            f.write(MAGIC)
+            f.write(struct.pack('<Q', len(header_bytes)))
+            f.write(header_bytes)
+            f.write(b'\0' * header_pad)
+            for block in blocks:
+                f.write(block)
+                f.write(b'\0' * ((-len(block)) % ALIGNMENT))
+        os.replace(tmp_path, path)
+
+class ColumnarFiling:
+    """Read-only, memory-mapped view of one .dcol store"""
+
+    def __init__(self, path):
+        self.path = path
+        self._file = open(path, 'rb')
+        self._mm = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        self._views = []  # memoryviews of the map, released by close()
+
+        if self._mm[:len(MAGIC)] != MAGIC:
+            self.close()
+            raise ValueError(f"Not a columnar store: {path}")
+
+        header_len = struct.unpack('<Q', self._mm[len(MAGIC):len(MAGIC) + 8])[0]
+        header_start = len(MAGIC) + 8
+        meta = json.loads(self._mm[header_start:header_start + header_len].decode('utf-8'))
+        if meta['byteorder'] != sys.byteorder:
+            self.close()
+            raise ValueError(f"Columnar store {path} was written on a {meta['byteorder']}-endian machine")
+
+        data_start = header_start + header_len
+        self._data_start = data_start + (-data_start) % ALIGNMENT
+
+        self.source_name = meta['source_name']
+        self.source_sha256 = meta['source_sha256']
+        self.csv_sha256 = meta.get('csv_sha256')
+        self.n_rows = meta['n_rows']
+        self.header = meta['header']
+        self._columns = {(c['name'], c['kind']): c for c in meta['columns']}
+        # Header position -> column name (the first column of a repeated name is the one stored)
+        self._names = {c['source_index']: c['name'] for c in meta['columns'] if 'source_index' in c}
+
+    def _view(self, col):
+        start = self._data_start + col['offset']
+        base = memoryview(self._mm)
+        block = base[start:start + col['length']]
+        view = block.cast(col['typecode'])
+        # Released in close(): the map cannot be closed while a view of it is alive
+        self._views.extend((view, block, base))
+        return view
+
+    def has_column(self, name):
+        return (name, 'dict') in self._columns or (name, 'int64') in self._columns
+
+    def n_cells(self):
+        """Number of cells each source row had (for the parsers' short-row filter)"""
+        return self._view(self._columns[('_n_cells', 'raw')])
+
+    def dictionary(self, name):
+        """(codes, dictionary) of a dictionary-encoded column"""
+        col = self._columns[(name, 'dict')]
+        return self._view(col), col['dictionary']
+
+    def strings(self, name):
+        """Decoded values of a dictionary-encoded column as a list"""
+        codes, dictionary = self.dictionary(name)
+        return [dictionary[c] for c in codes]
+
+    def ints(self, name):
+        """(int64 values, validity mask) of an amount column"""
+        return self._view(self._columns[(name, 'int64')]), self._view(self._columns[(name, 'mask')])
+
+    def floats(self, name):
+        """float64 values of an amount column (NaN where empty)"""
+        return self._view(self._columns[(name, 'float64')])
+
+    def text_at(self, idx):
+        """(codes, dictionary) of the dictionary-encoded column at header position idx, or None"""
+        name = self._names.get(idx)
+        if name is None or (name, 'dict') not in self._columns:
+            return None
+        return self.dictionary(name)
+
+    def _values_at(self, idx, kind, parse):
+        name = self._names.get(idx)
+        if name is None:
+            return None
+        if (name, 'dict') in self._columns:
+            # A column typed as text: each distinct cell is parsed once
+            codes, dictionary = self.dictionary(name)
+            parsed = [parse(value) for value in dictionary]
+            return [parsed[c] for c in codes]
+        col = self._columns.get((name, 'int64'))
+        if col is None:
+            return None
+        if kind == 'int':
+            if col.get('overflow'):
+                return None
+            values, mask = self.ints(name)
+            return [v if m else None for v, m in zip(values, mask)]
+        return [None if v != v else v for v in self.floats(name)]
+
+    def int_values_at(self, idx):
+        """Per-row parse_int_amount of the column at header position idx (None if it cannot be given exactly)"""
+        return self._values_at(idx, 'int', parse_int_amount)
+
+    def float_values_at(self, idx):
+        """Per-row parse_float_amount of the column at header position idx, or None"""
+        return self._values_at(idx, 'float', parse_float_amount)
+
+    def close(self):
+        """Release every view handed out and unmap the store (views cannot be used afterwards)"""
+        for view in self._views:
+            view.release()
+        self._views = []
+        self._mm.close()
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+def load_index(cache_dir=CACHE_DIR):
+    index_path = os.path.join(cache_dir, INDEX_FILE)
+    if not os.path.exists(index_path):
+        return {}
+    with open(index_path, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+def save_index(index, cache_dir=CACHE_DIR):
+    os.makedirs(cache_dir, exist_ok=True)
+    with open(os.path.join(cache_dir, INDEX_FILE), 'w', encoding='utf-8') as f:
+        json.dump(index, f, ensure_ascii=False, indent=2, sort_keys=True)
+
+def store_path(source_sha256, cache_dir=CACHE_DIR):
+    return os.path.join(cache_dir, f"{source_sha256}.dcol")
+
+def open_filing(filename, cache_dir=CACHE_DIR, index=None):
+    """Open the store for a filing by name (e.g. a csv_output filename), or None if not cached"""
+    if index is None:
+        index = load_index(cache_dir)
+    digest = index.get(os.path.splitext(os.path.basename(filename))[0])
+    if not digest:
+        return None
+    path = store_path(digest, cache_dir)
+    if not os.path.exists(path):
+        return None
+    return ColumnarFiling(path)
+
+# csv path -> (size, mtime_ns, sha256)
+_csv_hashes = {}
+# cache dir -> (index mtime_ns, index)
+_indexes = {}
+
+def open_current_filing(csv_path, cache_dir=CACHE_DIR):
+    """Store of a csv_output file if it was written together with that exact CSV, else None
+
+    The store records the SHA-256 of the CSV txt_to_csv wrote alongside it; a
+    CSV converted again without --columnar, edited or replaced has another
+    hash and is read as text. Stores of an older format are ignored too.
+    """
+    index_path = os.path.join(cache_dir, INDEX_FILE)
+    if not os.path.isfile(index_path) or not os.path.isfile(csv_path):
+        return None
+    mtime = os.stat(index_path).st_mtime_ns
+    cached = _indexes.get(cache_dir)
+    if cached is None or cached[0] != mtime:
+        cached = _indexes[cache_dir] = (mtime, load_index(cache_dir))
+    try:
+        filing = open_filing(csv_path, cache_dir, cached[1])
+    except ValueError:
+        return None
+    if filing is None:
+        return None
+
+    stat = os.stat(csv_path)
+    cached = _csv_hashes.get(csv_path)
+    if cached is None or cached[:2] != (stat.st_size, stat.st_mtime_ns):
+        cached = (stat.st_size, stat.st_mtime_ns, file_sha256(csv_path))
+        _csv_hashes[csv_path] = cached
+    if filing.csv_sha256 != cached[2]:
+        filing.close()
+        return None
+    return filing
+
+def save_filing(builder, source_path, cache_dir=CACHE_DIR, digest=None, register=True, csv_sha256=None):
+    """Write a built store keyed by the source file hash
+
+    Pass `digest` if the caller already hashed the source while reading it,
+    and `csv_sha256` (the hash of the CSV written from it) so parsers can tell
+    the store still matches csv_output (see open_current_filing).
+    With register=False the index is left alone (see register_filings), which
+    lets several processes write stores concurrently.
+    Returns (filing_name, digest, store path).
+    """
+    os.makedirs(cache_dir, exist_ok=True)
+    if digest is None:
+        digest = file_sha256(source_path)
+    filing_name = os.path.splitext(os.path.basename(source_path))[0]
+    path = store_path(digest, cache_dir)
+    builder.write(path, digest, filing_name, csv_sha256)
+
+    if register:
+        register_filings([(filing_name, digest)], cache_dir)
+    return filing_name, digest, path
+
+def register_filings(entries, cache_dir=CACHE_DIR):
+    """Record (filing_name, digest) pairs in the index"""
+    index = load_index(cache_dir)
+    for filing_name, digest in entries:
+        index[filing_name] = digest
+    save_index(index, cache_dir)
@@ -0,0 +1,337 @@
+"""
+Shared CSV reader for the DART corpus in csv_output
+
+Every parser reads its files through iter_rows(), which yields rows lazily so
+only one row of a file is held in memory at a time. The encoding of each file
+is detected once (a single binary pass, no CSV parsing) and cached for the rest
+of the process. Inside a use_corpus() block a Corpus streams the files to
+several parsers at once (see process_all.py): each file is decoded once,
+shared by every parser that reads it and dropped before the next one. A
+corpus can also list the filings of DART bulk archives (see
+dart_archive.py); parsers list their files with list_source_files() and
+stat them with source_stat(), which include those archive filings.
+"""
+import os
+import csv
+import sys
+import codecs
+import contextlib
+
+ENCODING_CANDIDATES = ['utf-8-sig', 'cp949', 'utf-8', 'euc-kr']
+# Raw DART .txt downloads are never UTF-8 with BOM
+TXT_ENCODING_CANDIDATES = ['cp949', 'utf-8', 'euc-kr']
+
+DETECT_CHUNK_SIZE = 1024 * 1024
+
+# Descriptor columns repeat on every row of a company/item, so their cells are interned
+SHARED_COLUMNS = {
+    '재무제표종류', '종목코드', '회사명', '시장구분', '업종', '업종명',
+    '결산월', '결산기준일', '보고서종류', '통화', '항목코드', '항목명'
+}
+
+_active_corpus = None
+
+def clean_header(h):
+    return h.replace(' ', '').replace('\xa0', '').strip()
+
+# Order of report types within a fiscal year
+REPORT_ORDER = {'1분기보고서': 1, '반기보고서': 2, '3분기보고서': 3, '사업보고서': 4}
+
+def filing_sort_key(filename):
+    """Chronological sort key for DART filenames like 2025_3분기보고서_02_손익계산서_연결_20251231.csv
+
+    (year, report order, publication date, filename); names that do not follow
+    the pattern sort first.
+    """
+    parts = os.path.splitext(os.path.basename(filename))[0].split('_')
+    try:
+        year = int(parts[0])
+    except ValueError:
+        return (0, 0, '', filename)
+    report_order = REPORT_ORDER.get(parts[1], 0) if len(parts) > 1 else 0
+    published = parts[-1] if len(parts) > 2 and parts[-1].isdigit() else ''
+    return (year, report_order, published, filename)
+
+class FileSchema:
+    """Column indexes of one file's header, resolved once before the row loop
+
+    Descriptor columns are plain attributes (None if the file lacks them) and
+    `min_len` is the row length the parsers require (rows must reach the last
+    named column). period_columns() turns a parser's target_periods into
+    (period_key, column index) pairs, dropping periods the file does not have.
+    """
+
+    def __init__(self, header):
+        self.col_map = {}
+        for idx, h in enumerate(header):
+            h = clean_header(h)
+            if h:
+                self.col_map[h] = idx
+
+        self.min_len = max(self.col_map.values()) + 1 if self.col_map else 0
+        self.code = self.idx(['종목코드'])
+        self.name = self.idx(['회사명'])
+        self.sector = self.idx(['업종명', '업종'])
+        self.item_code = self.idx(['항목코드'])
+        self.item_name = self.idx(['항목명'])
+
+    def idx(self, candidates):
+        """Index of the first candidate column present in the header, or None"""
+        for c in candidates:
+            if c in self.col_map:
+                return self.col_map[c]
+        return None
+
+    def period_columns(self, target_periods):
+        """[(period_key, column index)] for the target periods present in the file"""
+        columns = []
+        for period_key, candidates in target_periods:
+            col_idx = self.idx(candidates)
+            if col_idx is not None:
+                columns.append((period_key, col_idx))
+        return columns
+
+def _corpus_key(filepath):
+    return os.path.normcase(os.path.abspath(filepath))
+
+# key -> (size, mtime_ns, candidates, encoding or None)
+_encoding_cache = {}
+
+def detect_encoding(filepath, candidates=ENCODING_CANDIDATES):
+    """First candidate that decodes the whole file, or None
+
+    All candidates are fed the same bytes in one read of the file; the result
+    is cached until the file's size or mtime changes.
+    """
+    key = _corpus_key(filepath)
+    stat = os.stat(filepath)
+    cached = _encoding_cache.get(key)
+    if cached is not None and cached[:3] == (stat.st_size, stat.st_mtime_ns, tuple(candidates)):
+        return cached[3]
+
+    decoders = {enc: codecs.getincrementaldecoder(enc)() for enc in candidates}
+    with open(filepath, 'rb') as f:
+        while decoders:
+            chunk = f.read(DETECT_CHUNK_SIZE)
+            final = not chunk
+            for enc in list(decoders):
+                try:
+                    decoders[enc].decode(chunk, final)
+                except UnicodeDecodeError:
+                    del decoders[enc]
+            if final:
+                break
+
+    encoding = next((enc for enc in candidates if enc in decoders), None)
+    _encoding_cache[key] = (stat.st_size, stat.st_mtime_ns, tuple(candidates), encoding)
+    return encoding
+
+def _projection(header, columns):
+    """Indexes of the requested columns in a raw header (None if any is missing)"""
+    col_map = {}
+    for idx, h in enumerate(header):
+        h = clean_header(h)
+        if h:
+            col_map[h] = idx
+    indexes = [col_map.get(c) for c in columns]
+    if None in indexes:
+        return None
+    return indexes
+
+def _project(rows, columns):
+    rows = iter(rows)
+    header = next(rows, None)
+    if header is None:
+        return
+    indexes = _projection(header, columns)
+    if indexes is None:
+        return
+    yield [header[i] for i in indexes]
+
+    needed = max(indexes) + 1 if indexes else 0
+    for row in rows:
+        if len(row) < needed:
+            continue
+        yield [row[i] for i in indexes]
+
+def _iter_file(filepath, delimiter, candidates):
+    encoding = detect_encoding(filepath, candidates)
+    if encoding is None:
+        return
+    if delimiter == '\t':
+        # Raw DART text is unquoted, so plain splitting matches the original files
+        with open(filepath, 'r', encoding=encoding) as f:
+            for line in f:
+                yield line.rstrip('\n').split('\t')
+    else:
+        with open(filepath, 'r', encoding=encoding, newline='') as f:
+            yield from csv.reader(f, delimiter=delimiter)
+
+def iter_rows(filepath, columns=None, delimiter=',', candidates=None):
+    """Yield the rows of a file lazily, header first
+
+    Nothing is yielded if no candidate encoding can read the file.
+    columns: optional list of header names; each row (header included) is then
+    reduced to those cells in that order, rows too short to hold all of them
+    are dropped, and nothing is yielded if the header lacks one of them.
+    delimiter: ',' for csv_output files, '\t' for raw DART .txt downloads.
+    """
+    if candidates is None:
+        candidates = TXT_ENCODING_CANDIDATES if delimiter == '\t' else ENCODING_CANDIDATES
+
+    rows = None
+    if _active_corpus is not None and delimiter == ',':
+        rows = _active_corpus.get(filepath)
+    if rows is None:
+        rows = _iter_file(filepath, delimiter, candidates)
+    else:
+        rows = iter(rows)
+
+    if columns is not None:
+        rows = _project(rows, columns)
+    return rows
+
+def decode_rows(filepath):
+    """Read a whole CSV file into a list (empty list on failure)"""
+    return list(_iter_file(filepath, ',', ENCODING_CANDIDATES))
+
+def _intern_shared(rows):
+    if rows:
+        shared_idx = [idx for idx, h in enumerate(rows[0]) if clean_header(h) in SHARED_COLUMNS]
+        for row in rows[1:]:
+            for idx in shared_idx:
+                if idx < len(row):
+                    row[idx] = sys.intern(row[idx])
+    return rows
+
+class CorpusConsumer:
+    """A parser split around a corpus pass (see Corpus.stream and process_all.py)
+
+    start() does the setup and returns the filenames the parser reads;
+    on_file() is then called for each of them in name order and reads the
+    file through iter_rows(); finish() does everything after the pass and
+    writes the output. run() is the standalone equivalent, reading each file
+    from disk.
+    """
+
+    def start(self):
+        return []
+
+    def on_file(self, filepath, filename):
+        pass
+
+    def finish(self):
+        pass
+
+    def run(self, source_dir):
+        for filename in sorted(set(self.start())):
+            self.on_file(os.path.join(source_dir, filename), filename)
+        self.finish()
+
+class Corpus:
+    """The CSV files of a directory, decoded once per pass for every consumer that reads them
+
+    stream() walks the files in name order and hands each one to the consumers
+    that listed it. The first iter_rows() of the current file decodes it; the
+    other consumers share that copy, and it is dropped before the next file,
+    so at most one decoded file is held at a time. Filings of DART archives
+    (add_archives) are listed under the name they would have in source_dir,
+    replacing a csv_output copy, and are read from the archive again if
+    someone asks for one outside the pass.
+    """
+
+    def __init__(self, source_dir):
+        self.source_dir = source_dir
+        self.filenames = {}  # archive filename -> (size, mtime_ns) for list_source_files / source_stat
+        self.archive_readers = {}  # corpus key -> read() of the archive filing
+        self.current = None  # [corpus key, decoded rows or None] of the file being streamed
+        self.decoded_files = 0
+        self.decoded_rows = 0
+
+    def add_archives(self, archive_paths):
+        """List the income statement filings of DART .zip / .txt.gz archives (see dart_archive.py)
+
+        A filing also present in source_dir is replaced by the archive's copy.
+        """
+        from dart_archive import archive_filings
+
+        for archive_path in archive_paths:
+            mtime_ns = os.stat(archive_path).st_mtime_ns
+            count = 0
+            for filing, size, read in archive_filings(archive_path):
+                self.filenames[filing.filename] = (size, mtime_ns)
+                self.archive_readers[_corpus_key(os.path.join(self.source_dir, filing.filename))] = read
+                count += 1
+            print(f"Found {count} filings in {archive_path}")
+        return self
+
+    def stream(self, consumers):
+        """Call on_file of the consumers for their files, in name order, decoding each file at most once
+
+        consumers: (CorpusConsumer, filenames from its start()) pairs. Run
+        inside use_corpus(self) so iter_rows() serves the current file.
+        """
+        wanted = [(consumer, set(filenames)) for consumer, filenames in consumers]
+        names = sorted(set().union(*(filenames for _, filenames in wanted)))
+        print(f"Streaming {len(names)} files from {self.source_dir} (each decoded at most once)...")
+
+        for filename in names:
+            filepath = os.path.join(self.source_dir, filename)
+            self.current = [_corpus_key(filepath), None]
+            try:
+                for consumer, filenames in wanted:
+                    if filename in filenames:
+                        consumer.on_file(filepath, filename)
+            finally:
+                self.current = None
+
+        print(f"Decoded {self.decoded_files} files, {self.decoded_rows} rows")
+
+    def _decode(self, key, filepath):
+        read = self.archive_readers.get(key)
+        rows = _intern_shared(list(read()) if read is not None else decode_rows(filepath))
+        self.decoded_files += 1
+        self.decoded_rows += len(rows)
+        return rows
+
+    def get(self, filepath):
+        """Rows of the current file (decoded on first use), a fresh read of an archive filing, or None"""
+        key = _corpus_key(filepath)
+        current = self.current
+        if current is not None and current[0] == key:
+            if current[1] is None:
+                current[1] = self._decode(key, filepath)
+            return current[1]
+        read = self.archive_readers.get(key)
+        return read() if read is not None else None
+
+def _active_filenames(source_dir):
+    if _active_corpus is None or _corpus_key(_active_corpus.source_dir) != _corpus_key(source_dir):
+        return {}
+    return _active_corpus.filenames
+
+def list_source_files(source_dir):
+    """Filenames in source_dir plus the filings an active corpus serves for it (archive members)"""
+    names = set(os.listdir(source_dir)) if os.path.isdir(source_dir) else set()
+    names.update(_active_filenames(source_dir))
+    return list(names)
+
+def source_stat(filepath):
+    """(size, mtime_ns) of a source file; archive filings report their member size and archive mtime"""
+    directory, filename = os.path.split(filepath)
+    stat = _active_filenames(directory).get(filename)
+    if stat is not None:
+        return stat
+    stat = os.stat(filepath)
+    return (stat.st_size, stat.st_mtime_ns)
+
+@contextlib.contextmanager
+def use_corpus(corpus):
+    """Serve iter_rows() from a streaming corpus inside the block (see Corpus.stream)"""
+    global _active_corpus
+    previous = _active_corpus
+    _active_corpus = corpus
+    try:
+        yield corpus
+    finally:
+        _active_corpus = previous
@@ -0,0 +1,309 @@
+"""
+DataFrame extraction backend for process_data (optional, needs pandas)
+
+extract_file_facts_df() is a column-at-a-time version of
+process_data.extract_file_facts: a filing is loaded as one DataFrame, stock
+codes are normalized and amounts parsed with vectorized string ops, metric
+classification is a join against a table of the file's distinct
+(item code, item name) pairs classified once by CLASSIFIER, and the target
+period columns are selected in bulk. It returns the same FileFacts (same
+events, same order), so merging, fallback resolution and compile_final_data
+are shared with the row parser.
+
+Files are read with pd.read_csv in the encoding dart_corpus detects, every
+cell as a string, loading only the columns the file's schema uses. pandas
+pads short rows, so the rows the row parser drops for being shorter than the
+header's last column are found by counting fields on the raw lines instead
+(see load_frame).
+
+This is not a fast path. Without pyarrow, pandas' string columns hold Python
+objects and every .str op runs per element. On the sample corpus, extraction
+takes 6.8s with this backend against 4.0s with the row parser.
+
+Usage:
+    python process_data.py --backend dataframe   # build with this backend
+    python dataframe_backend.py                  # cross-check against the row parser
+"""
+import io
+import os
+import re
+import csv
+import sys
+
+try:
+    import pandas as pd
+except ImportError:  # optional: only needed for --backend dataframe
+    pd = None
+
+from dart_corpus import iter_rows, detect_encoding, FileSchema, clean_header
+from overrides import OVERRIDES
+from process_data import (
+    SOURCE_DIR, CLASSIFIER, FileFacts, FACT_VALUE, FACT_IFRS_REVENUE, FACT_FALLBACK,
+    describe_filing, extract_file_facts, normalize_code
+)
+
+# Digits-only / integer patterns matching normalize_code and parse_value
+NON_DIGIT = r'[^\d]'
+NON_AMOUNT = r'[^\d\-]'
+INTEGER = r'-?\d+'
+# A quoted CSV field ("" escapes are two adjacent matches)
+QUOTED_FIELD = re.compile(r'"[^"]*"')
+
+CLASSIFIER_FIELDS = ['skip', 'gross_profit', 'remapped', 'metric', 'first_metric', 'ifrs_revenue', 'fallback']
+
+def require_pandas():
+    if pd is None:
+        raise ImportError("The DataFrame backend needs pandas (pip install pandas)")
+
+def field_counts(text):
+    """Number of fields of each non-blank line of CSV text, or None if a line is not exactly one row
+
+    Quoted fields are cut out first, so only the separating commas are counted.
+    """
+    unquoted = QUOTED_FIELD.sub('', text)
+    if unquoted.count('\n') != text.count('\n') or '\r' in unquoted.replace('\r\n', '\n'):
+        return None  # a quoted newline, or a bare CR (csv ends a row there too)
+    return [line.count(',') + 1
+            for line, raw in zip(unquoted.split('\n'), text.split('\n'))
+            if raw not in ('', '\r')]  # blank: csv.reader yields [] and pd.read_csv skips it
+
+def _frame_from_rows(rows, columns):
+    needed = max(columns) + 1
+    return pd.DataFrame([[row[c] for c in columns] for row in rows if len(row) >= needed],
+                        columns=columns, dtype=object)
+
+def load_frame(filepath, columns_of):
+    """(header, DataFrame of the data rows) or (None, None) if the file cannot be read
+
+    columns_of(header) picks the column indexes to load (None: no frame).
+    Columns keep their index as label, and rows too short to hold all of them
+    are dropped, as the row parser drops rows shorter than the header's last
+    column. The fields per row are counted on the raw lines; files whose
+    lines are not one row each (a quoted newline), and filings not on disk
+    (archive members served by an active corpus), are read through iter_rows.
+    """
+    if os.path.exists(filepath):
+        encoding = detect_encoding(filepath)
+        if encoding is None:
+            return None, None
+        with open(filepath, 'r', encoding=encoding, newline='') as f:
+            text = f.read()
+        counts = field_counts(text)
+        if counts:
+            header = next(csv.reader(io.StringIO(text)))
+            columns = columns_of(header)
+            if columns is None:
+                return header, None
+            counts = pd.Series(counts[1:])
+            keep = (counts >= max(columns) + 1).to_numpy()
+            if not keep.any():
+                return header, pd.DataFrame(columns=columns, dtype=object)
+            frame = pd.read_csv(io.StringIO(text), header=None, names=range(int(counts.max())), skiprows=1,
+                                usecols=columns, dtype=str, keep_default_na=False, index_col=False)
+            return header, frame[keep].reset_index(drop=True)
+
+    rows = iter_rows(filepath)
+    header = next(rows, None)
+    if header is None:
+        return None, None
+    columns = columns_of(header)
+    if columns is None:
+        return header, None
+    return header, _frame_from_rows(rows, columns)
+
+def per_distinct(series, func):
+    """Apply a vectorized func to the distinct values of series only and broadcast the result back
+
+    Descriptor columns repeat on every row of a company or item, so this does
+    the string work once per distinct value instead of once per row.
+    """
+    codes, uniques = pd.factorize(series, use_na_sentinel=False)
+    result = func(pd.Series(uniques, dtype=object))
+    return pd.Series(result.to_numpy()[codes], index=series.index, dtype=object)
+
+def normalize_codes(raw_code):
+    """Vectorized normalize_code of stripped codes: '' where the code is missing, None where it is invalid
+
+    Missing codes ([null], no digits) are resolved by company name afterwards.
+    """
+    digits = raw_code.str.replace(NON_DIGIT, '', regex=True)
+    missing = (raw_code == '') | (raw_code == '[null]') | (digits == '')
+
+    # Codes with letters (like 0008Z0) are invalid
+    cleaned = raw_code.str.replace('[', '', regex=False).str.replace(']', '', regex=False) \
+        .str.replace(' ', '', regex=False).str.strip()
+    codes = digits.str.zfill(6).where(cleaned.str.isdigit(), None)
+    return codes.where(~missing, '')
+
+def parse_amounts(cells):
+    """Vectorized parse_value: int for cells holding an integer once non-digits are dropped, else missing"""
+    clean = cells.str.replace(NON_AMOUNT, '', regex=True)
+    valid = clean.str.fullmatch(INTEGER).fillna(False).astype(bool)
+    amounts = pd.Series(None, index=cells.index, dtype=object)
+    amounts[valid] = [int(v) for v in clean[valid]]
+    return amounts
+
+def classification_table(item_codes, item_names):
+    """One row per distinct (item code, item name) with its CLASSIFIER decision"""
+    pairs = pd.DataFrame({'item_code': item_codes, 'item_name': item_names}).drop_duplicates()
+    decisions = [CLASSIFIER.classify(c, n) for c, n in zip(pairs['item_code'], pairs['item_name'])]
+    table = pd.DataFrame(decisions, columns=CLASSIFIER_FIELDS, index=pairs.index, dtype=object)
+    return pd.concat([pairs, table.drop(columns=['first_metric'])], axis=1)
+
+def extract_file_facts_df(filepath, filename, company_name_to_code, allow_separate=False):
+    """FileFacts of one file, identical to extract_file_facts (without its `codes` mode)"""
+    require_pandas()
+
+    filing = describe_filing(filename, allow_separate)
+    if filing is None:
+        return None
+    year, is_consolidated, target_periods = filing
+
+    facts = FileFacts(filename, is_consolidated)
+
+    def needed_columns(header):
+        schema = FileSchema(header)
+        if schema.code is None or schema.item_code is None:
+            return None
+        columns = {schema.code, schema.item_code, schema.min_len - 1}
+        columns.update(c for c in (schema.name, schema.sector, schema.item_name) if c is not None)
+        columns.update(c for _, c in schema.period_columns(target_periods))
+        return sorted(columns)
+
+    header, frame = load_frame(filepath, needed_columns)
+    if header is None:
+        facts.error = f"Failed to read {filename}"
+        return facts
+
+    schema = FileSchema(header)
+    if frame is None:
+        facts.error = f"  Missing essential columns in {filename}"
+        return facts
+
+    period_cols = schema.period_columns(target_periods)
+    if frame.empty:
+        return facts
+
+    def text(col_idx):
+        if col_idx is None:
+            return None
+        return per_distinct(frame[col_idx], lambda cells: cells.str.strip())
+
+    company_name = text(schema.name)
+    codes = per_distinct(text(schema.code), normalize_codes)
+    missing = codes == ''
+    if missing.any():
+        if company_name is None:
+            codes[missing] = None
+        else:
+            def by_name(name):
+                return company_name_to_code.get(name) or normalize_code(None, name)
+            codes[missing] = per_distinct(company_name[missing], lambda names: names.map(by_name))
+    keep = codes.notna()
+    frame = frame[keep].reset_index(drop=True)
+    codes = codes[keep].reset_index(drop=True)
+    if company_name is not None:
+        company_name = company_name[keep].reset_index(drop=True)
+    if frame.empty:
+        return facts
+
+    # First row of each company, in row order
+    first = ~codes.duplicated()
+    sector = text(schema.sector)
+    facts.first_seen = list(zip(
+        codes[first],
+        company_name[first] if company_name is not None else [None] * int(first.sum()),
+        sector[first] if sector is not None else [None] * int(first.sum()),
+    ))
+
+    # Metric classification as a join against the file's distinct items
+    rows = pd.DataFrame({
+        'pos': range(len(frame)),
+        'code': codes.to_numpy(),
+        'item_code': text(schema.item_code).to_numpy(),
+        'item_name': text(schema.item_name).to_numpy(),
+    })
+    rows = rows.merge(classification_table(rows['item_code'], rows['item_name']),
+                      on=['item_code', 'item_name'], how='left', sort=False)
+
+    rows = rows[~rows['skip'].astype(bool)]
+    # Company-specific item remaps (e.g. Kakao's GrossProfit as revenue, see overrides.json)
+    remap = pd.Series(None, index=rows.index, dtype=object)
+    flagged = rows['remapped'].astype(bool)
+    if flagged.any():
+        remap[flagged] = [OVERRIDES.remapped_metric(code, item_code)
+                          for code, item_code in zip(rows['code'][flagged], rows['item_code'][flagged])]
+    remapped = remap.notna()
+    rows = rows[remapped | ~rows['gross_profit'].astype(bool)]
+    remapped = remapped[rows.index]
+    rows['metric'] = rows['metric'].where(~remapped, remap[rows.index])
+    ifrs_revenue = rows['ifrs_revenue'].astype(bool) & ~remapped
+    fallback = rows['metric'].isna() & rows['fallback'].astype(bool)
+
+    # Target period columns selected in bulk; only rows that produce a fact are parsed
+    needed = rows['pos'][rows['metric'].notna() | fallback].to_numpy()
+    amounts = {period_key: parse_amounts(frame[col_idx].take(needed).astype(str))
+               for period_key, col_idx in period_cols}
+
+    # Events as (row position, order within the row, event), sorted back into row order
+    keyed = []
+    ifrs_rows = rows[ifrs_revenue]
+    for pos, code in zip(ifrs_rows['pos'].tolist(), ifrs_rows['code'].tolist()):
+        keyed.append((pos, -1, (FACT_IFRS_REVENUE, code, year)))
+
+    fallback_rows = rows[fallback]
+    for pos, code, item_code, item_name in zip(*(fallback_rows[c].tolist() for c in ('pos', 'code', 'item_code', 'item_name'))):
+        values = tuple((period_key, amounts[period_key][pos]) for period_key, _ in period_cols
+                       if pd.notna(amounts[period_key][pos]))
+        keyed.append((pos, -1, (FACT_FALLBACK, code, year, item_code, item_name, clean_header(item_name),
+                                values, filename)))
+
+    matched = rows[rows['metric'].notna()]
+    for order, (period_key, _) in enumerate(period_cols):
+        target_year = year
+        storage_key = period_key
+        # 사업보고서: 당기 -> 파일명 연도, 전기 -> 전년도
+        if period_key == 'Annual_Previous_From_Next':
+            target_year = year - 1
+            storage_key = 'Annual_Previous'
+
+        vals = amounts[period_key].reindex(matched['pos'].to_numpy())
+        present = matched[vals.notna().to_numpy()]
+        for pos, code, metric, val, item_name, item_code in zip(
+                *(present[c].tolist() for c in ('pos', 'code', 'metric')), vals.dropna().tolist(),
+                *(present[c].tolist() for c in ('item_name', 'item_code'))):
+            keyed.append((pos, order, (FACT_VALUE, code, target_year, storage_key, metric, val, item_name, item_code)))
+
+    keyed.sort(key=lambda k: (k[0], k[1]))
+    facts.events = [event for _, _, event in keyed]
+    return facts
+
+def cross_check(source_dir=SOURCE_DIR, allow_separate=True):
+    """Compare both backends on every file; returns the names of files whose facts differ"""
+    from company_index import load_company_index
+    company_name_to_code = load_company_index(source_dir).name_to_code
+
+    mismatched = []
+    for filename in sorted(os.listdir(source_dir)):
+        if not filename.endswith('.csv'):
+            continue
+        filepath = os.path.join(source_dir, filename)
+        rows = extract_file_facts(filepath, filename, company_name_to_code, allow_separate)
+        frame = extract_file_facts_df(filepath, filename, company_name_to_code, allow_separate)
+        if rows is None and frame is None:
+            continue
+        same = (rows is not None and frame is not None
+                and (rows.error, rows.first_seen, rows.events) == (frame.error, frame.first_seen, frame.events))
+        events = len(rows.events) if rows is not None else 0
+        print(f"{'OK  ' if same else 'DIFF'} {filename} ({events} events)")
+        if not same:
+            mismatched.append(filename)
+    return mismatched
+
+if __name__ == '__main__':
+    require_pandas()
+    mismatched = cross_check()
+    if mismatched:
+        print(f"\n{len(mismatched)} files differ between the row parser and the DataFrame backend")
+        sys.exit(1)
+    print("\nRow parser and DataFrame backend produce identical facts")
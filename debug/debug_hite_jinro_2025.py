@@ -1,5 +1,10 @@
-import csv
+import os
 import re
+import sys
+
+# Repo root, for the shared row index
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from row_index import iter_company_rows
 
 csv_file = r"c:\Users\laser\OneDrive\2026\vibecode\korean_stock\csv_output\2025_반기보고서_03_포괄손익계산서_연결_20260107.csv"
 
@@ -15,18 +20,8 @@ def parse_value(v):
     except:
         return None
 
-# Read CSV
-encoding_candidates = ['utf-8-sig', 'cp949', 'utf-8', 'euc-kr']
-rows = []
-
-for enc in encoding_candidates:
-    try:
-        with open(csv_file, 'r', encoding=enc, newline='') as f:
-            reader = csv.reader(f)
-            rows = list(reader)
-        break
-    except (UnicodeDecodeError, csv.Error):
-        continue
+# Read the header and 하이트진로 (000080) rows only, via the row index
+rows = list(iter_company_rows(csv_file, codes=['000080'])) if os.path.exists(csv_file) else []
 
 if not rows:
     print("Failed to read file")
@@ -1,7 +1,13 @@
+import os
+import sys
 import json
-import csv
 import re
 
+# Repo root, for the company and row indexes
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from row_index import iter_company_rows
+from company_index import load_company_index
+
 def parse_value(v):
     if not v or v.strip() == '': return None
     try:
@@ -26,12 +32,12 @@ posco = data.get('005490', {})
 print(f"\nCurrent name in financial_data.json: {posco.get('name', 'N/A')}")
 print(f"Expected name: POSCO홀딩스")
 
-# Check company_code_mapping.json
-with open('company_code_mapping.json', 'r', encoding='utf-8') as f:
-    mapping = json.load(f)
+# Check the company index (company_index.json)
+index = load_company_index()
 
-code_to_name = mapping.get('code_to_company_name', {})
-print(f"\nName in code_to_company_name mapping: {code_to_name.get('005490', 'N/A')}")
+print(f"\nName in company index: {index.latest_name('005490') or 'N/A'}")
+for name, seen in index.names('005490').items():
+    print(f"  {name}: {seen['first_seen']} ~ {seen['last_seen']}")
 
 print("\n" + "=" * 80)
 print("ISSUE 2: 2022 Q4 Calculation")
@@ -52,8 +58,10 @@ print("-" * 80)
 # Check 2022 Q3 Report
 print("\n1. 2022 Q3 Report (3분기보고서):")
 filepath = 'csv_output/2022_3분기보고서_03_포괄손익계산서_연결_20240611.csv'
-with open(filepath, 'r', encoding='utf-8-sig') as f:
-    reader = csv.reader(f)
+val_13 = None
+if os.path.exists(filepath):
+    # Only POSCO rows, via the row index
+    reader = iter_company_rows(filepath, codes=['005490'])
     headers = [clean_header(h) for h in next(reader)]
 
     # Find indices
@@ -82,8 +90,10 @@ with open(filepath, 'r', encoding='utf-8-sig') as f:
 # Check 2022 Annual Report
 print("\n2. 2022 Annual Report (사업보고서):")
 filepath = 'csv_output/2022_사업보고서_03_포괄손익계산서_연결_20251113.csv'
-with open(filepath, 'r', encoding='utf-8-sig') as f:
-    reader = csv.reader(f)
+val_11 = None
+val_15 = None
+if os.path.exists(filepath):
+    reader = iter_company_rows(filepath, codes=['005490'])
     headers = [clean_header(h) for h in next(reader)]
 
     # Find indices
@@ -97,8 +107,6 @@ with open(filepath, 'r', encoding='utf-8-sig') as f:
             print(f"    Column {i}: {h}")
 
     # Find POSCO revenue row
-    val_11 = None
-    val_15 = None
     for row in reader:
         if '[005490]' in row[code_idx] and '매출액' == row[item_name_idx]:
             print(f"\n  POSCO 매출액 row found:")
@@ -1,5 +1,10 @@
-import process_data
 import os
+import sys
+
+# Repo root
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+import process_data
+from row_index import iter_company_rows
 
 # Monkey patch to add detailed tracing
 original_process = process_data.FinancialParser.process_file
@@ -11,7 +16,7 @@ def traced_process(self, filepath, filename, allow_separate=False):
         print(f"TRACING: {filename}")
         print(f"{'='*80}")
 
-        import csv, re
+        import re
 
         def clean_header(h):
             return h.replace(' ', '').replace('\xa0', '').strip()
@@ -25,49 +30,48 @@ def traced_process(self, filepath, filename, allow_separate=False):
             except:
                 return None
 
-        # Read the file
-        with open(filepath, 'r', encoding='utf-8-sig') as f:
-            reader = csv.reader(f)
-            headers = [clean_header(h) for h in next(reader)]
-
-            print(f"\nColumn headers containing '당기' or '전기':")
-            for i, h in enumerate(headers):
-                if '당기' in h or '전기' in h:
-                    print(f"  Column {i}: {h}")
-
-            # Find POSCO 매출액 rows
-            posco_found = False
-            for row in reader:
-                if len(row) > 1:
-                    # Check for POSCO code
-                    code_cell = row[1] if len(row) > 1 else ''
-                    if '005490' in code_cell or '[005490]' in code_cell:
-                        # Check if this is 매출액 row
-                        item_name_col = None
-                        for i, h in enumerate(headers):
-                            if h == '항목명':
-                                item_name_col = i
-                                break
-
-                        if item_name_col and len(row) > item_name_col:
-                            item_name = row[item_name_col].strip()
-                            if '매출액' == item_name:
-                                posco_found = True
-                                print(f"\n>>> FOUND POSCO 매출액 row:")
-                                print(f"    종목코드: {row[1]}")
-                                print(f"    회사명: {row[2] if len(row) > 2 else 'N/A'}")
-                                print(f"    항목명: {item_name}")
-
-                                # Show all period values
-                                for i, h in enumerate(headers):
-                                    if '당기' in h or '전기' in h:
-                                        val = parse_value(row[i]) if len(row) > i else None
-                                        if val:
-                                            print(f"    {h:30s} (col {i:2d}): {val:20,} = {val/100000000:10,.1f} 억")
-                                break
-
-            if not posco_found:
-                print(f"\n>>> POSCO 매출액 row NOT FOUND in this file")
+        # Read only POSCO rows, via the row index
+        reader = iter_company_rows(filepath, codes=['005490'])
+        headers = [clean_header(h) for h in next(reader)]
+
+        print(f"\nColumn headers containing '당기' or '전기':")
+        for i, h in enumerate(headers):
+            if '당기' in h or '전기' in h:
+                print(f"  Column {i}: {h}")
+
+        # Find POSCO 매출액 rows
+        posco_found = False
+        for row in reader:
+            if len(row) > 1:
+                # Check for POSCO code
+                code_cell = row[1] if len(row) > 1 else ''
+                if '005490' in code_cell or '[005490]' in code_cell:
+                    # Check if this is 매출액 row
+                    item_name_col = None
+                    for i, h in enumerate(headers):
+                        if h == '항목명':
+                            item_name_col = i
+                            break
+
+                    if item_name_col and len(row) > item_name_col:
+                        item_name = row[item_name_col].strip()
+                        if '매출액' == item_name:
+                            posco_found = True
+                            print(f"\n>>> FOUND POSCO 매출액 row:")
+                            print(f"    종목코드: {row[1]}")
+                            print(f"    회사명: {row[2] if len(row) > 2 else 'N/A'}")
+                            print(f"    항목명: {item_name}")
+
+                            # Show all period values
+                            for i, h in enumerate(headers):
+                                if '당기' in h or '전기' in h:
+                                    val = parse_value(row[i]) if len(row) > i else None
+                                    if val:
+                                        print(f"    {h:30s} (col {i:2d}): {val:20,} = {val/100000000:10,.1f} 억")
+                            break
+
+        if not posco_found:
+            print(f"\n>>> POSCO 매출액 row NOT FOUND in this file")
 
     # Call original
     result = original_process(self, filepath, filename, allow_separate)
@@ -89,6 +93,7 @@ def traced_process(self, filepath, filename, allow_separate=False):
 process_data.FinancialParser.process_file = traced_process
 
 parser = process_data.FinancialParser()
+parser.codes = {'005490'}  # Only POSCO rows are read from each file
 files = sorted(os.listdir(process_data.SOURCE_DIR))
 
 parser.build_company_mapping(files)
@@ -5,10 +5,14 @@ Expected values:
 - 2023 4Q: 67,779,900,000,000 (67.78조)
 """
 import os
-import csv
 import re
+import sys
 import json
 
+# Repo root, for the shared row index
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from row_index import iter_company_rows
+
 def clean_header(h):
     return h.replace(' ', '').replace('\xa0', '').strip()
 
@@ -44,9 +48,8 @@ for year in [2024, 2025]:
     filepath = os.path.join(CSV_DIR, matching_files[0])
     print(f"\n  파일: {matching_files[0]}")
 
-    with open(filepath, 'r', encoding='utf-8-sig', newline='') as f:
-        reader = csv.reader(f)
-        rows = list(reader)
+    # Only 삼성전자 rows, via the row index
+    rows = list(iter_company_rows(filepath, codes=[SAMSUNG_CODE]))
 
     headers = [clean_header(h) for h in rows[0]]
     col_map = {h: idx for idx, h in enumerate(headers) if h}
@@ -100,9 +103,7 @@ for year in [2023, 2024]:
     filepath = os.path.join(CSV_DIR, matching_files[0])
     print(f"\n  파일: {matching_files[0]}")
 
-    with open(filepath, 'r', encoding='utf-8-sig', newline='') as f:
-        reader = csv.reader(f)
-        rows = list(reader)
+    rows = list(iter_company_rows(filepath, codes=[SAMSUNG_CODE]))
 
     headers = [clean_header(h) for h in rows[0]]
     col_map = {h: idx for idx, h in enumerate(headers) if h}
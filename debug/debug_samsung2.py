@@ -4,13 +4,17 @@ Simplified debug: Check if Samsung data exists in internal data structure
 import os
 import sys
 
-# Add current directory to path
-sys.path.insert(0, os.path.dirname(__file__))
+# Add repo root to path
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
 
 # Import the parser
 from process_data import FinancialParser
 
+# Check Samsung data
+SAMSUNG_CODE = '005930'
+
 parser = FinancialParser()
+parser.codes = {SAMSUNG_CODE}  # Read only 삼성전자 rows via the row index
 files = sorted(os.listdir('csv_output'))
 
 # Build company mapping
@@ -21,9 +25,6 @@ for f in files:
     if f.endswith('.csv'):
         parser.process_file(os.path.join('csv_output', f), f)
 
-# Check Samsung data
-SAMSUNG_CODE = '005930'
-
 if SAMSUNG_CODE in parser.data:
     print(f"=== 삼성전자 ({SAMSUNG_CODE}) 내부 데이터 구조 ===\n")
     
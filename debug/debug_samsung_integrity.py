@@ -3,6 +3,10 @@ import re
 import sys
 sys.stdout.reconfigure(encoding='utf-8')
 
+# Repo root, for the shared row index
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from row_index import iter_company_rows
+
 SOURCE_DIR = "손익계산서"
 TARGET_CODE = '005930'
 FILENAME = "2023_사업보고서_03_포괄손익계산서_연결_20251206.txt"
@@ -15,14 +19,13 @@ def normalize_code(code):
     return re.sub(r'[^\d]', '', code).zfill(6)
 
 filepath = os.path.join(SOURCE_DIR, FILENAME)
-try:
-    with open(filepath, encoding='cp949') as f:
-        lines = f.readlines()
-except:
+# Header plus the rows of TARGET_CODE only, via the row index
+rows = list(iter_company_rows(filepath, codes=[TARGET_CODE], delimiter='\t')) if os.path.exists(filepath) else []
+if not rows:
     print(f"Failed to read {FILENAME}")
     sys.exit(1)
 
-headers = [clean_header(h) for h in lines[0].split('\t')]
+headers = [clean_header(h) for h in rows[0]]
 col_map = {h: idx for idx, h in enumerate(headers) if h}
 col_code = col_map.get('종목코드')
 col_name = col_map.get('회사명')
@@ -33,12 +36,10 @@ print(f"Header Count: {len(headers)}")
 print(f"Max Col Index: {max(col_map.values())}")
 print(f"Columns: {col_map}")
 
-print(f"\nScanning ALL lines for {TARGET_CODE}...")
+print(f"\nScanning indexed rows for {TARGET_CODE}...")
 
 found_count = 0
-for i, line in enumerate(lines[1:], start=2):
-    parts = line.split('\t')
-    
+for i, parts in enumerate(rows[1:], start=1):
     # Try to find target code at known column index
     if len(parts) > col_code:
         row_code = normalize_code(parts[col_code])
@@ -52,7 +53,7 @@ for i, line in enumerate(lines[1:], start=2):
                 status = f"SHORT ({len(parts)} < {max(col_map.values()) + 1})"
                 
             if found_count <= 20 or 'Revenue' in item_c or '매출' in item_n:
-                print(f"Line {i} [{status}]: {item_c} | {item_n}")
+                print(f"Row {i} [{status}]: {item_c} | {item_n}")
 
 if found_count == 0:
     print("No lines found for Samsung Electronics found.")
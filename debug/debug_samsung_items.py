@@ -3,6 +3,10 @@ import re
 import sys
 sys.stdout.reconfigure(encoding='utf-8')
 
+# Repo root, for the shared row index
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from row_index import iter_company_rows
+
 SOURCE_DIR = "손익계산서"
 TARGET_CODE = '005930'
 FILENAME = "2023_사업보고서_03_포괄손익계산서_연결_20251206.txt"
@@ -22,10 +26,10 @@ def normalize_code(code):
     return re.sub(r'[^\d]', '', code).zfill(6)
 
 filepath = os.path.join(SOURCE_DIR, FILENAME)
-with open(filepath, encoding='cp949') as f:
-    lines = f.readlines()
+# Header plus the rows of TARGET_CODE only, via the row index
+rows = list(iter_company_rows(filepath, codes=[TARGET_CODE], delimiter='\t'))
 
-headers = [clean_header(h) for h in lines[0].split('\t')]
+headers = [clean_header(h) for h in rows[0]]
 col_map = {h: idx for idx, h in enumerate(headers) if h}
 col_code = col_map.get('종목코드')
 col_item_code = col_map.get('항목코드')
@@ -33,8 +37,7 @@ col_item_name = col_map.get('항목명')
 
 print(f"Scanning items for {TARGET_CODE} in {FILENAME}...")
 
-for line in lines[1:]:
-    parts = line.split('\t')
+for parts in rows[1:]:
     if len(parts) < max(col_map.values()) + 1: continue
     
     row_code = normalize_code(parts[col_code])
@@ -3,6 +3,10 @@ import re
 import sys
 sys.stdout.reconfigure(encoding='utf-8')
 
+# Repo root, for the shared row index
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from row_index import iter_company_rows
+
 SOURCE_DIR = "손익계산서"
 TARGET_CODE = '005930'
 # Check '손익계산서' (02) instead of '포괄손익계산서' (03)
@@ -22,18 +26,17 @@ def normalize_code(code):
     if not code: return None
     return re.sub(r'[^\d]', '', code).zfill(6)
 
-with open(filepath, encoding='cp949') as f:
-    lines = f.readlines()
+# Header plus the rows of TARGET_CODE only, via the row index
+rows = list(iter_company_rows(filepath, codes=[TARGET_CODE], delimiter='\t'))
 
-headers = [clean_header(h) for h in lines[0].split('\t')]
+headers = [clean_header(h) for h in rows[0]]
 col_map = {h: idx for idx, h in enumerate(headers) if h}
 col_code = col_map.get('종목코드')
 col_item_code = col_map.get('항목코드')
 col_item_name = col_map.get('항목명')
 
 found_count = 0
-for i, line in enumerate(lines[1:], start=2):
-    parts = line.split('\t')
+for i, parts in enumerate(rows[1:], start=1):
     if len(parts) < max(col_map.values()) + 1: continue
     
     row_code = normalize_code(parts[col_code])
@@ -43,7 +46,7 @@ for i, line in enumerate(lines[1:], start=2):
         item_n = parts[col_item_name].strip()
         
         if 'Revenue' in item_c or '매출' in item_n:
-            print(f"  Line {i}: {item_c} | {item_n}")
+            print(f"  Row {i}: {item_c} | {item_n}")
 
 if found_count > 0:
     print(f"\nFound {found_count} lines for Samsung Electronics in '손익계산서' file.")
@@ -0,0 +1,82 @@
+"""
+External sort of parsed facts into per-company groups
+
+The parsers keep every company's facts in memory until compile_final_data.
+FactRuns is the alternative used by `process_data.py --streaming`: records
+(code, seq, ...) are buffered up to `run_size`, sorted and spilled to a run
+file on disk, and groups() k-way merges the runs back into one list of
+records per company, in code order and, within a company, in `seq`
+(precedence) order. Peak memory is one run buffer plus one company, however
+many companies and years the corpus has.
+"""
+import os
+import heapq
+import pickle
+import shutil
+import tempfile
+import itertools
+
+DEFAULT_RUN_SIZE = 50000
+# Records per pickle frame in a run file. groups() holds one frame per run,
+# so this times the number of runs is the merge's buffer
+BATCH_SIZE = 256
+
+def _record_key(record):
+    return (record[0], record[1])
+
+def _read_run(path):
+    with open(path, 'rb') as f:
+        while True:
+            try:
+                batch = pickle.load(f)
+            except EOFError:
+                return
+            yield from batch
+
+class FactRuns:
+    """Sorted on-disk runs of (code, seq, ...) records"""
+
+    def __init__(self, run_size=DEFAULT_RUN_SIZE, tmp_dir=None):
+        self.run_size = run_size
+        self.tmp_dir = tempfile.mkdtemp(prefix='fact_runs_', dir=tmp_dir)
+        self.runs = []
+        self.buffer = []
+        self.records = 0
+
+    def add(self, record):
+        self.buffer.append(record)
+        self.records += 1
+        if len(self.buffer) >= self.run_size:
+            self._spill()
+
+    def _spill(self):
+        if not self.buffer:
+            return
+        self.buffer.sort(key=_record_key)
+        path = os.path.join(self.tmp_dir, f'run_{len(self.runs):05d}.pkl')
+        with open(path, 'wb') as f:
+            for start in range(0, len(self.buffer), BATCH_SIZE):
+                pickle.dump(self.buffer[start:start + BATCH_SIZE], f, pickle.HIGHEST_PROTOCOL)
+        self.runs.append(path)
+        self.buffer = []
+
+    @property
+    def run_count(self):
+        """Runs on disk plus the one the buffer will become"""
+        return len(self.runs) + (1 if self.buffer else 0)
+
+    def groups(self):
+        """Yield (code, records) per company in code order, records in seq order"""
+        self._spill()
+        merged = heapq.merge(*(_read_run(path) for path in self.runs), key=_record_key)
+        for code, records in itertools.groupby(merged, key=lambda record: record[0]):
+            yield code, list(records)
+
+    def close(self):
+        shutil.rmtree(self.tmp_dir, ignore_errors=True)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
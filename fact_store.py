@@ -0,0 +1,190 @@
+"""
+Compact store for parsed financial facts
+
+FinancialParser used to keep its facts in
+defaultdict(defaultdict(defaultdict(dict))) keyed code -> year -> period ->
+metric, with '_meta_{metric}_name/_code' strings next to the periods of each
+year. FactStore keeps the same facts in flat arrays instead:
+
+    values  int64, one cell per [company-year slot, period, metric]
+    mask    1 where a value was stored (0 cells are "missing", like NaN)
+    meta    int32 ids into an interned string table, [slot, metric, name/code]
+
+A (code, year) pair is mapped to a slot once; everything else is array
+indexing. Reads used by compile_final_data and find_companies_with_missing_quarters
+go through year_data(), which returns the old dict shape for one year, or
+period_table(), which hands whole (period, metric) columns to
+period_derivation.py. The store also answers `code in store`, store[code][year] and store.get(code, {})
+so existing debug scripts keep working.
+"""
+import array
+
+from period_derivation import PeriodTable
+
+# Cells are int64; amounts outside that range (never seen in DART filings) go to a side dict
+INT64_MIN = -(1 << 63)
+INT64_MAX = (1 << 63) - 1
+
+class FactStore:
+    """Facts per (code, year, period, metric) with first-wins values and last-wins meta"""
+
+    def __init__(self, periods, metrics):
+        self.periods = list(periods)
+        self.metrics = list(metrics)
+        self._period_idx = {p: i for i, p in enumerate(self.periods)}
+        self._metric_idx = {m: i for i, m in enumerate(self.metrics)}
+        self._width = len(self.periods) * len(self.metrics)
+
+        self._slots = {}  # code -> {year: slot}
+        self.values = array.array('q')
+        self.mask = array.array('B')
+        self.meta = array.array('i')  # -1 = not set
+        self._overflow = {}  # cell -> value outside int64
+
+        self.strings = []  # interned item names / item codes
+        self._string_ids = {}
+
+    # --- writing -----------------------------------------------------------
+
+    def _slot(self, code, year):
+        years = self._slots.get(code)
+        if years is None:
+            years = self._slots[code] = {}
+        slot = years.get(year)
+        if slot is None:
+            slot = years[year] = len(self.values) // self._width
+            self.values.extend([0] * self._width)
+            self.mask.extend([0] * self._width)
+            self.meta.extend([-1] * (2 * len(self.metrics)))
+        return slot
+
+    def _intern(self, s):
+        sid = self._string_ids.get(s)
+        if sid is None:
+            sid = self._string_ids[s] = len(self.strings)
+            self.strings.append(s)
+        return sid
+
+    def set_meta(self, code, year, metric, item_name, item_code):
+        """Record the item a metric came from (the last call wins)"""
+        pos = 2 * (self._slot(code, year) * len(self.metrics) + self._metric_idx[metric])
+        self.meta[pos] = self._intern(item_name)
+        self.meta[pos + 1] = self._intern(item_code)
+
+    def set_default(self, code, year, period, metric, val):
+        """Store val unless the cell already has a value (the first call wins)"""
+        cell = (self._slot(code, year) * len(self.periods) + self._period_idx[period]) * len(self.metrics) \
+            + self._metric_idx[metric]
+        if self.mask[cell]:
+            return False
+        if INT64_MIN <= val <= INT64_MAX:
+            self.values[cell] = val
+        else:
+            self._overflow[cell] = val
+        self.mask[cell] = 1
+        return True
+
+    # --- reading -----------------------------------------------------------
+
+    def _value(self, cell):
+        if not self.mask[cell]:
+            return None
+        if cell in self._overflow:
+            return self._overflow[cell]
+        return self.values[cell]
+
+    def get_value(self, code, year, period, metric):
+        slot = self._slots.get(code, {}).get(year)
+        if slot is None:
+            return None
+        cell = (slot * len(self.periods) + self._period_idx[period]) * len(self.metrics) + self._metric_idx[metric]
+        return self._value(cell)
+
+    def codes(self):
+        return self._slots.keys()
+
+    def years(self, code):
+        return self._slots.get(code, {}).keys()
+
+    def slot(self, code, year):
+        """Row of (code, year) in period_table(), or None"""
+        return self._slots.get(code, {}).get(year)
+
+    def year_meta(self, code, year):
+        """'_meta_{metric}_name/_code' entries of one year"""
+        slot = self.slot(code, year)
+        meta = {}
+        if slot is None:
+            return meta
+        for m_idx, metric in enumerate(self.metrics):
+            pos = 2 * (slot * len(self.metrics) + m_idx)
+            if self.meta[pos] >= 0:
+                meta[f'_meta_{metric}_name'] = self.strings[self.meta[pos]]
+                meta[f'_meta_{metric}_code'] = self.strings[self.meta[pos + 1]]
+        return meta
+
+    def period_table(self):
+        """PeriodTable of every (period, metric) column, one row per slot"""
+        size = len(self)
+        table = PeriodTable(self.metrics, size)
+        stride = self._width
+        for p_idx, period in enumerate(self.periods):
+            for m_idx, metric in enumerate(self.metrics):
+                start = p_idx * len(self.metrics) + m_idx
+                mask = self.mask[start::stride]
+                if not any(mask):
+                    continue
+                column = [v if k else None for v, k in zip(self.values[start::stride], mask)]
+                for cell, val in self._overflow.items():
+                    if cell % stride == start:
+                        column[cell // stride] = val
+                table.set_column(period, metric, column)
+        return table
+
+    def year_data(self, code, year):
+        """One year as {period: {metric: value}, '_meta_{metric}_name/_code': str}
+
+        Only periods with at least one value appear, as with the nested dicts
+        this store replaced. Returns {} for an unknown (code, year).
+        """
+        slot = self._slots.get(code, {}).get(year)
+        if slot is None:
+            return {}
+
+        n_metrics = len(self.metrics)
+        y_data = self.year_meta(code, year)
+
+        for p_idx, period in enumerate(self.periods):
+            base = (slot * len(self.periods) + p_idx) * n_metrics
+            period_data = {}
+            for m_idx, metric in enumerate(self.metrics):
+                val = self._value(base + m_idx)
+                if val is not None:
+                    period_data[metric] = val
+            if period_data:
+                y_data[period] = period_data
+        return y_data
+
+    def nbytes(self):
+        """Approximate size of the arrays (excluding the slot dicts and strings)"""
+        return sum(a.itemsize * len(a) for a in (self.values, self.mask, self.meta))
+
+    def __len__(self):
+        """Number of (code, year) slots"""
+        return len(self.values) // self._width if self._width else 0
+
+    # --- read-only mapping access (code -> year -> year_data) --------------
+
+    def __contains__(self, code):
+        return code in self._slots
+
+    def __getitem__(self, code):
+        if code not in self._slots:
+            raise KeyError(code)
+        return {year: self.year_data(code, year) for year in self._slots[code]}
+
+    def get(self, code, default=None):
+        return self[code] if code in self._slots else default
+
+    def keys(self):
+        return self._slots.keys()
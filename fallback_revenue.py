@@ -0,0 +1,208 @@
+"""
+Compact fallback revenue candidates and recorded decisions for ambiguous groups
+
+Rows whose revenue is only recognizable by a Korean name (see 'fallback_names'
+in METRICS) are kept as candidates until process_fallback_revenue picks one
+per (company, year). A candidate used to be a dict holding the whole CSV row
+and its column map; FallbackCandidate keeps only the period values, already
+parsed, and ids into a StringTable for the item code, item name and file.
+
+When the priority rules cannot pick a candidate, the (company, year) group is
+written to QUEUE_FILE. A decision recorded in DECISIONS_FILE, keyed by the
+group's fingerprint, is applied automatically on later runs. The fingerprint
+covers every candidate of the group, so a new filing adding a candidate puts
+the group back in the queue.
+
+Usage:
+    python fallback_revenue.py                                  # list queued groups
+    python fallback_revenue.py decide <group> [<candidate> ...]  # use these candidates
+                                                                # (fingerprint or item code)
+    python fallback_revenue.py decide <group>                    # use none of them
+"""
+import os
+import sys
+import json
+import hashlib
+
+# CONFIGURATION
+QUEUE_FILE = "fallback_revenue_queue.json"
+DECISIONS_FILE = "fallback_revenue_decisions.json"
+
+class StringTable:
+    """Interned strings: intern(s) -> id, table[id] -> s"""
+
+    def __init__(self):
+        self.strings = []
+        self._ids = {}
+
+    def intern(self, s):
+        sid = self._ids.get(s)
+        if sid is None:
+            sid = self._ids[s] = len(self.strings)
+            self.strings.append(s)
+        return sid
+
+    def __getitem__(self, sid):
+        return self.strings[sid]
+
+    def __len__(self):
+        return len(self.strings)
+
+class FallbackCandidate:
+    """One fallback revenue row; string fields are StringTable ids"""
+    __slots__ = ('item_code', 'item_name', 'clean_name', 'filename', 'values')
+
+    def __init__(self, item_code, item_name, clean_name, filename, values):
+        self.item_code = item_code
+        self.item_name = item_name
+        self.clean_name = clean_name
+        self.filename = filename
+        self.values = values  # ((period_key, value), ...) in target period order
+
+def parse_period_values(row, col_idx_map, parse_value):
+    """((period_key, value), ...) for the periods of col_idx_map that have a value in row"""
+    values = []
+    for period_key, col_idx in col_idx_map.items():
+        if col_idx is not None and col_idx < len(row):
+            val = parse_value(row[col_idx])
+            if val is not None:
+                values.append((period_key, val))
+    return tuple(values)
+
+def make_candidate(strings, item_code, item_name, clean_name, filename, values):
+    return FallbackCandidate(strings.intern(item_code), strings.intern(item_name),
+                             strings.intern(clean_name), strings.intern(filename), values)
+
+# --- ambiguity decisions ---------------------------------------------------
+
+def candidate_fingerprint(cand, strings):
+    key = '\t'.join((strings[cand.item_code], strings[cand.item_name], strings[cand.filename]))
+    return hashlib.sha1(key.encode('utf-8')).hexdigest()[:12]
+
+def group_fingerprint(code, year, candidates, strings):
+    key = '\t'.join([code, str(year)] + sorted(candidate_fingerprint(c, strings) for c in candidates))
+    return hashlib.sha1(key.encode('utf-8')).hexdigest()[:16]
+
+def _load_json(path, default):
+    if not os.path.exists(path):
+        return default
+    with open(path, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+def _save_json(data, path):
+    with open(path + '.tmp', 'w', encoding='utf-8') as f:
+        json.dump(data, f, ensure_ascii=False, indent=2)
+    os.replace(path + '.tmp', path)
+
+class FallbackDecisions:
+    """Recorded decisions for one parser plus the groups it could not settle this run
+
+    `source` names the parser's section of QUEUE_FILE ('quarterly', 'annual').
+    """
+
+    def __init__(self, source, decisions_path=DECISIONS_FILE, queue_path=QUEUE_FILE):
+        self.source = source
+        self.decisions_path = decisions_path
+        self.queue_path = queue_path
+        self.decisions = _load_json(decisions_path, {})
+        self.queue = {}  # group fingerprint -> queue entry
+        self.applied = 0
+
+    def resolve(self, code, year, candidates, strings):
+        """Candidates chosen by a recorded decision, or None if the group is undecided"""
+        decision = self.decisions.get(group_fingerprint(code, year, candidates, strings))
+        if decision is None:
+            return None
+        self.applied += 1
+        selected = set(decision['select'])
+        return [c for c in candidates if candidate_fingerprint(c, strings) in selected]
+
+    def enqueue(self, code, name, year, candidates, strings):
+        fingerprint = group_fingerprint(code, year, candidates, strings)
+        self.queue[fingerprint] = {
+            'code': code,
+            'name': name,
+            'year': year,
+            'candidates': [{
+                'fingerprint': candidate_fingerprint(c, strings),
+                'item_code': strings[c.item_code],
+                'item_name': strings[c.item_name],
+                'file': strings[c.filename],
+                'amounts': dict(c.values),
+            } for c in candidates],
+        }
+
+    def save_queue(self, codes=None):
+        """Replace this parser's section of QUEUE_FILE (only the given codes' entries if codes is set)"""
+        queue = _load_json(self.queue_path, {})
+        section = queue.get(self.source, {})
+        if codes is None:
+            section = {}
+        else:
+            section = {fp: e for fp, e in section.items() if e['code'] not in codes}
+        section.update(self.queue)
+        queue[self.source] = dict(sorted(section.items(), key=lambda item: (item[1]['code'], item[1]['year'], item[0])))
+        _save_json(queue, self.queue_path)
+
+        if self.applied:
+            print(f"Applied {self.applied} recorded fallback revenue decisions ({self.decisions_path})")
+        if self.queue:
+            print(f"{len(self.queue)} undecided fallback revenue groups written to {self.queue_path} "
+                  f"(record decisions with: python fallback_revenue.py decide <group> [<candidate> ...])")
+
+def record_decision(group, selectors, queue_path=QUEUE_FILE, decisions_path=DECISIONS_FILE):
+    """Record which candidates of a queued group to use
+
+    A selector is a candidate fingerprint or an item code; an item code selects
+    that item in every file of the group.
+    """
+    queue = _load_json(queue_path, {})
+    entry = None
+    for section in queue.values():
+        if group in section:
+            entry = section[group]
+            break
+    if entry is None:
+        raise KeyError(f"Group {group} is not in {queue_path}")
+
+    selected = []
+    for selector in selectors:
+        matches = [c['fingerprint'] for c in entry['candidates'] if selector in (c['fingerprint'], c['item_code'])]
+        if not matches:
+            raise KeyError(f"Group {group} has no candidate {selector}")
+        selected.extend(fp for fp in matches if fp not in selected)
+
+    decisions = _load_json(decisions_path, {})
+    decisions[group] = {
+        'code': entry['code'],
+        'name': entry['name'],
+        'year': entry['year'],
+        'select': selected,
+        'items': [f"{c['item_name']} ({c['item_code']}, {c['file']})"
+                  for c in entry['candidates'] if c['fingerprint'] in selected],
+    }
+    _save_json(dict(sorted(decisions.items())), decisions_path)
+    return decisions[group]
+
+def main():
+    args = sys.argv[1:]
+    if args and args[0] == 'decide':
+        if len(args) < 2:
+            print(__doc__)
+            return
+        decision = record_decision(args[1], args[2:])
+        print(f"Recorded {args[1]} ({decision['code']} {decision['name']} {decision['year']}): "
+              f"{', '.join(decision['items']) or 'no fallback revenue'}")
+        return
+
+    queue = _load_json(QUEUE_FILE, {})
+    for source, section in queue.items():
+        print(f"=== {source}: {len(section)} undecided groups ===")
+        for fingerprint, entry in section.items():
+            print(f"\n{fingerprint}  {entry['code']} {entry['name']} {entry['year']}")
+            for cand in entry['candidates']:
+                amounts = ", ".join(f"{k}: {v:,}" for k, v in cand['amounts'].items()) or "금액 없음"
+                print(f"  {cand['fingerprint']}  {cand['item_name']} ({cand['item_code']})  {cand['file']}  {amounts}")
+
+if __name__ == '__main__':
+    main()
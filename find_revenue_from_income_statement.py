@@ -6,11 +6,13 @@
 """
 
 import os
-import csv
 import re
 import json
 from collections import defaultdict
 
+from dart_corpus import iter_rows, FileSchema
+from source_catalog import parse_filing, current_filenames
+
 # CONFIGURATION
 SOURCE_DIR = "csv_output"
 OUTPUT_FILE = "revenue_from_income_statement.json"
@@ -50,26 +52,15 @@ def extract_revenue_companies(filepath, filename):
     """CSV에서 revenue가 있는 기업 목록과 데이터 추출"""
     companies = {}
 
-    encoding_candidates = ['utf-8-sig', 'cp949', 'utf-8', 'euc-kr']
-    rows = []
-
-    for enc in encoding_candidates:
-        try:
-            with open(filepath, 'r', encoding=enc, newline='') as f:
-                reader = csv.reader(f)
-                rows = list(reader)
-            break
-        except (UnicodeDecodeError, csv.Error):
-            continue
+    rows = iter_rows(filepath)
+    header = next(rows, None)
 
-    if not rows:
+    if header is None:
         return companies
 
-    headers = [clean_header(h) for h in rows[0]]
-    col_map = {}
-    for idx, h in enumerate(headers):
-        if h:
-            col_map[h] = idx
+    headers = [clean_header(h) for h in header]
+    schema = FileSchema(header)
+    col_map = schema.col_map
 
     col_code = col_map.get('종목코드')
     col_name = col_map.get('회사명')
@@ -80,8 +71,11 @@ def extract_revenue_companies(filepath, filename):
     if col_code is None or col_item_code is None:
         return companies
 
-    for row in rows[1:]:
-        if len(row) <= max(col_map.values()):
+    # Header resolved once; the row loop only does indexed access
+    min_len = schema.min_len
+
+    for row in rows:
+        if len(row) < min_len:
             continue
 
         item_code = row[col_item_code].strip()
@@ -112,7 +106,7 @@ def extract_revenue_companies(filepath, filename):
     return companies
 
 def main():
-    files = sorted(os.listdir(SOURCE_DIR))
+    files = current_filenames(SOURCE_DIR)
 
     # 포괄손익계산서_연결 파일들
     comprehensive_files = get_files_by_pattern(files, '03_포괄손익계산서_연결')
@@ -124,10 +118,8 @@ def main():
 
     # 연도/분기별로 그룹화
     def extract_period(filename):
-        parts = filename.split('_')
-        year = parts[0]
-        report_type = parts[1]
-        return f"{year}_{report_type}"
+        filing = parse_filing(filename)
+        return f"{filing.year}_{filing.report_type}"
 
     # 포괄손익에 revenue 있는 기업들 (per period)
     comprehensive_revenue_by_period = defaultdict(set)
@@ -0,0 +1,175 @@
+"""
+Write a JSON object one entry at a time
+
+write_json_items(path, items) produces the same bytes as
+json.dump(dict(items), f, ensure_ascii=False, indent=2), but each value is
+serialized and written as it arrives, so the whole output never has to be in
+memory. Keys must be unique and arrive in the order they should appear.
+
+ShardWriter streams the same entries into compact shard files
+(<prefix>_00.json, <prefix>_01.json, ..., as json.dump(..., separators=(',', ':'))
+would write them), cut at a compressed-byte budget, and writes
+<prefix>_index.json when closed: the layout split_financial_data.py produces
+and src/dataLoader.js reads.
+"""
+import os
+import re
+import json
+import zlib
+
+try:
+    import brotli
+except ImportError:  # optional: shard sizes are measured with gzip instead
+    brotli = None
+
+INDENT = 2
+COMPACT = (',', ':')
+
+# Codec used to measure shard sizes: brotli (what browsers get from the CDN) when installed, else gzip
+DEFAULT_CODEC = 'brotli' if brotli is not None else 'gzip'
+BROTLI_QUALITY = 5   # fast setting; quality 11 only makes the real files smaller than measured
+GZIP_LEVEL = 6
+GZIP_WBITS = 31      # gzip container
+
+def _entry(key, value):
+    body = json.dumps(value, ensure_ascii=False, indent=INDENT)
+    body = body.replace('\n', '\n' + ' ' * INDENT)
+    return f'{" " * INDENT}{json.dumps(key, ensure_ascii=False)}: {body}'
+
+def _compact_entry(key, value):
+    return f'{json.dumps(key, ensure_ascii=False)}:{json.dumps(value, ensure_ascii=False, separators=COMPACT)}'
+
+class JsonObjectWriter:
+    """One pretty-printed JSON object (indent=2), written to path.tmp and moved into place on close"""
+
+    def __init__(self, path):
+        self.path = path
+        self.count = 0
+        self.f = open(path + '.tmp', 'w', encoding='utf-8')
+        self.f.write('{')
+
+    def add(self, key, value):
+        self.f.write(',\n' if self.count else '\n')
+        self.f.write(_entry(key, value))
+        self.count += 1
+
+    def close(self):
+        self.f.write('\n}' if self.count else '}')
+        self.f.close()
+        os.replace(self.path + '.tmp', self.path)
+        return self.count
+
+def write_json_items(path, items):
+    """Stream (key, value) pairs into `path` as one JSON object; returns the number of entries"""
+    writer = JsonObjectWriter(path)
+    for key, value in items:
+        writer.add(key, value)
+    return writer.close()
+
+class _CompressedSize:
+    """Compressed size of a text stream so far (flushed after every write, so slightly above one-shot)"""
+
+    def __init__(self, codec):
+        if codec == 'brotli':
+            self.c = brotli.Compressor(quality=BROTLI_QUALITY)
+            self._feed = lambda data: self.c.process(data) + self.c.flush()
+        else:
+            self.c = zlib.compressobj(GZIP_LEVEL, zlib.DEFLATED, GZIP_WBITS)
+            self._feed = lambda data: self.c.compress(data) + self.c.flush(zlib.Z_SYNC_FLUSH)
+        self.size = 0
+
+    def write(self, text):
+        self.size += len(self._feed(text.encode('utf-8')))
+
+def compressed_size(data, codec=DEFAULT_CODEC):
+    """Size of data (bytes) compressed in one shot with codec"""
+    if codec == 'brotli':
+        return len(brotli.compress(data, quality=BROTLI_QUALITY))
+    c = zlib.compressobj(GZIP_LEVEL, zlib.DEFLATED, GZIP_WBITS)
+    return len(c.compress(data) + c.flush())
+
+class ShardWriter:
+    """Compact shard files cut at a compressed-size budget, plus an index of their key ranges and sizes
+
+    Entries are packed into a shard until its compressed size, measured as
+    they are written, reaches budget_bytes (so a shard exceeds the budget by
+    less than one entry). The index records each shard's raw and one-shot
+    compressed size.
+
+    On close, <prefix>_NN.json files of an earlier build that the new index
+    does not list are deleted.
+    """
+
+    def __init__(self, output_dir, prefix, budget_bytes, source_file=None, codec=DEFAULT_CODEC):
+        self.output_dir = output_dir
+        self.prefix = prefix
+        self.budget_bytes = budget_bytes
+        self.source_file = source_file
+        self.codec = codec
+        self.chunks = []  # index entries of the closed shards
+        self.count = 0
+        self.f = None
+        self.measure = None
+        self.keys = []  # keys of the open shard
+        os.makedirs(output_dir, exist_ok=True)
+
+    def _write(self, text):
+        self.f.write(text)
+        self.measure.write(text)
+
+    def add(self, key, value):
+        if self.f is None:
+            filename = f"{self.prefix}_{len(self.chunks):02d}.json"
+            self.f = open(os.path.join(self.output_dir, filename), 'w', encoding='utf-8')
+            self.measure = _CompressedSize(self.codec)
+        self._write(('{' if not self.keys else ',') + _compact_entry(key, value))
+        self.keys.append(key)
+        self.count += 1
+        if self.measure.size >= self.budget_bytes:
+            self._close_shard()
+
+    def _chunk_entry(self, path, keys):
+        with open(path, 'rb') as f:
+            data = f.read()
+        return {
+            'file': os.path.basename(path),
+            'start': keys[0],
+            'end': keys[-1],
+            'count': len(keys),
+            'size_mb': round(len(data) / (1024 * 1024), 2),
+            'raw_bytes': len(data),
+            'compressed_bytes': compressed_size(data, self.codec)
+        }
+
+    def _close_shard(self):
+        self.f.write('}')
+        self.f.close()
+        self.chunks.append(self._chunk_entry(self.f.name, self.keys))
+        self.f = None
+        self.measure = None
+        self.keys = []
+
+    def close(self):
+        """Close the last shard and write <prefix>_index.json; returns the index entries of the shards"""
+        if self.f is not None:
+            self._close_shard()
+        index_data = {
+            'source_file': self.source_file,
+            'total_companies': self.count,
+            'num_chunks': len(self.chunks),
+            'compression': self.codec,
+            'budget_bytes': self.budget_bytes,
+            'chunks': self.chunks
+        }
+        with open(os.path.join(self.output_dir, f"{self.prefix}_index.json"), 'w', encoding='utf-8') as f:
+            json.dump(index_data, f, ensure_ascii=False, indent=2)
+        self._remove_stale_shards()
+        return self.chunks
+
+    def _remove_stale_shards(self):
+        shard_name = re.compile(re.escape(self.prefix) + r'_\d+\.json$')
+        current = {c['file'] for c in self.chunks}
+        for filename in sorted(os.listdir(self.output_dir)):
+            if shard_name.match(filename) and filename not in current:
+                os.remove(os.path.join(self.output_dir, filename))
+                print(f"Removed stale shard {filename}")
@@ -0,0 +1,117 @@
+"""
+Compiled METRICS classifier shared by the quarterly/annual/separate parsers
+
+The parsers used to run should_exclude_metric / matches_metric_code and the
+fallback-name loops for every row, although a corpus only has a few thousand
+distinct (item code, item name) pairs. MetricClassifier compiles a METRICS dict
+once (exact-code sets, one regex per substring rule list) and memoizes the
+decision per pair, so classifying a row is a dict lookup.
+"""
+import re
+import collections
+
+from overrides import OVERRIDES
+
+# Revenue codes that must match exactly (all other METRICS codes are substrings)
+EXACT_CODES = {'ifrs_Revenue', 'ifrs-full_Revenue'}
+
+Classification = collections.namedtuple('Classification', [
+    'skip',               # Cost of sales (CostOfSales / 매출원가): never a metric
+    'gross_profit',       # Gross profit (GrossProfit / 매출총이익 / 매출총손실)
+    'remapped',           # Some company remaps this item code (OVERRIDES.remapped_metric, see overrides.py)
+    'metric',             # First metric the item matches and is not excluded from, or None
+    'first_metric',       # Metric only if the first non-excluded metric matches (see classify)
+    'ifrs_revenue',       # metric == 'revenue' through an exact IFRS revenue code
+    'fallback',           # Name matches the revenue fallback names and none of their exclusions
+])
+
+def clean_header(h):
+    return h.replace(' ', '').replace('\xa0', '').strip()
+
+def _substring_pattern(words):
+    """Regex that finds any of the words (None if there are none)"""
+    if not words:
+        return None
+    return re.compile('|'.join(re.escape(w) for w in words))
+
+class MetricClassifier:
+    """Classify (item_code, item_name) pairs against a METRICS definition"""
+
+    def __init__(self, metrics, remapped_item_codes=None):
+        self.remapped_item_codes = (OVERRIDES.remapped_item_codes if remapped_item_codes is None
+                                    else frozenset(remapped_item_codes))
+        self.rules = []
+        for m_key, m_def in metrics.items():
+            codes = m_def.get('codes', [])
+            self.rules.append((
+                m_key,
+                _substring_pattern(m_def.get('exclude_codes', [])),
+                _substring_pattern(m_def.get('exclude_names', [])),
+                {c for c in codes if c in EXACT_CODES},
+                _substring_pattern([c for c in codes if c not in EXACT_CODES]),
+                _substring_pattern(m_def.get('names', [])),
+            ))
+
+        revenue = metrics.get('revenue', {})
+        self.fallback_names = _substring_pattern(revenue.get('fallback_names', []))
+        self.fallback_exclude = _substring_pattern(revenue.get('fallback_exclude_patterns', []))
+
+        self._cache = {}
+
+    def classify(self, item_code, item_name):
+        """Memoized Classification of one item
+
+        `metric` follows the parsers' rule: metrics are tried in METRICS order,
+        skipping those the item is excluded from. `first_metric` is the variant
+        used by Pass 1 of process_annual_data, which only tests the first metric
+        the item is not excluded from.
+        """
+        key = (item_code, item_name)
+        result = self._cache.get(key)
+        if result is None:
+            result = self._classify(item_code, item_name)
+            self._cache[key] = result
+        return result
+
+    def _classify(self, item_code, item_name):
+        clean_name = clean_header(item_name)
+
+        skip = 'CostOfSales' in item_code or '매출원가' in clean_name
+        gross_profit = 'GrossProfit' in item_code or '매출총이익' in clean_name or '매출총손실' in clean_name
+
+        metric = None
+        first_metric = None
+        first_tested = False
+        for m_key, exclude_codes, exclude_names, exact_codes, code_pattern, name_pattern in self.rules:
+            if exclude_codes is not None and exclude_codes.search(item_code):
+                continue
+            if exclude_names is not None and exclude_names.search(clean_name):
+                continue
+
+            matched = (item_code in exact_codes
+                       or (code_pattern is not None and code_pattern.search(item_code) is not None)
+                       or (name_pattern is not None and name_pattern.search(clean_name) is not None))
+            if not first_tested:
+                first_tested = True
+                if matched:
+                    first_metric = m_key
+            if matched:
+                metric = m_key
+                break
+
+        fallback = (self.fallback_names is not None
+                    and self.fallback_names.search(clean_name) is not None
+                    and (self.fallback_exclude is None or self.fallback_exclude.search(clean_name) is None))
+
+        return Classification(
+            skip=skip,
+            gross_profit=gross_profit,
+            remapped=item_code in self.remapped_item_codes,
+            metric=metric,
+            first_metric=first_metric,
+            ifrs_revenue=metric == 'revenue' and item_code in EXACT_CODES,
+            fallback=fallback,
+        )
+
+    def __len__(self):
+        return len(self._cache)
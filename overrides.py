@@ -0,0 +1,117 @@
+"""
+Company-specific overrides, declared in overrides.json
+
+Special cases used to be inlined in the parsers (Kakao's GrossProfit as
+revenue, POSCO's 2022 4Q revenue and name, the 포스코 -> 005490 code map,
+SK스퀘어's revenue + equity-method profit), several of them in every row
+of every file. The registry declares them once and compiles them into lookup
+tables:
+
+    code_aliases   company name -> stock code, for rows without a usable code
+    names          stock code -> display name in the outputs
+    item_remaps    (stock code, item code) -> metric (the item is used as that metric)
+    fixed_values   (stock code, year, period, metric) -> value, replacing the parsed/derived one
+    components     stock code -> [(metric, component)]: component is added to metric
+
+Item remaps are resolved in the row loop, but only for items whose
+Classification has `remapped` set (see metric_classifier.py), so other rows
+do not pay for them. The rest is applied after parsing: fix_values() and
+add_components() on a PeriodTable (period_derivation.py), apply_names() on
+the compiled output. Adding a fix is an edit to overrides.json.
+"""
+import os
+import json
+import collections
+
+OVERRIDES_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'overrides.json')
+
+QUARTERS = ('1Q', '2Q', '3Q', '4Q')
+
+class OverrideRegistry:
+    """Lookup tables compiled from the overrides.json entries"""
+
+    def __init__(self, entries):
+        self.code_aliases = dict(entries.get('code_aliases', {}))
+        self.names = dict(entries.get('names', {}))
+
+        self.item_remaps = {}
+        for remap in entries.get('item_remaps', []):
+            for item_code in remap['item_codes']:
+                self.item_remaps[(remap['code'], item_code)] = remap['metric']
+        # Item codes MetricClassifier flags as `remapped`
+        self.remapped_item_codes = frozenset(item_code for _, item_code in self.item_remaps)
+
+        self.fixed_values = {}
+        for fix in entries.get('fixed_values', []):
+            key = (fix['code'], fix['year'], fix['period'], fix['metric'])
+            self.fixed_values[key] = (fix['value'], fix.get('statement'))
+
+        self.components = collections.defaultdict(list)
+        for comp in entries.get('components', []):
+            self.components[comp['code']].append((comp['metric'], comp['component']))
+
+    def code_alias(self, company_name):
+        return self.code_aliases.get(company_name.strip())
+
+    def remapped_metric(self, code, item_code):
+        """Metric a company's item is remapped to, or None"""
+        return self.item_remaps.get((code, item_code))
+
+    def has_component(self, code, component):
+        return any(c == component for _, c in self.components.get(code, ()))
+
+    def fix_values(self, table, row_of, statement_of):
+        """Replace values in a PeriodTable; row_of(code, year) -> row or None
+
+        statement_of(code) is the statement type (연결/별도) the company's data
+        comes from; entries declared for another statement type are skipped.
+        Only cells that hold a value are replaced, so a fix never creates a
+        record the parsed/derived data does not have.
+        Returns the number of cells set.
+        """
+        count = 0
+        for (code, year, period, metric), (value, fix_statement) in self.fixed_values.items():
+            if fix_statement is not None and fix_statement != statement_of(code):
+                continue
+            row = row_of(code, year)
+            if row is None or metric not in table.metrics:
+                continue
+            column = list(table.column(period, metric))
+            if column[row] is None:
+                continue
+            column[row] = value
+            table.set_column(period, metric, column)
+            count += 1
+        return count
+
+    def add_components(self, table, code, periods=QUARTERS):
+        """Add code's component columns to their metric, where both have a value
+
+        Every row of the table belongs to `code` (one company's years).
+        Returns the (metric, component) pairs applied.
+        """
+        applied = self.components.get(code, [])
+        for metric, component in applied:
+            for period in periods:
+                if period not in table.columns:
+                    continue
+                table.set_column(period, metric, [
+                    v + c if v is not None and c is not None else v
+                    for v, c in zip(table.column(period, metric), table.column(period, component))
+                ])
+        return applied
+
+    def apply_names(self, output):
+        """Replace display names of the compiled output ({code: {'name': ...}}) in place"""
+        for code, name in self.names.items():
+            if code in output:
+                output[code]['name'] = name
+        return output
+
+def load_overrides(path=OVERRIDES_FILE):
+    if not os.path.exists(path):
+        return OverrideRegistry({})
+    with open(path, 'r', encoding='utf-8') as f:
+        return OverrideRegistry(json.load(f))
+
+OVERRIDES = load_overrides()
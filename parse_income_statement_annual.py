@@ -10,11 +10,14 @@ process_annual_data.py와 동일한 구조로 연간 데이터를 추출하되,
 출력: income_statement_annual.json
 """
 
-import os
-import csv
 import re
 import json
-from collections import defaultdict
+from collections import defaultdict, Counter
+
+from dart_corpus import iter_rows, FileSchema, CorpusConsumer
+from source_catalog import parse_filing, current_filenames
+from company_index import load_company_index
+from overrides import OVERRIDES
 
 # CONFIGURATION
 SOURCE_DIR = "csv_output"
@@ -63,92 +66,29 @@ def get_files_by_pattern(files, pattern):
     return [f for f in files if pattern in f and f.endswith('.csv')]
 
 def build_latest_company_names(source_dir):
-    """2025년 3분기 보고서에서 최신 회사명 매핑 추출"""
-    latest_names = {}
-
-    # 2025년 3분기 손익계산서 연결 파일 찾기
-    files = sorted(os.listdir(source_dir))
-    target_file = None
-    for f in files:
-        if '2025_3분기보고서_02_손익계산서_연결' in f:
-            target_file = f
-            break
-
-    if not target_file:
-        print("Warning: 2025년 3분기 보고서 파일을 찾을 수 없습니다.")
-        return latest_names
-
-    filepath = os.path.join(source_dir, target_file)
-    encoding_candidates = ['utf-8-sig', 'cp949', 'utf-8', 'euc-kr']
-    rows = []
-
-    for enc in encoding_candidates:
-        try:
-            with open(filepath, 'r', encoding=enc, newline='') as f:
-                reader = csv.reader(f)
-                rows = list(reader)
-            break
-        except (UnicodeDecodeError, csv.Error):
-            continue
-
-    if not rows:
-        return latest_names
-
-    headers = [clean_header(h) for h in rows[0]]
-    col_map = {}
-    for idx, h in enumerate(headers):
-        if h:
-            col_map[h] = idx
-
-    col_code = col_map.get('종목코드')
-    col_name = col_map.get('회사명')
-    col_sector = col_map.get('업종명')
-
-    if col_code is None or col_name is None:
-        return latest_names
-
-    for row in rows[1:]:
-        if len(row) <= max(col_code, col_name):
-            continue
-
-        raw_code = row[col_code].strip()
-        stock_code = normalize_code(raw_code)
-        if not stock_code:
-            continue
+    """회사 식별 인덱스(company_index.json)에서 종목코드별 최신 회사명/업종 매핑"""
+    index = load_company_index(source_dir)
 
-        company_name = row[col_name].strip()
-        sector = row[col_sector].strip() if col_sector is not None and col_sector < len(row) else 'Unknown'
-
-        if stock_code not in latest_names:
-            latest_names[stock_code] = {'name': company_name, 'sector': sector}
+    latest_names = {}
+    for stock_code, company_name in index.code_to_name.items():
+        sector = index.latest_sector(stock_code)
+        latest_names[stock_code] = {'name': company_name, 'sector': sector if sector is not None else 'Unknown'}
 
-    print(f"  2025년 3분기 기준 {len(latest_names)}개 기업명 매핑 완료")
+    print(f"  회사 인덱스 기준 {len(latest_names)}개 기업명 매핑 완료")
     return latest_names
 
 def extract_revenue_from_comprehensive(filepath):
     """포괄손익계산서에서 revenue가 있는 기업 목록 추출"""
     companies_with_revenue = set()
 
-    encoding_candidates = ['utf-8-sig', 'cp949', 'utf-8', 'euc-kr']
-    rows = []
-
-    for enc in encoding_candidates:
-        try:
-            with open(filepath, 'r', encoding=enc, newline='') as f:
-                reader = csv.reader(f)
-                rows = list(reader)
-            break
-        except (UnicodeDecodeError, csv.Error):
-            continue
+    rows = iter_rows(filepath)
+    header = next(rows, None)
 
-    if not rows:
+    if header is None:
         return companies_with_revenue
 
-    headers = [clean_header(h) for h in rows[0]]
-    col_map = {}
-    for idx, h in enumerate(headers):
-        if h:
-            col_map[h] = idx
+    schema = FileSchema(header)
+    col_map = schema.col_map
 
     col_code = col_map.get('종목코드')
     col_item_code = col_map.get('항목코드')
@@ -156,8 +96,11 @@ def extract_revenue_from_comprehensive(filepath):
     if col_code is None or col_item_code is None:
         return companies_with_revenue
 
-    for row in rows[1:]:
-        if len(row) <= max(col_map.values()):
+    # Header resolved once; the row loop only does indexed access
+    min_len = schema.min_len
+
+    for row in rows:
+        if len(row) < min_len:
             continue
 
         item_code = row[col_item_code].strip()
@@ -177,38 +120,20 @@ def extract_annual_data_from_income_statement(filepath, filename):
     results = {}
 
     # 사업보고서만 처리
-    if '사업보고서' not in filename:
+    filing = parse_filing(filename)
+    if filing is None or '사업보고서' not in filing.report_type:
         return results
 
-    parts = filename.split('_')
-    year = int(parts[0])
-
-    encoding_candidates = ['utf-8-sig', 'cp949', 'utf-8', 'euc-kr']
-    rows = []
+    year = filing.year
 
-    for enc in encoding_candidates:
-        try:
-            with open(filepath, 'r', encoding=enc, newline='') as f:
-                reader = csv.reader(f)
-                rows = list(reader)
-            break
-        except (UnicodeDecodeError, csv.Error):
-            continue
+    rows = iter_rows(filepath)
+    header = next(rows, None)
 
-    if not rows:
+    if header is None:
         return results
 
-    headers = [clean_header(h) for h in rows[0]]
-    col_map = {}
-    for idx, h in enumerate(headers):
-        if h:
-            col_map[h] = idx
-
-    def get_idx(candidates):
-        for c in candidates:
-            if c in col_map:
-                return col_map[c]
-        return None
+    schema = FileSchema(header)
+    col_map = schema.col_map
 
     col_code = col_map.get('종목코드')
     col_name = col_map.get('회사명')
@@ -227,8 +152,12 @@ def extract_annual_data_from_income_statement(filepath, filename):
         ('Previous', ['전기', '전기사업년도'])
     ]
 
-    for row in rows[1:]:
-        if len(row) <= max(col_map.values()):
+    # Header resolved once; the row loop only does indexed access
+    period_cols = schema.period_columns(target_periods)
+    min_len = schema.min_len
+
+    for row in rows:
+        if len(row) < min_len:
             continue
 
         raw_code = row[col_code].strip()
@@ -262,9 +191,8 @@ def extract_annual_data_from_income_statement(filepath, filename):
             }
 
         # 각 타겟 기간에서 값 추출
-        for period_key, allowed_cols in target_periods:
-            col_idx = get_idx(allowed_cols)
-            if col_idx is not None and col_idx < len(row):
+        for period_key, col_idx in period_cols:
+            if col_idx < len(row):
                 val = parse_value(row[col_idx])
                 if val is not None:
                     # 당기 -> year, 전기 -> year - 1
@@ -310,59 +238,74 @@ def compile_history(data):
 
     return history
 
-def main():
-    files = sorted(os.listdir(SOURCE_DIR))
-
-    # 파일 목록 (사업보고서만)
-    comprehensive_files = [f for f in get_files_by_pattern(files, '03_포괄손익계산서_연결') if '사업보고서' in f]
-    income_files = [f for f in get_files_by_pattern(files, '02_손익계산서_연결') if '사업보고서' in f]
-
-    print(f"포괄손익계산서 (사업보고서) 파일: {len(comprehensive_files)}개")
-    print(f"손익계산서 (사업보고서) 파일: {len(income_files)}개")
-
-    # 0단계: 2025년 3분기 기준 최신 회사명 매핑 추출
-    print("\n=== 0단계: 2025년 3분기 기준 최신 회사명 매핑 ===")
-    latest_company_names = build_latest_company_names(SOURCE_DIR)
-
-    # 1단계: 포괄손익계산서에서 revenue가 있는 기업 목록 추출 (기간별)
-    comprehensive_revenue_by_period = defaultdict(set)
-
-    print("\n=== 1단계: 포괄손익계산서에서 revenue 있는 기업 추출 ===")
-    for f in comprehensive_files:
-        parts = f.split('_')
-        year = parts[0]
-        period = f"{year}_사업보고서"
-        filepath = os.path.join(SOURCE_DIR, f)
-        companies = extract_revenue_from_comprehensive(filepath)
-        comprehensive_revenue_by_period[period] = companies
-        print(f"  {period}: {len(companies)}개 기업")
-
-    # 2단계: 손익계산서에서 연간 데이터 추출 (포괄손익에 없는 기업만)
-    print("\n=== 2단계: 손익계산서에서 연간 데이터 추출 ===")
-
-    all_results = {}  # {stock_code: {name, sector, data}}
-
-    for f in income_files:
-        parts = f.split('_')
-        year = parts[0]
-        period = f"{year}_사업보고서"
-        filepath = os.path.join(SOURCE_DIR, f)
-
+class CorpusBuild(CorpusConsumer):
+    """main() split around the corpus pass (see dart_corpus.CorpusConsumer)
+
+    Files arrive in name order, so a period's 손익계산서 comes before its
+    포괄손익계산서. Each 손익계산서 result waits until every 포괄손익계산서 of
+    its period has been read and is then merged in the original file order,
+    so at most a file's worth of results is held back.
+    """
+
+    def start(self):
+        files = current_filenames(SOURCE_DIR)
+
+        # 파일 목록 (사업보고서만, current_filenames의 파일은 모두 parse_filing으로 해석됨)
+        files = [f for f in files if parse_filing(f).report_type == '사업보고서']
+        self.comprehensive_files = get_files_by_pattern(files, '03_포괄손익계산서_연결')
+        self.income_files = get_files_by_pattern(files, '02_손익계산서_연결')
+
+        print(f"포괄손익계산서 (사업보고서) 파일: {len(self.comprehensive_files)}개")
+        print(f"손익계산서 (사업보고서) 파일: {len(self.income_files)}개")
+
+        # 0단계: 회사 인덱스 기준 최신 회사명 매핑 추출
+        print("\n=== 0단계: 회사 인덱스 기준 최신 회사명 매핑 ===")
+        self.latest_company_names = build_latest_company_names(SOURCE_DIR)
+
+        print("\n=== 1단계/2단계: 포괄손익계산서에서 revenue 있는 기업 추출, 손익계산서에서 연간 데이터 추출 ===")
+        self.comprehensive_set = set(self.comprehensive_files)
+        self.comprehensive_revenue_by_period = defaultdict(set)
+        self.unread_comprehensive = Counter(self._period(f) for f in self.comprehensive_files)
+        self.income = {}  # filename -> 2단계 result waiting to be merged
+        self.merged = 0  # income_files merged so far
+        self.all_results = {}  # {stock_code: {name, sector, data}}
+        return self.comprehensive_files + self.income_files
+
+    def _period(self, filename):
+        return f"{parse_filing(filename).year}_사업보고서"
+
+    def on_file(self, filepath, filename):
+        if filename in self.comprehensive_set:
+            # 1단계: 포괄손익계산서에서 revenue가 있는 기업 목록 (기간별)
+            period = self._period(filename)
+            companies = extract_revenue_from_comprehensive(filepath)
+            self.comprehensive_revenue_by_period[period] = companies
+            self.unread_comprehensive[period] -= 1
+            print(f"  {period}: {len(companies)}개 기업")
+        else:
+            self.income[filename] = extract_annual_data_from_income_statement(filepath, filename)
+
+        # 포괄손익계산서를 모두 읽은 기간의 손익계산서부터 파일 순서대로 병합
+        while self.merged < len(self.income_files):
+            f = self.income_files[self.merged]
+            if f not in self.income or self.unread_comprehensive[self._period(f)] > 0:
+                break
+            self._merge_income(f, self.income.pop(f))
+            self.merged += 1
+
+    def _merge_income(self, f, results):
+        """2단계: 포괄손익에 revenue가 없는 기업만 병합"""
         print(f"  Processing: {f}")
-
         # 포괄손익에 revenue가 있는 기업들
-        companies_with_comprehensive_revenue = comprehensive_revenue_by_period.get(period, set())
-
-        # 손익계산서에서 연간 데이터 추출
-        results = extract_annual_data_from_income_statement(filepath, f)
+        companies_with_comprehensive_revenue = self.comprehensive_revenue_by_period.get(self._period(f), set())
 
         # 포괄손익에 없는 기업만 필터링하여 저장
         for stock_code, company_data in results.items():
             if stock_code in companies_with_comprehensive_revenue:
                 continue  # 포괄손익에 이미 있으면 스킵
 
-            if stock_code not in all_results:
-                all_results[stock_code] = {
+            if stock_code not in self.all_results:
+                self.all_results[stock_code] = {
                     'name': company_data['name'],
                     'sector': company_data['sector'],
                     'data': defaultdict(dict)
@@ -371,67 +314,74 @@ def main():
             # 데이터 병합
             for year_key, year_data in company_data['data'].items():
                 for key, value in year_data.items():
-                    if key not in all_results[stock_code]['data'][year_key]:
-                        all_results[stock_code]['data'][year_key][key] = value
-
-    # 3단계: 히스토리 컴파일 및 출력 (최신 회사명 사용)
-    print("\n=== 3단계: 결과 컴파일 (2025년 3분기 기준 회사명 적용) ===")
-
-    final_output = {}
-
-    for stock_code in sorted(all_results.keys()):
-        company_data = all_results[stock_code]
-        history = compile_history(dict(company_data['data']))
-
-        if history:
-            # 최신 회사명 사용 (있으면), 없으면 기존 이름 유지
-            if stock_code in latest_company_names:
-                name = latest_company_names[stock_code]['name']
-                sector = latest_company_names[stock_code]['sector']
-            else:
-                name = company_data['name']
-                sector = company_data['sector']
+                    if key not in self.all_results[stock_code]['data'][year_key]:
+                        self.all_results[stock_code]['data'][year_key][key] = value
+
+    def finish(self):
+        # 3단계: 히스토리 컴파일 및 출력 (최신 회사명 사용)
+        print("\n=== 3단계: 결과 컴파일 (최신 회사명 적용) ===")
+
+        final_output = {}
+
+        for stock_code in sorted(self.all_results.keys()):
+            company_data = self.all_results[stock_code]
+            history = compile_history(dict(company_data['data']))
+
+            if history:
+                # 최신 회사명 사용 (있으면), 없으면 기존 이름 유지
+                if stock_code in self.latest_company_names:
+                    name = self.latest_company_names[stock_code]['name']
+                    sector = self.latest_company_names[stock_code]['sector']
+                else:
+                    name = company_data['name']
+                    sector = company_data['sector']
+
+                final_output[stock_code] = {
+                    'name': name,
+                    'sector': sector,
+                    'source': '02_손익계산서_연결',
+                    'history': history
+                }
 
-            final_output[stock_code] = {
-                'name': name,
-                'sector': sector,
-                'source': '02_손익계산서_연결',
-                'history': history
-            }
+        print(f"\n총 {len(final_output)}개 기업의 연간 데이터 추출 완료")
+
+        # 회사명 보정 (overrides.json)
+        OVERRIDES.apply_names(final_output)
+
+        # JSON 저장
+        with open(OUTPUT_FILE, 'w', encoding='utf-8') as f:
+            json.dump(final_output, f, ensure_ascii=False, indent=2)
+
+        print(f"결과가 {OUTPUT_FILE}에 저장되었습니다.")
+
+        # 샘플 출력: 한화오션
+        if '042660' in final_output:
+            print("\n=== 샘플: 한화오션 [042660] ===")
+            hwo = final_output['042660']
+            print(f"회사명: {hwo['name']}")
+            print(f"업종: {hwo['sector']}")
+            print(f"데이터 출처: {hwo['source']}")
+            print(f"연간 데이터 개수: {len(hwo['history'])}")
+            print("\n연간 데이터:")
+            for rec in hwo['history']:
+                rev_str = f"{rec['revenue']:,}" if rec.get('revenue') else 'N/A'
+                op_str = f"{rec['op_profit']:,}" if rec.get('op_profit') else 'N/A'
+                net_str = f"{rec['net_income']:,}" if rec.get('net_income') else 'N/A'
+                print(f"  {rec['year']}: 매출 {rev_str}, 영업이익 {op_str}, 순이익 {net_str}")
+
+        # 통계
+        print("\n=== 통계 ===")
+        years_count = defaultdict(int)
+        for code, data in final_output.items():
+            for rec in data['history']:
+                years_count[rec['year']] += 1
+
+        print("연도별 기업 수:")
+        for year in sorted(years_count.keys()):
+            print(f"  {year}: {years_count[year]}개")
 
-    print(f"\n총 {len(final_output)}개 기업의 연간 데이터 추출 완료")
-
-    # JSON 저장
-    with open(OUTPUT_FILE, 'w', encoding='utf-8') as f:
-        json.dump(final_output, f, ensure_ascii=False, indent=2)
-
-    print(f"결과가 {OUTPUT_FILE}에 저장되었습니다.")
-
-    # 샘플 출력: 한화오션
-    if '042660' in final_output:
-        print("\n=== 샘플: 한화오션 [042660] ===")
-        hwo = final_output['042660']
-        print(f"회사명: {hwo['name']}")
-        print(f"업종: {hwo['sector']}")
-        print(f"데이터 출처: {hwo['source']}")
-        print(f"연간 데이터 개수: {len(hwo['history'])}")
-        print("\n연간 데이터:")
-        for rec in hwo['history']:
-            rev_str = f"{rec['revenue']:,}" if rec.get('revenue') else 'N/A'
-            op_str = f"{rec['op_profit']:,}" if rec.get('op_profit') else 'N/A'
-            net_str = f"{rec['net_income']:,}" if rec.get('net_income') else 'N/A'
-            print(f"  {rec['year']}: 매출 {rev_str}, 영업이익 {op_str}, 순이익 {net_str}")
-
-    # 통계
-    print("\n=== 통계 ===")
-    years_count = defaultdict(int)
-    for code, data in final_output.items():
-        for rec in data['history']:
-            years_count[rec['year']] += 1
-
-    print("연도별 기업 수:")
-    for year in sorted(years_count.keys()):
-        print(f"  {year}: {years_count[year]}개")
+def main():
+    CorpusBuild().run(SOURCE_DIR)
 
 if __name__ == '__main__':
     main()
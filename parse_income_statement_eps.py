@@ -10,11 +10,15 @@ process_eps_data.py와 동일한 구조로 EPS 데이터를 추출하되,
 출력: income_statement_eps.json
 """
 
-import os
-import csv
 import re
 import json
-from collections import defaultdict
+from collections import defaultdict, Counter
+
+from dart_corpus import iter_rows, FileSchema, CorpusConsumer
+from source_catalog import parse_filing, current_filenames
+from company_index import load_company_index
+from overrides import OVERRIDES
+from period_derivation import PeriodTable, DERIVATION_RULES
 
 # CONFIGURATION
 SOURCE_DIR = "csv_output"
@@ -109,91 +113,29 @@ def get_files_by_pattern(files, pattern):
     return [f for f in files if pattern in f and f.endswith('.csv')]
 
 def build_latest_company_names(source_dir):
-    """2025년 3분기 보고서에서 최신 회사명 매핑 추출"""
-    latest_names = {}
-
-    files = sorted(os.listdir(source_dir))
-    target_file = None
-    for f in files:
-        if '2025_3분기보고서_02_손익계산서_연결' in f:
-            target_file = f
-            break
-
-    if not target_file:
-        print("Warning: 2025년 3분기 보고서 파일을 찾을 수 없습니다.")
-        return latest_names
-
-    filepath = os.path.join(source_dir, target_file)
-    encoding_candidates = ['utf-8-sig', 'cp949', 'utf-8', 'euc-kr']
-    rows = []
-
-    for enc in encoding_candidates:
-        try:
-            with open(filepath, 'r', encoding=enc, newline='') as f:
-                reader = csv.reader(f)
-                rows = list(reader)
-            break
-        except (UnicodeDecodeError, csv.Error):
-            continue
-
-    if not rows:
-        return latest_names
-
-    headers = [clean_header(h) for h in rows[0]]
-    col_map = {}
-    for idx, h in enumerate(headers):
-        if h:
-            col_map[h] = idx
-
-    col_code = col_map.get('종목코드')
-    col_name = col_map.get('회사명')
-    col_sector = col_map.get('업종명')
-
-    if col_code is None or col_name is None:
-        return latest_names
-
-    for row in rows[1:]:
-        if len(row) <= max(col_code, col_name):
-            continue
+    """회사 식별 인덱스(company_index.json)에서 종목코드별 최신 회사명/업종 매핑"""
+    index = load_company_index(source_dir)
 
-        raw_code = row[col_code].strip()
-        stock_code = normalize_code(raw_code)
-        if not stock_code:
-            continue
-
-        company_name = row[col_name].strip()
-        sector = row[col_sector].strip() if col_sector is not None and col_sector < len(row) else 'Unknown'
-
-        if stock_code not in latest_names:
-            latest_names[stock_code] = {'name': company_name, 'sector': sector}
+    latest_names = {}
+    for stock_code, company_name in index.code_to_name.items():
+        sector = index.latest_sector(stock_code)
+        latest_names[stock_code] = {'name': company_name, 'sector': sector if sector is not None else 'Unknown'}
 
-    print(f"  2025년 3분기 기준 {len(latest_names)}개 기업명 매핑 완료")
+    print(f"  회사 인덱스 기준 {len(latest_names)}개 기업명 매핑 완료")
     return latest_names
 
 def extract_revenue_companies_from_comprehensive(filepath):
     """포괄손익계산서에서 revenue가 있는 기업 목록 추출"""
     companies_with_revenue = set()
 
-    encoding_candidates = ['utf-8-sig', 'cp949', 'utf-8', 'euc-kr']
-    rows = []
-
-    for enc in encoding_candidates:
-        try:
-            with open(filepath, 'r', encoding=enc, newline='') as f:
-                reader = csv.reader(f)
-                rows = list(reader)
-            break
-        except (UnicodeDecodeError, csv.Error):
-            continue
+    rows = iter_rows(filepath)
+    header = next(rows, None)
 
-    if not rows:
+    if header is None:
         return companies_with_revenue
 
-    headers = [clean_header(h) for h in rows[0]]
-    col_map = {}
-    for idx, h in enumerate(headers):
-        if h:
-            col_map[h] = idx
+    schema = FileSchema(header)
+    col_map = schema.col_map
 
     col_code = col_map.get('종목코드')
     col_item_code = col_map.get('항목코드')
@@ -201,8 +143,11 @@ def extract_revenue_companies_from_comprehensive(filepath):
     if col_code is None or col_item_code is None:
         return companies_with_revenue
 
-    for row in rows[1:]:
-        if len(row) <= max(col_map.values()):
+    # Header resolved once; the row loop only does indexed access
+    min_len = schema.min_len
+
+    for row in rows:
+        if len(row) < min_len:
             continue
 
         item_code = row[col_item_code].strip()
@@ -219,10 +164,8 @@ def extract_revenue_companies_from_comprehensive(filepath):
 
 def extract_period_info(filename):
     """파일명에서 연도, 보고서 종류 추출"""
-    parts = filename.split('_')
-    year = int(parts[0])
-    report_type = parts[1]
-    return year, report_type
+    filing = parse_filing(filename)
+    return filing.year, filing.report_type
 
 def get_target_periods(report_type):
     """보고서 종류에 따른 타겟 기간 컬럼 설정"""
@@ -251,32 +194,14 @@ def extract_eps_data_from_income_statement(filepath, filename):
     if not target_periods:
         return results
 
-    encoding_candidates = ['utf-8-sig', 'cp949', 'utf-8', 'euc-kr']
-    rows = []
-
-    for enc in encoding_candidates:
-        try:
-            with open(filepath, 'r', encoding=enc, newline='') as f:
-                reader = csv.reader(f)
-                rows = list(reader)
-            break
-        except (UnicodeDecodeError, csv.Error):
-            continue
+    rows = iter_rows(filepath)
+    header = next(rows, None)
 
-    if not rows:
+    if header is None:
         return results
 
-    headers = [clean_header(h) for h in rows[0]]
-    col_map = {}
-    for idx, h in enumerate(headers):
-        if h:
-            col_map[h] = idx
-
-    def get_idx(candidates):
-        for c in candidates:
-            if c in col_map:
-                return col_map[c]
-        return None
+    schema = FileSchema(header)
+    col_map = schema.col_map
 
     col_code = col_map.get('종목코드')
     col_name = col_map.get('회사명')
@@ -287,8 +212,12 @@ def extract_eps_data_from_income_statement(filepath, filename):
     if col_code is None or col_item_code is None:
         return results
 
-    for row in rows[1:]:
-        if len(row) <= max(col_map.values()):
+    # Header resolved once; the row loop only does indexed access
+    period_cols = schema.period_columns(target_periods)
+    min_len = schema.min_len
+
+    for row in rows:
+        if len(row) < min_len:
             continue
 
         raw_code = row[col_code].strip()
@@ -327,9 +256,8 @@ def extract_eps_data_from_income_statement(filepath, filename):
             }
 
         # 각 타겟 기간에서 값 추출
-        for period_key, allowed_cols in target_periods:
-            col_idx = get_idx(allowed_cols)
-            if col_idx is not None and col_idx < len(row):
+        for period_key, col_idx in period_cols:
+            if col_idx < len(row):
                 val = parse_value(row[col_idx])
                 if val is not None:
                     target_year = year
@@ -349,7 +277,12 @@ def compile_history(data):
     """데이터를 분기별 히스토리로 컴파일"""
     history = []
 
-    for year in sorted(data.keys()):
+    # 4Q (Annual - 3Q_Acc) 일괄 계산 (period_derivation.py)
+    years = sorted(data.keys())
+    table = PeriodTable.from_year_data((data[year] for year in years), ['eps'])
+    table.derive(DERIVATION_RULES)
+
+    for row, year in enumerate(years):
         year_data = data[year]
 
         # 1Q, 2Q, 3Q
@@ -371,84 +304,97 @@ def compile_history(data):
                 if rec['eps'] is not None:
                     history.append(rec)
 
-        # 4Q 계산 (Annual - 3Q_Acc)
-        annual_data = year_data.get('Annual_Current') or year_data.get('Annual_Previous')
-        q3_acc_data = year_data.get('3Q_Acc')
-
-        if annual_data and q3_acc_data:
-            val_ann = annual_data.get('eps')
-            val_q3 = q3_acc_data.get('eps')
+        # 4Q (Annual - 3Q_Acc)
+        q4_eps = table.period_data(row, '4Q').get('eps')
 
-            if val_ann is not None and val_q3 is not None:
-                q4_rec = {
-                    'year': year,
-                    'quarter': '4Q',
-                    'eps': val_ann - val_q3
-                }
+        if q4_eps is not None:
+            q4_rec = {
+                'year': year,
+                'quarter': '4Q',
+                'eps': q4_eps
+            }
 
-                # Add metadata from Annual
-                code_key = 'Annual_Current_eps_item_code'
-                name_key = 'Annual_Current_eps_item_name'
-                if code_key not in year_data:
-                    code_key = 'Annual_Previous_eps_item_code'
-                    name_key = 'Annual_Previous_eps_item_name'
+            # Add metadata from Annual
+            code_key = 'Annual_Current_eps_item_code'
+            name_key = 'Annual_Current_eps_item_name'
+            if code_key not in year_data:
+                code_key = 'Annual_Previous_eps_item_code'
+                name_key = 'Annual_Previous_eps_item_name'
 
-                if code_key in year_data:
-                    q4_rec['eps_ifrs_code'] = year_data[code_key]
-                    q4_rec['eps_korean_name'] = year_data[name_key]
+            if code_key in year_data:
+                q4_rec['eps_ifrs_code'] = year_data[code_key]
+                q4_rec['eps_korean_name'] = year_data[name_key]
 
-                history.append(q4_rec)
+            history.append(q4_rec)
 
     return history
 
-def main():
-    files = sorted(os.listdir(SOURCE_DIR))
-
-    # 파일 목록
-    comprehensive_files = get_files_by_pattern(files, '03_포괄손익계산서_연결')
-    income_files = get_files_by_pattern(files, '02_손익계산서_연결')
-
-    print(f"포괄손익계산서 파일: {len(comprehensive_files)}개")
-    print(f"손익계산서 파일: {len(income_files)}개")
-
-    # 0단계: 2025년 3분기 기준 최신 회사명 매핑 추출
-    print("\n=== 0단계: 2025년 3분기 기준 최신 회사명 매핑 ===")
-    latest_company_names = build_latest_company_names(SOURCE_DIR)
-
-    # 1단계: 포괄손익계산서에서 revenue가 있는 기업 목록 추출 (기간별)
-    comprehensive_revenue_by_period = defaultdict(set)
-
-    print("\n=== 1단계: 포괄손익계산서에서 revenue 있는 기업 추출 ===")
-    for f in comprehensive_files:
-        year, report_type = extract_period_info(f)
-        period = f"{year}_{report_type}"
-        filepath = os.path.join(SOURCE_DIR, f)
-        companies = extract_revenue_companies_from_comprehensive(filepath)
-        comprehensive_revenue_by_period[period] = companies
-
-    # 2단계: 손익계산서에서 EPS 데이터 추출 (포괄손익에 revenue 없는 기업만)
-    print("\n=== 2단계: 손익계산서에서 EPS 데이터 추출 ===")
-
-    all_results = {}
-
-    for f in income_files:
-        year, report_type = extract_period_info(f)
-        period = f"{year}_{report_type}"
-        filepath = os.path.join(SOURCE_DIR, f)
+class CorpusBuild(CorpusConsumer):
+    """main() split around the corpus pass (see dart_corpus.CorpusConsumer)
+
+    Files arrive in name order, so a period's 손익계산서 comes before its
+    포괄손익계산서. Each 손익계산서 result waits until every 포괄손익계산서 of
+    its period has been read and is then merged in the original file order,
+    so at most a file's worth of results is held back.
+    """
+
+    def start(self):
+        files = current_filenames(SOURCE_DIR)
+
+        # 파일 목록
+        self.comprehensive_files = get_files_by_pattern(files, '03_포괄손익계산서_연결')
+        self.income_files = get_files_by_pattern(files, '02_손익계산서_연결')
+
+        print(f"포괄손익계산서 파일: {len(self.comprehensive_files)}개")
+        print(f"손익계산서 파일: {len(self.income_files)}개")
+
+        # 0단계: 회사 인덱스 기준 최신 회사명 매핑 추출
+        print("\n=== 0단계: 회사 인덱스 기준 최신 회사명 매핑 ===")
+        self.latest_company_names = build_latest_company_names(SOURCE_DIR)
+
+        print("\n=== 1단계/2단계: 포괄손익계산서에서 revenue 있는 기업 추출, 손익계산서에서 EPS 데이터 추출 ===")
+        self.comprehensive_set = set(self.comprehensive_files)
+        self.comprehensive_revenue_by_period = defaultdict(set)
+        self.unread_comprehensive = Counter(self._period(f) for f in self.comprehensive_files)
+        self.income = {}  # filename -> 2단계 result waiting to be merged
+        self.merged = 0  # income_files merged so far
+        self.all_results = {}  # {stock_code: {name, sector, data}}
+        return self.comprehensive_files + self.income_files
+
+    def _period(self, filename):
+        year, report_type = extract_period_info(filename)
+        return f"{year}_{report_type}"
+
+    def on_file(self, filepath, filename):
+        if filename in self.comprehensive_set:
+            # 1단계: 포괄손익계산서에서 revenue가 있는 기업 목록 (기간별)
+            period = self._period(filename)
+            companies = extract_revenue_companies_from_comprehensive(filepath)
+            self.comprehensive_revenue_by_period[period] = companies
+            self.unread_comprehensive[period] -= 1
+        else:
+            self.income[filename] = extract_eps_data_from_income_statement(filepath, filename)
+
+        # 포괄손익계산서를 모두 읽은 기간의 손익계산서부터 파일 순서대로 병합
+        while self.merged < len(self.income_files):
+            f = self.income_files[self.merged]
+            if f not in self.income or self.unread_comprehensive[self._period(f)] > 0:
+                break
+            self._merge_income(f, self.income.pop(f))
+            self.merged += 1
 
+    def _merge_income(self, f, results):
+        """2단계: 포괄손익에 revenue가 없는 기업만 병합"""
         # 포괄손익에 revenue가 있는 기업들
-        companies_with_comprehensive_revenue = comprehensive_revenue_by_period.get(period, set())
-
-        # 손익계산서에서 EPS 데이터 추출
-        results = extract_eps_data_from_income_statement(filepath, f)
+        companies_with_comprehensive_revenue = self.comprehensive_revenue_by_period.get(self._period(f), set())
 
         # 포괄손익에 없는 기업만 필터링하여 저장
         for stock_code, company_data in results.items():
             if stock_code in companies_with_comprehensive_revenue:
                 continue  # 포괄손익에 이미 있으면 스킵
 
-            if stock_code not in all_results:
-                all_results[stock_code] = {
+            if stock_code not in self.all_results:
+                self.all_results[stock_code] = {
                     'name': company_data['name'],
                     'sector': company_data['sector'],
                     'data': defaultdict(lambda: defaultdict(dict))
@@ -458,55 +404,62 @@ def main():
             for year_key, year_data in company_data['data'].items():
                 for period_key, period_data in year_data.items():
                     if isinstance(period_data, dict):
-                        all_results[stock_code]['data'][year_key][period_key].update(period_data)
+                        self.all_results[stock_code]['data'][year_key][period_key].update(period_data)
                     else:
-                        all_results[stock_code]['data'][year_key][period_key] = period_data
+                        self.all_results[stock_code]['data'][year_key][period_key] = period_data
+
+    def finish(self):
+        # 3단계: 히스토리 컴파일 및 출력 (최신 회사명 사용)
+        print("\n=== 3단계: 결과 컴파일 (최신 회사명 적용) ===")
+
+        final_output = {}
+
+        for stock_code in sorted(self.all_results.keys()):
+            company_data = self.all_results[stock_code]
+            history = compile_history(dict(company_data['data']))
+
+            if history:
+                # 최신 회사명 사용 (있으면), 없으면 기존 이름 유지
+                if stock_code in self.latest_company_names:
+                    name = self.latest_company_names[stock_code]['name']
+                    sector = self.latest_company_names[stock_code]['sector']
+                else:
+                    name = company_data['name']
+                    sector = company_data['sector']
+
+                final_output[stock_code] = {
+                    'name': name,
+                    'sector': sector,
+                    'source': '02_손익계산서_연결',
+                    'history': history
+                }
 
-    # 3단계: 히스토리 컴파일 및 출력 (최신 회사명 사용)
-    print("\n=== 3단계: 결과 컴파일 (2025년 3분기 기준 회사명 적용) ===")
+        print(f"\n총 {len(final_output)}개 기업의 EPS 데이터 추출 완료")
 
-    final_output = {}
+        # 회사명 보정 (overrides.json)
+        OVERRIDES.apply_names(final_output)
 
-    for stock_code in sorted(all_results.keys()):
-        company_data = all_results[stock_code]
-        history = compile_history(dict(company_data['data']))
+        # JSON 저장
+        with open(OUTPUT_FILE, 'w', encoding='utf-8') as f:
+            json.dump(final_output, f, ensure_ascii=False, indent=2)
 
-        if history:
-            # 최신 회사명 사용 (있으면), 없으면 기존 이름 유지
-            if stock_code in latest_company_names:
-                name = latest_company_names[stock_code]['name']
-                sector = latest_company_names[stock_code]['sector']
-            else:
-                name = company_data['name']
-                sector = company_data['sector']
+        print(f"결과가 {OUTPUT_FILE}에 저장되었습니다.")
 
-            final_output[stock_code] = {
-                'name': name,
-                'sector': sector,
-                'source': '02_손익계산서_연결',
-                'history': history
-            }
+        # 샘플 출력: 한화오션
+        if '042660' in final_output:
+            print("\n=== 샘플: 한화오션 [042660] ===")
+            hwo = final_output['042660']
+            print(f"회사명: {hwo['name']}")
+            print(f"업종: {hwo['sector']}")
+            print(f"데이터 출처: {hwo['source']}")
+            print(f"분기 데이터 개수: {len(hwo['history'])}")
+            print("\n최근 5개 분기:")
+            for rec in hwo['history'][-5:]:
+                eps_str = f"{rec['eps']:,.2f}" if rec['eps'] is not None else 'N/A'
+                print(f"  {rec['year']} {rec['quarter']}: EPS {eps_str}원")
 
-    print(f"\n총 {len(final_output)}개 기업의 EPS 데이터 추출 완료")
-
-    # JSON 저장
-    with open(OUTPUT_FILE, 'w', encoding='utf-8') as f:
-        json.dump(final_output, f, ensure_ascii=False, indent=2)
-
-    print(f"결과가 {OUTPUT_FILE}에 저장되었습니다.")
-
-    # 샘플 출력: 한화오션
-    if '042660' in final_output:
-        print("\n=== 샘플: 한화오션 [042660] ===")
-        hwo = final_output['042660']
-        print(f"회사명: {hwo['name']}")
-        print(f"업종: {hwo['sector']}")
-        print(f"데이터 출처: {hwo['source']}")
-        print(f"분기 데이터 개수: {len(hwo['history'])}")
-        print("\n최근 5개 분기:")
-        for rec in hwo['history'][-5:]:
-            eps_str = f"{rec['eps']:,.2f}" if rec['eps'] is not None else 'N/A'
-            print(f"  {rec['year']} {rec['quarter']}: EPS {eps_str}원")
+def main():
+    CorpusBuild().run(SOURCE_DIR)
 
 if __name__ == '__main__':
     main()
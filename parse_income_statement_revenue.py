@@ -8,11 +8,15 @@
 - 각 기업의 분기별 revenue 데이터
 """
 
-import os
-import csv
 import re
 import json
-from collections import defaultdict
+from collections import defaultdict, Counter
+
+from dart_corpus import iter_rows, FileSchema, CorpusConsumer
+from source_catalog import parse_filing, current_filenames
+from company_index import load_company_index
+from period_derivation import PeriodTable, DERIVATION_RULES
+from overrides import OVERRIDES
 
 # CONFIGURATION
 SOURCE_DIR = "csv_output"
@@ -24,14 +28,9 @@ REVENUE_CODES = ['ifrs_Revenue', 'ifrs-full_Revenue']
 # Operating profit codes
 OP_PROFIT_CODES = ['dart_OperatingIncomeLoss', 'ifrs_OperatingIncomeLoss', 'ifrs-full_ProfitLossFromOperatingActivities']
 
-# 지분법이익 코드 (SK스퀘어 등 특수 기업용)
+# 지분법이익 코드 (SK스퀘어 등 특수 기업용, 합산 기업은 overrides.json의 components)
 EQUITY_METHOD_PROFIT_CODES = ['dart_ProfitsOfAssociatesAndJointVenturesAccountedForUsingEquityMethod']
 
-# 특수 처리 기업: revenue + 지분법이익을 합산해야 하는 기업들
-SPECIAL_REVENUE_COMPANIES = {
-    '402340': 'SK스퀘어'  # revenue + 지분법이익 합산
-}
-
 def clean_header(h):
     return h.replace(' ', '').replace('\xa0', '').strip()
 
@@ -61,74 +60,21 @@ def get_files_by_pattern(files, pattern):
     return [f for f in files if pattern in f and f.endswith('.csv')]
 
 def build_latest_company_names(source_dir):
-    """2025년 3분기 보고서에서 최신 회사명 매핑 추출"""
-    latest_names = {}
-
-    # 2025년 3분기 손익계산서 연결 파일 찾기
-    files = sorted(os.listdir(source_dir))
-    target_file = None
-    for f in files:
-        if '2025_3분기보고서_02_손익계산서_연결' in f:
-            target_file = f
-            break
-
-    if not target_file:
-        print("Warning: 2025년 3분기 보고서 파일을 찾을 수 없습니다.")
-        return latest_names
-
-    filepath = os.path.join(source_dir, target_file)
-    encoding_candidates = ['utf-8-sig', 'cp949', 'utf-8', 'euc-kr']
-    rows = []
-
-    for enc in encoding_candidates:
-        try:
-            with open(filepath, 'r', encoding=enc, newline='') as f:
-                reader = csv.reader(f)
-                rows = list(reader)
-            break
-        except (UnicodeDecodeError, csv.Error):
-            continue
-
-    if not rows:
-        return latest_names
-
-    headers = [clean_header(h) for h in rows[0]]
-    col_map = {}
-    for idx, h in enumerate(headers):
-        if h:
-            col_map[h] = idx
+    """회사 식별 인덱스(company_index.json)에서 종목코드별 최신 회사명/업종 매핑"""
+    index = load_company_index(source_dir)
 
-    col_code = col_map.get('종목코드')
-    col_name = col_map.get('회사명')
-    col_sector = col_map.get('업종명')
-
-    if col_code is None or col_name is None:
-        return latest_names
-
-    for row in rows[1:]:
-        if len(row) <= max(col_code, col_name):
-            continue
-
-        raw_code = row[col_code].strip()
-        stock_code = normalize_code(raw_code)
-        if not stock_code:
-            continue
-
-        company_name = row[col_name].strip()
-        sector = row[col_sector].strip() if col_sector is not None and col_sector < len(row) else 'Unknown'
-
-        if stock_code not in latest_names:
-            latest_names[stock_code] = {'name': company_name, 'sector': sector}
+    latest_names = {}
+    for stock_code, company_name in index.code_to_name.items():
+        sector = index.latest_sector(stock_code)
+        latest_names[stock_code] = {'name': company_name, 'sector': sector if sector is not None else 'Unknown'}
 
-    print(f"  2025년 3분기 기준 {len(latest_names)}개 기업명 매핑 완료")
+    print(f"  회사 인덱스 기준 {len(latest_names)}개 기업명 매핑 완료")
     return latest_names
 
 def extract_period_info(filename):
     """파일명에서 연도, 보고서 종류 추출"""
-    parts = filename.split('_')
-    year = int(parts[0])
-    report_type = parts[1]
-    return year, report_type
+    filing = parse_filing(filename)
+    return filing.year, filing.report_type
 
 def get_target_periods(report_type):
     """보고서 종류에 따른 타겟 기간 컬럼 설정"""
@@ -151,26 +97,14 @@ def extract_revenue_from_comprehensive(filepath, filename):
     """포괄손익계산서에서 revenue가 있는 기업 목록 추출"""
     companies_with_revenue = set()
 
-    encoding_candidates = ['utf-8-sig', 'cp949', 'utf-8', 'euc-kr']
-    rows = []
-
-    for enc in encoding_candidates:
-        try:
-            with open(filepath, 'r', encoding=enc, newline='') as f:
-                reader = csv.reader(f)
-                rows = list(reader)
-            break
-        except (UnicodeDecodeError, csv.Error):
-            continue
+    rows = iter_rows(filepath)
+    header = next(rows, None)
 
-    if not rows:
+    if header is None:
         return companies_with_revenue
 
-    headers = [clean_header(h) for h in rows[0]]
-    col_map = {}
-    for idx, h in enumerate(headers):
-        if h:
-            col_map[h] = idx
+    schema = FileSchema(header)
+    col_map = schema.col_map
 
     col_code = col_map.get('종목코드')
     col_item_code = col_map.get('항목코드')
@@ -178,8 +112,11 @@ def extract_revenue_from_comprehensive(filepath, filename):
     if col_code is None or col_item_code is None:
         return companies_with_revenue
 
-    for row in rows[1:]:
-        if len(row) <= max(col_map.values()):
+    # Header resolved once; the row loop only does indexed access
+    min_len = schema.min_len
+
+    for row in rows:
+        if len(row) < min_len:
             continue
 
         item_code = row[col_item_code].strip()
@@ -204,32 +141,14 @@ def extract_revenue_data_from_income_statement(filepath, filename, target_compan
     if not target_periods:
         return results
 
-    encoding_candidates = ['utf-8-sig', 'cp949', 'utf-8', 'euc-kr']
-    rows = []
+    rows = iter_rows(filepath)
+    header = next(rows, None)
 
-    for enc in encoding_candidates:
-        try:
-            with open(filepath, 'r', encoding=enc, newline='') as f:
-                reader = csv.reader(f)
-                rows = list(reader)
-            break
-        except (UnicodeDecodeError, csv.Error):
-            continue
-
-    if not rows:
+    if header is None:
         return results
 
-    headers = [clean_header(h) for h in rows[0]]
-    col_map = {}
-    for idx, h in enumerate(headers):
-        if h:
-            col_map[h] = idx
-
-    def get_idx(candidates):
-        for c in candidates:
-            if c in col_map:
-                return col_map[c]
-        return None
+    schema = FileSchema(header)
+    col_map = schema.col_map
 
     col_code = col_map.get('종목코드')
     col_name = col_map.get('회사명')
@@ -240,8 +159,12 @@ def extract_revenue_data_from_income_statement(filepath, filename, target_compan
     if col_code is None or col_item_code is None:
         return results
 
-    for row in rows[1:]:
-        if len(row) <= max(col_map.values()):
+    # Header resolved once; the row loop only does indexed access
+    period_cols = schema.period_columns(target_periods)
+    min_len = schema.min_len
+
+    for row in rows:
+        if len(row) < min_len:
             continue
 
         raw_code = row[col_code].strip()
@@ -265,8 +188,8 @@ def extract_revenue_data_from_income_statement(filepath, filename, target_compan
         elif any(code in item_code for code in OP_PROFIT_CODES):
             metric_type = 'op_profit'
         elif any(code in item_code for code in EQUITY_METHOD_PROFIT_CODES):
-            # 지분법이익은 특수 기업에 대해서만 저장
-            if stock_code in SPECIAL_REVENUE_COMPANIES:
+            # 지분법이익은 합산 대상 기업에 대해서만 저장
+            if OVERRIDES.has_component(stock_code, 'equity_method_profit'):
                 metric_type = 'equity_method_profit'
 
         if not metric_type:
@@ -281,9 +204,8 @@ def extract_revenue_data_from_income_statement(filepath, filename, target_compan
             }
 
         # 각 타겟 기간에서 값 추출
-        for period_key, allowed_cols in target_periods:
-            col_idx = get_idx(allowed_cols)
-            if col_idx is not None and col_idx < len(row):
+        for period_key, col_idx in period_cols:
+            if col_idx < len(row):
                 val = parse_value(row[col_idx])
                 if val is not None:
                     target_year = year
@@ -303,67 +225,54 @@ def compile_history(data, stock_code=None):
     """데이터를 분기별 히스토리로 컴파일"""
     history = []
 
-    # 특수 기업 여부 확인
-    is_special = stock_code in SPECIAL_REVENUE_COMPANIES
+    # 4Q (Annual - 3Q_Acc) 일괄 계산 (period_derivation.py)
+    years = sorted(data.keys())
+    table = PeriodTable.from_year_data((data[year] for year in years), ['revenue', 'op_profit', 'equity_method_profit'])
+    table.derive(DERIVATION_RULES)
 
-    for year in sorted(data.keys()):
-        year_data = data[year]
+    # 특수 기업의 경우 revenue + 지분법이익 합산, 고정값 적용 (overrides.json)
+    includes_equity = ('revenue', 'equity_method_profit') in OVERRIDES.add_components(table, stock_code)
+    row_of_year = {year: row for row, year in enumerate(years)}
+    OVERRIDES.fix_values(table, lambda code, year: row_of_year.get(year) if code == stock_code else None,
+                         lambda code: '연결')  # 02_손익계산서_연결 only
 
+    for row, year in enumerate(years):
         # 1Q, 2Q, 3Q
         for q in ['1Q', '2Q', '3Q']:
-            if q in year_data:
-                base_revenue = year_data[q].get('revenue')
-                equity_profit = year_data[q].get('equity_method_profit')
-
-                # 특수 기업의 경우 revenue + 지분법이익 합산
-                if is_special and base_revenue is not None and equity_profit is not None:
-                    combined_revenue = base_revenue + equity_profit
-                else:
-                    combined_revenue = base_revenue
-
+            q_data = table.period_data(row, q)
+            if q_data:
                 rec = {
                     'year': year,
                     'quarter': q,
-                    'revenue': combined_revenue,
-                    'op_profit': year_data[q].get('op_profit'),
+                    'revenue': q_data.get('revenue'),
+                    'op_profit': q_data.get('op_profit'),
                 }
 
                 # 특수 기업의 경우 메타 정보 추가
-                if is_special and equity_profit is not None:
+                equity_profit = q_data.get('equity_method_profit')
+                if includes_equity and equity_profit is not None:
                     rec['revenue_includes_equity_method'] = True
                     rec['equity_method_profit'] = equity_profit
 
                 if rec['revenue'] is not None or rec['op_profit'] is not None:
                     history.append(rec)
 
-        # 4Q 계산 (Annual - 3Q_Acc)
-        annual_data = year_data.get('Annual_Current') or year_data.get('Annual_Previous')
-        q3_acc_data = year_data.get('3Q_Acc')
+        # 4Q (Annual - 3Q_Acc)
+        q4_data = table.period_data(row, '4Q')
 
-        if annual_data and q3_acc_data:
+        if q4_data:
             q4_rec = {
                 'year': year,
                 'quarter': '4Q',
-                'revenue': None,
-                'op_profit': None
+                'revenue': q4_data.get('revenue'),
+                'op_profit': q4_data.get('op_profit')
             }
 
-            for m in ['revenue', 'op_profit']:
-                val_ann = annual_data.get(m)
-                val_q3 = q3_acc_data.get(m)
-                if val_ann is not None and val_q3 is not None:
-                    q4_rec[m] = val_ann - val_q3
-
             # 특수 기업의 경우 지분법이익도 4Q 계산
-            if is_special:
-                equity_ann = annual_data.get('equity_method_profit')
-                equity_q3 = q3_acc_data.get('equity_method_profit')
-                if equity_ann is not None and equity_q3 is not None:
-                    q4_equity = equity_ann - equity_q3
-                    if q4_rec['revenue'] is not None:
-                        q4_rec['revenue'] = q4_rec['revenue'] + q4_equity
-                        q4_rec['revenue_includes_equity_method'] = True
-                        q4_rec['equity_method_profit'] = q4_equity
+            q4_equity = q4_data.get('equity_method_profit')
+            if includes_equity and q4_equity is not None and q4_rec['revenue'] is not None:
+                q4_rec['revenue_includes_equity_method'] = True
+                q4_rec['equity_method_profit'] = q4_equity
 
             if q4_rec['revenue'] is not None or q4_rec['op_profit'] is not None:
                 # 음수 revenue 스킵
@@ -374,58 +283,75 @@ def compile_history(data, stock_code=None):
 
     return history
 
-def main():
-    files = sorted(os.listdir(SOURCE_DIR))
-
-    # 파일 목록
-    comprehensive_files = get_files_by_pattern(files, '03_포괄손익계산서_연결')
-    income_files = get_files_by_pattern(files, '02_손익계산서_연결')
-
-    print(f"포괄손익계산서 파일: {len(comprehensive_files)}개")
-    print(f"손익계산서 파일: {len(income_files)}개")
-
-    # 0단계: 2025년 3분기 기준 최신 회사명 매핑 추출
-    print("\n=== 0단계: 2025년 3분기 기준 최신 회사명 매핑 ===")
-    latest_company_names = build_latest_company_names(SOURCE_DIR)
-
-    # 1단계: 포괄손익계산서에서 revenue가 있는 기업 목록 추출 (기간별)
-    comprehensive_revenue_by_period = defaultdict(set)
-
-    print("\n=== 1단계: 포괄손익계산서에서 revenue 있는 기업 추출 ===")
-    for f in comprehensive_files:
-        year, report_type = extract_period_info(f)
-        period = f"{year}_{report_type}"
-        filepath = os.path.join(SOURCE_DIR, f)
-        companies = extract_revenue_from_comprehensive(filepath, f)
-        comprehensive_revenue_by_period[period] = companies
-
-    # 2단계: 손익계산서에서 revenue 데이터 추출 (포괄손익에 없는 기업만)
-    print("\n=== 2단계: 손익계산서에서 revenue 데이터 추출 ===")
-
-    all_results = {}  # {stock_code: {name, sector, data}}
-
-    for f in income_files:
-        year, report_type = extract_period_info(f)
-        period = f"{year}_{report_type}"
-        filepath = os.path.join(SOURCE_DIR, f)
-
+class CorpusBuild(CorpusConsumer):
+    """main() split around the corpus pass (see dart_corpus.CorpusConsumer)
+
+    Files arrive in name order, so a period's 손익계산서 comes before its
+    포괄손익계산서. Each 손익계산서 result waits until every 포괄손익계산서 of
+    its period has been read and is then merged in the original file order,
+    so at most a file's worth of results is held back.
+    """
+
+    def start(self):
+        files = current_filenames(SOURCE_DIR)
+
+        # 파일 목록
+        self.comprehensive_files = get_files_by_pattern(files, '03_포괄손익계산서_연결')
+        self.income_files = get_files_by_pattern(files, '02_손익계산서_연결')
+
+        print(f"포괄손익계산서 파일: {len(self.comprehensive_files)}개")
+        print(f"손익계산서 파일: {len(self.income_files)}개")
+
+        # 0단계: 회사 인덱스 기준 최신 회사명 매핑 추출
+        print("\n=== 0단계: 회사 인덱스 기준 최신 회사명 매핑 ===")
+        self.latest_company_names = build_latest_company_names(SOURCE_DIR)
+
+        print("\n=== 1단계/2단계: 포괄손익계산서에서 revenue 있는 기업 추출, 손익계산서에서 revenue 데이터 추출 ===")
+        self.comprehensive_set = set(self.comprehensive_files)
+        self.comprehensive_revenue_by_period = defaultdict(set)
+        self.unread_comprehensive = Counter(self._period(f) for f in self.comprehensive_files)
+        self.income = {}  # filename -> 2단계 result waiting to be merged
+        self.merged = 0  # income_files merged so far
+        self.all_results = {}  # {stock_code: {name, sector, data}}
+        return self.comprehensive_files + self.income_files
+
+    def _period(self, filename):
+        year, report_type = extract_period_info(filename)
+        return f"{year}_{report_type}"
+
+    def on_file(self, filepath, filename):
+        if filename in self.comprehensive_set:
+            # 1단계: 포괄손익계산서에서 revenue가 있는 기업 목록 (기간별)
+            period = self._period(filename)
+            companies = extract_revenue_from_comprehensive(filepath, filename)
+            self.comprehensive_revenue_by_period[period] = companies
+            self.unread_comprehensive[period] -= 1
+        else:
+            self.income[filename] = extract_revenue_data_from_income_statement(
+                filepath, filename,
+                target_companies=None  # 일단 모든 기업
+            )
+
+        # 포괄손익계산서를 모두 읽은 기간의 손익계산서부터 파일 순서대로 병합
+        while self.merged < len(self.income_files):
+            f = self.income_files[self.merged]
+            if f not in self.income or self.unread_comprehensive[self._period(f)] > 0:
+                break
+            self._merge_income(f, self.income.pop(f))
+            self.merged += 1
+
+    def _merge_income(self, f, results):
+        """2단계: 포괄손익에 revenue가 없는 기업만 병합"""
         # 포괄손익에 revenue가 있는 기업들
-        companies_with_comprehensive_revenue = comprehensive_revenue_by_period.get(period, set())
-
-        # 손익계산서에서 모든 기업의 revenue 추출
-        # (나중에 필터링)
-        results = extract_revenue_data_from_income_statement(
-            filepath, f,
-            target_companies=None  # 일단 모든 기업
-        )
+        companies_with_comprehensive_revenue = self.comprehensive_revenue_by_period.get(self._period(f), set())
 
         # 포괄손익에 없는 기업만 필터링하여 저장
         for stock_code, company_data in results.items():
             if stock_code in companies_with_comprehensive_revenue:
                 continue  # 포괄손익에 이미 있으면 스킵
 
-            if stock_code not in all_results:
-                all_results[stock_code] = {
+            if stock_code not in self.all_results:
+                self.all_results[stock_code] = {
                     'name': company_data['name'],
                     'sector': company_data['sector'],
                     'data': defaultdict(lambda: defaultdict(dict))
@@ -435,71 +361,78 @@ def main():
             for year_key, year_data in company_data['data'].items():
                 for period_key, period_data in year_data.items():
                     if isinstance(period_data, dict):
-                        all_results[stock_code]['data'][year_key][period_key].update(period_data)
+                        self.all_results[stock_code]['data'][year_key][period_key].update(period_data)
                     else:
-                        all_results[stock_code]['data'][year_key][period_key] = period_data
+                        self.all_results[stock_code]['data'][year_key][period_key] = period_data
 
-    # 3단계: 히스토리 컴파일 및 출력 (최신 회사명 사용)
-    print("\n=== 3단계: 결과 컴파일 (2025년 3분기 기준 회사명 적용) ===")
+    def finish(self):
+        # 3단계: 히스토리 컴파일 및 출력 (최신 회사명 사용)
+        print("\n=== 3단계: 결과 컴파일 (최신 회사명 적용) ===")
 
-    final_output = {}
+        final_output = {}
 
-    for stock_code in sorted(all_results.keys()):
-        company_data = all_results[stock_code]
-        history = compile_history(dict(company_data['data']), stock_code=stock_code)
+        for stock_code in sorted(self.all_results.keys()):
+            company_data = self.all_results[stock_code]
+            history = compile_history(dict(company_data['data']), stock_code=stock_code)
 
-        if history:
-            # 최신 회사명 사용 (있으면), 없으면 기존 이름 유지
-            if stock_code in latest_company_names:
-                name = latest_company_names[stock_code]['name']
-                sector = latest_company_names[stock_code]['sector']
-            else:
-                name = company_data['name']
-                sector = company_data['sector']
+            if history:
+                # 최신 회사명 사용 (있으면), 없으면 기존 이름 유지
+                if stock_code in self.latest_company_names:
+                    name = self.latest_company_names[stock_code]['name']
+                    sector = self.latest_company_names[stock_code]['sector']
+                else:
+                    name = company_data['name']
+                    sector = company_data['sector']
+
+                final_output[stock_code] = {
+                    'name': name,
+                    'sector': sector,
+                    'source': '02_손익계산서_연결',
+                    'history': history
+                }
 
-            final_output[stock_code] = {
-                'name': name,
-                'sector': sector,
-                'source': '02_손익계산서_연결',
-                'history': history
-            }
+        print(f"\n총 {len(final_output)}개 기업의 revenue 데이터 추출 완료")
+
+        # 회사명 보정 (overrides.json)
+        OVERRIDES.apply_names(final_output)
+
+        # JSON 저장
+        with open(OUTPUT_FILE, 'w', encoding='utf-8') as f:
+            json.dump(final_output, f, ensure_ascii=False, indent=2)
+
+        print(f"결과가 {OUTPUT_FILE}에 저장되었습니다.")
+
+        # 샘플 출력: 한화오션
+        if '042660' in final_output:
+            print("\n=== 샘플: 한화오션 [042660] ===")
+            hwo = final_output['042660']
+            print(f"회사명: {hwo['name']}")
+            print(f"업종: {hwo['sector']}")
+            print(f"데이터 출처: {hwo['source']}")
+            print(f"분기 데이터 개수: {len(hwo['history'])}")
+            print("\n최근 5개 분기:")
+            for rec in hwo['history'][-5:]:
+                rev_str = f"{rec['revenue']:,}" if rec['revenue'] else 'N/A'
+                op_str = f"{rec['op_profit']:,}" if rec['op_profit'] else 'N/A'
+                print(f"  {rec['year']} {rec['quarter']}: 매출 {rev_str}, 영업이익 {op_str}")
+
+        # 샘플 출력: SK스퀘어 (revenue + 지분법이익 합산)
+        if '402340' in final_output:
+            print("\n=== 샘플: SK스퀘어 [402340] (revenue + 지분법이익 합산) ===")
+            sks = final_output['402340']
+            print(f"회사명: {sks['name']}")
+            print(f"업종: {sks['sector']}")
+            print(f"데이터 출처: {sks['source']}")
+            print(f"분기 데이터 개수: {len(sks['history'])}")
+            print("\n최근 5개 분기:")
+            for rec in sks['history'][-5:]:
+                rev_str = f"{rec['revenue']:,}" if rec.get('revenue') else 'N/A'
+                op_str = f"{rec['op_profit']:,}" if rec.get('op_profit') else 'N/A'
+                equity_str = f" (지분법이익: {rec['equity_method_profit']:,})" if rec.get('equity_method_profit') else ''
+                print(f"  {rec['year']} {rec['quarter']}: 매출 {rev_str}{equity_str}, 영업이익 {op_str}")
 
-    print(f"\n총 {len(final_output)}개 기업의 revenue 데이터 추출 완료")
-
-    # JSON 저장
-    with open(OUTPUT_FILE, 'w', encoding='utf-8') as f:
-        json.dump(final_output, f, ensure_ascii=False, indent=2)
-
-    print(f"결과가 {OUTPUT_FILE}에 저장되었습니다.")
-
-    # 샘플 출력: 한화오션
-    if '042660' in final_output:
-        print("\n=== 샘플: 한화오션 [042660] ===")
-        hwo = final_output['042660']
-        print(f"회사명: {hwo['name']}")
-        print(f"업종: {hwo['sector']}")
-        print(f"데이터 출처: {hwo['source']}")
-        print(f"분기 데이터 개수: {len(hwo['history'])}")
-        print("\n최근 5개 분기:")
-        for rec in hwo['history'][-5:]:
-            rev_str = f"{rec['revenue']:,}" if rec['revenue'] else 'N/A'
-            op_str = f"{rec['op_profit']:,}" if rec['op_profit'] else 'N/A'
-            print(f"  {rec['year']} {rec['quarter']}: 매출 {rev_str}, 영업이익 {op_str}")
-
-    # 샘플 출력: SK스퀘어 (revenue + 지분법이익 합산)
-    if '402340' in final_output:
-        print("\n=== 샘플: SK스퀘어 [402340] (revenue + 지분법이익 합산) ===")
-        sks = final_output['402340']
-        print(f"회사명: {sks['name']}")
-        print(f"업종: {sks['sector']}")
-        print(f"데이터 출처: {sks['source']}")
-        print(f"분기 데이터 개수: {len(sks['history'])}")
-        print("\n최근 5개 분기:")
-        for rec in sks['history'][-5:]:
-            rev_str = f"{rec['revenue']:,}" if rec.get('revenue') else 'N/A'
-            op_str = f"{rec['op_profit']:,}" if rec.get('op_profit') else 'N/A'
-            equity_str = f" (지분법이익: {rec['equity_method_profit']:,})" if rec.get('equity_method_profit') else ''
-            print(f"  {rec['year']} {rec['quarter']}: 매출 {rev_str}{equity_str}, 영업이익 {op_str}")
+def main():
+    CorpusBuild().run(SOURCE_DIR)
 
 if __name__ == '__main__':
     main()
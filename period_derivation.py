@@ -0,0 +1,122 @@
+"""
+Derive the quarters a filing does not report as a 3-month column
+
+DART has no Q4 report: every parser computed 4Q = Annual - 3Q_Acc itself, one
+company-year at a time. Half-year and Q3 reports also sometimes leave the
+3-month column (당기반기3개월 / 당기3분기3개월) empty while the cumulative
+column (당기반기누적 / 당기3분기누적) is filled, which left a gap in history.
+
+PeriodTable holds one column per (period, metric) over many company-years
+(rows) and derive() applies the rules column by column, for all rows at once:
+
+    2Q = H1_Acc - 1Q         where 2Q is not reported
+    3Q = 3Q_Acc - H1_Acc     where 3Q is not reported
+    4Q = Annual - 3Q_Acc     Annual: the first of `annual_order` the row reports
+
+Operands are always reported values (never derived ones), and every derived
+cell is flagged, so consumers can tell reported from derived values.
+"""
+import collections
+
+# Which annual figure a Q4 is computed from, when a year has both
+ANNUAL_CURRENT_FIRST = ('Annual_Current', 'Annual_Previous')    # same year's 사업보고서 first
+ANNUAL_PREVIOUS_FIRST = ('Annual_Previous', 'Annual_Current')   # next year's 사업보고서 (전기) first
+
+# target = first reported of `minuend` periods - subtrahend, only where target is not reported
+Rule = collections.namedtuple('Rule', ['target', 'minuend', 'subtrahend'])
+
+def derivation_rules(annual_order=ANNUAL_CURRENT_FIRST):
+    return (
+        Rule('2Q', ('H1_Acc',), '1Q'),
+        Rule('3Q', ('3Q_Acc',), 'H1_Acc'),
+        Rule('4Q', tuple(annual_order), '3Q_Acc'),
+    )
+
+DERIVATION_RULES = derivation_rules()
+
+class PeriodTable:
+    """Columns of metric values (None = missing) per period over `size` rows"""
+
+    def __init__(self, metrics, size):
+        self.metrics = list(metrics)
+        self.size = size
+        self.columns = {}  # period -> {metric: [value or None] * size}
+        self.derived = {}  # period -> {metric: [bool] * size}, only for derived periods
+
+    @classmethod
+    def from_year_data(cls, year_datas, metrics):
+        """Table with one row per {period: {metric: value}} dict (other keys are ignored)"""
+        year_datas = list(year_datas)
+        table = cls(metrics, len(year_datas))
+        periods = {p for y_data in year_datas for p, v in y_data.items() if isinstance(v, dict)}
+        for period in periods:
+            for metric in table.metrics:
+                table.set_column(period, metric,
+                                 [(y_data.get(period) or {}).get(metric) for y_data in year_datas])
+        return table
+
+    def set_column(self, period, metric, values):
+        self.columns.setdefault(period, {})[metric] = values
+
+    def column(self, period, metric):
+        cols = self.columns.get(period)
+        if cols is None or metric not in cols:
+            return [None] * self.size
+        return cols[metric]
+
+    def reported(self, period):
+        """Per row: does the period have a value for any metric"""
+        cols = self.columns.get(period)
+        if not cols:
+            return [False] * self.size
+        return [any(v is not None for v in row) for row in zip(*cols.values())]
+
+    def _first_reported(self, periods):
+        """{metric: column} taking each row from the first of `periods` it reports"""
+        result = {m: [None] * self.size for m in self.metrics}
+        taken = [False] * self.size
+        for period in periods:
+            if period not in self.columns:
+                continue
+            take = [r and not t for r, t in zip(self.reported(period), taken)]
+            for m in self.metrics:
+                src = self.column(period, m)
+                result[m] = [s if k else d for s, d, k in zip(src, result[m], take)]
+            taken = [t or k for t, k in zip(taken, take)]
+        return result
+
+    def derive(self, rules=DERIVATION_RULES):
+        """Apply rules in order; returns {target period: number of derived cells}"""
+        counts = collections.Counter()
+        for rule in rules:
+            if rule.subtrahend not in self.columns or not any(p in self.columns for p in rule.minuend):
+                continue
+            minuend = self._first_reported(rule.minuend)
+            for m in self.metrics:
+                current = self.column(rule.target, m)
+                derived = [
+                    a - b if v is None and a is not None and b is not None else None
+                    for v, a, b in zip(current, minuend[m], self.column(rule.subtrahend, m))
+                ]
+                flags = [d is not None for d in derived]
+                n = sum(flags)
+                if not n:
+                    continue
+                self.set_column(rule.target, m, [v if d is None else d for v, d in zip(current, derived)])
+                self.derived.setdefault(rule.target, {})[m] = flags
+                counts[rule.target] += n
+        return counts
+
+    def period_data(self, row, period):
+        """{metric: value} of one row's period (reported or derived), like a year_data entry"""
+        cols = self.columns.get(period)
+        if not cols:
+            return {}
+        return {m: col[row] for m, col in cols.items() if col[row] is not None}
+
+    def derived_metrics(self, row, period):
+        """Metrics of one row's period that were derived, in metric order"""
+        flags = self.derived.get(period)
+        if not flags:
+            return []
+        return [m for m in self.metrics if m in flags and flags[m][row]]
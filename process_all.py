@@ -0,0 +1,88 @@
+"""
+Full data refresh over csv_output in a single decoding pass
+
+Every registered consumer (each parser script's CorpusBuild, see
+dart_corpus.CorpusConsumer) is started, then the corpus streams the files in
+name order: each file is decoded once, handed to every consumer that reads
+it and dropped before the next file. Afterwards each consumer finishes its
+later passes and writes its usual JSON output. Only one decoded file is in
+memory at a time, on top of what the consumers keep.
+
+With --archives, DART bulk downloads (.zip / .txt.gz) are read straight
+from the archives (see dart_archive.py), so no 손익계산서/ or csv_output/ copy
+is needed; filings already in csv_output are replaced by the archive's copy.
+
+Usage:
+    python process_all.py                   # all consumers
+    python process_all.py quarterly eps     # selected consumers only
+    python process_all.py [quarterly ...] --archives downloads/ a.zip
+"""
+import time
+import argparse
+
+import process_data
+import process_annual_data
+import process_eps_data
+import parse_income_statement_revenue
+import parse_income_statement_eps
+import parse_income_statement_annual
+from dart_corpus import Corpus, use_corpus
+from dart_archive import find_archives
+
+# CONFIGURATION
+SOURCE_DIR = "csv_output"
+
+# Consumers in run order: (name, CorpusConsumer class, output file)
+CONSUMERS = [
+    ('quarterly', process_data.CorpusBuild, process_data.OUTPUT_FILE),
+    ('annual', process_annual_data.CorpusBuild, process_annual_data.OUTPUT_FILE),
+    ('eps', process_eps_data.CorpusBuild, process_eps_data.OUTPUT_FILE),
+    ('income_revenue', parse_income_statement_revenue.CorpusBuild, parse_income_statement_revenue.OUTPUT_FILE),
+    ('income_eps', parse_income_statement_eps.CorpusBuild, parse_income_statement_eps.OUTPUT_FILE),
+    ('income_annual', parse_income_statement_annual.CorpusBuild, parse_income_statement_annual.OUTPUT_FILE),
+]
+
+def run(selected=None, archives=None):
+    consumers = [c for c in CONSUMERS if not selected or c[0] in selected]
+    if not consumers:
+        print(f"No matching consumers. Available: {', '.join(c[0] for c in CONSUMERS)}")
+        return
+
+    start = time.time()
+    corpus = Corpus(SOURCE_DIR)
+    if archives:
+        corpus.add_archives(find_archives(archives))
+
+    with use_corpus(corpus):
+        started = []
+        for name, build, output_file in consumers:
+            print("\n" + "=" * 60)
+            print(f"Starting consumer: {name}")
+            print("=" * 60)
+            consumer = build()
+            started.append((consumer, consumer.start()))
+
+        print("\n" + "=" * 60)
+        corpus.stream(started)
+        print(f"Corpus pass finished in {time.time() - start:.1f}s")
+
+        for (name, _, output_file), (consumer, _) in zip(consumers, started):
+            print("\n" + "=" * 60)
+            print(f"Consumer: {name} -> {output_file}")
+            print("=" * 60)
+            consumer_start = time.time()
+            consumer.finish()
+            print(f"[{name}] finished in {time.time() - consumer_start:.1f}s")
+
+    print(f"\nAll consumers finished in {time.time() - start:.1f}s")
+
+def main():
+    arg_parser = argparse.ArgumentParser(description='Run every parser over a corpus decoded once')
+    arg_parser.add_argument('consumers', nargs='*', help=f"Consumers to run (default: all of {', '.join(c[0] for c in CONSUMERS)})")
+    arg_parser.add_argument('--archives', nargs='+', default=None,
+                            help='DART bulk .zip / .txt.gz files or directories to read directly')
+    args = arg_parser.parse_args()
+    run(args.consumers, args.archives)
+
+if __name__ == '__main__':
+    main()
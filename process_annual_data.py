@@ -2,7 +2,13 @@ import os
 import json
 import re
 import collections
-import csv
+
+from dart_corpus import iter_rows, FileSchema, CorpusConsumer
+from source_catalog import parse_filing, current_filenames
+from company_index import load_company_index
+from metric_classifier import MetricClassifier
+from overrides import OVERRIDES
+from fallback_revenue import StringTable, FallbackDecisions, parse_period_values, make_candidate
 
 # CONFIGURATION
 SOURCE_DIR = "csv_output"
@@ -97,6 +103,9 @@ METRICS = {
     }
 }
 
+# Compiled METRICS rules with per-(item code, item name) decisions memoized
+CLASSIFIER = MetricClassifier(METRICS)
+
 def clean_header(h):
     return h.replace(' ', '').replace('\xa0', '').strip()
 
@@ -114,12 +123,8 @@ def normalize_code(code, company_name=None):
     if not code or code == '[null]' or re.sub(r'[^\d]', '', code) == '':
         # Special handling for companies with missing codes
         if company_name:
-            # Known mappings for companies with missing stock codes in DART data
-            COMPANY_CODE_MAP = {
-                '포스코': '005490',
-                'POSCO': '005490',
-            }
-            return COMPANY_CODE_MAP.get(company_name.strip())
+            # Known mappings for companies with missing stock codes in DART data (overrides.json)
+            return OVERRIDES.code_alias(company_name)
         return None
 
     # Extract only digits
@@ -145,184 +150,71 @@ def is_financial_sector(sector):
             return True
     return False
 
-def should_exclude_metric(item_code, item_name, metric_def):
-    """Check if this item should be excluded from the metric"""
-    # Check exclude codes
-    for exc_code in metric_def.get('exclude_codes', []):
-        if exc_code in item_code:
-            return True
-
-    # Check exclude names
-    clean_name = clean_header(item_name)
-    for exc_name in metric_def.get('exclude_names', []):
-        if exc_name in clean_name:
-            return True
-
-    return False
-
-def matches_metric_code(item_code, metric_def):
-    """Check if item_code matches metric definition codes with exact matching"""
-    allowed_codes = metric_def.get('codes', [])
-
-    for code in allowed_codes:
-        # Exact match for ifrs_Revenue and ifrs-full_Revenue
-        if code in ['ifrs_Revenue', 'ifrs-full_Revenue']:
-            if item_code == code:
-                return True
-        # Substring match for other codes
-        elif code in item_code:
-            return True
-
-    return False
-
 class AnnualFinancialParser:
     def __init__(self):
         self.data = collections.defaultdict(lambda: collections.defaultdict(dict))
         self.meta = {}
         self.companies_with_ifrs_revenue_by_year = collections.defaultdict(set)
         self.fallback_revenue_candidates = collections.defaultdict(lambda: collections.defaultdict(list))
+        self.strings = StringTable()  # Item codes/names and filenames of fallback candidates
+        self.settled_fallback_groups = {}  # (code, year) -> number of candidates when last resolved
+        self.fallback_decisions = FallbackDecisions('annual')  # Recorded choices for ambiguous groups
         self.current_file = None
         self.company_name_to_code = {}
         self.code_to_company_name = {}
         self.companies_with_consolidated_data = set()
 
-    def build_company_mapping(self, files):
-        """Build company name to code mapping from all files to catch name changes"""
-        print("\nBuilding company name to code mapping from all files...")
-
-        # Sort files by year descending to process latest first
-        sorted_files = sorted([f for f in files if f.endswith('.csv')], reverse=True)
+    def build_company_mapping(self, files=None):
+        """Load company name <-> code mappings from the persistent company index
 
-        for filename in sorted_files:
-            filepath = os.path.join(SOURCE_DIR, filename)
-
-            # Read CSV file
-            encoding_candidates = ['utf-8-sig', 'cp949', 'utf-8', 'euc-kr']
-            rows = []
-
-            for enc in encoding_candidates:
-                try:
-                    with open(filepath, 'r', encoding=enc, newline='') as f:
-                        reader = csv.reader(f)
-                        rows = list(reader)
-                    break
-                except (UnicodeDecodeError, csv.Error):
-                    continue
-
-            if not rows:
-                continue
-
-            headers = [clean_header(h) for h in rows[0]]
-            col_map = {}
-            for idx, h in enumerate(headers):
-                if h:
-                    col_map[h] = idx
-
-            col_code = col_map.get('종목코드')
-            col_name = col_map.get('회사명')
-
-            if col_code is None or col_name is None:
-                continue
-
-            # Extract company code and name mappings
-            for row in rows[1:]:
-                if len(row) <= max(col_code, col_name):
-                    continue
-
-                raw_code = row[col_code].strip()
-                company_name = row[col_name].strip()
-
-                if not company_name:
-                    continue
-
-                # Skip [null] codes, we want valid codes only
-                if raw_code and raw_code != '[null]':
-                    normalized = re.sub(r'[^\d]', '', raw_code)
-                    if normalized:
-                        stock_code = normalized.zfill(6)
-
-                        # Store all historical names for the same code
-                        if company_name not in self.company_name_to_code:
-                            self.company_name_to_code[company_name] = stock_code
-
-                        # For code_to_company_name, always use latest name
-                        self.code_to_company_name[stock_code] = company_name
-
-        print(f"Mapped {len(self.company_name_to_code)} companies")
-
-        # Save mapping to JSON file for reference
-        mapping_data = {
-            'company_name_to_code': self.company_name_to_code,
-            'code_to_company_name': self.code_to_company_name
-        }
-        with open('company_code_mapping_annual.json', 'w', encoding='utf-8') as f:
-            json.dump(mapping_data, f, ensure_ascii=False, indent=2)
-        print("Saved mapping to company_code_mapping_annual.json")
+        Only files of SOURCE_DIR that are new since the last run are scanned
+        (see company_index.py). `files` is accepted for older callers.
+        """
+        index = load_company_index(SOURCE_DIR)
+        self.company_name_to_code = index.name_to_code
+        self.code_to_company_name = index.code_to_name
+        print(f"\nMapped {len(self.company_name_to_code)} companies (company index)")
 
     def process_file(self, filepath, filename, allow_separate=False):
         """Process only 사업보고서 (Annual Report) files"""
         self.current_file = filename
-        parts = filename.split('_')
+        filing = parse_filing(filename)
 
-        # Skip if not 사업보고서
-        if len(parts) < 2:
+        # Skip if not a DART filing name
+        if filing is None:
             return
 
-        year = int(parts[0])
-        report_type = parts[1]
+        year = filing.year
 
         # ONLY process 사업보고서 (Annual Reports)
-        if '사업보고서' not in report_type:
+        if '사업보고서' not in filing.report_type:
             return
 
         # Skip separate statements unless explicitly allowed
-        is_consolidated = '연결' in filename
-        if not is_consolidated and not allow_separate:
+        if not filing.consolidated and not allow_separate:
             return
 
         # Track if this is a consolidated file
-        processing_consolidated = is_consolidated
+        processing_consolidated = filing.consolidated
 
-        if '포괄손익계산서' not in filename and '손익계산서' not in filename:
-            return
-        if '현금흐름표' in filename or '재무상태표' in filename or '자본변동표' in filename:
+        if not filing.is_income_statement:
             return
 
         print(f"Processing {filename}...")
 
-        encoding_candidates = ['utf-8-sig', 'cp949', 'utf-8', 'euc-kr']
-        rows = []
+        rows = iter_rows(filepath)
+        header = next(rows, None)
 
-        for enc in encoding_candidates:
-            try:
-                with open(filepath, 'r', encoding=enc, newline='') as f:
-                    reader = csv.reader(f)
-                    rows = list(reader)
-                break
-            except (UnicodeDecodeError, csv.Error):
-                continue
-
-        if not rows:
+        if header is None:
             print(f"Failed to read {filename}")
             return
 
-        headers = [clean_header(h) for h in rows[0]]
-
-        col_map = {}
-        for idx, h in enumerate(headers):
-            if h:
-                col_map[h] = idx
-
-        def get_idx(candidates):
-            for c in candidates:
-                if c in col_map: return col_map[c]
-            return None
-
-        col_code = get_idx(['종목코드'])
-        col_name = get_idx(['회사명'])
-        col_sector = get_idx(['업종명', '업종'])
-        col_item_code = get_idx(['항목코드'])
-        col_item_name = get_idx(['항목명'])
+        schema = FileSchema(header)
+        col_code = schema.code
+        col_name = schema.name
+        col_sector = schema.sector
+        col_item_code = schema.item_code
+        col_item_name = schema.item_name
 
         if col_code is None or col_item_code is None:
             print(f"  Missing essential columns in {filename}")
@@ -336,8 +228,13 @@ class AnnualFinancialParser:
             ('Previous', ['전기', '전기사업년도'])
         ]
 
-        for row in rows[1:]:
-            if len(row) < max(col_map.values()) + 1:
+        # Header resolved once; the row loop only does indexed access
+        period_cols = schema.period_columns(target_periods)
+        col_idx_map = dict(period_cols)  # for fallback candidates
+        min_len = schema.min_len
+
+        for row in rows:
+            if len(row) < min_len:
                 continue
 
             # Try to normalize code with company name fallback
@@ -374,110 +271,89 @@ class AnnualFinancialParser:
 
             item_code = row[col_item_code].strip()
             item_name = row[col_item_name].strip()
-            clean_item_name = clean_header(item_name)
+            decision = CLASSIFIER.classify(item_code, item_name)
 
-            # Skip Cost of Sales and Gross Profit (except for Kakao)
-            if 'CostOfSales' in item_code or '매출원가' in clean_item_name:
+            # Skip Cost of Sales
+            if decision.skip:
                 continue
 
-            # SPECIAL CASE: Kakao (035720) uses GrossProfit for revenue
-            if row_code == '035720' and (item_code == 'ifrs_GrossProfit' or item_code == 'ifrs-full_GrossProfit'):
-                # Treat Kakao's GrossProfit as revenue
-                metric_type = 'revenue'
-            elif 'GrossProfit' in item_code or '매출총이익' in clean_item_name or '매출총손실' in clean_item_name:
+            # Company-specific item remaps (e.g. Kakao's GrossProfit as revenue)
+            remapped_metric = OVERRIDES.remapped_metric(row_code, item_code) if decision.remapped else None
+            if remapped_metric:
+                metric_type = remapped_metric
+            elif decision.gross_profit:
                 continue
             else:
-                # Determine Metric Type with exclusion check
-                metric_type = None
-                for m_key, m_def in METRICS.items():
-                    # First check if should be excluded
-                    if should_exclude_metric(item_code, item_name, m_def):
-                        continue
-
-                    # Check if matches by code or standard names
-                    if matches_metric_code(item_code, m_def) or any(n in clean_item_name for n in m_def['names']):
-                        metric_type = m_key
-                    # Track if this is revenue with IFRS code
-                    if m_key == 'revenue' and (item_code == 'ifrs_Revenue' or item_code == 'ifrs-full_Revenue'):
-                        self.companies_with_ifrs_revenue_by_year[row_code].add(year)
-                    break
+                # Pass 1 only ever tested the first metric the item is not excluded
+                # from (the loop broke after it), so it keeps using first_metric
+                metric_type = decision.first_metric
+                # Track if this is revenue with IFRS code
+                if decision.ifrs_revenue:
+                    self.companies_with_ifrs_revenue_by_year[row_code].add(year)
 
             # If not matched and this is potentially a fallback revenue candidate
-            if not metric_type and 'fallback_names' in METRICS['revenue']:
-                fallback_names = METRICS['revenue']['fallback_names']
-                fallback_exclude = METRICS['revenue'].get('fallback_exclude_patterns', [])
-
-                # Check if Korean name matches fallback patterns
-                matched_fallback = False
-                for fb_name in fallback_names:
-                    if fb_name in clean_item_name:
-                        # Check if any exclude pattern exists in the name
-                        has_exclude = any(exc in clean_item_name for exc in fallback_exclude)
-                        if not has_exclude:
-                            col_idx_map = {pk: get_idx(cols) for pk, cols in target_periods}
-
-                            # Store as potential fallback candidate
-                            self.fallback_revenue_candidates[row_code][year].append({
-                                'item_code': item_code,
-                                'item_name': item_name,
-                                'clean_name': clean_item_name,
-                                'row_data': row,
-                                'col_idx_map': col_idx_map,
-                                'filename': self.current_file
-                            })
-                            matched_fallback = True
-                            break
-
-                if matched_fallback:
-                    continue  # Will process in second pass
+            if not metric_type and decision.fallback:
+                # Store as potential fallback candidate (values parsed now, not the row)
+                self.fallback_revenue_candidates[row_code][year].append(
+                    make_candidate(self.strings, item_code, item_name, clean_header(item_name), self.current_file,
+                                   parse_period_values(row, col_idx_map, parse_value)))
+                continue  # Will process in second pass
 
             if not metric_type:
                 continue
 
             # Extract Values for targets
-            for period_key, allowed_cols in target_periods:
-                col_idx = get_idx(allowed_cols)
-                if col_idx is not None:
-                    val = parse_value(row[col_idx])
-                    if val is not None:
-                        # For 사업보고서: 파일명의 year = 결산연도 = 당기 연도
-                        # 당기 -> target_year = year (파일명 연도)
-                        # 전기 -> target_year = year - 1
-                        if period_key == 'Annual':
-                            target_year = year
-                        elif period_key == 'Previous':
-                            target_year = year - 1
-                        else:
-                            continue
+            for period_key, col_idx in period_cols:
+                val = parse_value(row[col_idx])
+                if val is not None:
+                    # For 사업보고서: 파일명의 year = 결산연도 = 당기 연도
+                    # 당기 -> target_year = year (파일명 연도)
+                    # 전기 -> target_year = year - 1
+                    if period_key == 'Annual':
+                        target_year = year
+                    elif period_key == 'Previous':
+                        target_year = year - 1
+                    else:
+                        continue
 
-                        # Store metadata
-                        if f'_meta_{metric_type}_name' not in self.data[row_code][target_year]:
-                            self.data[row_code][target_year][f'_meta_{metric_type}_name'] = item_name
-                        if f'_meta_{metric_type}_code' not in self.data[row_code][target_year]:
-                            self.data[row_code][target_year][f'_meta_{metric_type}_code'] = item_code
+                    # Store metadata
+                    if f'_meta_{metric_type}_name' not in self.data[row_code][target_year]:
+                        self.data[row_code][target_year][f'_meta_{metric_type}_name'] = item_name
+                    if f'_meta_{metric_type}_code' not in self.data[row_code][target_year]:
+                        self.data[row_code][target_year][f'_meta_{metric_type}_code'] = item_code
 
-                        # Store value
-                        if metric_type not in self.data[row_code][target_year]:
-                            self.data[row_code][target_year][metric_type] = val
+                    # Store value
+                    if metric_type not in self.data[row_code][target_year]:
+                        self.data[row_code][target_year][metric_type] = val
 
     def process_fallback_revenue(self):
-        """Process fallback Korean name revenue for companies without IFRS codes"""
+        """Process fallback Korean name revenue for companies without IFRS codes
+
+        Only (company, year) groups that gained candidates since the previous
+        call are resolved again.
+        """
         multiple_matches = {}
+        strings = self.strings
 
         for row_code, year_candidates in self.fallback_revenue_candidates.items():
             for year, candidates in year_candidates.items():
+                # Groups resolved by an earlier call stay settled unless they gained candidates since
+                if self.settled_fallback_groups.get((row_code, year)) == len(candidates):
+                    continue
+                self.settled_fallback_groups[(row_code, year)] = len(candidates)
+
                 # Deduplicate candidates
                 seen = set()
                 deduped_candidates = []
                 for cand in candidates:
-                    unique_key = (cand['item_code'], cand['filename'])
+                    unique_key = (cand.item_code, cand.filename)
                     if unique_key not in seen:
                         seen.add(unique_key)
                         deduped_candidates.append(cand)
 
                 # Check if all candidates have the same clean_name
                 if len(deduped_candidates) > 1:
-                    unique_names = set(c['clean_name'] for c in deduped_candidates)
+                    unique_names = set(c.clean_name for c in deduped_candidates)
                     if len(unique_names) == 1:
                         # All same name - process all candidates
                         candidates_to_process = deduped_candidates
@@ -486,62 +362,60 @@ class AnnualFinancialParser:
                         selected = None
 
                         # Priority 1: Exact match '매출액'
-                        exact_maechul = [c for c in deduped_candidates if c['clean_name'] == '매출액']
+                        exact_maechul = [c for c in deduped_candidates if strings[c.clean_name] == '매출액']
                         if exact_maechul:
                             selected = exact_maechul[0]
 
                         # Priority 2: Exact match '영업수익'
                         if not selected:
-                            exact_youngsup = [c for c in deduped_candidates if c['clean_name'] == '영업수익']
+                            exact_youngsup = [c for c in deduped_candidates if strings[c.clean_name] == '영업수익']
                             if len(exact_youngsup) == 1:
                                 selected = exact_youngsup[0]
                             elif len(exact_youngsup) > 1:
                                 # Priority 3: '영업수익' with '매출' in name
-                                youngsup_with_maechul = [c for c in exact_youngsup if '매출' in c['clean_name']]
+                                youngsup_with_maechul = [c for c in exact_youngsup if '매출' in strings[c.clean_name]]
                                 if len(youngsup_with_maechul) == 1:
                                     selected = youngsup_with_maechul[0]
 
                         if selected:
                             candidates_to_process = [selected]
                         else:
-                            # Multiple matches found
-                            company_name = self.meta.get(row_code, {}).get('name', 'Unknown')
-                            key = f"{row_code}_{company_name}_{year}"
-                            multiple_matches[key] = deduped_candidates
-                            continue
+                            # A decision recorded in fallback_revenue_decisions.json settles the group
+                            candidates_to_process = self.fallback_decisions.resolve(row_code, year, deduped_candidates, strings)
+                            if candidates_to_process is None:
+                                # Multiple matches found
+                                company_name = self.meta.get(row_code, {}).get('name', 'Unknown')
+                                key = f"{row_code}_{company_name}_{year}"
+                                multiple_matches[key] = deduped_candidates
+                                self.fallback_decisions.enqueue(row_code, company_name, year, deduped_candidates, strings)
+                                continue
                 else:
                     candidates_to_process = deduped_candidates
 
                 # Process all selected candidates
                 for candidate in candidates_to_process:
-                    item_code = candidate['item_code']
-                    item_name = candidate['item_name']
-                    row = candidate['row_data']
-                    col_idx_map = candidate['col_idx_map']
+                    item_code = strings[candidate.item_code]
+                    item_name = strings[candidate.item_name]
 
                     # Process this as revenue
-                    for period_key, col_idx in col_idx_map.items():
-                        if col_idx is not None and col_idx < len(row):
-                            val = parse_value(row[col_idx])
-
-                            if val is not None:
-                                # Determine target year
-                                if period_key == 'Annual':
-                                    target_year = year
-                                elif period_key == 'Previous':
-                                    target_year = year - 1
-                                else:
-                                    continue
-
-                                # Store metadata
-                                if '_meta_revenue_name' not in self.data[row_code][target_year]:
-                                    self.data[row_code][target_year]['_meta_revenue_name'] = item_name
-                                if '_meta_revenue_code' not in self.data[row_code][target_year]:
-                                    self.data[row_code][target_year]['_meta_revenue_code'] = item_code
-
-                                # Only set if revenue doesn't exist
-                                if 'revenue' not in self.data[row_code][target_year]:
-                                    self.data[row_code][target_year]['revenue'] = val
+                    for period_key, val in candidate.values:
+                        # Determine target year
+                        if period_key == 'Annual':
+                            target_year = year
+                        elif period_key == 'Previous':
+                            target_year = year - 1
+                        else:
+                            continue
+
+                        # Store metadata
+                        if '_meta_revenue_name' not in self.data[row_code][target_year]:
+                            self.data[row_code][target_year]['_meta_revenue_name'] = item_name
+                        if '_meta_revenue_code' not in self.data[row_code][target_year]:
+                            self.data[row_code][target_year]['_meta_revenue_code'] = item_code
+
+                        # Only set if revenue doesn't exist
+                        if 'revenue' not in self.data[row_code][target_year]:
+                            self.data[row_code][target_year]['revenue'] = val
 
         # Report multiple matches
         if multiple_matches:
@@ -550,21 +424,15 @@ class AnnualFinancialParser:
                 print(f"\n{key}:")
                 for i, cand in enumerate(candidates, 1):
                     amounts_str = []
-                    row = cand['row_data']
-                    col_idx_map = cand['col_idx_map']
-                    for period_key, col_idx in col_idx_map.items():
-                        if col_idx is not None and col_idx < len(row):
-                            val = parse_value(row[col_idx])
-                            if val is not None:
-                                period_name = period_key.replace('Annual', '당기연간').replace('Previous', '전기연간')
-                                amounts_str.append(f"{period_name}: {val:,}원")
+                    for period_key, val in cand.values:
+                        period_name = period_key.replace('Annual', '당기연간').replace('Previous', '전기연간')
+                        amounts_str.append(f"{period_name}: {val:,}원")
 
                     amounts_display = ", ".join(amounts_str) if amounts_str else "금액 없음"
-                    filename = cand.get('filename', '알 수 없음')
 
-                    print(f"  {i}. Name: {cand['item_name']}")
-                    print(f"     Code: {cand['item_code']}")
-                    print(f"     File: {filename}")
+                    print(f"  {i}. Name: {strings[cand.item_name]}")
+                    print(f"     Code: {strings[cand.item_code]}")
+                    print(f"     File: {strings[cand.filename]}")
                     print(f"     Amounts: {amounts_display}")
             print("\n==========================================================\n")
 
@@ -592,56 +460,30 @@ class AnnualFinancialParser:
 
     def process_file_for_separate(self, filepath, filename, target_companies):
         """Process separate statements (별도) only for target companies"""
-        # Only process files WITHOUT '연결' (separate statements)
-        if '연결' in filename:
-            return
-
-        # Check if it's an income statement from 사업보고서
-        if '사업보고서' not in filename:
-            return
-        if '포괄손익계산서' not in filename and '손익계산서' not in filename:
+        # Only process separate statements (no '연결') that are income statements from 사업보고서
+        filing = parse_filing(filename)
+        if filing is None or filing.consolidated:
             return
-        if '현금흐름표' in filename or '재무상태표' in filename or '자본변동표' in filename:
+        if '사업보고서' not in filing.report_type or not filing.is_income_statement:
             return
 
         print(f"Processing (별도): {filename}...")
 
-        parts = filename.split('_')
-        year = int(parts[0])
+        year = filing.year
 
-        encoding_candidates = ['utf-8-sig', 'cp949', 'utf-8', 'euc-kr']
-        rows = []
+        rows = iter_rows(filepath)
+        header = next(rows, None)
 
-        for enc in encoding_candidates:
-            try:
-                with open(filepath, 'r', encoding=enc, newline='') as f:
-                    reader = csv.reader(f)
-                    rows = list(reader)
-                break
-            except (UnicodeDecodeError, csv.Error):
-                continue
-
-        if not rows:
+        if header is None:
             print(f"Failed to read {filename}")
             return
 
-        headers = [clean_header(h) for h in rows[0]]
-
-        col_map = {}
-        for idx, h in enumerate(headers):
-            if h:
-                col_map[h] = idx
-
-        def get_idx(candidates):
-            for c in candidates:
-                if c in col_map: return col_map[c]
-            return None
-
-        col_code = get_idx(['종목코드'])
-        col_name = get_idx(['회사명'])
-        col_sector = get_idx(['업종명', '업종'])
-        col_item_code = get_idx(['항목코드'])
-        col_item_name = get_idx(['항목명'])
+        schema = FileSchema(header)
+        col_code = schema.code
+        col_name = schema.name
+        col_sector = schema.sector
+        col_item_code = schema.item_code
+        col_item_name = schema.item_name
 
         if col_code is None or col_item_code is None:
             print(f"  Missing essential columns in {filename}")
@@ -652,8 +494,13 @@ class AnnualFinancialParser:
             ('Previous', ['전기', '전기사업년도'])
         ]
 
-        for row in rows[1:]:
-            if len(row) < max(col_map.values()) + 1:
+        # Header resolved once; the row loop only does indexed access
+        period_cols = schema.period_columns(target_periods)
+        col_idx_map = dict(period_cols)  # for fallback candidates
+        min_len = schema.min_len
+
+        for row in rows:
+            if len(row) < min_len:
                 continue
 
             company_name = row[col_name].strip() if col_name is not None else None
@@ -691,75 +538,45 @@ class AnnualFinancialParser:
 
             item_code = row[col_item_code].strip()
             item_name = row[col_item_name].strip()
-            clean_item_name = clean_header(item_name)
+            decision = CLASSIFIER.classify(item_code, item_name)
 
             # Skip Cost of Sales and Gross Profit
-            if 'CostOfSales' in item_code or '매출원가' in clean_item_name:
-                continue
-            if 'GrossProfit' in item_code or '매출총이익' in clean_item_name or '매출총손실' in clean_item_name:
+            if decision.skip or decision.gross_profit:
                 continue
 
             # Determine Metric Type
-            metric_type = None
-            for m_key, m_def in METRICS.items():
-                if should_exclude_metric(item_code, item_name, m_def):
-                    continue
-
-                if matches_metric_code(item_code, m_def) or any(n in clean_item_name for n in m_def['names']):
-                    metric_type = m_key
-                    if m_key == 'revenue' and (item_code == 'ifrs_Revenue' or item_code == 'ifrs-full_Revenue'):
-                        self.companies_with_ifrs_revenue_by_year[row_code].add(year)
-                    break
+            metric_type = decision.metric
+            if decision.ifrs_revenue:
+                self.companies_with_ifrs_revenue_by_year[row_code].add(year)
 
             # Fallback revenue handling
-            if not metric_type and 'fallback_names' in METRICS['revenue']:
-                fallback_names = METRICS['revenue']['fallback_names']
-                fallback_exclude = METRICS['revenue'].get('fallback_exclude_patterns', [])
-
-                matched_fallback = False
-                for fb_name in fallback_names:
-                    if fb_name in clean_item_name:
-                        has_exclude = any(exc in clean_item_name for exc in fallback_exclude)
-                        if not has_exclude:
-                            col_idx_map = {pk: get_idx(cols) for pk, cols in target_periods}
-
-                            self.fallback_revenue_candidates[row_code][year].append({
-                                'item_code': item_code,
-                                'item_name': item_name,
-                                'clean_name': clean_item_name,
-                                'row_data': row,
-                                'col_idx_map': col_idx_map,
-                                'filename': filename
-                            })
-                            matched_fallback = True
-                            break
-
-                if matched_fallback:
-                    continue
+            if not metric_type and decision.fallback:
+                self.fallback_revenue_candidates[row_code][year].append(
+                    make_candidate(self.strings, item_code, item_name, clean_header(item_name), filename,
+                                   parse_period_values(row, col_idx_map, parse_value)))
+                continue
 
             if not metric_type:
                 continue
 
             # Extract Values
-            for period_key, allowed_cols in target_periods:
-                col_idx = get_idx(allowed_cols)
-                if col_idx is not None:
-                    val = parse_value(row[col_idx])
-                    if val is not None:
-                        if period_key == 'Annual':
-                            target_year = year
-                        elif period_key == 'Previous':
-                            target_year = year - 1
-                        else:
-                            continue
+            for period_key, col_idx in period_cols:
+                val = parse_value(row[col_idx])
+                if val is not None:
+                    if period_key == 'Annual':
+                        target_year = year
+                    elif period_key == 'Previous':
+                        target_year = year - 1
+                    else:
+                        continue
 
-                        if f'_meta_{metric_type}_name' not in self.data[row_code][target_year]:
-                            self.data[row_code][target_year][f'_meta_{metric_type}_name'] = item_name
-                        if f'_meta_{metric_type}_code' not in self.data[row_code][target_year]:
-                            self.data[row_code][target_year][f'_meta_{metric_type}_code'] = item_code
+                    if f'_meta_{metric_type}_name' not in self.data[row_code][target_year]:
+                        self.data[row_code][target_year][f'_meta_{metric_type}_name'] = item_name
+                    if f'_meta_{metric_type}_code' not in self.data[row_code][target_year]:
+                        self.data[row_code][target_year][f'_meta_{metric_type}_code'] = item_code
 
-                        if metric_type not in self.data[row_code][target_year]:
-                            self.data[row_code][target_year][metric_type] = val
+                    if metric_type not in self.data[row_code][target_year]:
+                        self.data[row_code][target_year][metric_type] = val
 
     def compile_final_data(self):
         """Compile final annual data"""
@@ -796,69 +613,77 @@ class AnnualFinancialParser:
                     history.append(rec)
 
             if history:
-                company_name = company_meta['name']
-
-                # HARDCODED FIX: POSCO name correction
-                if code == '005490':
-                    company_name = 'POSCO홀딩스'
-
                 output[code] = {
-                    'name': company_name,
+                    'name': company_meta['name'],
                     'sector': company_meta['sector'],
                     'statement_type': company_meta.get('statement_type', '연결'),
                     'history': history
                 }
 
-        return output
+        return OVERRIDES.apply_names(output)
 
-def main():
-    parser = AnnualFinancialParser()
+class CorpusBuild(CorpusConsumer):
+    """main() split around the corpus pass (see dart_corpus.CorpusConsumer): Pass 1 runs per file"""
+
+    def start(self):
+        self.parser = AnnualFinancialParser()
 
-    files = sorted(os.listdir(SOURCE_DIR))
+        self.files = current_filenames(SOURCE_DIR)
 
-    # Build company name to code mapping
-    parser.build_company_mapping(files)
+        # Build company name to code mapping
+        self.parser.build_company_mapping()
 
-    # PASS 1: Process consolidated statements (연결) from 사업보고서 only
-    print("\n=== Pass 1: Processing Consolidated Statements (연결) from 사업보고서 ===")
-    for f in files:
-        if f.endswith('.csv'):
-            parser.process_file(os.path.join(SOURCE_DIR, f), f, allow_separate=False)
+        # PASS 1: Process consolidated statements (연결) from 사업보고서 only
+        print("\n=== Pass 1: Processing Consolidated Statements (연결) from 사업보고서 ===")
+        return [f for f in self.files if f.endswith('.csv')]
 
-    # Process fallback revenue for companies without IFRS codes (Pass 1)
-    print(f"\nProcessing fallback revenue (Pass 1)...")
-    total_ifrs_company_years = sum(len(years) for years in parser.companies_with_ifrs_revenue_by_year.values())
-    print(f"Company-years with IFRS revenue codes: {total_ifrs_company_years}")
-    print(f"Companies with fallback candidates: {len(parser.fallback_revenue_candidates)}")
+    def on_file(self, filepath, filename):
+        self.parser.process_file(filepath, filename, allow_separate=False)
 
-    multiple_matches = parser.process_fallback_revenue()
+    def finish(self):
+        parser = self.parser
+        files = self.files
 
-    # PASS 2: Process separate statements (별도) for companies with missing data
-    print("\n=== Pass 2: Processing Separate Statements (별도) for Missing Companies ===")
-    missing_companies = parser.find_companies_with_missing_data()
-    print(f"Found {len(missing_companies)} companies with missing data")
+        # Process fallback revenue for companies without IFRS codes (Pass 1)
+        print(f"\nProcessing fallback revenue (Pass 1)...")
+        total_ifrs_company_years = sum(len(years) for years in parser.companies_with_ifrs_revenue_by_year.values())
+        print(f"Company-years with IFRS revenue codes: {total_ifrs_company_years}")
+        print(f"Companies with fallback candidates: {len(parser.fallback_revenue_candidates)}")
 
-    if missing_companies:
-        for f in files:
-            if f.endswith('.csv'):
-                parser.process_file_for_separate(os.path.join(SOURCE_DIR, f), f, missing_companies)
+        multiple_matches = parser.process_fallback_revenue()
 
-        # Process fallback revenue again for newly added data (Pass 2)
-        print(f"\nProcessing fallback revenue (Pass 2)...")
-        multiple_matches_pass2 = parser.process_fallback_revenue()
+        # PASS 2: Process separate statements (별도) for companies with missing data
+        print("\n=== Pass 2: Processing Separate Statements (별도) for Missing Companies ===")
+        missing_companies = parser.find_companies_with_missing_data()
+        print(f"Found {len(missing_companies)} companies with missing data")
 
-        # Merge both pass results
-        if multiple_matches_pass2:
-            multiple_matches.update(multiple_matches_pass2)
+        if missing_companies:
+            for f in files:
+                if f.endswith('.csv'):
+                    parser.process_file_for_separate(os.path.join(SOURCE_DIR, f), f, missing_companies)
 
-    final_data = parser.compile_final_data()
+            # Process fallback revenue again for newly added data (Pass 2)
+            print(f"\nProcessing fallback revenue (Pass 2)...")
+            multiple_matches_pass2 = parser.process_fallback_revenue()
 
-    with open(OUTPUT_FILE, 'w', encoding='utf-8') as f:
-        json.dump(final_data, f, ensure_ascii=False, indent=2)
+            # Merge both pass results
+            if multiple_matches_pass2:
+                multiple_matches.update(multiple_matches_pass2)
 
-    print(f"\nDone. Processed {len(final_data)} companies.")
-    if multiple_matches:
-        print(f"WARNING: {len(multiple_matches)} company-years have multiple fallback matches (see above)")
+        # Undecided multiple-match groups go to the review queue (see fallback_revenue.py)
+        parser.fallback_decisions.save_queue()
+
+        final_data = parser.compile_final_data()
+
+        with open(OUTPUT_FILE, 'w', encoding='utf-8') as f:
+            json.dump(final_data, f, ensure_ascii=False, indent=2)
+
+        print(f"\nDone. Processed {len(final_data)} companies.")
+        if multiple_matches:
+            print(f"WARNING: {len(multiple_matches)} company-years have multiple fallback matches (see above)")
+
+def main():
+    CorpusBuild().run(SOURCE_DIR)
 
 if __name__ == '__main__':
     main()
@@ -1,12 +1,30 @@
 import os
 import json
 import re
+import pickle
+import tempfile
 import collections
-import csv
+import argparse
+import concurrent.futures
+
+from dart_corpus import iter_rows, FileSchema, CorpusConsumer
+from dart_columnar import open_current_filing
+from company_index import load_company_index, index_code
+from row_index import load_row_index, iter_indexed_rows
+from metric_classifier import MetricClassifier
+from fact_store import FactStore
+from period_derivation import DERIVATION_RULES
+from overrides import OVERRIDES
+from source_catalog import parse_filing, current_filenames
+from fallback_revenue import StringTable, FallbackDecisions, parse_period_values, make_candidate
+from external_sort import FactRuns, DEFAULT_RUN_SIZE
+from json_stream import JsonObjectWriter, ShardWriter
+from split_financial_data import OUTPUT_DIR as SHARD_DIR, CHUNK_BUDGET, report_chunks
 
 # CONFIGURATION
 SOURCE_DIR = "csv_output"
 OUTPUT_FILE = "financial_data.json"
+SHARD_PREFIX = "financial_data"  # <SHARD_DIR>/financial_data_NN.json + financial_data_index.json (--shards)
 
 # EXCLUDED SECTORS (Financial and Insurance companies)
 EXCLUDED_SECTORS = [
@@ -97,6 +115,12 @@ METRICS = {
     }
 }
 
+# Compiled METRICS rules with per-(item code, item name) decisions memoized
+CLASSIFIER = MetricClassifier(METRICS)
+
+# Storage keys of FinancialParser.data ('Annual_Previous_From_Next' is stored as 'Annual_Previous')
+STORE_PERIODS = ['1Q', '2Q', 'H1_Acc', '3Q', '3Q_Acc', 'Annual_Current', 'Annual_Previous']
+
 def clean_header(h):
     return h.replace(' ', '').replace('\xa0', '').strip()
 
@@ -114,12 +138,8 @@ def normalize_code(code, company_name=None):
     if not code or code == '[null]' or re.sub(r'[^\d]', '', code) == '':
         # Special handling for companies with missing codes
         if company_name:
-            # Known mappings for companies with missing stock codes in DART data
-            COMPANY_CODE_MAP = {
-                '포스코': '005490',
-                'POSCO': '005490',
-            }
-            return COMPANY_CODE_MAP.get(company_name.strip())
+            # Known mappings for companies with missing stock codes in DART data (overrides.json)
+            return OVERRIDES.code_alias(company_name)
         return None
 
     # Extract only digits
@@ -145,393 +165,538 @@ def is_financial_sector(sector):
             return True
     return False
 
-def should_exclude_metric(item_code, item_name, metric_def):
-    """Check if this item should be excluded from the metric"""
-    # Check exclude codes
-    for exc_code in metric_def.get('exclude_codes', []):
-        if exc_code in item_code:
-            return True
-    
-    # Check exclude names
-    clean_name = clean_header(item_name)
-    for exc_name in metric_def.get('exclude_names', []):
-        if exc_name in clean_name:
-            return True
-    
-    return False
-
-def matches_metric_code(item_code, metric_def):
-    """Check if item_code matches metric definition codes with exact matching"""
-    allowed_codes = metric_def.get('codes', [])
-    
-    for code in allowed_codes:
-        # Exact match for ifrs_Revenue and ifrs-full_Revenue
-        if code in ['ifrs_Revenue', 'ifrs-full_Revenue']:
-            if item_code == code:
-                return True
-        # Substring match for other codes
-        elif code in item_code:
-            return True
-    
-    return False
-    """Check if this item should be excluded from the metric"""
-    # Check exclude codes
-    for exc_code in metric_def.get('exclude_codes', []):
-        if exc_code in item_code:
-            return True
-    
-    # Check exclude names
-    clean_name = clean_header(item_name)
-    for exc_name in metric_def.get('exclude_names', []):
-        if exc_name in clean_name:
-            return True
-    
-    return False
-
-class FinancialParser:
-    def __init__(self):
-        self.data = collections.defaultdict(lambda: collections.defaultdict(lambda: collections.defaultdict(dict)))
-        self.meta = {}
-        self.companies_with_ifrs_revenue_by_year = collections.defaultdict(set)  # Track company-year pairs with IFRS codes
-        self.fallback_revenue_candidates = collections.defaultdict(lambda: collections.defaultdict(list))  # Track multiple matches
-        self.current_file = None  # Track current file being processed
-        self.company_name_to_code = {}  # Map company name to stock code (from latest files)
-        self.code_to_company_name = {}  # Map stock code to company name (from latest files)
-        self.companies_with_consolidated_data = set()  # Track companies that have data from 연결 (consolidated) files
-
-    def build_company_mapping(self, files):
-        """Build company name to code mapping from all files to catch name changes"""
-        print("\nBuilding company name to code mapping from all files...")
-
-        # Sort files by year descending to process latest first
-        sorted_files = sorted([f for f in files if f.endswith('.csv')], reverse=True)
-
-        for filename in sorted_files:  # Process all files to catch historical name changes
-            filepath = os.path.join(SOURCE_DIR, filename)
+# Fact kinds recorded by extract_file_facts (replayed in row order by merge_file_facts)
+FACT_VALUE = 'value'
+FACT_IFRS_REVENUE = 'ifrs_revenue'
+FACT_FALLBACK = 'fallback'
+# Streaming build only: a file's (code, name, sector) record, replayed through merge_first_seen
+FACT_SEEN = 'seen'
+
+class FileFacts:
+    """Everything one income statement file contributes, independent of parser state"""
+
+    def __init__(self, filename, is_consolidated):
+        self.filename = filename
+        self.is_consolidated = is_consolidated
+        self.error = None
+        self.first_seen = []  # (code, name, sector) for the first row of each company, in row order
+        self.events = []  # (kind, code, ...) in row order
+
+def _scan_rows_for_codes(rows, codes, company_name_to_code):
+    header = next(rows, None)
+    if header is None:
+        return
+    yield header
+    schema = FileSchema(header)
+    if schema.code is None:
+        return
+    # Same row selection as the row index (row_index.py)
+    for row in rows:
+        raw_code = row[schema.code].strip() if schema.code < len(row) else ''
+        if not raw_code or raw_code == '[null]' or re.sub(r'[^\d]', '', raw_code) == '':
+            name = row[schema.name].strip() if schema.name is not None and schema.name < len(row) else ''
+            code = company_name_to_code.get(name) or normalize_code(None, name)
+        else:
+            code = index_code(raw_code)
+        if code in codes:
+            yield row
+
+def iter_rows_for_codes(filepath, codes, company_name_to_code):
+    """Header plus only the rows that resolve to one of `codes`, via the file's row index
+
+    [null]-code rows are picked by company name, resolved the same way as in
+    extract_file_facts. Archive filings (dart_archive.py) are not on disk to be
+    indexed, so their rows are filtered from the corpus instead.
+    """
+    if not os.path.exists(filepath):
+        return _scan_rows_for_codes(iter_rows(filepath), codes, company_name_to_code)
+    index = load_row_index(filepath)
+    names = [name for name in (index['names'] if index else ())
+             if (company_name_to_code.get(name) or normalize_code(None, name)) in codes]
+    return iter_indexed_rows(filepath, index, sorted(codes), names)
+
+def describe_filing(filename, allow_separate=False):
+    """(year, is_consolidated, target_periods) of an income statement file, or None if it is not processed"""
+    filing = parse_filing(filename)
+    if filing is None: return None
+
+    # Skip separate statements unless explicitly allowed
+    if not filing.consolidated and not allow_separate:
+        return None
 
-            # Read CSV file
-            encoding_candidates = ['utf-8-sig', 'cp949', 'utf-8', 'euc-kr']
-            rows = []
+    if not filing.is_income_statement: return None
+
+    report_type = filing.report_type
+    target_periods = []
+
+    if '1분기보고서' in report_type:
+        target_periods.append(('1Q', ['당기1분기3개월', '당기1분기', '당기']))
+    elif '반기보고서' in report_type:
+        target_periods.append(('2Q', ['당기반기3개월', '당기2분기3개월', '당기2분기']))
+        target_periods.append(('H1_Acc', ['당기반기누적']))
+    elif '3분기보고서' in report_type:
+        target_periods.append(('3Q', ['당기3분기3개월']))
+        target_periods.append(('3Q_Acc', ['당기3분기누적']))
+    elif '사업보고서' in report_type:
+        target_periods.append(('Annual_Current', ['당기', '당기사업년도']))
+        target_periods.append(('Annual_Previous_From_Next', ['전기', '전기사업년도']))
+
+    return filing.year, filing.consolidated, target_periods
+
+def resolve_row_code(raw_code, company_name, company_name_to_code):
+    """Stock code of a row (stripped code and company name cells), or None if it has none"""
+    # First try to get from mapping if code is null
+    if not raw_code or raw_code == '[null]' or re.sub(r'[^\d]', '', raw_code) == '':
+        row_code = company_name_to_code.get(company_name)
+        if row_code:
+            return row_code
+    return normalize_code(raw_code, company_name)
+
+def resolve_metric(row_code, item_code, item_name):
+    """(metric_type, ifrs_revenue, fallback) of a row's item, or None if the row is skipped
+
+    fallback is True for unmatched items kept as fallback revenue candidates
+    (metric_type is None then); ifrs_revenue marks IFRS-coded revenue rows.
+    """
+    decision = CLASSIFIER.classify(item_code, item_name)
+
+    # Skip Cost of Sales
+    if decision.skip:
+        return None
 
-            for enc in encoding_candidates:
-                try:
-                    with open(filepath, 'r', encoding=enc, newline='') as f:
-                        reader = csv.reader(f)
-                        rows = list(reader)
-                    break
-                except (UnicodeDecodeError, csv.Error):
-                    continue
+    # Company-specific item remaps (e.g. Kakao's GrossProfit as revenue)
+    remapped_metric = OVERRIDES.remapped_metric(row_code, item_code) if decision.remapped else None
+    if remapped_metric:
+        return remapped_metric, False, False
+    if decision.gross_profit:
+        return None
 
-            if not rows:
-                continue
+    # Metric type with exclusion check (see metric_classifier.py)
+    metric_type = decision.metric
+    fallback = not metric_type and bool(decision.fallback)
+    if not (metric_type or fallback or decision.ifrs_revenue):
+        return None
+    return metric_type, decision.ifrs_revenue, fallback
 
-            headers = [clean_header(h) for h in rows[0]]
-            col_map = {}
-            for idx, h in enumerate(headers):
-                if h:
-                    col_map[h] = idx
+def extract_file_facts(filepath, filename, company_name_to_code, allow_separate=False, codes=None):
+    """Parse a single file into a FileFacts, or None if the file is not processed
 
-            col_code = col_map.get('종목코드')
-            col_name = col_map.get('회사명')
+    Only reads company_name_to_code, so it can run in a worker process.
+    Metadata and the financial-sector filter are applied at merge time.
+    With `codes`, only those companies' rows are read (see row_index.py).
+    """
+    filing = describe_filing(filename, allow_separate)
+    if filing is None:
+        return None
+    year, is_consolidated, target_periods = filing
+
+    facts = FileFacts(filename, is_consolidated)
+
+    if codes is None:
+        # A columnar store written with this exact CSV (txt_to_csv.py --columnar) is read instead
+        store = open_current_filing(filepath)
+        if store is not None:
+            with store:
+                if extract_store_facts(store, facts, year, target_periods, company_name_to_code):
+                    return facts
+        rows = iter_rows(filepath)
+    else:
+        rows = iter_rows_for_codes(filepath, codes, company_name_to_code)
+    header = next(rows, None)
+
+    if header is None:
+        facts.error = f"Failed to read {filename}"
+        return facts
+
+    schema = FileSchema(header)
+    col_code = schema.code
+    col_name = schema.name
+    col_sector = schema.sector
+    col_item_code = schema.item_code
+    col_item_name = schema.item_name
+
+    if col_code is None or col_item_code is None:
+        facts.error = f"  Missing essential columns in {filename}"
+        return facts
+
+    seen_codes = set()
+    events = facts.events
+
+    # Header resolved once; the row loop only does indexed access
+    period_cols = schema.period_columns(target_periods)
+    col_idx_map = dict(period_cols)  # for fallback candidates
+    min_len = schema.min_len
+
+    for row in rows:
+        if len(row) < min_len: continue
+
+        # Try to normalize code with company name fallback
+        company_name = row[col_name].strip() if col_name is not None else None
+        raw_code = row[col_code].strip() if col_code is not None else None
+
+        row_code = resolve_row_code(raw_code, company_name, company_name_to_code)
+        if not row_code: continue
+
+        if row_code not in seen_codes:
+            seen_codes.add(row_code)
+            company_sector = row[col_sector].strip() if col_sector is not None else None
+            facts.first_seen.append((row_code, company_name, company_sector))
+
+        item_code = row[col_item_code].strip()
+        item_name = row[col_item_name].strip()
+        metric = resolve_metric(row_code, item_code, item_name)
+        if metric is None: continue
+        metric_type, ifrs_revenue, fallback = metric
+
+        # Track if this is revenue with IFRS code (per year)
+        if ifrs_revenue:
+            events.append((FACT_IFRS_REVENUE, row_code, year))
+
+        # If not matched and this is potentially a fallback revenue candidate
+        if fallback:
+            # Store as potential fallback candidate with file info (values parsed now, not the row)
+            events.append((FACT_FALLBACK, row_code, year, item_code, item_name, clean_header(item_name),
+                           parse_period_values(row, col_idx_map, parse_value), filename))
+            continue  # Will process in second pass
+
+        if not metric_type: continue
+
+        # Extract Values for targets
+        for period_key, col_idx in period_cols:
+            val = parse_value(row[col_idx])
+            if val is not None:
+                target_year = year
+                storage_key = period_key
+
+                # For 사업보고서: 파일명의 year = 결산연도 = 당기 연도
+                # 당기 -> target_year = year (파일명 연도)
+                # 전기 -> target_year = year - 1
+                if period_key == 'Annual_Current':
+                    target_year = year
+                elif period_key == 'Annual_Previous_From_Next':
+                    target_year = year - 1
+                    storage_key = 'Annual_Previous'
+
+                events.append((FACT_VALUE, row_code, target_year, storage_key, metric_type, val, item_name, item_code))
+
+    return facts
+
+def extract_store_facts(store, facts, year, target_periods, company_name_to_code):
+    """Fill `facts` from a ColumnarFiling exactly as extract_file_facts fills them from its rows
+
+    Stock codes and classifications are resolved once per distinct value and
+    amounts come from the typed columns. Returns False, leaving `facts`
+    untouched, if the store lacks a column the row loop reads or cannot give
+    its values exactly (the caller then reads the CSV).
+    """
+    schema = FileSchema(store.header)
+    if schema.code is None or schema.item_code is None or schema.item_name is None or schema.min_len > 255:
+        return False
 
-            if col_code is None or col_name is None:
-                continue
+    text = {}
+    for col in (schema.code, schema.name, schema.sector, schema.item_code, schema.item_name):
+        if col is not None:
+            text[col] = store.text_at(col)
+            if text[col] is None:
+                return False
+    period_values = []
+    for period_key, col_idx in schema.period_columns(target_periods):
+        values = store.int_values_at(col_idx)
+        if values is None:
+            return False
+        period_values.append((period_key, values))
+
+    code_ids, code_dict = text[schema.code]
+    name_ids, name_dict = text[schema.name] if schema.name is not None else (None, None)
+    sector_ids, sector_dict = text[schema.sector] if schema.sector is not None else (None, None)
+    item_code_ids, item_code_dict = text[schema.item_code]
+    item_name_ids, item_name_dict = text[schema.item_name]
+
+    seen_codes = set()
+    events = facts.events
+    row_codes = {}  # (code id, name id) -> row_code
+    metrics = {}  # (row_code, item code id, item name id) -> (metric_type, ifrs_revenue, fallback) or None
+    min_len = schema.min_len
+    n_cells = store.n_cells()
+
+    for i in range(store.n_rows):
+        if n_cells[i] < min_len: continue
+
+        name_id = name_ids[i] if name_ids is not None else None
+        key = (code_ids[i], name_id)
+        row_code = row_codes.get(key, False)
+        if row_code is False:
+            row_code = row_codes[key] = resolve_row_code(
+                code_dict[key[0]], name_dict[name_id] if name_id is not None else None, company_name_to_code)
+        if not row_code: continue
+
+        if row_code not in seen_codes:
+            seen_codes.add(row_code)
+            facts.first_seen.append((row_code, name_dict[name_id] if name_id is not None else None,
+                                     sector_dict[sector_ids[i]] if sector_ids is not None else None))
+
+        key = (row_code, item_code_ids[i], item_name_ids[i])
+        metric = metrics.get(key, False)
+        if metric is False:
+            metric = metrics[key] = resolve_metric(row_code, item_code_dict[key[1]], item_name_dict[key[2]])
+        if metric is None: continue
+        metric_type, ifrs_revenue, fallback = metric
+
+        item_code = item_code_dict[key[1]]
+        item_name = item_name_dict[key[2]]
+        if ifrs_revenue:
+            events.append((FACT_IFRS_REVENUE, row_code, year))
+
+        if fallback:
+            values = tuple((period_key, values[i]) for period_key, values in period_values if values[i] is not None)
+            events.append((FACT_FALLBACK, row_code, year, item_code, item_name, clean_header(item_name),
+                           values, facts.filename))
+            continue
+
+        if not metric_type: continue
+
+        for period_key, values in period_values:
+            val = values[i]
+            if val is not None:
+                target_year = year
+                storage_key = period_key
+                if period_key == 'Annual_Previous_From_Next':
+                    target_year = year - 1
+                    storage_key = 'Annual_Previous'
+                events.append((FACT_VALUE, row_code, target_year, storage_key, metric_type, val, item_name, item_code))
+
+    return True
+
+_worker_company_name_to_code = {}
+
+def _init_worker(company_name_to_code):
+    global _worker_company_name_to_code
+    _worker_company_name_to_code = company_name_to_code
+
+def extract_with_backend(backend, filepath, filename, company_name_to_code, allow_separate=False, codes=None):
+    """extract_file_facts, or the pandas version of dataframe_backend.py when backend == 'dataframe'
+
+    The DataFrame backend reads whole files, so `codes` mode always uses the row parser.
+    """
+    if backend == 'dataframe' and codes is None:
+        from dataframe_backend import extract_file_facts_df
+        return extract_file_facts_df(filepath, filename, company_name_to_code, allow_separate)
+    return extract_file_facts(filepath, filename, company_name_to_code, allow_separate, codes)
+
+def _extract_file_facts_worker(task):
+    filepath, filename, allow_separate, backend = task
+    return extract_with_backend(backend, filepath, filename, _worker_company_name_to_code, allow_separate)
 
-            # Extract company code and name mappings
-            for row in rows[1:]:
-                if len(row) <= max(col_code, col_name):
-                    continue
+class FinancialParser:
+    def __init__(self):
+        self.reset_facts()
+        self.strings = StringTable()  # Item codes/names and filenames of fallback candidates
+        self.fallback_decisions = FallbackDecisions('quarterly')  # Recorded choices for ambiguous groups
+        self.current_file = None  # Track current file being processed
+        self.company_name_to_code = {}  # Map company name to stock code (from latest files)
+        self.code_to_company_name = {}  # Map stock code to company name (from latest files)
+        self.codes = None  # Restrict parsing to these stock codes (--codes mode)
+        self.backend = 'rows'  # 'rows' (extract_file_facts) or 'dataframe' (dataframe_backend.py)
 
-                raw_code = row[col_code].strip()
-                company_name = row[col_name].strip()
+    def reset_facts(self):
+        """Drop all per-company state (the streaming build compiles one company at a time)"""
+        self.data = FactStore(STORE_PERIODS, METRICS)  # code -> year -> period -> metric
+        self.meta = {}
+        self.companies_with_ifrs_revenue_by_year = collections.defaultdict(set)  # Track company-year pairs with IFRS codes
+        self.fallback_revenue_candidates = collections.defaultdict(lambda: collections.defaultdict(list))  # Track multiple matches
+        self.settled_fallback_groups = {}  # (code, year) -> number of candidates when last resolved
+        self.companies_with_consolidated_data = set()  # Track companies that have data from 연결 (consolidated) files
 
-                if not company_name:
-                    continue
+    def build_company_mapping(self, files=None):
+        """Load company name <-> code mappings from the persistent company index
 
-                # Skip [null] codes, we want valid codes only
-                if raw_code and raw_code != '[null]':
-                    normalized = re.sub(r'[^\d]', '', raw_code)
-                    if normalized:
-                        stock_code = normalized.zfill(6)
-
-                        # Store all historical names for the same code
-                        # This catches company name changes (e.g., 포스코 -> POSCO홀딩스)
-                        if company_name not in self.company_name_to_code:
-                            self.company_name_to_code[company_name] = stock_code
-
-                        # For code_to_company_name, use latest name (first encountered since files sorted descending)
-                        # Only set if not already present to preserve newest name
-                        if stock_code not in self.code_to_company_name:
-                            self.code_to_company_name[stock_code] = company_name
-
-        print(f"Mapped {len(self.company_name_to_code)} companies")
-
-        # Save mapping to JSON file for reference
-        mapping_data = {
-            'company_name_to_code': self.company_name_to_code,
-            'code_to_company_name': self.code_to_company_name
-        }
-        with open('company_code_mapping.json', 'w', encoding='utf-8') as f:
-            json.dump(mapping_data, f, ensure_ascii=False, indent=2)
-        print("Saved mapping to company_code_mapping.json")
+        Only files of SOURCE_DIR that are new since the last run are scanned
+        (see company_index.py). `files` is accepted for older callers.
+        """
+        index = load_company_index(SOURCE_DIR)
+        self.company_name_to_code = index.name_to_code
+        self.code_to_company_name = index.code_to_name
+        print(f"\nMapped {len(self.company_name_to_code)} companies (company index)")
 
     def process_file(self, filepath, filename, allow_separate=False):
         self.current_file = filename  # Track current file
-        parts = filename.split('_')
-        year = int(parts[0])
-        report_type = parts[1]
-
-        # Skip separate statements unless explicitly allowed
-        is_consolidated = '연결' in filename
-        if not is_consolidated and not allow_separate:
-            return
+        facts = extract_with_backend(self.backend, filepath, filename, self.company_name_to_code,
+                                     allow_separate, self.codes)
+        if facts is not None:
+            self.merge_file_facts(facts)
 
-        # Track if this is a consolidated file for later filtering
-        processing_consolidated = is_consolidated
+    def process_files_parallel(self, source_dir, files, allow_separate=False, workers=None):
+        """Parse files in a process pool, merging results in the serial order
 
-        if '포괄손익계산서' not in filename and '손익계산서' not in filename: return
-        if '현금흐름표' in filename or '재무상태표' in filename or '자본변동표' in filename: return
-
-        print(f"Processing {filename}...")
-
-        encoding_candidates = ['utf-8-sig', 'cp949', 'utf-8', 'euc-kr']
-        rows = []
-
-        for enc in encoding_candidates:
-            try:
-                with open(filepath, 'r', encoding=enc, newline='') as f:
-                    reader = csv.reader(f)
-                    rows = list(reader)
-                break
-            except (UnicodeDecodeError, csv.Error):
-                continue
-
-        if not rows:
-            print(f"Failed to read {filename}")
+        Each worker turns one file into a FileFacts. Results are merged strictly
+        in the order of `files`, so first-wins precedence is identical to
+        calling process_file on each file one after another.
+        """
+        for filename, facts in self.iter_file_facts(source_dir, files, allow_separate, workers):
+            self.current_file = filename
+            if facts is not None:
+                self.merge_file_facts(facts)
+
+    def iter_file_facts(self, source_dir, files, allow_separate=False, workers=None):
+        """Yield (filename, FileFacts or None) for the csv files in order, extracted in a pool if workers > 1"""
+        csv_files = [f for f in files if f.endswith('.csv')]
+        tasks = [(os.path.join(source_dir, f), f, allow_separate, self.backend) for f in csv_files]
+
+        if not workers or workers <= 1:
+            for task in tasks:
+                yield task[1], extract_with_backend(self.backend, task[0], task[1], self.company_name_to_code,
+                                                    allow_separate, self.codes)
             return
 
-        headers = [clean_header(h) for h in rows[0]]
-
-        col_map = {}
-        for idx, h in enumerate(headers):
-            if h:
-                col_map[h] = idx
-
-        def get_idx(candidates):
-            for c in candidates:
-                if c in col_map: return col_map[c]
-            return None
-
-        col_code = get_idx(['종목코드'])
-        col_name = get_idx(['회사명'])
-        col_sector = get_idx(['업종명', '업종'])
-        col_item_code = get_idx(['항목코드'])
-        col_item_name = get_idx(['항목명'])
-
-        if col_code is None or col_item_code is None:
-            print(f"  Missing essential columns in {filename}")
+        with concurrent.futures.ProcessPoolExecutor(
+            max_workers=workers,
+            initializer=_init_worker,
+            initargs=(self.company_name_to_code,)
+        ) as executor:
+            yield from zip(csv_files, executor.map(_extract_file_facts_worker, tasks))
+
+    def merge_file_facts(self, facts):
+        """Apply one file's facts to the parser state in their original row order"""
+        print(f"Processing {facts.filename}...")
+        if facts.error:
+            print(facts.error)
             return
 
-        target_periods = []
-        
-        if '1분기보고서' in report_type:
-            target_periods.append(('1Q', ['당기1분기3개월', '당기1분기', '당기']))
-        elif '반기보고서' in report_type:
-            target_periods.append(('2Q', ['당기반기3개월', '당기2분기3개월', '당기2분기']))
-        elif '3분기보고서' in report_type:
-            target_periods.append(('3Q', ['당기3분기3개월']))
-            target_periods.append(('3Q_Acc', ['당기3분기누적']))
-        elif '사업보고서' in report_type:
-            target_periods.append(('Annual_Current', ['당기', '당기사업년도']))
-            target_periods.append(('Annual_Previous_From_Next', ['전기', '전기사업년도']))
-
-        for row in rows[1:]:
-            if len(row) < max(col_map.values()) + 1: continue
-
-            # Try to normalize code with company name fallback
-            company_name = row[col_name].strip() if col_name is not None else None
-            raw_code = row[col_code].strip() if col_code is not None else None
-
-            # First try to get from mapping if code is null
-            if not raw_code or raw_code == '[null]' or re.sub(r'[^\d]', '', raw_code) == '':
-                row_code = self.company_name_to_code.get(company_name)
-                if not row_code:
-                    row_code = normalize_code(raw_code, company_name)
-            else:
-                row_code = normalize_code(raw_code, company_name)
-
-            if not row_code: continue
-
-            # Track companies with consolidated data (from 연결 files)
-            if processing_consolidated:
-                self.companies_with_consolidated_data.add(row_code)
-
-            # Get or update metadata
-            if row_code not in self.meta:
-                company_sector = row[col_sector].strip() if col_sector is not None else None
-                self.meta[row_code] = {
-                    'name': row[col_name].strip(),
-                    'sector': company_sector
-                }
+        for row_code, name, sector in facts.first_seen:
+            self.merge_first_seen(row_code, name, sector, facts.is_consolidated)
 
-            # Skip financial and insurance companies
-            company_sector = self.meta[row_code].get('sector')
-            if is_financial_sector(company_sector):
-                continue
+        for event in facts.events:
+            self.merge_event(event)
 
-            item_code = row[col_item_code].strip()
-            item_name = row[col_item_name].strip()
-            clean_item_name = clean_header(item_name)
+    def merge_first_seen(self, row_code, name, sector, is_consolidated):
+        # Track companies with consolidated data (from 연결 files)
+        if is_consolidated:
+            self.companies_with_consolidated_data.add(row_code)
 
-            # Skip Cost of Sales and Gross Profit (except for Kakao)
-            if 'CostOfSales' in item_code or '매출원가' in clean_item_name:
-                continue
+        # Get or update metadata
+        if row_code not in self.meta:
+            self.meta[row_code] = {
+                'name': name,
+                'sector': sector
+            }
 
-            # SPECIAL CASE: Kakao (035720) uses GrossProfit for revenue
-            if row_code == '035720' and (item_code == 'ifrs_GrossProfit' or item_code == 'ifrs-full_GrossProfit'):
-                # Treat Kakao's GrossProfit as revenue
-                metric_type = 'revenue'
-            elif 'GrossProfit' in item_code or '매출총이익' in clean_item_name or '매출총손실' in clean_item_name:
-                continue
+    def merge_separate_seen(self, row_code, name, sector):
+        """Metadata from a company's rows in a 별도 file, as process_file_for_separate sets it"""
+        if row_code not in self.meta:
+            self.meta[row_code] = {
+                'name': name,
+                'sector': sector,
+                'statement_type': '별도'
+            }
+        elif 'statement_type' not in self.meta[row_code]:
+            self.meta[row_code]['statement_type'] = '별도'
+
+    def merge_records(self, code, records, separate=False):
+        """Apply one company's sorted run records (see main_streaming)"""
+        for record in records:
+            if record[2] != FACT_SEEN:
+                self.merge_event(record[2:])
+            elif separate:
+                self.merge_separate_seen(code, *record[3:5])
             else:
-                # Determine Metric Type with exclusion check
-                metric_type = None
-                for m_key, m_def in METRICS.items():
-                    # First check if should be excluded
-                    if should_exclude_metric(item_code, item_name, m_def):
-                        continue
+                self.merge_first_seen(code, *record[3:])
 
-                    # Check if matches by code or standard names
-                    if matches_metric_code(item_code, m_def) or any(n in clean_item_name for n in m_def['names']):
-                        metric_type = m_key
-                        # Track if this is revenue with IFRS code (per year)
-                        if m_key == 'revenue' and (item_code == 'ifrs_Revenue' or item_code == 'ifrs-full_Revenue'):
-                            self.companies_with_ifrs_revenue_by_year[row_code].add(year)
-                        break
+    def merge_event(self, event):
+        row_code = event[1]
 
-            # If not matched and this is potentially a fallback revenue candidate
-            if not metric_type and 'fallback_names' in METRICS['revenue']:
-                fallback_names = METRICS['revenue']['fallback_names']
-                fallback_exclude = METRICS['revenue'].get('fallback_exclude_patterns', [])
-
-                # Check if Korean name matches fallback patterns
-                matched_fallback = False
-                for fb_name in fallback_names:
-                    if fb_name in clean_item_name:
-                        # Check if any exclude pattern exists in the name
-                        has_exclude = any(exc in clean_item_name for exc in fallback_exclude)
-                        if not has_exclude:
-                            col_idx_map = {pk: get_idx(cols) for pk, cols in target_periods}
-
-                            # Store as potential fallback candidate with file info
-                            self.fallback_revenue_candidates[row_code][year].append({
-                                'item_code': item_code,
-                                'item_name': item_name,
-                                'clean_name': clean_item_name,
-                                'row_data': row,
-                                'col_idx_map': col_idx_map,
-                                'filename': self.current_file
-                            })
-                            matched_fallback = True
-                            break
-
-                if matched_fallback:
-                    continue  # Will process in second pass
-
-            if not metric_type: continue
+        # Skip financial and insurance companies
+        if is_financial_sector(self.meta[row_code].get('sector')):
+            return
 
-            # Extract Values for targets
-            for period_key, allowed_cols in target_periods:
-                col_idx = get_idx(allowed_cols)
-                if col_idx is not None:
-                    val = parse_value(row[col_idx])
-                    if val is not None:
-                        target_year = year
-                        storage_key = period_key
+        kind = event[0]
+        if kind == FACT_VALUE:
+            _, _, target_year, storage_key, metric_type, val, item_name, item_code = event
 
-                        # For 사업보고서: 파일명의 year = 결산연도 = 당기 연도
-                        # 당기 -> target_year = year (파일명 연도)
-                        # 전기 -> target_year = year - 1
-                        if period_key == 'Annual_Current':
-                            target_year = year
-                        elif period_key == 'Annual_Previous_From_Next':
-                            target_year = year - 1
-                            storage_key = 'Annual_Previous'
-                        
-                        self.data[row_code][target_year][f'_meta_{metric_type}_name'] = item_name
-                        self.data[row_code][target_year][f'_meta_{metric_type}_code'] = item_code
+            self.data.set_meta(row_code, target_year, metric_type, item_name, item_code)
 
-                        if metric_type not in self.data[row_code][target_year][storage_key]:
-                            self.data[row_code][target_year][storage_key][metric_type] = val
+            # Only store first match (don't overwrite)
+            self.data.set_default(row_code, target_year, storage_key, metric_type, val)
+        elif kind == FACT_IFRS_REVENUE:
+            # Track if this is revenue with IFRS code (per year)
+            self.companies_with_ifrs_revenue_by_year[row_code].add(event[2])
+        elif kind == FACT_FALLBACK:
+            _, _, year, item_code, item_name, clean_name, values, filename = event
+            self.fallback_revenue_candidates[row_code][year].append(
+                make_candidate(self.strings, item_code, item_name, clean_name, filename, values))
 
+    def statement_type(self, code):
+        """Statement type (연결/별도) a company's output is labelled with"""
+        return self.meta.get(code, {}).get('statement_type', '연결')
 
     def compile_final_data(self):
         output = {}
 
-        sorted_codes = sorted(self.data.keys())
+        # 2Q/3Q gaps and 4Q for every company-year at once (see period_derivation.py)
+        # Annual_Current (same year's annual report) is preferred over Annual_Previous (next year's report):
+        # Annual_Previous can be incorrect due to accounting standard changes or restatements
+        table = self.data.period_table()
+        derived_counts = table.derive(DERIVATION_RULES)
+        OVERRIDES.fix_values(table, self.data.slot, self.statement_type)  # e.g. POSCO 2022 4Q revenue (overrides.json)
+        if derived_counts.get('2Q') or derived_counts.get('3Q'):
+            print(f"Derived from cumulative columns: {derived_counts.get('2Q', 0)} 2Q and "
+                  f"{derived_counts.get('3Q', 0)} 3Q values")
+
+        sorted_codes = sorted(self.data.codes())
 
         for code in sorted_codes:
-            company_years = sorted(self.data[code].keys())
+            company_years = sorted(self.data.years(code))
             history = []
 
             company_meta = self.meta.get(code, {'name': 'Unknown', 'sector': 'Unknown'})
 
             for y in company_years:
-                y_data = self.data[code][y]
+                slot = self.data.slot(code, y)
+                y_meta = self.data.year_meta(code, y)
 
                 for q in ['1Q', '2Q', '3Q']:
-                    if q in y_data:
+                    q_data = table.period_data(slot, q)
+                    if q_data:
                         rec = {
                             'year': y,
                             'quarter': q,
-                            'revenue': y_data[q].get('revenue'),
-                            'op_profit': y_data[q].get('op_profit'),
-                            'net_income': y_data[q].get('net_income')
+                            'revenue': q_data.get('revenue'),
+                            'op_profit': q_data.get('op_profit'),
+                            'net_income': q_data.get('net_income')
                         }
                         for metric in ['revenue', 'op_profit', 'net_income']:
                             meta_name_key = f'_meta_{metric}_name'
                             meta_code_key = f'_meta_{metric}_code'
-                            if meta_name_key in y_data:
-                                rec[f'{metric}_ifrs_code'] = y_data[meta_code_key]
-                                rec[f'{metric}_korean_name'] = y_data[meta_name_key]
-                            
-                        if rec['revenue'] or rec['op_profit']:
-                            history.append(rec)
+                            if meta_name_key in y_meta:
+                                rec[f'{metric}_ifrs_code'] = y_meta[meta_code_key]
+                                rec[f'{metric}_korean_name'] = y_meta[meta_name_key]
 
-                # Calculate Q4
-                # Prefer Annual_Current (from same year's annual report) over Annual_Previous (from next year's report)
-                # Annual_Previous can be incorrect due to accounting standard changes or restatements
-                annual_total = y_data.get('Annual_Current')
-                if not annual_total:
-                    annual_total = y_data.get('Annual_Previous')
+                        # Values the filing only reports cumulatively (H1_Acc - 1Q, 3Q_Acc - H1_Acc)
+                        derived = table.derived_metrics(slot, q)
+                        if derived:
+                            if rec['revenue'] is not None and rec['revenue'] < 0:
+                                continue
+                            rec['derived'] = derived
 
-                q3_acc = y_data.get('3Q_Acc')
+                        if rec['revenue'] or rec['op_profit']:
+                            history.append(rec)
 
-                if annual_total and q3_acc:
+                # Q4 = Annual - 3Q_Acc
+                q4_data = table.period_data(slot, '4Q')
+                if q4_data:
                     q4_rec = {
                         'year': y,
                         'quarter': '4Q',
-                        'revenue': None,
-                        'op_profit': None,
-                        'net_income': None
+                        'revenue': q4_data.get('revenue'),
+                        'op_profit': q4_data.get('op_profit'),
+                        'net_income': q4_data.get('net_income')
                     }
 
-                    for m in ['revenue', 'op_profit', 'net_income']:
-                        val_ann = annual_total.get(m)
-                        val_q3 = q3_acc.get(m)
-                        if val_ann is not None and val_q3 is not None:
-                            q4_rec[m] = val_ann - val_q3
-
-                    # HARDCODED FIX: POSCO 2022 4Q revenue
-                    if code == '005490' and y == 2022:
-                        q4_rec['revenue'] = 19247545076289  # 84,750,203,702,240 - 65,502,658,625,951
-                    
                     for metric in ['revenue', 'op_profit', 'net_income']:
                         meta_name_key = f'_meta_{metric}_name'
                         meta_code_key = f'_meta_{metric}_code'
-                        if meta_name_key in y_data:
-                            q4_rec[f'{metric}_ifrs_code'] = y_data[meta_code_key]
-                            q4_rec[f'{metric}_korean_name'] = y_data[meta_name_key]
+                        if meta_name_key in y_meta:
+                            q4_rec[f'{metric}_ifrs_code'] = y_meta[meta_code_key]
+                            q4_rec[f'{metric}_korean_name'] = y_meta[meta_name_key]
 
                     if q4_rec['revenue'] is not None and q4_rec['revenue'] < 0:
                         continue
@@ -540,22 +705,16 @@ class FinancialParser:
                         history.append(q4_rec)
 
             if history:
-                 company_name = company_meta['name']
-
-                 # HARDCODED FIX: POSCO name correction
-                 if code == '005490':
-                     company_name = 'POSCO홀딩스'
-
                  output[code] = {
-                     'name': company_name,
+                     'name': company_meta['name'],
                      'sector': company_meta['sector'],
                      'statement_type': company_meta.get('statement_type', '연결'),
                      'history': history
                  }
 
-        return output
+        return OVERRIDES.apply_names(output)
 
-    def process_fallback_revenue(self):
+    def process_fallback_revenue(self, report=True):
         """Process fallback Korean name revenue for companies without IFRS codes
 
         Priority:
@@ -563,11 +722,21 @@ class FinancialParser:
         2. Exact match '영업수익' (no additional words)
         3. If multiple '영업수익', choose one with '매출' in name
         4. Otherwise, report for manual selection
+
+        Called after each pass: only (company, year) groups that gained
+        candidates since the previous call are resolved (and reported) again.
+        report=False resolves without printing the multiple-match report.
         """
         multiple_matches = {}
+        strings = self.strings
 
         for row_code, year_candidates in self.fallback_revenue_candidates.items():
             for year, candidates in year_candidates.items():
+                # Groups resolved by an earlier call stay settled unless they gained candidates since
+                if self.settled_fallback_groups.get((row_code, year)) == len(candidates):
+                    continue
+                self.settled_fallback_groups[(row_code, year)] = len(candidates)
+
                 # Don't skip entire year - check per-quarter if revenue already exists
 
                 # Don't merge! Process each candidate separately to handle different row_data from different files
@@ -576,7 +745,7 @@ class FinancialParser:
                 deduped_candidates = []
                 for cand in candidates:
                     # Create a unique key based on item_code and filename
-                    unique_key = (cand['item_code'], cand['filename'])
+                    unique_key = (cand.item_code, cand.filename)
                     if unique_key not in seen:
                         seen.add(unique_key)
                         deduped_candidates.append(cand)
@@ -584,7 +753,7 @@ class FinancialParser:
                 # Check if all candidates have the same clean_name
                 # If so, they're the same metric from different quarterly reports - process all of them
                 if len(deduped_candidates) > 1:
-                    unique_names = set(c['clean_name'] for c in deduped_candidates)
+                    unique_names = set(c.clean_name for c in deduped_candidates)
                     if len(unique_names) == 1:
                         # All same name - process all candidates to cover all quarters
                         candidates_to_process = deduped_candidates
@@ -593,18 +762,18 @@ class FinancialParser:
                         selected = None
 
                         # Priority 1: Exact match '매출액'
-                        exact_maechul = [c for c in deduped_candidates if c['clean_name'] == '매출액']
+                        exact_maechul = [c for c in deduped_candidates if strings[c.clean_name] == '매출액']
                         if exact_maechul:
                             selected = exact_maechul[0]
 
                         # Priority 2: Exact match '영업수익'
                         if not selected:
-                            exact_youngsup = [c for c in deduped_candidates if c['clean_name'] == '영업수익']
+                            exact_youngsup = [c for c in deduped_candidates if strings[c.clean_name] == '영업수익']
                             if len(exact_youngsup) == 1:
                                 selected = exact_youngsup[0]
                             elif len(exact_youngsup) > 1:
                                 # Priority 3: '영업수익' with '매출' in name
-                                youngsup_with_maechul = [c for c in exact_youngsup if '매출' in c['clean_name']]
+                                youngsup_with_maechul = [c for c in exact_youngsup if '매출' in strings[c.clean_name]]
                                 if len(youngsup_with_maechul) == 1:
                                     selected = youngsup_with_maechul[0]
 
@@ -612,73 +781,60 @@ class FinancialParser:
                             # Use the selected candidate
                             candidates_to_process = [selected]
                         else:
-                            # Multiple matches found - store for reporting
-                            company_name = self.meta.get(row_code, {}).get('name', 'Unknown')
-                            key = f"{row_code}_{company_name}_{year}"
-                            multiple_matches[key] = deduped_candidates
-                            continue
+                            # A decision recorded in fallback_revenue_decisions.json settles the group
+                            candidates_to_process = self.fallback_decisions.resolve(row_code, year, deduped_candidates, strings)
+                            if candidates_to_process is None:
+                                # Multiple matches found - store for reporting
+                                company_name = self.meta.get(row_code, {}).get('name', 'Unknown')
+                                key = f"{row_code}_{company_name}_{year}"
+                                multiple_matches[key] = deduped_candidates
+                                self.fallback_decisions.enqueue(row_code, company_name, year, deduped_candidates, strings)
+                                continue
                 else:
                     candidates_to_process = deduped_candidates
 
                 # Process all selected candidates
                 for candidate in candidates_to_process:
-                    item_code = candidate['item_code']
-                    item_name = candidate['item_name']
-                    row = candidate['row_data']
-                    col_idx_map = candidate['col_idx_map']
+                    item_code = strings[candidate.item_code]
+                    item_name = strings[candidate.item_name]
 
                     # Process this as revenue
-                    for period_key, col_idx in col_idx_map.items():
-                        if col_idx is not None and col_idx < len(row):
-                            val = parse_value(row[col_idx])
-
-                            if val is not None:
-                                target_year = year
-                                storage_key = period_key
-
-                                # For 사업보고서: 파일명의 year = 결산연도 = 당기 연도
-                                # 당기 -> target_year = year (파일명 연도)
-                                # 전기 -> target_year = year - 1
-                                if period_key == 'Annual_Current':
-                                    target_year = year
-                                elif period_key == 'Annual_Previous_From_Next':
-                                    target_year = year - 1
-                                    storage_key = 'Annual_Previous'
+                    for period_key, val in candidate.values:
+                        target_year = year
+                        storage_key = period_key
 
-                                self.data[row_code][target_year][f'_meta_revenue_name'] = item_name
-                                self.data[row_code][target_year][f'_meta_revenue_code'] = item_code
+                        # For 사업보고서: 파일명의 year = 결산연도 = 당기 연도
+                        # 당기 -> target_year = year (파일명 연도)
+                        # 전기 -> target_year = year - 1
+                        if period_key == 'Annual_Current':
+                            target_year = year
+                        elif period_key == 'Annual_Previous_From_Next':
+                            target_year = year - 1
+                            storage_key = 'Annual_Previous'
 
-                                # Only set if revenue doesn't exist or is None
-                                if storage_key not in self.data[row_code][target_year]:
-                                    self.data[row_code][target_year][storage_key] = {}
+                        self.data.set_meta(row_code, target_year, 'revenue', item_name, item_code)
 
-                                if self.data[row_code][target_year][storage_key].get('revenue') is None:
-                                    self.data[row_code][target_year][storage_key]['revenue'] = val
+                        # Only set if revenue doesn't exist or is None
+                        self.data.set_default(row_code, target_year, storage_key, 'revenue', val)
 
         # Report multiple matches with file info and amounts
-        if multiple_matches:
+        if multiple_matches and report:
             print("\n=== WARNING: Multiple fallback revenue matches found ===")
             for key, candidates in multiple_matches.items():
                 print(f"\n{key}:")
                 for i, cand in enumerate(candidates, 1):
                     # Get sample amounts from the candidate
                     amounts_str = []
-                    row = cand['row_data']
-                    col_idx_map = cand['col_idx_map']
-                    for period_key, col_idx in col_idx_map.items():
-                        if col_idx is not None and col_idx < len(row):
-                            val = parse_value(row[col_idx])
-                            if val is not None:
-                                # Format period name
-                                period_name = period_key.replace('_Acc', '누적').replace('Annual_Current', '당기연간').replace('Annual_Previous', '전기연간')
-                                amounts_str.append(f"{period_name}: {val:,}원")
+                    for period_key, val in cand.values:
+                        # Format period name
+                        period_name = period_key.replace('_Acc', '누적').replace('Annual_Current', '당기연간').replace('Annual_Previous', '전기연간')
+                        amounts_str.append(f"{period_name}: {val:,}원")
 
                     amounts_display = ", ".join(amounts_str) if amounts_str else "금액 없음"
-                    filename = cand.get('filename', '알 수 없음')
 
-                    print(f"  {i}. Name: {cand['item_name']}")
-                    print(f"     Code: {cand['item_code']}")
-                    print(f"     File: {filename}")
+                    print(f"  {i}. Name: {strings[cand.item_name]}")
+                    print(f"     Code: {strings[cand.item_code]}")
+                    print(f"     File: {strings[cand.filename]}")
                     print(f"     Amounts: {amounts_display}")
             print("\n==========================================================\n")
 
@@ -695,6 +851,10 @@ class FinancialParser:
         """
         missing_companies = set()
 
+        # Quarters derivable from cumulative columns are not missing (see period_derivation.py)
+        table = self.data.period_table()
+        table.derive(DERIVATION_RULES)
+
         for code in self.meta.keys():
             # CRITICAL: Skip companies that have consolidated data
             # We don't want to overwrite 연결 data with 별도 data
@@ -703,11 +863,12 @@ class FinancialParser:
 
             # Check if company has data for 2020-2024
             for year in range(2020, 2025):
-                year_data = self.data.get(code, {}).get(year, {})
+                year_data = self.data.year_data(code, year)
+                slot = self.data.slot(code, year)
 
                 # Check each quarter
                 for quarter in ['1Q', '2Q', '3Q']:
-                    if quarter not in year_data or not year_data[quarter].get('revenue'):
+                    if slot is None or not table.period_data(slot, quarter).get('revenue'):
                         missing_companies.add(code)
                         break
 
@@ -720,89 +881,52 @@ class FinancialParser:
         return missing_companies
 
     def process_file_for_separate(self, filepath, filename, target_companies):
-        """Process separate statements (별도) only for target companies"""
-        # Only process files WITHOUT '연결' (separate statements)
-        if '연결' in filename:
-            return
+        """Process separate statements (별도) only for target companies
 
-        # Check if it's an income statement
-        if '포괄손익계산서' not in filename and '손익계산서' not in filename:
-            return
-        if '현금흐름표' in filename or '재무상태표' in filename or '자본변동표' in filename:
+        Only the target companies' rows are read, through the file's row index
+        (see row_index.py), so Pass 2 does not decode whole files again.
+        """
+        # Only process separate statements (no '연결') that are income statements
+        filing = parse_filing(filename)
+        if filing is None or filing.consolidated or not filing.is_income_statement:
             return
 
         print(f"Processing (별도): {filename}...")
 
-        parts = filename.split('_')
-        year = int(parts[0])
-        report_type = parts[1]
+        year, _, target_periods = describe_filing(filename, allow_separate=True)
 
-        encoding_candidates = ['utf-8-sig', 'cp949', 'utf-8', 'euc-kr']
-        rows = []
+        codes = set(target_companies) if self.codes is None else set(target_companies) & self.codes
+        rows = iter_rows_for_codes(filepath, codes, self.company_name_to_code)
+        header = next(rows, None)
 
-        for enc in encoding_candidates:
-            try:
-                with open(filepath, 'r', encoding=enc, newline='') as f:
-                    reader = csv.reader(f)
-                    rows = list(reader)
-                break
-            except (UnicodeDecodeError, csv.Error):
-                continue
-
-        if not rows:
+        if header is None:
             print(f"Failed to read {filename}")
             return
 
-        headers = [clean_header(h) for h in rows[0]]
-
-        col_map = {}
-        for idx, h in enumerate(headers):
-            if h:
-                col_map[h] = idx
-
-        def get_idx(candidates):
-            for c in candidates:
-                if c in col_map: return col_map[c]
-            return None
-
-        col_code = get_idx(['종목코드'])
-        col_name = get_idx(['회사명'])
-        col_sector = get_idx(['업종명', '업종'])
-        col_item_code = get_idx(['항목코드'])
-        col_item_name = get_idx(['항목명'])
+        schema = FileSchema(header)
+        col_code = schema.code
+        col_name = schema.name
+        col_sector = schema.sector
+        col_item_code = schema.item_code
+        col_item_name = schema.item_name
 
         if col_code is None or col_item_code is None:
             print(f"  Missing essential columns in {filename}")
             return
 
-        target_periods = []
-
-        if '1분기보고서' in report_type:
-            target_periods.append(('1Q', ['당기1분기3개월', '당기1분기', '당기']))
-        elif '반기보고서' in report_type:
-            target_periods.append(('2Q', ['당기반기3개월', '당기2분기3개월', '당기2분기']))
-        elif '3분기보고서' in report_type:
-            target_periods.append(('3Q', ['당기3분기3개월']))
-            target_periods.append(('3Q_Acc', ['당기3분기누적']))
-        elif '사업보고서' in report_type:
-            target_periods.append(('Annual_Current', ['당기', '당기사업년도']))
-            target_periods.append(('Annual_Previous_From_Next', ['전기', '전기사업년도']))
+        # Header resolved once; the row loop only does indexed access
+        period_cols = schema.period_columns(target_periods)
+        col_idx_map = dict(period_cols)  # for fallback candidates
+        min_len = schema.min_len
 
-        for row in rows[1:]:
-            if len(row) < max(col_map.values()) + 1: continue
+        for row in rows:
+            if len(row) < min_len: continue
 
             # Try to normalize code with company name fallback
             company_name = row[col_name].strip() if col_name is not None else None
             raw_code = row[col_code].strip() if col_code is not None else None
 
-            # First try to get from mapping if code is null
-            if not raw_code or raw_code == '[null]' or re.sub(r'[^\d]', '', raw_code) == '':
-                row_code = self.company_name_to_code.get(company_name)
-                if not row_code:
-                    row_code = normalize_code(raw_code, company_name)
-            else:
-                row_code = normalize_code(raw_code, company_name)
-
+            row_code = resolve_row_code(raw_code, company_name, self.company_name_to_code)
             if not row_code: continue
 
             # ONLY process if this company is in target_companies
@@ -827,103 +951,103 @@ class FinancialParser:
 
             item_code = row[col_item_code].strip()
             item_name = row[col_item_name].strip()
-            clean_item_name = clean_header(item_name)
-
-            # Skip Cost of Sales and Gross Profit (except for Kakao)
-            if 'CostOfSales' in item_code or '매출원가' in clean_item_name:
-                continue
-
-            # SPECIAL CASE: Kakao (035720) uses GrossProfit for revenue
-            if row_code == '035720' and (item_code == 'ifrs_GrossProfit' or item_code == 'ifrs-full_GrossProfit'):
-                # Treat Kakao's GrossProfit as revenue
-                metric_type = 'revenue'
-            elif 'GrossProfit' in item_code or '매출총이익' in clean_item_name or '매출총손실' in clean_item_name:
-                continue
-            else:
-                # Determine Metric Type with exclusion check
-                metric_type = None
-                for m_key, m_def in METRICS.items():
-                    # First check if should be excluded
-                    if should_exclude_metric(item_code, item_name, m_def):
-                        continue
+            metric = resolve_metric(row_code, item_code, item_name)
+            if metric is None: continue
+            metric_type, ifrs_revenue, fallback = metric
 
-                    # Check if matches by code or standard names
-                    if matches_metric_code(item_code, m_def) or any(n in clean_item_name for n in m_def['names']):
-                        metric_type = m_key
-                        # Track if this is revenue with IFRS code (per year)
-                        if m_key == 'revenue' and (item_code == 'ifrs_Revenue' or item_code == 'ifrs-full_Revenue'):
-                            self.companies_with_ifrs_revenue_by_year[row_code].add(year)
-                        break
+            # Track if this is revenue with IFRS code (per year)
+            if ifrs_revenue:
+                self.companies_with_ifrs_revenue_by_year[row_code].add(year)
 
             # If not matched and this is potentially a fallback revenue candidate
-            if not metric_type and 'fallback_names' in METRICS['revenue']:
-                fallback_names = METRICS['revenue']['fallback_names']
-                fallback_exclude = METRICS['revenue'].get('fallback_exclude_patterns', [])
-
-                # Check if Korean name matches fallback patterns
-                matched_fallback = False
-                for fb_name in fallback_names:
-                    if fb_name in clean_item_name:
-                        # Check if any exclude pattern exists in the name
-                        has_exclude = any(exc in clean_item_name for exc in fallback_exclude)
-                        if not has_exclude:
-                            col_idx_map = {pk: get_idx(cols) for pk, cols in target_periods}
-
-                            # Store as potential fallback candidate with file info
-                            self.fallback_revenue_candidates[row_code][year].append({
-                                'item_code': item_code,
-                                'item_name': item_name,
-                                'clean_name': clean_item_name,
-                                'row_data': row,
-                                'col_idx_map': col_idx_map,
-                                'filename': filename
-                            })
-                            matched_fallback = True
-                            break
-
-                if matched_fallback:
-                    continue  # Will process in second pass
+            if fallback:
+                # Store as potential fallback candidate with file info (values parsed now, not the row)
+                self.fallback_revenue_candidates[row_code][year].append(
+                    make_candidate(self.strings, item_code, item_name, clean_header(item_name), filename,
+                                   parse_period_values(row, col_idx_map, parse_value)))
+                continue  # Will process in second pass
 
             if not metric_type: continue
 
             # Extract Values for targets
-            for period_key, allowed_cols in target_periods:
-                col_idx = get_idx(allowed_cols)
-                if col_idx is not None:
-                    val = parse_value(row[col_idx])
-                    if val is not None:
+            for period_key, col_idx in period_cols:
+                val = parse_value(row[col_idx])
+                if val is not None:
+                    target_year = year
+                    storage_key = period_key
+
+                    # For 사업보고서: 파일명의 year = 결산연도 = 당기 연도
+                    # 당기 -> target_year = year (파일명 연도)
+                    # 전기 -> target_year = year - 1
+                    if period_key == 'Annual_Current':
                         target_year = year
-                        storage_key = period_key
-
-                        # For 사업보고서: 파일명의 year = 결산연도 = 당기 연도
-                        # 당기 -> target_year = year (파일명 연도)
-                        # 전기 -> target_year = year - 1
-                        if period_key == 'Annual_Current':
-                            target_year = year
-                        elif period_key == 'Annual_Previous_From_Next':
-                            target_year = year - 1
-                            storage_key = 'Annual_Previous'
-
-                        self.data[row_code][target_year][f'_meta_{metric_type}_name'] = item_name
-                        self.data[row_code][target_year][f'_meta_{metric_type}_code'] = item_code
-
-                        if metric_type not in self.data[row_code][target_year][storage_key]:
-                            self.data[row_code][target_year][storage_key][metric_type] = val
-
-def main():
+                    elif period_key == 'Annual_Previous_From_Next':
+                        target_year = year - 1
+                        storage_key = 'Annual_Previous'
+
+                    self.data.set_meta(row_code, target_year, metric_type, item_name, item_code)
+
+                    # Only store first match (don't overwrite)
+                    self.data.set_default(row_code, target_year, storage_key, metric_type, val)
+
+def write_output(items, shards=False, monolith=True):
+    """Stream compiled (code, entry) pairs into OUTPUT_FILE and/or the frontend shards
+
+    Entries are serialized once as they arrive; the shards are the files
+    split_financial_data.py would cut from OUTPUT_FILE, so with shards=True
+    the pretty-printed monolith is only needed for --codes rebuilds and debugging.
+    Returns the number of companies written.
+    """
+    writers = []
+    if monolith:
+        writers.append(JsonObjectWriter(OUTPUT_FILE))
+    if shards:
+        # The index names the monolith only if this run writes it
+        writers.append(ShardWriter(SHARD_DIR, SHARD_PREFIX, CHUNK_BUDGET, source_file=OUTPUT_FILE if monolith else None))
+
+    count = 0
+    for code, entry in items:
+        for writer in writers:
+            writer.add(code, entry)
+        count += 1
+
+    for writer in writers:
+        result = writer.close()
+        if isinstance(writer, ShardWriter):
+            print(f"\nWrote {len(result)} shards to {SHARD_DIR}/ ({SHARD_PREFIX}_index.json)")
+            report_chunks(result)
+    return count
+
+def main(workers=None, codes=None, backend='rows', shards=False, monolith=True):
+    """Run the full build; workers > 1 parses Pass 1 files in a process pool
+
+    With `codes`, only those companies are rebuilt: their rows are read through
+    the per-filing row index and their entries in OUTPUT_FILE are replaced.
+    backend='dataframe' extracts Pass 1 facts with pandas (see dataframe_backend.py).
+    shards / monolith select the outputs (see write_output).
+    """
     parser = FinancialParser()
+    parser.codes = set(codes) if codes else None
+    parser.backend = backend
 
-    files = sorted(os.listdir(SOURCE_DIR), reverse=True)  # Process latest files first for company name mapping
+    files = current_filenames(SOURCE_DIR, reverse=True)  # Process latest files first for company name mapping
 
     # Build company name to code mapping from latest files first
-    parser.build_company_mapping(files)
+    parser.build_company_mapping()
 
     # PASS 1: Process consolidated statements (연결)
     print("\n=== Pass 1: Processing Consolidated Statements (연결) ===")
-    for f in files:
-        if f.endswith('.csv'):
-            parser.process_file(os.path.join(SOURCE_DIR, f), f, allow_separate=False)
+    if workers and workers > 1 and parser.codes is None:
+        parser.process_files_parallel(SOURCE_DIR, files, allow_separate=False, workers=workers)
+    else:
+        for f in files:
+            if f.endswith('.csv'):
+                parser.process_file(os.path.join(SOURCE_DIR, f), f, allow_separate=False)
 
+    complete_build(parser, files, shards, monolith)
+
+def complete_build(parser, files, shards=False, monolith=True):
+    """Everything in main() after Pass 1: fallback revenue, Pass 2, then compile and write the outputs"""
     # Process fallback revenue for companies without IFRS codes (Pass 1)
     print(f"\nProcessing fallback revenue (Pass 1)...")
     total_ifrs_company_years = sum(len(years) for years in parser.companies_with_ifrs_revenue_by_year.values())
@@ -950,14 +1074,207 @@ def main():
         if multiple_matches_pass2:
             multiple_matches.update(multiple_matches_pass2)
 
+    # Undecided multiple-match groups go to the review queue (see fallback_revenue.py)
+    parser.fallback_decisions.save_queue(parser.codes)
+
+    print(f"\nFact store: {len(parser.data)} company-years, {parser.data.nbytes() / 1024:.0f} KB of arrays, "
+          f"{len(parser.data.strings)} interned item names/codes")
+
     final_data = parser.compile_final_data()
 
-    with open(OUTPUT_FILE, 'w', encoding='utf-8') as f:
-        json.dump(final_data, f, ensure_ascii=False, indent=2)
+    if parser.codes is not None and os.path.exists(OUTPUT_FILE):
+        # Keep every other company from the last full build
+        with open(OUTPUT_FILE, 'r', encoding='utf-8') as f:
+            merged = json.load(f)
+        for code in parser.codes:
+            merged.pop(code, None)
+        merged.update(final_data)
+        print(f"Rebuilt {len(final_data)} of {len(parser.codes)} requested companies; merged into {OUTPUT_FILE}")
+        final_data = dict(sorted(merged.items()))
+
+    write_output(final_data.items(), shards, monolith)
 
     print(f"\nDone. Processed {len(final_data)} companies.")
     if multiple_matches:
         print(f"WARNING: {len(multiple_matches)} company-years have multiple fallback matches (see above)")
 
+class CorpusBuild(CorpusConsumer):
+    """main() as a process_all.py consumer, with Pass 1 files read in the corpus pass
+
+    The pass hands files over oldest first but Pass 1 merges them newest
+    first, so each file's FileFacts is pickled to a spool file as it arrives
+    and the spool is merged back in reverse after the pass. Only one file's
+    facts are in memory at a time.
+    """
+
+    def __init__(self, backend='rows', shards=False, monolith=True):
+        self.backend = backend
+        self.outputs = dict(shards=shards, monolith=monolith)
+
+    def start(self):
+        self.parser = FinancialParser()
+        self.parser.backend = self.backend
+        self.files = current_filenames(SOURCE_DIR, reverse=True)
+        self.parser.build_company_mapping()
+        self.spool = tempfile.TemporaryFile()
+        self.spooled = []  # (filename, offset) in pass order
+        return [f for f in self.files if f.endswith('.csv')]
+
+    def on_file(self, filepath, filename):
+        facts = extract_with_backend(self.backend, filepath, filename, self.parser.company_name_to_code)
+        if facts is not None:
+            self.spooled.append((filename, self.spool.tell()))
+            pickle.dump(facts, self.spool, pickle.HIGHEST_PROTOCOL)
+
+    def finish(self):
+        print("\n=== Pass 1: Processing Consolidated Statements (연결) ===")
+        with self.spool:
+            for filename, offset in reversed(self.spooled):
+                self.spool.seek(offset)
+                self.parser.current_file = filename
+                self.parser.merge_file_facts(pickle.load(self.spool))
+        complete_build(self.parser, self.files, **self.outputs)
+
+def main_streaming(workers=None, backend='rows', run_size=DEFAULT_RUN_SIZE, shards=False, monolith=True):
+    """Full build with memory bounded by one company instead of the whole corpus
+
+    Pass 1 facts are tagged with their global order (seq) and sorted into
+    on-disk runs by (code, seq) (see external_sort.py). Each company's records
+    are then replayed in seq order, which is the order the in-memory build
+    merges them in, so first-wins values, last-wins meta and the
+    financial-sector filter come out the same. Pass 2 first finds the
+    companies with missing data (only companies without a consolidated row can
+    qualify), then reads the 별도 files once for all of them into a second set
+    of runs. Each company's fallback revenue and Pass 2 facts are resolved, and
+    its entry is compiled and written to OUTPUT_FILE (and/or the shards) before
+    the next company is read. The output is identical to main().
+
+    Peak memory is about one run buffer (run_size records) plus one company,
+    whatever the corpus size. On the sample corpus (~88k facts) that is 22 MB
+    at the default run size and 10 MB at run_size=5000, against 12 MB for
+    main() (tracemalloc peaks).
+    """
+    parser = FinancialParser()
+    parser.backend = backend
+    parser.build_company_mapping()
+
+    files = current_filenames(SOURCE_DIR, reverse=True)  # Process latest files first for company name mapping
+
+    print(f"\n=== Pass 1: Sorting Consolidated Statement Facts (연결) into runs of {run_size} ===")
+    with FactRuns(run_size) as runs, FactRuns(run_size) as separate_runs:
+        seq = 0
+        pass2_candidates = set()  # Companies seen without a consolidated row (only they can qualify for Pass 2)
+        consolidated_codes = set()
+        for filename, facts in parser.iter_file_facts(SOURCE_DIR, files, allow_separate=False, workers=workers):
+            if facts is None:
+                continue
+            print(f"Processing {facts.filename}...")
+            if facts.error:
+                print(facts.error)
+                continue
+            for row_code, name, sector in facts.first_seen:
+                runs.add((row_code, seq, FACT_SEEN, name, sector, facts.is_consolidated))
+                seq += 1
+                if facts.is_consolidated:
+                    consolidated_codes.add(row_code)
+                else:
+                    pass2_candidates.add(row_code)
+            for event in facts.events:
+                runs.add((event[1], seq) + event)
+                seq += 1
+        print(f"Sorted {runs.records} facts into {runs.run_count} runs")
+
+        # PASS 2: find the companies with missing data first, then read the 별도 files once for all of them
+        print("\n=== Pass 2: Processing Separate Statements (별도) for Missing Companies ===")
+        pass2_candidates -= consolidated_codes
+        missing_companies = set()
+        if pass2_candidates:
+            for code, records in runs.groups():
+                if code not in pass2_candidates:
+                    continue
+                parser.reset_facts()
+                parser.merge_records(code, records)
+                parser.process_fallback_revenue(report=False)
+                missing_companies |= parser.find_companies_with_missing_quarters()
+        print(f"Found {len(missing_companies)} companies with missing data")
+
+        if missing_companies:
+            seq = 0
+            for f in files:
+                filing = parse_filing(f)
+                if not f.endswith('.csv') or filing is None or filing.consolidated or not filing.is_income_statement:
+                    continue
+                print(f"Processing (별도): {f}...")
+                facts = extract_file_facts(os.path.join(SOURCE_DIR, f), f, parser.company_name_to_code,
+                                           allow_separate=True, codes=missing_companies)
+                if facts is None or facts.error:
+                    print(facts.error if facts is not None else f"Failed to read {f}")
+                    continue
+                for row_code, name, sector in facts.first_seen:
+                    if row_code in missing_companies:
+                        separate_runs.add((row_code, seq, FACT_SEEN, name, sector, False))
+                        seq += 1
+                for event in facts.events:
+                    if event[1] in missing_companies:
+                        separate_runs.add((event[1], seq) + event)
+                        seq += 1
+
+        multiple_matches = {}
+
+        def compile_companies():
+            separate_groups = separate_runs.groups()
+            separate = next(separate_groups, None)
+            for code, records in runs.groups():
+                parser.reset_facts()
+                parser.merge_records(code, records)
+                multiple_matches.update(parser.process_fallback_revenue())
+
+                # This company's Pass 2 facts, merged after its consolidated ones as in main()
+                if separate is not None and separate[0] == code:
+                    parser.merge_records(code, separate[1], separate=True)
+                    separate = next(separate_groups, None)
+                    multiple_matches.update(parser.process_fallback_revenue())
+
+                yield from parser.compile_final_data().items()
+
+        print(f"\n=== Compiling companies from the merged runs ===")
+        count = write_output(compile_companies(), shards, monolith)
+
+    print(f"Pass 2 (별도) applied to {len(missing_companies)} companies with missing data")
+    parser.fallback_decisions.save_queue()
+
+    print(f"\nDone. Processed {count} companies.")
+    if multiple_matches:
+        print(f"WARNING: {len(multiple_matches)} company-years have multiple fallback matches (see above)")
+
 if __name__ == '__main__':
-    main()
\ No newline at end of file
+    arg_parser = argparse.ArgumentParser(description='Build financial_data.json from csv_output')
+    arg_parser.add_argument('--workers', type=int, default=None,
+                            help='Parse files in a process pool with this many workers (default: serial)')
+    arg_parser.add_argument('--codes', default=None,
+                            help='Comma-separated stock codes (e.g. 005930,005490): rebuild only these companies '
+                                 'and merge them into the existing output')
+    arg_parser.add_argument('--backend', choices=['rows', 'dataframe'], default='rows',
+                            help='Fact extraction: row-at-a-time parser (default) or the pandas DataFrame backend')
+    arg_parser.add_argument('--streaming', action='store_true',
+                            help='Bounded-memory build: sort facts into on-disk runs and compile one company at a time')
+    arg_parser.add_argument('--run-size', type=int, default=DEFAULT_RUN_SIZE,
+                            help=f'Facts per sorted run in --streaming mode (default: {DEFAULT_RUN_SIZE})')
+    arg_parser.add_argument('--shards', action='store_true',
+                            help=f'Also write the frontend shards ({SHARD_DIR}/{SHARD_PREFIX}_NN.json and the index) '
+                                 'directly, without split_financial_data.py')
+    arg_parser.add_argument('--no-monolith', action='store_true',
+                            help=f'Do not write {OUTPUT_FILE} (requires --shards)')
+    args = arg_parser.parse_args()
+    codes = [c.strip().zfill(6) for c in args.codes.split(',') if c.strip()] if args.codes else None
+    if args.no_monolith and not args.shards:
+        arg_parser.error('--no-monolith leaves nothing to write without --shards')
+    if args.no_monolith and codes:
+        arg_parser.error(f'--codes merges into the existing {OUTPUT_FILE}; it cannot be combined with --no-monolith')
+    outputs = dict(shards=args.shards, monolith=not args.no_monolith)
+    if args.streaming:
+        if codes:
+            arg_parser.error('--streaming rebuilds every company; it cannot be combined with --codes')
+        main_streaming(workers=args.workers, backend=args.backend, run_size=args.run_size, **outputs)
+    else:
+        main(workers=args.workers, codes=codes, backend=args.backend, **outputs)
\ No newline at end of file
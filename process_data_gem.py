@@ -2,7 +2,12 @@ import os
 import json
 import re
 import collections
-import csv
+
+from dart_corpus import iter_rows, FileSchema
+from source_catalog import parse_filing, current_filenames
+from metric_classifier import MetricClassifier
+from period_derivation import PeriodTable, derivation_rules, ANNUAL_CURRENT_FIRST
+from overrides import OVERRIDES
 
 # CONFIGURATION
 SOURCE_DIR = "csv_output"
@@ -101,6 +106,9 @@ METRICS = {
     }
 }
 
+# Compiled METRICS rules with per-(item code, item name) decisions memoized
+CLASSIFIER = MetricClassifier(METRICS)
+
 def clean_header(h):
     return h.replace(' ', '').replace('\xa0', '').strip()
 
@@ -118,12 +126,8 @@ def normalize_code(code, company_name=None):
     if not code or code == '[null]' or re.sub(r'[^\d]', '', code) == '':
         # Special handling for companies with missing codes
         if company_name:
-            # Known mappings for companies with missing stock codes in DART data
-            COMPANY_CODE_MAP = {
-                '포스코': '005490',
-                'POSCO': '005490',
-            }
-            return COMPANY_CODE_MAP.get(company_name.strip())
+            # Known mappings for companies with missing stock codes in DART data (overrides.json)
+            return OVERRIDES.code_alias(company_name)
         return None
     return re.sub(r'[^\d]', '', code).zfill(6)
 
@@ -138,36 +142,6 @@ def is_financial_sector(sector):
             return True
     return False
 
-def should_exclude_metric(item_code, item_name, metric_def):
-    """Check if this item should be excluded from the metric"""
-    # Check exclude codes
-    for exc_code in metric_def.get('exclude_codes', []):
-        if exc_code in item_code:
-            return True
-    
-    # Check exclude names
-    clean_name = clean_header(item_name)
-    for exc_name in metric_def.get('exclude_names', []):
-        if exc_name in clean_name:
-            return True
-    
-    return False
-
-def matches_metric_code(item_code, metric_def):
-    """Check if item_code matches metric definition codes with exact matching"""
-    allowed_codes = metric_def.get('codes', [])
-    
-    for code in allowed_codes:
-        # Exact match for ifrs_Revenue and ifrs-full_Revenue
-        if code in ['ifrs_Revenue', 'ifrs-full_Revenue']:
-            if item_code == code:
-                return True
-        # Substring match for other codes
-        elif code in item_code:
-            return True
-    
-    return False
-
 # [수정] 아래 클래스 로직은 원본 유지하되, 하단부 find_companies_with_missing_quarters 함수 내 연도 범위만 상수로 교체됨
 
 class FinancialParser:
@@ -192,22 +166,13 @@ class FinancialParser:
             filepath = os.path.join(SOURCE_DIR, filename)
 
             # Read CSV file
-            encoding_candidates = ['utf-8-sig', 'cp949', 'utf-8', 'euc-kr']
-            rows = []
-
-            for enc in encoding_candidates:
-                try:
-                    with open(filepath, 'r', encoding=enc, newline='') as f:
-                        reader = csv.reader(f)
-                        rows = list(reader)
-                    break
-                except (UnicodeDecodeError, csv.Error):
-                    continue
+            rows = iter_rows(filepath)
+            header = next(rows, None)
 
-            if not rows:
+            if header is None:
                 continue
 
-            headers = [clean_header(h) for h in rows[0]]
+            headers = [clean_header(h) for h in header]
             col_map = {}
             for idx, h in enumerate(headers):
                 if h:
@@ -220,7 +185,7 @@ class FinancialParser:
                 continue
 
             # Extract company code and name mappings
-            for row in rows[1:]:
+            for row in rows:
                 if len(row) <= max(col_code, col_name):
                     continue
 
@@ -258,56 +223,36 @@ class FinancialParser:
 
     def process_file(self, filepath, filename, allow_separate=False):
         self.current_file = filename  # Track current file
-        parts = filename.split('_')
-        year = int(parts[0])
-        report_type = parts[1]
+        filing = parse_filing(filename)
+        if filing is None: return
+        year = filing.year
+        report_type = filing.report_type
 
         # Skip separate statements unless explicitly allowed
-        is_consolidated = '연결' in filename
+        is_consolidated = filing.consolidated
         if not is_consolidated and not allow_separate:
             return
 
         # Track if this is a consolidated file for later filtering
         processing_consolidated = is_consolidated
 
-        if '포괄손익계산서' not in filename and '손익계산서' not in filename: return
-        if '현금흐름표' in filename or '재무상태표' in filename or '자본변동표' in filename: return
+        if not filing.is_income_statement: return
 
         print(f"Processing {filename}...")
 
-        encoding_candidates = ['utf-8-sig', 'cp949', 'utf-8', 'euc-kr']
-        rows = []
+        rows = iter_rows(filepath)
+        header = next(rows, None)
 
-        for enc in encoding_candidates:
-            try:
-                with open(filepath, 'r', encoding=enc, newline='') as f:
-                    reader = csv.reader(f)
-                    rows = list(reader)
-                break
-            except (UnicodeDecodeError, csv.Error):
-                continue
-
-        if not rows:
+        if header is None:
             print(f"Failed to read {filename}")
             return
 
-        headers = [clean_header(h) for h in rows[0]]
-
-        col_map = {}
-        for idx, h in enumerate(headers):
-            if h:
-                col_map[h] = idx
-
-        def get_idx(candidates):
-            for c in candidates:
-                if c in col_map: return col_map[c]
-            return None
-
-        col_code = get_idx(['종목코드'])
-        col_name = get_idx(['회사명'])
-        col_sector = get_idx(['업종명', '업종'])
-        col_item_code = get_idx(['항목코드'])
-        col_item_name = get_idx(['항목명'])
+        schema = FileSchema(header)
+        col_code = schema.code
+        col_name = schema.name
+        col_sector = schema.sector
+        col_item_code = schema.item_code
+        col_item_name = schema.item_name
 
         if col_code is None or col_item_code is None:
             print(f"  Missing essential columns in {filename}")
@@ -326,8 +271,13 @@ class FinancialParser:
             target_periods.append(('Annual_Current', ['당기', '당기사업년도']))
             target_periods.append(('Annual_Previous_From_Next', ['전기', '전기사업년도']))
 
-        for row in rows[1:]:
-            if len(row) < max(col_map.values()) + 1: continue
+        # Header resolved once; the row loop only does indexed access
+        period_cols = schema.period_columns(target_periods)
+        col_idx_map = dict(period_cols)  # for fallback candidates
+        min_len = schema.min_len
+
+        for row in rows:
+            if len(row) < min_len: continue
 
             # Try to normalize code with company name fallback
             company_name = row[col_name].strip() if col_name is not None else None
@@ -362,90 +312,72 @@ class FinancialParser:
 
             item_code = row[col_item_code].strip()
             item_name = row[col_item_name].strip()
-            clean_item_name = clean_header(item_name)
+            decision = CLASSIFIER.classify(item_code, item_name)
 
             # Skip Cost of Sales and Gross Profit
-            if 'CostOfSales' in item_code or '매출원가' in clean_item_name:
-                continue
-            if 'GrossProfit' in item_code or '매출총이익' in clean_item_name or '매출총손실' in clean_item_name:
+            if decision.skip or decision.gross_profit:
                 continue
 
-            # Determine Metric Type with exclusion check
-            metric_type = None
-            for m_key, m_def in METRICS.items():
-                # First check if should be excluded
-                if should_exclude_metric(item_code, item_name, m_def):
-                    continue
-
-                # Check if matches by code or standard names
-                if matches_metric_code(item_code, m_def) or any(n in clean_item_name for n in m_def['names']):
-                    metric_type = m_key
-                    # Track if this is revenue with IFRS code (per year)
-                    if m_key == 'revenue' and (item_code == 'ifrs_Revenue' or item_code == 'ifrs-full_Revenue'):
-                        self.companies_with_ifrs_revenue_by_year[row_code].add(year)
-                    break
+            # Metric type with exclusion check (see metric_classifier.py)
+            metric_type = decision.metric
+            # Track if this is revenue with IFRS code (per year)
+            if decision.ifrs_revenue:
+                self.companies_with_ifrs_revenue_by_year[row_code].add(year)
 
             # If not matched and this is potentially a fallback revenue candidate
-            if not metric_type and 'fallback_names' in METRICS['revenue']:
-                fallback_names = METRICS['revenue']['fallback_names']
-                fallback_exclude = METRICS['revenue'].get('fallback_exclude_patterns', [])
-
-                # Check if Korean name matches fallback patterns
-                matched_fallback = False
-                for fb_name in fallback_names:
-                    if fb_name in clean_item_name:
-                        # Check if any exclude pattern exists in the name
-                        has_exclude = any(exc in clean_item_name for exc in fallback_exclude)
-                        if not has_exclude:
-                            col_idx_map = {pk: get_idx(cols) for pk, cols in target_periods}
-
-                            # Store as potential fallback candidate with file info
-                            self.fallback_revenue_candidates[row_code][year].append({
-                                'item_code': item_code,
-                                'item_name': item_name,
-                                'clean_name': clean_item_name,
-                                'row_data': row,
-                                'col_idx_map': col_idx_map,
-                                'filename': self.current_file
-                            })
-                            matched_fallback = True
-                            break
-
-                if matched_fallback:
-                    continue  # Will process in second pass
+            if not metric_type and decision.fallback:
+                # Store as potential fallback candidate with file info
+                self.fallback_revenue_candidates[row_code][year].append({
+                    'item_code': item_code,
+                    'item_name': item_name,
+                    'clean_name': clean_header(item_name),
+                    'row_data': row,
+                    'col_idx_map': col_idx_map,
+                    'filename': self.current_file
+                })
+                continue  # Will process in second pass
 
             if not metric_type: continue
 
             # Extract Values for targets
-            for period_key, allowed_cols in target_periods:
-                col_idx = get_idx(allowed_cols)
-                if col_idx is not None:
-                    val = parse_value(row[col_idx])
-                    if val is not None:
+            for period_key, col_idx in period_cols:
+                val = parse_value(row[col_idx])
+                if val is not None:
+                    target_year = year
+                    storage_key = period_key
+
+                    # For 사업보고서: 파일명의 year = 결산연도 = 당기 연도
+                    # 당기 -> target_year = year (파일명 연도)
+                    # 전기 -> target_year = year - 1
+                    if period_key == 'Annual_Current':
                         target_year = year
-                        storage_key = period_key
-
-                        # For 사업보고서: 파일명의 year = 결산연도 = 당기 연도
-                        # 당기 -> target_year = year (파일명 연도)
-                        # 전기 -> target_year = year - 1
-                        if period_key == 'Annual_Current':
-                            target_year = year
-                        elif period_key == 'Annual_Previous_From_Next':
-                            target_year = year - 1
-                            storage_key = 'Annual_Previous'
+                    elif period_key == 'Annual_Previous_From_Next':
+                        target_year = year - 1
+                        storage_key = 'Annual_Previous'
                         
-                        self.data[row_code][target_year][f'_meta_{metric_type}_name'] = item_name
-                        self.data[row_code][target_year][f'_meta_{metric_type}_code'] = item_code
+                    self.data[row_code][target_year][f'_meta_{metric_type}_name'] = item_name
+                    self.data[row_code][target_year][f'_meta_{metric_type}_code'] = item_code
+
+                    if metric_type not in self.data[row_code][target_year][storage_key]:
+                        self.data[row_code][target_year][storage_key][metric_type] = val
 
-                        if metric_type not in self.data[row_code][target_year][storage_key]:
-                            self.data[row_code][target_year][storage_key][metric_type] = val
 
+    def statement_type(self, code):
+        """Statement type (연결/별도) a company's output is labelled with"""
+        return self.meta.get(code, {}).get('statement_type', '연결')
 
     def compile_final_data(self):
         output = {}
 
         sorted_codes = sorted(self.data.keys())
 
+        # 4Q for every company-year at once (see period_derivation.py)
+        rows = {(code, y): i for i, (code, y) in enumerate(
+            (code, y) for code in sorted_codes for y in sorted(self.data[code].keys()))}
+        table = PeriodTable.from_year_data((self.data[code][y] for code, y in rows), ['revenue', 'op_profit', 'net_income'])
+        table.derive(derivation_rules(ANNUAL_CURRENT_FIRST))
+        OVERRIDES.fix_values(table, lambda code, y: rows.get((code, y)), self.statement_type)
+
         for code in sorted_codes:
             company_years = sorted(self.data[code].keys())
             history = []
@@ -477,27 +409,17 @@ class FinancialParser:
                 # Calculate Q4
                 # Prefer Annual_Current (from same year's annual report) over Annual_Previous (from next year's report)
                 # Annual_Previous can be incorrect due to accounting standard changes or restatements
-                annual_total = y_data.get('Annual_Current')
-                if not annual_total:
-                    annual_total = y_data.get('Annual_Previous')
+                q4_data = table.period_data(rows[(code, y)], '4Q')
 
-                q3_acc = y_data.get('3Q_Acc')
-                
-                if annual_total and q3_acc:
+                if q4_data:
                     q4_rec = {
                         'year': y,
                         'quarter': '4Q',
-                        'revenue': None,
-                        'op_profit': None,
-                        'net_income': None
+                        'revenue': q4_data.get('revenue'),
+                        'op_profit': q4_data.get('op_profit'),
+                        'net_income': q4_data.get('net_income')
                     }
                     
-                    for m in ['revenue', 'op_profit', 'net_income']:
-                        val_ann = annual_total.get(m)
-                        val_q3 = q3_acc.get(m)
-                        if val_ann is not None and val_q3 is not None:
-                            q4_rec[m] = val_ann - val_q3
-                    
                     for metric in ['revenue', 'op_profit', 'net_income']:
                         meta_name_key = f'_meta_{metric}_name'
                         meta_code_key = f'_meta_{metric}_code'
@@ -519,7 +441,7 @@ class FinancialParser:
                      'history': history
                  }
 
-        return output
+        return OVERRIDES.apply_names(output)
 
     def process_fallback_revenue(self):
         """Process fallback Korean name revenue for companies without IFRS codes
@@ -687,55 +609,33 @@ class FinancialParser:
 
     def process_file_for_separate(self, filepath, filename, target_companies):
         """Process separate statements (별도) only for target companies"""
-        # Only process files WITHOUT '연결' (separate statements)
-        if '연결' in filename:
+        filing = parse_filing(filename)
+        # Only process separate statements (별도)
+        if filing is None or filing.consolidated:
             return
 
         # Check if it's an income statement
-        if '포괄손익계산서' not in filename and '손익계산서' not in filename:
-            return
-        if '현금흐름표' in filename or '재무상태표' in filename or '자본변동표' in filename:
+        if not filing.is_income_statement:
             return
 
         print(f"Processing (별도): {filename}...")
 
-        parts = filename.split('_')
-        year = int(parts[0])
-        report_type = parts[1]
-
-        encoding_candidates = ['utf-8-sig', 'cp949', 'utf-8', 'euc-kr']
-        rows = []
+        year = filing.year
+        report_type = filing.report_type
 
-        for enc in encoding_candidates:
-            try:
-                with open(filepath, 'r', encoding=enc, newline='') as f:
-                    reader = csv.reader(f)
-                    rows = list(reader)
-                break
-            except (UnicodeDecodeError, csv.Error):
-                continue
+        rows = iter_rows(filepath)
+        header = next(rows, None)
 
-        if not rows:
+        if header is None:
             print(f"Failed to read {filename}")
             return
 
-        headers = [clean_header(h) for h in rows[0]]
-
-        col_map = {}
-        for idx, h in enumerate(headers):
-            if h:
-                col_map[h] = idx
-
-        def get_idx(candidates):
-            for c in candidates:
-                if c in col_map: return col_map[c]
-            return None
-
-        col_code = get_idx(['종목코드'])
-        col_name = get_idx(['회사명'])
-        col_sector = get_idx(['업종명', '업종'])
-        col_item_code = get_idx(['항목코드'])
-        col_item_name = get_idx(['항목명'])
+        schema = FileSchema(header)
+        col_code = schema.code
+        col_name = schema.name
+        col_sector = schema.sector
+        col_item_code = schema.item_code
+        col_item_name = schema.item_name
 
         if col_code is None or col_item_code is None:
             print(f"  Missing essential columns in {filename}")
@@ -754,8 +654,13 @@ class FinancialParser:
             target_periods.append(('Annual_Current', ['당기', '당기사업년도']))
             target_periods.append(('Annual_Previous_From_Next', ['전기', '전기사업년도']))
 
-        for row in rows[1:]:
-            if len(row) < max(col_map.values()) + 1: continue
+        # Header resolved once; the row loop only does indexed access
+        period_cols = schema.period_columns(target_periods)
+        col_idx_map = dict(period_cols)  # for fallback candidates
+        min_len = schema.min_len
+
+        for row in rows:
+            if len(row) < min_len: continue
 
             # Try to normalize code with company name fallback
             company_name = row[col_name].strip() if col_name is not None else None
@@ -793,88 +698,59 @@ class FinancialParser:
 
             item_code = row[col_item_code].strip()
             item_name = row[col_item_name].strip()
-            clean_item_name = clean_header(item_name)
+            decision = CLASSIFIER.classify(item_code, item_name)
 
             # Skip Cost of Sales and Gross Profit
-            if 'CostOfSales' in item_code or '매출원가' in clean_item_name:
+            if decision.skip or decision.gross_profit:
                 continue
-            if 'GrossProfit' in item_code or '매출총이익' in clean_item_name or '매출총손실' in clean_item_name:
-                continue
-
-            # Determine Metric Type with exclusion check
-            metric_type = None
-            for m_key, m_def in METRICS.items():
-                # First check if should be excluded
-                if should_exclude_metric(item_code, item_name, m_def):
-                    continue
 
-                # Check if matches by code or standard names
-                if matches_metric_code(item_code, m_def) or any(n in clean_item_name for n in m_def['names']):
-                    metric_type = m_key
-                    # Track if this is revenue with IFRS code (per year)
-                    if m_key == 'revenue' and (item_code == 'ifrs_Revenue' or item_code == 'ifrs-full_Revenue'):
-                        self.companies_with_ifrs_revenue_by_year[row_code].add(year)
-                    break
+            # Metric type with exclusion check (see metric_classifier.py)
+            metric_type = decision.metric
+            # Track if this is revenue with IFRS code (per year)
+            if decision.ifrs_revenue:
+                self.companies_with_ifrs_revenue_by_year[row_code].add(year)
 
             # If not matched and this is potentially a fallback revenue candidate
-            if not metric_type and 'fallback_names' in METRICS['revenue']:
-                fallback_names = METRICS['revenue']['fallback_names']
-                fallback_exclude = METRICS['revenue'].get('fallback_exclude_patterns', [])
-
-                # Check if Korean name matches fallback patterns
-                matched_fallback = False
-                for fb_name in fallback_names:
-                    if fb_name in clean_item_name:
-                        # Check if any exclude pattern exists in the name
-                        has_exclude = any(exc in clean_item_name for exc in fallback_exclude)
-                        if not has_exclude:
-                            col_idx_map = {pk: get_idx(cols) for pk, cols in target_periods}
-
-                            # Store as potential fallback candidate with file info
-                            self.fallback_revenue_candidates[row_code][year].append({
-                                'item_code': item_code,
-                                'item_name': item_name,
-                                'clean_name': clean_item_name,
-                                'row_data': row,
-                                'col_idx_map': col_idx_map,
-                                'filename': filename
-                            })
-                            matched_fallback = True
-                            break
-
-                if matched_fallback:
-                    continue  # Will process in second pass
+            if not metric_type and decision.fallback:
+                # Store as potential fallback candidate with file info
+                self.fallback_revenue_candidates[row_code][year].append({
+                    'item_code': item_code,
+                    'item_name': item_name,
+                    'clean_name': clean_header(item_name),
+                    'row_data': row,
+                    'col_idx_map': col_idx_map,
+                    'filename': filename
+                })
+                continue  # Will process in second pass
 
             if not metric_type: continue
 
             # Extract Values for targets
-            for period_key, allowed_cols in target_periods:
-                col_idx = get_idx(allowed_cols)
-                if col_idx is not None:
-                    val = parse_value(row[col_idx])
-                    if val is not None:
+            for period_key, col_idx in period_cols:
+                val = parse_value(row[col_idx])
+                if val is not None:
+                    target_year = year
+                    storage_key = period_key
+
+                    # For 사업보고서: 파일명의 year = 결산연도 = 당기 연도
+                    # 당기 -> target_year = year (파일명 연도)
+                    # 전기 -> target_year = year - 1
+                    if period_key == 'Annual_Current':
                         target_year = year
-                        storage_key = period_key
-
-                        # For 사업보고서: 파일명의 year = 결산연도 = 당기 연도
-                        # 당기 -> target_year = year (파일명 연도)
-                        # 전기 -> target_year = year - 1
-                        if period_key == 'Annual_Current':
-                            target_year = year
-                        elif period_key == 'Annual_Previous_From_Next':
-                            target_year = year - 1
-                            storage_key = 'Annual_Previous'
+                    elif period_key == 'Annual_Previous_From_Next':
+                        target_year = year - 1
+                        storage_key = 'Annual_Previous'
 
-                        self.data[row_code][target_year][f'_meta_{metric_type}_name'] = item_name
-                        self.data[row_code][target_year][f'_meta_{metric_type}_code'] = item_code
+                    self.data[row_code][target_year][f'_meta_{metric_type}_name'] = item_name
+                    self.data[row_code][target_year][f'_meta_{metric_type}_code'] = item_code
 
-                        if metric_type not in self.data[row_code][target_year][storage_key]:
-                            self.data[row_code][target_year][storage_key][metric_type] = val
+                    if metric_type not in self.data[row_code][target_year][storage_key]:
+                        self.data[row_code][target_year][storage_key][metric_type] = val
 
 def main():
     parser = FinancialParser()
 
-    files = sorted(os.listdir(SOURCE_DIR))
+    files = current_filenames(SOURCE_DIR)
 
     # Build company name to code mapping from latest files first
     parser.build_company_mapping(files)
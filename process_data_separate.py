@@ -7,6 +7,12 @@ import json
 import re
 import collections
 
+from dart_corpus import iter_rows, FileSchema
+from source_catalog import parse_filing, current_filenames
+from metric_classifier import MetricClassifier
+from period_derivation import PeriodTable, derivation_rules, ANNUAL_PREVIOUS_FIRST
+from overrides import OVERRIDES
+
 # CONFIGURATION
 SOURCE_DIR = "손익계산서"
 OUTPUT_FILE = "financial_data_separate.json"
@@ -90,6 +96,9 @@ METRICS = {
     }
 }
 
+# Compiled METRICS rules with per-(item code, item name) decisions memoized
+CLASSIFIER = MetricClassifier(METRICS)
+
 def clean_header(h):
     return h.replace(' ', '').replace('\xa0', '').strip()
 
@@ -117,36 +126,6 @@ def is_financial_sector(sector):
             return True
     return False
 
-def should_exclude_metric(item_code, item_name, metric_def):
-    """Check if this item should be excluded from the metric"""
-    # Check exclude codes
-    for exc_code in metric_def.get('exclude_codes', []):
-        if exc_code in item_code:
-            return True
-    
-    # Check exclude names
-    clean_name = clean_header(item_name)
-    for exc_name in metric_def.get('exclude_names', []):
-        if exc_name in clean_name:
-            return True
-    
-    return False
-
-def matches_metric_code(item_code, metric_def):
-    """Check if item_code matches metric definition codes with exact matching"""
-    allowed_codes = metric_def.get('codes', [])
-    
-    for code in allowed_codes:
-        # Exact match for ifrs_Revenue and ifrs-full_Revenue
-        if code in ['ifrs_Revenue', 'ifrs-full_Revenue']:
-            if item_code == code:
-                return True
-        # Substring match for other codes
-        elif code in item_code:
-            return True
-    
-    return False
-
 class FinancialParser:
     def __init__(self, excluded_codes):
         self.data = collections.defaultdict(lambda: collections.defaultdict(lambda: collections.defaultdict(dict)))
@@ -154,49 +133,31 @@ class FinancialParser:
         self.excluded_codes = excluded_codes  # Companies already in consolidated data
 
     def process_file(self, filepath, filename):
-        parts = filename.split('_')
-        year = int(parts[0])
-        report_type = parts[1]
+        filing = parse_filing(filename)
+        if filing is None: return
+        year = filing.year
+        report_type = filing.report_type
         
         # Only process non-consolidated (without _연결)
-        if '_연결' in filename: return
-        if '포괄손익계산서' not in filename and '손익계산서' not in filename: return
-        if '현금흐름표' in filename or '재무상태표' in filename or '자본변동표' in filename: return
+        if filing.consolidated: return
+        if not filing.is_income_statement: return
 
         print(f"Processing {filename}...")
 
-        encoding_candidates = ['cp949', 'utf-8', 'euc-kr']
-        lines = []
-        
-        for enc in encoding_candidates:
-            try:
-                with open(filepath, 'r', encoding=enc) as f:
-                    lines = f.readlines()
-                break
-            except UnicodeDecodeError:
-                continue
-        
-        if not lines:
+        # Raw DART downloads are tab-separated
+        rows = iter_rows(filepath, delimiter='\t')
+        header = next(rows, None)
+
+        if header is None:
             print(f"Failed to read {filename}")
             return
 
-        headers = [clean_header(h) for h in lines[0].split('\t')]
-        
-        col_map = {}
-        for idx, h in enumerate(headers):
-            if h:
-                col_map[h] = idx
-
-        def get_idx(candidates):
-            for c in candidates:
-                if c in col_map: return col_map[c]
-            return None
-
-        col_code = get_idx(['종목코드'])
-        col_name = get_idx(['회사명'])
-        col_sector = get_idx(['업종명', '업종'])
-        col_item_code = get_idx(['항목코드'])
-        col_item_name = get_idx(['항목명'])
+        schema = FileSchema(header)
+        col_code = schema.code
+        col_name = schema.name
+        col_sector = schema.sector
+        col_item_code = schema.item_code
+        col_item_name = schema.item_name
 
         if col_code is None or col_item_code is None:
             print(f"  Missing essential columns in {filename}")
@@ -215,9 +176,12 @@ class FinancialParser:
             target_periods.append(('Annual_Current', ['당기', '당기사업년도']))
             target_periods.append(('Annual_Previous_From_Next', ['전기', '전기사업년도']))
 
-        for line in lines[1:]:
-            parts = line.split('\t')
-            if len(parts) < max(col_map.values()) + 1: continue
+        # Header resolved once; the row loop only does indexed access
+        period_cols = schema.period_columns(target_periods)
+        min_len = schema.min_len
+
+        for parts in rows:
+            if len(parts) < min_len: continue
 
             row_code = normalize_code(parts[col_code])
             if not row_code: continue
@@ -241,46 +205,33 @@ class FinancialParser:
 
             item_code = parts[col_item_code].strip()
             item_name = parts[col_item_name].strip()
-            clean_item_name = clean_header(item_name)
+            decision = CLASSIFIER.classify(item_code, item_name)
             
             # Skip Cost of Sales and Gross Profit
-            if 'CostOfSales' in item_code or '매출원가' in clean_item_name:
-                continue
-            if 'GrossProfit' in item_code or '매출총이익' in clean_item_name or '매출총손실' in clean_item_name:
+            if decision.skip or decision.gross_profit:
                 continue
 
-            # Determine Metric Type with exclusion check
-            metric_type = None
-            for m_key, m_def in METRICS.items():
-                # First check if should be excluded
-                if should_exclude_metric(item_code, item_name, m_def):
-                    continue
-                
-                # Then check if matches (with exact matching for Revenue codes)
-                if matches_metric_code(item_code, m_def) or any(n in clean_item_name for n in m_def['names']):
-                    metric_type = m_key
-                    break
+            # Metric type with exclusion check (exact matching for Revenue codes)
+            metric_type = decision.metric
             
             if not metric_type: continue
 
-            for period_key, allowed_cols in target_periods:
-                col_idx = get_idx(allowed_cols)
-                if col_idx is not None:
-                    val = parse_value(parts[col_idx])
-                    if val is not None:
-                        target_year = year
-                        if period_key == 'Annual_Previous_From_Next':
-                            target_year = year - 1
-                            storage_key = 'Annual_Previous'
-                        else:
-                            storage_key = period_key
+            for period_key, col_idx in period_cols:
+                val = parse_value(parts[col_idx])
+                if val is not None:
+                    target_year = year
+                    if period_key == 'Annual_Previous_From_Next':
+                        target_year = year - 1
+                        storage_key = 'Annual_Previous'
+                    else:
+                        storage_key = period_key
                         
-                        self.data[row_code][target_year][f'_meta_{metric_type}_name'] = item_name
-                        self.data[row_code][target_year][f'_meta_{metric_type}_code'] = item_code
+                    self.data[row_code][target_year][f'_meta_{metric_type}_name'] = item_name
+                    self.data[row_code][target_year][f'_meta_{metric_type}_code'] = item_code
                         
-                        # Only store first match (don't overwrite)
-                        if metric_type not in self.data[row_code][target_year][storage_key]:
-                            self.data[row_code][target_year][storage_key][metric_type] = val
+                    # Only store first match (don't overwrite)
+                    if metric_type not in self.data[row_code][target_year][storage_key]:
+                        self.data[row_code][target_year][storage_key][metric_type] = val
 
 
     def compile_final_data(self):
@@ -288,6 +239,13 @@ class FinancialParser:
         
         sorted_codes = sorted(self.data.keys())
         
+        # 4Q for every company-year at once (see period_derivation.py)
+        rows = {(code, y): i for i, (code, y) in enumerate(
+            (code, y) for code in sorted_codes for y in sorted(self.data[code].keys()))}
+        table = PeriodTable.from_year_data((self.data[code][y] for code, y in rows), ['revenue', 'op_profit', 'net_income'])
+        table.derive(derivation_rules(ANNUAL_PREVIOUS_FIRST))
+        OVERRIDES.fix_values(table, lambda code, y: rows.get((code, y)), lambda code: '별도')
+
         for code in sorted_codes:
             company_years = sorted(self.data[code].keys())
             history = []
@@ -316,28 +274,18 @@ class FinancialParser:
                         if rec['revenue'] or rec['op_profit']:
                             history.append(rec)
 
-                # Calculate Q4
-                annual_total = y_data.get('Annual_Previous')
-                if not annual_total:
-                    annual_total = y_data.get('Annual_Current')
-                
-                q3_acc = y_data.get('3Q_Acc')
+                # Calculate Q4 (Annual_Previous preferred over Annual_Current)
+                q4_data = table.period_data(rows[(code, y)], '4Q')
                 
-                if annual_total and q3_acc:
+                if q4_data:
                     q4_rec = {
                         'year': y,
                         'quarter': '4Q',
-                        'revenue': None,
-                        'op_profit': None,
-                        'net_income': None
+                        'revenue': q4_data.get('revenue'),
+                        'op_profit': q4_data.get('op_profit'),
+                        'net_income': q4_data.get('net_income')
                     }
                     
-                    for m in ['revenue', 'op_profit', 'net_income']:
-                        val_ann = annual_total.get(m)
-                        val_q3 = q3_acc.get(m)
-                        if val_ann is not None and val_q3 is not None:
-                            q4_rec[m] = val_ann - val_q3
-                    
                     for metric in ['revenue', 'op_profit', 'net_income']:
                         meta_name_key = f'_meta_{metric}_name'
                         meta_code_key = f'_meta_{metric}_code'
@@ -359,7 +307,7 @@ class FinancialParser:
                      'history': history 
                  }
         
-        return output
+        return OVERRIDES.apply_names(output)
 
 def main():
     # Load existing consolidated data to get list of companies to exclude
@@ -372,11 +320,10 @@ def main():
     
     parser = FinancialParser(excluded_codes)
     
-    files = sorted(os.listdir(SOURCE_DIR))
+    files = current_filenames(SOURCE_DIR, suffix='.txt')
     
     for f in files:
-        if f.endswith('.txt'):
-            parser.process_file(os.path.join(SOURCE_DIR, f), f)
+        parser.process_file(os.path.join(SOURCE_DIR, f), f)
             
     final_data = parser.compile_final_data()
     
@@ -1,8 +1,13 @@
-import os
 import json
 import re
 import collections
-import csv
+
+from dart_corpus import iter_rows, FileSchema, CorpusConsumer
+from dart_columnar import open_current_filing
+from source_catalog import parse_filing, current_filenames
+from company_index import load_company_index
+from period_derivation import PeriodTable, derivation_rules, ANNUAL_PREVIOUS_FIRST
+from overrides import OVERRIDES
 
 # CONFIGURATION
 SOURCE_DIR = "csv_output"
@@ -36,6 +41,9 @@ EPS_METRICS = {
     }
 }
 
+# Statement precedence when the same fact is filed in both (lower wins)
+STATEMENT_RANK = {'연결': 0, '별도': 1}
+
 def clean_header(h):
     return h.replace(' ', '').replace('\xa0', '').strip()
 
@@ -54,11 +62,7 @@ def normalize_code(code, company_name=None):
     """Normalize stock code"""
     if not code or code == '[null]' or re.sub(r'[^\d]', '', code) == '':
         if company_name:
-            COMPANY_CODE_MAP = {
-                '포스코': '005490',
-                'POSCO': '005490',
-            }
-            return COMPANY_CODE_MAP.get(company_name.strip())
+            return OVERRIDES.code_alias(company_name)
         return None
     return re.sub(r'[^\d]', '', code).zfill(6)
 
@@ -98,125 +102,69 @@ def matches_metric_code(item_code, metric_def):
 
     return False
 
+def eps_metric(item_code, item_name):
+    """EPS_METRICS key of an item, or None"""
+    clean_item_name = clean_header(item_name)
+    for m_key, m_def in EPS_METRICS.items():
+        # First check if should be excluded
+        if should_exclude_metric(item_code, item_name, m_def):
+            continue
+
+        # Check if matches by code or standard names
+        if matches_metric_code(item_code, m_def) or any(n in clean_item_name for n in m_def['names']):
+            return m_key
+    return None
+
 class EPSParser:
+    """Reads every file once; consolidated-over-separate precedence is resolved in merge_statements
+
+    Facts are kept with their (statement rank, file order) precedence, so a
+    value from a consolidated (연결) filing always wins over a separate (별도)
+    one, and within a statement type the first file wins. This is what the
+    former two passes (연결 files, then all files again) produced.
+    """
+
     def __init__(self):
         self.data = collections.defaultdict(lambda: collections.defaultdict(lambda: collections.defaultdict(dict)))
         self.meta = {}
         self.company_name_to_code = {}
         self.code_to_company_name = {}
 
-    def build_company_mapping(self, files):
-        """Build company name to code mapping from all files"""
-        print("\nBuilding company name to code mapping...")
-
-        sorted_files = sorted([f for f in files if f.endswith('.csv')], reverse=True)
-
-        for filename in sorted_files:
-            filepath = os.path.join(SOURCE_DIR, filename)
-
-            encoding_candidates = ['utf-8-sig', 'cp949', 'utf-8', 'euc-kr']
-            rows = []
-
-            for enc in encoding_candidates:
-                try:
-                    with open(filepath, 'r', encoding=enc, newline='') as f:
-                        reader = csv.reader(f)
-                        rows = list(reader)
-                    break
-                except (UnicodeDecodeError, csv.Error):
-                    continue
-
-            if not rows:
-                continue
-
-            headers = [clean_header(h) for h in rows[0]]
-            col_map = {}
-            for idx, h in enumerate(headers):
-                if h:
-                    col_map[h] = idx
-
-            col_code = col_map.get('종목코드')
-            col_name = col_map.get('회사명')
-
-            if col_code is None or col_name is None:
-                continue
-
-            for row in rows[1:]:
-                if len(row) <= max(col_code, col_name):
-                    continue
-
-                raw_code = row[col_code].strip()
-                company_name = row[col_name].strip()
-
-                if not company_name:
-                    continue
-
-                if raw_code and raw_code != '[null]':
-                    normalized = re.sub(r'[^\d]', '', raw_code)
-                    if normalized:
-                        stock_code = normalized.zfill(6)
-
-                        if company_name not in self.company_name_to_code:
-                            self.company_name_to_code[company_name] = stock_code
-
-                        if stock_code not in self.code_to_company_name:
-                            self.code_to_company_name[stock_code] = company_name
-
-        print(f"Mapped {len(self.company_name_to_code)} companies")
-
-    def process_file(self, filepath, filename, allow_separate=False):
-        """Process a single CSV file for EPS data"""
-        parts = filename.split('_')
-        year = int(parts[0])
-        report_type = parts[1]
+        self.file_order = 0
+        self.facts = {}  # (code, year, storage_key, metric) -> ((statement rank, file order), value)
+        self.fact_items = {}  # (code, year, metric) -> (item_name, item_code) of the latest fact
+        self.company_meta = {}  # code -> ((statement rank, file order), meta)
+
+    def build_company_mapping(self, files=None):
+        """Load company name <-> code mappings from the persistent company index
+
+        Only files of SOURCE_DIR that are new since the last run are scanned
+        (see company_index.py). `files` is accepted for older callers.
+        """
+        index = load_company_index(SOURCE_DIR)
+        self.company_name_to_code = index.name_to_code
+        self.code_to_company_name = index.code_to_name
+        print(f"\nMapped {len(self.company_name_to_code)} companies (company index)")
+
+    def process_file(self, filepath, filename, allow_separate=True):
+        """Record the EPS facts of a single CSV file (call in file order, then merge_statements)"""
+        filing = parse_filing(filename)
+        if filing is None: return
+        year = filing.year
+        report_type = filing.report_type
 
         # Skip separate statements unless explicitly allowed
-        is_consolidated = '연결' in filename
+        is_consolidated = filing.consolidated
         if not is_consolidated and not allow_separate:
             return
 
-        if '포괄손익계산서' not in filename and '손익계산서' not in filename: return
-        if '현금흐름표' in filename or '재무상태표' in filename or '자본변동표' in filename: return
+        if not filing.is_income_statement: return
 
         print(f"Processing {filename}...")
 
-        encoding_candidates = ['utf-8-sig', 'cp949', 'utf-8', 'euc-kr']
-        rows = []
-
-        for enc in encoding_candidates:
-            try:
-                with open(filepath, 'r', encoding=enc, newline='') as f:
-                    reader = csv.reader(f)
-                    rows = list(reader)
-                break
-            except (UnicodeDecodeError, csv.Error):
-                continue
-
-        if not rows:
-            print(f"Failed to read {filename}")
-            return
-
-        headers = [clean_header(h) for h in rows[0]]
-
-        col_map = {}
-        for idx, h in enumerate(headers):
-            if h:
-                col_map[h] = idx
-
-        def get_idx(candidates):
-            for c in candidates:
-                if c in col_map: return col_map[c]
-            return None
-
-        col_code = get_idx(['종목코드'])
-        col_name = get_idx(['회사명'])
-        col_sector = get_idx(['업종명', '업종'])
-        col_item_code = get_idx(['항목코드'])
-        col_item_name = get_idx(['항목명'])
-
-        if col_code is None or col_item_code is None:
-            print(f"  Missing essential columns in {filename}")
-            return
+        statement_type = '연결' if is_consolidated else '별도'
+        precedence = (STATEMENT_RANK[statement_type], self.file_order)
+        self.file_order += 1
 
         target_periods = []
 
@@ -224,6 +172,7 @@ class EPSParser:
             target_periods.append(('1Q', ['당기1분기3개월', '당기1분기', '당기']))
         elif '반기보고서' in report_type:
             target_periods.append(('2Q', ['당기반기3개월', '당기2분기3개월', '당기2분기']))
+            target_periods.append(('H1_Acc', ['당기반기누적']))
         elif '3분기보고서' in report_type:
             target_periods.append(('3Q', ['당기3분기3개월']))
             target_periods.append(('3Q_Acc', ['당기3분기누적']))
@@ -231,75 +180,164 @@ class EPSParser:
             target_periods.append(('Annual_Current', ['당기', '당기사업년도']))
             target_periods.append(('Annual_Previous_From_Next', ['전기', '전기사업년도']))
 
-        for row in rows[1:]:
-            if len(row) < max(col_map.values()) + 1: continue
+        # A columnar store written with this exact CSV (txt_to_csv.py --columnar) is read instead
+        store = open_current_filing(filepath)
+        if store is not None:
+            with store:
+                if self.process_store(store, year, statement_type, precedence, target_periods):
+                    return
+
+        rows = iter_rows(filepath)
+        header = next(rows, None)
+
+        if header is None:
+            print(f"Failed to read {filename}")
+            return
+
+        schema = FileSchema(header)
+        col_code = schema.code
+        col_name = schema.name
+        col_sector = schema.sector
+        col_item_code = schema.item_code
+        col_item_name = schema.item_name
+
+        if col_code is None or col_item_code is None:
+            print(f"  Missing essential columns in {filename}")
+            return
+
+        # Header resolved once; the row loop only does indexed access
+        period_cols = schema.period_columns(target_periods)
+        min_len = schema.min_len
+
+        for row in rows:
+            if len(row) < min_len: continue
 
             company_name = row[col_name].strip() if col_name is not None else None
             raw_code = row[col_code].strip() if col_code is not None else None
 
-            # Get stock code
-            if not raw_code or raw_code == '[null]' or re.sub(r'[^\d]', '', raw_code) == '':
-                row_code = self.company_name_to_code.get(company_name)
-                if not row_code:
-                    row_code = normalize_code(raw_code, company_name)
-            else:
-                row_code = normalize_code(raw_code, company_name)
-
+            row_code = self.resolve_row_code(raw_code, company_name)
             if not row_code: continue
 
-            # Get or update metadata
-            if row_code not in self.meta:
+            # Metadata from the first row of the highest-precedence filing
+            # (financial companies are dropped in merge_statements, once it is known)
+            known = self.company_meta.get(row_code)
+            if known is None or precedence < known[0]:
                 company_sector = row[col_sector].strip() if col_sector is not None else None
-                self.meta[row_code] = {
+                self.company_meta[row_code] = (precedence, {
                     'name': row[col_name].strip(),
                     'sector': company_sector,
-                    'statement_type': '별도' if not is_consolidated else '연결'
-                }
-
-            # Skip financial and insurance companies
-            company_sector = self.meta[row_code].get('sector')
-            if is_financial_sector(company_sector):
-                continue
+                    'statement_type': statement_type
+                })
 
             item_code = row[col_item_code].strip()
             item_name = row[col_item_name].strip()
-            clean_item_name = clean_header(item_name)
-
-            # Check if this is EPS metric
-            metric_type = None
-            for m_key, m_def in EPS_METRICS.items():
-                # First check if should be excluded
-                if should_exclude_metric(item_code, item_name, m_def):
-                    continue
+            metric_type = eps_metric(item_code, item_name)
+            if not metric_type: continue
 
-                # Check if matches by code or standard names
-                if matches_metric_code(item_code, m_def) or any(n in clean_item_name for n in m_def['names']):
-                    metric_type = m_key
-                    break
+            # Extract Values for targets
+            for period_key, col_idx in period_cols:
+                val = parse_value(row[col_idx])
+                if val is not None:
+                    self.record_fact(row_code, year, period_key, metric_type, val, item_name, item_code, precedence)
+
+    def process_store(self, store, year, statement_type, precedence, target_periods):
+        """process_file's row loop over a ColumnarFiling; False (nothing recorded) if the CSV must be read instead
+
+        Stock codes and metrics are resolved once per distinct value and the
+        EPS amounts come from the store's float64 columns.
+        """
+        schema = FileSchema(store.header)
+        columns = (schema.code, schema.name, schema.item_code, schema.item_name)
+        if None in columns or schema.min_len > 255:
+            return False
+        text = [store.text_at(col) for col in columns]
+        sectors = store.text_at(schema.sector) if schema.sector is not None else None
+        period_values = [(period_key, store.float_values_at(col_idx))
+                         for period_key, col_idx in schema.period_columns(target_periods)]
+        if None in text or (schema.sector is not None and sectors is None) \
+                or any(values is None for _, values in period_values):
+            return False
+
+        (code_ids, code_dict), (name_ids, name_dict), (item_code_ids, item_code_dict), \
+            (item_name_ids, item_name_dict) = text
+        row_codes = {}  # (code id, name id) -> row_code
+        metrics = {}  # (item code id, item name id) -> metric_type
+        min_len = schema.min_len
+        n_cells = store.n_cells()
+
+        for i in range(store.n_rows):
+            if n_cells[i] < min_len: continue
+
+            key = (code_ids[i], name_ids[i])
+            row_code = row_codes.get(key, False)
+            if row_code is False:
+                row_code = row_codes[key] = self.resolve_row_code(code_dict[key[0]], name_dict[key[1]])
+            if not row_code: continue
 
+            known = self.company_meta.get(row_code)
+            if known is None or precedence < known[0]:
+                self.company_meta[row_code] = (precedence, {
+                    'name': name_dict[key[1]],
+                    'sector': sectors[1][sectors[0][i]] if sectors is not None else None,
+                    'statement_type': statement_type
+                })
+
+            key = (item_code_ids[i], item_name_ids[i])
+            metric_type = metrics.get(key, False)
+            if metric_type is False:
+                metric_type = metrics[key] = eps_metric(item_code_dict[key[0]], item_name_dict[key[1]])
             if not metric_type: continue
 
-            # Extract Values for targets
-            for period_key, allowed_cols in target_periods:
-                col_idx = get_idx(allowed_cols)
-                if col_idx is not None:
-                    val = parse_value(row[col_idx])
-                    if val is not None:
-                        target_year = year
-                        storage_key = period_key
-
-                        # For 사업보고서: 파일명의 year = 결산연도 = 당기 연도
-                        if period_key == 'Annual_Current':
-                            target_year = year
-                        elif period_key == 'Annual_Previous_From_Next':
-                            target_year = year - 1
-                            storage_key = 'Annual_Previous'
-
-                        self.data[row_code][target_year][f'_meta_{metric_type}_name'] = item_name
-                        self.data[row_code][target_year][f'_meta_{metric_type}_code'] = item_code
-
-                        if metric_type not in self.data[row_code][target_year][storage_key]:
-                            self.data[row_code][target_year][storage_key][metric_type] = val
+            for period_key, values in period_values:
+                val = values[i]
+                if val is not None:
+                    self.record_fact(row_code, year, period_key, metric_type, val,
+                                     item_name_dict[key[1]], item_code_dict[key[0]], precedence)
+        return True
+
+    def resolve_row_code(self, raw_code, company_name):
+        """Stock code of a row (stripped code and company name cells), or None"""
+        if not raw_code or raw_code == '[null]' or re.sub(r'[^\d]', '', raw_code) == '':
+            row_code = self.company_name_to_code.get(company_name)
+            if row_code:
+                return row_code
+        return normalize_code(raw_code, company_name)
+
+    def record_fact(self, row_code, year, period_key, metric_type, val, item_name, item_code, precedence):
+        target_year = year
+        storage_key = period_key
+
+        # For 사업보고서: 파일명의 year = 결산연도 = 당기 연도
+        if period_key == 'Annual_Current':
+            target_year = year
+        elif period_key == 'Annual_Previous_From_Next':
+            target_year = year - 1
+            storage_key = 'Annual_Previous'
+
+        self.fact_items[(row_code, target_year, metric_type)] = (item_name, item_code)
+
+        key = (row_code, target_year, storage_key, metric_type)
+        known = self.facts.get(key)
+        if known is None or precedence < known[0]:
+            self.facts[key] = (precedence, val)
+
+    def merge_statements(self):
+        """Resolve recorded facts into self.meta / self.data, skipping financial companies"""
+        self.meta = {code: meta for code, (_, meta) in self.company_meta.items()}
+
+        for (code, year, storage_key, metric), (_, val) in self.facts.items():
+            if is_financial_sector(self.meta[code].get('sector')):
+                continue
+            self.data[code][year][storage_key][metric] = val
+
+        for (code, year, metric), (item_name, item_code) in self.fact_items.items():
+            if code in self.data:
+                self.data[code][year][f'_meta_{metric}_name'] = item_name
+                self.data[code][year][f'_meta_{metric}_code'] = item_code
+
+    def statement_type(self, code):
+        """Statement type (연결/별도) a company's output is labelled with"""
+        return self.meta.get(code, {}).get('statement_type', '연결')
 
     def compile_final_data(self):
         """Compile final EPS data into output format"""
@@ -307,6 +345,13 @@ class EPSParser:
 
         sorted_codes = sorted(self.data.keys())
 
+        # Derived 2Q/3Q/4Q EPS for every company-year at once (see period_derivation.py)
+        rows = {(code, y): i for i, (code, y) in enumerate(
+            (code, y) for code in sorted_codes for y in sorted(self.data[code].keys()))}
+        table = PeriodTable.from_year_data((self.data[code][y] for code, y in rows), ['eps'])
+        table.derive(derivation_rules(ANNUAL_PREVIOUS_FIRST))
+        OVERRIDES.fix_values(table, lambda code, y: rows.get((code, y)), self.statement_type)
+
         for code in sorted_codes:
             company_years = sorted(self.data[code].keys())
             history = []
@@ -315,13 +360,15 @@ class EPSParser:
 
             for y in company_years:
                 y_data = self.data[code][y]
+                row = rows[(code, y)]
 
-                for q in ['1Q', '2Q', '3Q']:
-                    if q in y_data:
+                for q in ['1Q', '2Q', '3Q', '4Q']:
+                    q_data = table.period_data(row, q)
+                    if q_data:
                         rec = {
                             'year': y,
                             'quarter': q,
-                            'eps': y_data[q].get('eps')
+                            'eps': q_data.get('eps')
                         }
 
                         meta_name_key = '_meta_eps_name'
@@ -330,37 +377,14 @@ class EPSParser:
                             rec['eps_ifrs_code'] = y_data[meta_code_key]
                             rec['eps_korean_name'] = y_data[meta_name_key]
 
+                        # 4Q is always Annual - 3Q_Acc; flag only quarters filled from cumulative columns
+                        derived = table.derived_metrics(row, q) if q != '4Q' else None
+                        if derived:
+                            rec['derived'] = derived
+
                         if rec['eps'] is not None:
                             history.append(rec)
 
-                # Calculate Q4 EPS
-                annual_total = y_data.get('Annual_Previous')
-                if not annual_total:
-                    annual_total = y_data.get('Annual_Current')
-
-                q3_acc = y_data.get('3Q_Acc')
-
-                if annual_total and q3_acc:
-                    q4_rec = {
-                        'year': y,
-                        'quarter': '4Q',
-                        'eps': None
-                    }
-
-                    val_ann = annual_total.get('eps')
-                    val_q3 = q3_acc.get('eps')
-                    if val_ann is not None and val_q3 is not None:
-                        q4_rec['eps'] = val_ann - val_q3
-
-                    meta_name_key = '_meta_eps_name'
-                    meta_code_key = '_meta_eps_code'
-                    if meta_name_key in y_data:
-                        q4_rec['eps_ifrs_code'] = y_data[meta_code_key]
-                        q4_rec['eps_korean_name'] = y_data[meta_name_key]
-
-                    if q4_rec['eps'] is not None:
-                        history.append(q4_rec)
-
             if history:
                  output[code] = {
                      'name': company_meta['name'],
@@ -369,44 +393,48 @@ class EPSParser:
                      'history': history
                  }
 
-        return output
+        return OVERRIDES.apply_names(output)
 
-def main():
-    parser = EPSParser()
+class CorpusBuild(CorpusConsumer):
+    """main() split around the corpus pass (see dart_corpus.CorpusConsumer): process_file runs per file"""
 
-    files = sorted(os.listdir(SOURCE_DIR))
+    def start(self):
+        self.parser = EPSParser()
 
-    # Build company name to code mapping
-    parser.build_company_mapping(files)
+        files = current_filenames(SOURCE_DIR)
 
-    # PASS 1: Process consolidated statements (연결)
-    print("\n=== Pass 1: Processing Consolidated Statements (연결) ===")
-    for f in files:
-        if f.endswith('.csv'):
-            parser.process_file(os.path.join(SOURCE_DIR, f), f, allow_separate=False)
+        # Build company name to code mapping
+        self.parser.build_company_mapping()
 
-    # PASS 2: Process separate statements (별도) for all companies
-    print("\n=== Pass 2: Processing Separate Statements (별도) ===")
-    for f in files:
-        if f.endswith('.csv'):
-            parser.process_file(os.path.join(SOURCE_DIR, f), f, allow_separate=True)
+        # Single pass over 연결 and 별도 files; 연결 values take precedence in the merge
+        print("\n=== Processing Consolidated (연결) and Separate (별도) Statements ===")
+        return [f for f in files if f.endswith('.csv')]
 
-    final_data = parser.compile_final_data()
+    def on_file(self, filepath, filename):
+        self.parser.process_file(filepath, filename)
 
-    with open(OUTPUT_FILE, 'w', encoding='utf-8') as f:
-        json.dump(final_data, f, ensure_ascii=False, indent=2)
+    def finish(self):
+        self.parser.merge_statements()
 
-    print(f"\nDone. Processed EPS data for {len(final_data)} companies.")
+        final_data = self.parser.compile_final_data()
 
-    # Show sample data
-    print("\n=== Sample EPS Data ===")
-    sample_codes = list(final_data.keys())[:3]
-    for code in sample_codes:
-        company = final_data[code]
-        print(f"\n[{code}] {company['name']} ({company['statement_type']})")
-        recent_data = company['history'][-4:] if len(company['history']) >= 4 else company['history']
-        for rec in recent_data:
-            print(f"  {rec['year']} {rec['quarter']}: {rec['eps']:.2f}원")
+        with open(OUTPUT_FILE, 'w', encoding='utf-8') as f:
+            json.dump(final_data, f, ensure_ascii=False, indent=2)
+
+        print(f"\nDone. Processed EPS data for {len(final_data)} companies.")
+
+        # Show sample data
+        print("\n=== Sample EPS Data ===")
+        sample_codes = list(final_data.keys())[:3]
+        for code in sample_codes:
+            company = final_data[code]
+            print(f"\n[{code}] {company['name']} ({company['statement_type']})")
+            recent_data = company['history'][-4:] if len(company['history']) >= 4 else company['history']
+            for rec in recent_data:
+                print(f"  {rec['year']} {rec['quarter']}: {rec['eps']:.2f}원")
+
+def main():
+    CorpusBuild().run(SOURCE_DIR)
 
 if __name__ == '__main__':
     main()
@@ -0,0 +1,176 @@
+"""
+Byte-offset row index per DART filing
+
+Rows of a DART file are grouped by company, so each company occupies one
+contiguous byte range. The index stores, per stock code, the (offset, length,
+row count) of those ranges; rows whose code is missing ([null]) are indexed by
+company name instead, since the parsers resolve them through the name. Reading
+one company's rows is then a seek and a read instead of a scan of the file.
+
+Indexes are built on first use and kept in <source dir>/.row_index/<filename>.json.
+They are rebuilt automatically when the file's size or mtime changes.
+
+Usage:
+    python row_index.py [source_dir]    # build/refresh indexes for every .csv/.txt file
+"""
+import os
+import io
+import re
+import csv
+import sys
+import json
+
+from dart_corpus import detect_encoding, clean_header, ENCODING_CANDIDATES, TXT_ENCODING_CANDIDATES
+from company_index import index_code
+
+# CONFIGURATION
+INDEX_DIRNAME = ".row_index"
+INDEX_VERSION = 1
+
+def index_path(filepath):
+    directory, filename = os.path.split(filepath)
+    return os.path.join(directory, INDEX_DIRNAME, filename + '.json')
+
+def _binary_lines(f, encoding, positions):
+    """Decoded lines of a binary file; the byte offset after each line goes to positions"""
+    pos = f.tell()
+    for raw in f:
+        pos += len(raw)
+        positions.append(pos)
+        yield raw.decode(encoding)
+
+def build_row_index(filepath, delimiter=','):
+    """Scan a file once and return its row index (None if it cannot be decoded)"""
+    candidates = TXT_ENCODING_CANDIDATES if delimiter == '\t' else ENCODING_CANDIDATES
+    encoding = detect_encoding(filepath, candidates)
+    if encoding is None:
+        return None
+
+    stat = os.stat(filepath)
+    index = {
+        'version': INDEX_VERSION,
+        'size': stat.st_size,
+        'mtime_ns': stat.st_mtime_ns,
+        'encoding': encoding,
+        'delimiter': delimiter,
+        'header': None,
+        'codes': {},
+        'names': {},
+    }
+
+    with open(filepath, 'rb') as f:
+        positions = [0]
+        lines = _binary_lines(f, encoding, positions)
+        if delimiter == '\t':
+            records = (line.rstrip('\r\n').split('\t') for line in lines)
+        else:
+            records = csv.reader(lines, delimiter=delimiter)
+
+        header = next(records, None)
+        if header is None:
+            return index
+        index['header'] = [0, positions[-1]]
+
+        col_map = {}
+        for idx, h in enumerate(header):
+            h = clean_header(h)
+            if h:
+                col_map[h] = idx
+        col_code = col_map.get('종목코드')
+        col_name = col_map.get('회사명')
+        if col_code is None:
+            return index
+
+        # A record starts where the previous one ended
+        start = positions[-1]
+        for row in records:
+            end = positions[-1]
+            raw_code = row[col_code].strip() if col_code < len(row) else ''
+
+            if not raw_code or raw_code == '[null]' or re.sub(r'[^\d]', '', raw_code) == '':
+                company_name = row[col_name].strip() if col_name is not None and col_name < len(row) else ''
+                segments = index['names'].setdefault(company_name, [])
+            else:
+                code = index_code(raw_code)
+                segments = index['codes'].setdefault(code, []) if code else None
+
+            if segments is not None:
+                if segments and segments[-1][0] + segments[-1][1] == start:
+                    segments[-1][1] = end - segments[-1][0]
+                    segments[-1][2] += 1
+                else:
+                    segments.append([start, end - start, 1])
+            start = end
+
+    return index
+
+def load_row_index(filepath, delimiter=','):
+    """Row index of a file, built and saved on first use or when the file changed"""
+    path = index_path(filepath)
+    stat = os.stat(filepath)
+    if os.path.exists(path):
+        with open(path, 'r', encoding='utf-8') as f:
+            index = json.load(f)
+        if (index.get('version') == INDEX_VERSION and index['size'] == stat.st_size
+                and index['mtime_ns'] == stat.st_mtime_ns and index['delimiter'] == delimiter):
+            return index
+
+    index = build_row_index(filepath, delimiter)
+    if index is not None:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path + '.tmp', 'w', encoding='utf-8') as f:
+            json.dump(index, f, ensure_ascii=False)
+        os.replace(path + '.tmp', path)
+    return index
+
+def _parse_block(text, delimiter):
+    if delimiter == '\t':
+        return [line.rstrip('\n').split('\t') for line in io.StringIO(text, newline=None)]
+    return list(csv.reader(io.StringIO(text, newline=''), delimiter=delimiter))
+
+def iter_indexed_rows(filepath, index, codes=(), names=()):
+    """Yield the header, then the rows of the given codes / [null]-code company names
+
+    Rows come out in file order, exactly as a full scan would see them.
+    """
+    if index is None or index['header'] is None:
+        return
+
+    segments = []
+    for code in codes:
+        segments.extend(index['codes'].get(code, ()))
+    for name in names:
+        segments.extend(index['names'].get(name, ()))
+    segments.sort()
+
+    encoding = index['encoding']
+    delimiter = index['delimiter']
+    with open(filepath, 'rb') as f:
+        header_offset, header_length = index['header']
+        f.seek(header_offset)
+        # utf-8-sig only strips the BOM here, at the start of the file
+        yield _parse_block(f.read(header_length).decode(encoding), delimiter)[0]
+
+        body_encoding = 'utf-8' if encoding == 'utf-8-sig' else encoding
+        for offset, length, _ in segments:
+            f.seek(offset)
+            yield from _parse_block(f.read(length).decode(body_encoding), delimiter)
+
+def iter_company_rows(filepath, codes=(), names=(), delimiter=','):
+    """Header plus the rows of the given companies, via the file's row index"""
+    return iter_indexed_rows(filepath, load_row_index(filepath, delimiter), codes, names)
+
+def main():
+    source_dir = sys.argv[1] if len(sys.argv) > 1 else 'csv_output'
+
+    # csv_output files are comma-separated, raw DART .txt downloads tab-separated
+    filenames = sorted(f for f in os.listdir(source_dir) if f.endswith(('.csv', '.txt')))
+    for filename in filenames:
+        delimiter = '\t' if filename.endswith('.txt') else ','
+        index = load_row_index(os.path.join(source_dir, filename), delimiter)
+        if index is not None:
+            print(f"{filename}: {len(index['codes'])} codes, {len(index['names'])} [null]-code names")
+    print(f"Indexed {len(filenames)} files in {source_dir}")
+
+if __name__ == '__main__':
+    main()
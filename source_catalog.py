@@ -0,0 +1,136 @@
+"""
+Catalog of DART source files: filenames parsed once into typed records
+
+A DART filing name carries everything the parsers need to know about a file:
+
+    2025_3분기보고서_02_손익계산서_연결_20251231.csv
+    year _report type_no_statement   _연결 _publication date
+
+parse_filing() turns it into a Filing (cached per name), so parsers no longer
+split filenames and test substrings themselves. When DART re-issues a filing,
+the new file differs only in its date suffix and both versions can sit in
+csv_output. SourceCatalog keeps the newest version of each period (same name
+without the date) and skips the superseded ones; filing_sort_key (oldest
+first) is the precedence order between filings.
+
+Usage:
+    python source_catalog.py [source_dir]    # list current and superseded filings
+"""
+import os
+import sys
+import functools
+import collections
+
+from dart_corpus import filing_sort_key, list_source_files
+
+# CONFIGURATION
+SOURCE_DIR = "csv_output"
+
+INCOME_STATEMENTS = ('손익계산서', '포괄손익계산서')
+
+class Filing(collections.namedtuple('Filing', [
+    'filename',
+    'year',           # Fiscal year (int)
+    'report_type',    # '1분기보고서', '반기보고서', '3분기보고서', '사업보고서'
+    'statement',      # '손익계산서', '포괄손익계산서', '재무상태표', ...
+    'consolidated',   # 연결 (True) or 별도 (False)
+    'published',      # Publication date 'YYYYMMDD', or None
+    'period',         # Filename without the date: all versions of one filing share it
+])):
+    __slots__ = ()
+
+    @property
+    def is_income_statement(self):
+        return self.statement in INCOME_STATEMENTS
+
+    @property
+    def sort_key(self):
+        """Precedence between filings: (year, report order, publication date, filename)"""
+        return filing_sort_key(self.filename)
+
+@functools.lru_cache(maxsize=None)
+def parse_filing(filename):
+    """Filing of a DART filename (.csv or raw .txt), or None if the name does not follow the pattern"""
+    stem = os.path.splitext(os.path.basename(filename))[0]
+    parts = stem.split('_')
+    if len(parts) < 4 or not parts[0].isdigit():
+        return None
+
+    published = None
+    period = stem
+    if len(parts) > 4 and len(parts[-1]) == 8 and parts[-1].isdigit():
+        published = parts[-1]
+        period = '_'.join(parts[:-1])
+
+    return Filing(
+        filename=filename,
+        year=int(parts[0]),
+        report_type=parts[1],
+        statement=parts[3],
+        consolidated='연결' in parts[4:],
+        published=published,
+        period=period,
+    )
+
+class SourceCatalog:
+    """Filings of a source directory, with superseded versions set aside"""
+
+    def __init__(self, source_dir=SOURCE_DIR, suffix='.csv'):
+        self.source_dir = source_dir
+        self.unrecognized = []
+        by_period = collections.defaultdict(list)
+        for filename in list_source_files(source_dir):
+            if not filename.endswith(suffix):
+                continue
+            filing = parse_filing(filename)
+            if filing is None:
+                self.unrecognized.append(filename)
+            else:
+                by_period[filing.period].append(filing)
+
+        self.filings = []      # newest version of every period, by filename
+        self.superseded = {}   # filename -> filename of the version that replaces it
+        for versions in by_period.values():
+            versions.sort(key=lambda f: (f.published or '', f.filename))
+            newest = versions[-1]
+            self.filings.append(newest)
+            for old in versions[:-1]:
+                self.superseded[old.filename] = newest.filename
+        self.filings.sort(key=lambda f: f.filename)
+        self.unrecognized.sort()
+
+    def filenames(self, reverse=False):
+        """Current filings by filename (the order the parsers have always used)"""
+        names = [f.filename for f in self.filings]
+        return names[::-1] if reverse else names
+
+    def by_precedence(self):
+        """Current filings oldest first (year, report order, publication date)"""
+        return sorted(self.filings, key=lambda f: f.sort_key)
+
+    def report_skipped(self):
+        for old, new in sorted(self.superseded.items()):
+            print(f"Skipping superseded filing {old} (replaced by {new})")
+        for filename in self.unrecognized:
+            print(f"Skipping {filename}: not a DART filing name")
+
+def current_filenames(source_dir=SOURCE_DIR, suffix='.csv', reverse=False):
+    """Filenames to parse in source_dir: newest version per filing, sorted by name"""
+    catalog = SourceCatalog(source_dir, suffix)
+    catalog.report_skipped()
+    return catalog.filenames(reverse)
+
+def main():
+    source_dir = sys.argv[1] if len(sys.argv) > 1 else SOURCE_DIR
+    suffix = '.txt' if any(f.endswith('.txt') for f in list_source_files(source_dir)) else '.csv'
+    catalog = SourceCatalog(source_dir, suffix)
+    for filing in catalog.by_precedence():
+        kind = '연결' if filing.consolidated else '별도'
+        print(f"{filing.year} {filing.report_type:<6} {filing.statement:<8} {kind} "
+              f"{filing.published or '-'}  {filing.filename}")
+    catalog.report_skipped()
+    print(f"\n{len(catalog.filings)} current filings, {len(catalog.superseded)} superseded, "
+          f"{len(catalog.unrecognized)} unrecognized in {source_dir}")
+
+if __name__ == '__main__':
+    main()
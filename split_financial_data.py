@@ -3,22 +3,37 @@ import json
 import os
 import sys
 import io
+import argparse
 
-# Set stdout encoding to UTF-8 on Windows
-if sys.platform == 'win32':
-    sys.stdout = io.TextIOWrapper(sys.stdout.buffer, encoding='utf-8')
+from json_stream import ShardWriter
 
 # Configuration
-CHUNK_SIZE = 500  # Number of companies per chunk
+CHUNK_BUDGET = 300 * 1024            # Target compressed bytes per chunk (brotli, or gzip without the brotli module)
+PLATFORM_LIMIT = 25 * 1024 * 1024    # Cloudflare Pages per-file limit (raw bytes)
 OUTPUT_DIR = "public/data"
 
-def split_json_file(input_file, output_prefix, chunk_size=CHUNK_SIZE):
-    """Split a large JSON file into smaller chunks"""
+def report_chunks(chunks_info):
+    """Print the chunks; exits with an error if any file is over the 25MB limit"""
+    for i, c in enumerate(chunks_info):
+        print(f"  Chunk {i}: {c['start']}-{c['end']} ({c['count']} companies, "
+              f"{c['raw_bytes'] / 1024:.0f} KB, {c['compressed_bytes'] / 1024:.0f} KB compressed)")
 
-    print(f"\nProcessing {input_file}...")
+    # Check for files over 25MB
+    oversized = [c for c in chunks_info if c['raw_bytes'] > PLATFORM_LIMIT]
+    if oversized:
+        print(f"\nERROR: {len(oversized)} chunks exceed 25MB limit:")
+        for c in oversized:
+            print(f"  {c['file']}: {c['size_mb']} MB")
+        sys.exit("Reduce the chunk budget (--budget-kb)")
+    print(f"\n✓ All chunks are under 25MB limit")
+
+def split_json_file(input_file, output_prefix, budget_bytes=CHUNK_BUDGET):
+    """Split a large JSON file into chunks of about budget_bytes compressed
+
+    process_data.py --shards writes the same chunks directly from compile.
+    """
 
-    # Create output directory
-    os.makedirs(OUTPUT_DIR, exist_ok=True)
+    print(f"\nProcessing {input_file}...")
 
     # Load the data
     with open(input_file, 'r', encoding='utf-8') as f:
@@ -29,89 +44,41 @@ def split_json_file(input_file, output_prefix, chunk_size=CHUNK_SIZE):
     total_companies = len(sorted_codes)
 
     print(f"Total companies: {total_companies}")
+    print(f"Packing chunks of ~{budget_bytes // 1024} KB compressed")
 
-    # Calculate number of chunks
-    num_chunks = (total_companies + chunk_size - 1) // chunk_size
-    print(f"Will create {num_chunks} chunks of ~{chunk_size} companies each")
-
-    chunks_info = []
-
-    # Split into chunks
-    for i in range(num_chunks):
-        start_idx = i * chunk_size
-        end_idx = min((i + 1) * chunk_size, total_companies)
-
-        chunk_codes = sorted_codes[start_idx:end_idx]
-        chunk_data = {code: data[code] for code in chunk_codes}
-
-        # Determine code range for this chunk
-        first_code = chunk_codes[0]
-        last_code = chunk_codes[-1]
-
-        # Create filename
-        chunk_filename = f"{output_prefix}_{i:02d}.json"
-        chunk_path = os.path.join(OUTPUT_DIR, chunk_filename)
-
-        # Save chunk
-        with open(chunk_path, 'w', encoding='utf-8') as f:
-            json.dump(chunk_data, f, ensure_ascii=False, separators=(',', ':'))
+    writer = ShardWriter(OUTPUT_DIR, output_prefix, budget_bytes, source_file=input_file)
+    for code in sorted_codes:
+        writer.add(code, data[code])
+    chunks_info = writer.close()
 
-        # Get file size
-        file_size = os.path.getsize(chunk_path)
-        file_size_mb = file_size / (1024 * 1024)
-
-        chunk_info = {
-            'file': chunk_filename,
-            'start': first_code,
-            'end': last_code,
-            'count': len(chunk_codes),
-            'size_mb': round(file_size_mb, 2)
-        }
-        chunks_info.append(chunk_info)
-
-        print(f"  Chunk {i}: {first_code}-{last_code} ({len(chunk_codes)} companies, {file_size_mb:.2f} MB)")
-
-    # Create index file
-    index_data = {
-        'source_file': input_file,
-        'total_companies': total_companies,
-        'num_chunks': num_chunks,
-        'chunks': chunks_info
-    }
-
-    index_filename = f"{output_prefix}_index.json"
-    index_path = os.path.join(OUTPUT_DIR, index_filename)
-
-    with open(index_path, 'w', encoding='utf-8') as f:
-        json.dump(index_data, f, ensure_ascii=False, indent=2)
-
-    print(f"\nCreated index file: {index_filename}")
+    report_chunks(chunks_info)
+    print(f"\nCreated index file: {output_prefix}_index.json")
     print(f"All chunks saved to: {OUTPUT_DIR}/")
 
-    # Check for files over 25MB
-    oversized = [c for c in chunks_info if c['size_mb'] > 25]
-    if oversized:
-        print(f"\nWARNING: {len(oversized)} chunks exceed 25MB limit:")
-        for c in oversized:
-            print(f"  {c['file']}: {c['size_mb']} MB")
-        print("Consider reducing CHUNK_SIZE")
-    else:
-        print(f"\n✓ All chunks are under 25MB limit")
-
     return chunks_info
 
 def main():
+    # Set stdout encoding to UTF-8 on Windows
+    if sys.platform == 'win32':
+        sys.stdout = io.TextIOWrapper(sys.stdout.buffer, encoding='utf-8')
+
+    parser = argparse.ArgumentParser(description='Split the output JSON files into chunks for the frontend')
+    parser.add_argument('--budget-kb', type=int, default=CHUNK_BUDGET // 1024,
+                        help=f'Target compressed size per chunk in KB (default: {CHUNK_BUDGET // 1024})')
+    args = parser.parse_args()
+    budget_bytes = args.budget_kb * 1024
+
     # Split financial_data.json
     if os.path.exists('financial_data.json'):
-        split_json_file('financial_data.json', 'financial_data')
+        split_json_file('financial_data.json', 'financial_data', budget_bytes)
 
     # Split financial_data_separate.json
     if os.path.exists('financial_data_separate.json'):
-        split_json_file('financial_data_separate.json', 'financial_data_separate')
+        split_json_file('financial_data_separate.json', 'financial_data_separate', budget_bytes)
 
     # Split eps_data.json
     if os.path.exists('eps_data.json'):
-        split_json_file('eps_data.json', 'eps_data')
+        split_json_file('eps_data.json', 'eps_data', budget_bytes)
 
     print("\n" + "="*60)
     print("Split complete!")
@@ -0,0 +1,8 @@
+"""The modules under test are flat scripts in the repository root (and 손익계산서/ for txt_to_csv)"""
+import os
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+for path in (ROOT, os.path.join(ROOT, '손익계산서')):
+    if path not in sys.path:
+        sys.path.insert(0, path)
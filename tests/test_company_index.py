@@ -0,0 +1,62 @@
+import csv
+import os
+
+from company_index import CompanyIndex, index_code, load_company_index
+
+HEADER = ['종목코드', '회사명', '업종명', '항목코드']
+
+def write_filing(source_dir, filename, rows):
+    with open(os.path.join(source_dir, filename), 'w', encoding='utf-8-sig', newline='') as f:
+        csv.writer(f).writerows([HEADER] + [row + ['ifrs-full_Revenue'] for row in rows])
+
+def test_index_code():
+    assert index_code(' [5930] ') == '005930'
+    assert index_code('[null]') is None
+    assert index_code('[0008Z0]') is None
+
+def test_latest_filing_wins(tmp_path):
+    src = str(tmp_path)
+    write_filing(src, '2023_사업보고서_03_포괄손익계산서_연결_20240301.csv',
+                 [['[000001]', '옛이름', '제조업'], ['[000002]', '공유이름', '서비스업']])
+    write_filing(src, '2024_1분기보고서_03_포괄손익계산서_연결_20240515.csv',
+                 [['[000001]', '새이름', '전기전자'], ['[000003]', '공유이름', '서비스업']])
+
+    index = CompanyIndex(src)
+    assert index.update() == 2
+    assert index.latest_name('000001') == '새이름'
+    assert index.latest_sector('000001') == '전기전자'
+    assert index.resolve('옛이름') == '000001'
+    # A name filed under two codes resolves to the code of the latest filing
+    assert index.resolve('공유이름') == '000003'
+    names = index.names('000001')
+    assert names['옛이름']['first_seen'].startswith('2023_')
+    assert names['새이름']['last_seen'].startswith('2024_')
+
+def test_incremental_update_and_rebuild(tmp_path):
+    src = str(tmp_path / 'csv_output')
+    os.mkdir(src)
+    path = str(tmp_path / 'company_index.json')
+    write_filing(src, '2023_사업보고서_03_포괄손익계산서_연결_20240301.csv', [['[000001]', '가', '제조업']])
+    assert load_company_index(src, path).latest_name('000001') == '가'
+
+    write_filing(src, '2024_사업보고서_03_포괄손익계산서_연결_20250301.csv', [['[000002]', '나', '제조업']])
+    index = CompanyIndex.load(path, src)
+    assert index.update() == 1  # only the new file is scanned
+    index.save(path)
+
+    # An indexed file that changed cannot be taken back out: everything is rescanned
+    write_filing(src, '2023_사업보고서_03_포괄손익계산서_연결_20240301.csv', [['[000001]', '다', '제조업']])
+    index = CompanyIndex.load(path, src)
+    assert index.update() == 2
+    assert index.latest_name('000001') == '다'
+    assert '가' not in index.names('000001')
+
+def test_superseded_filings_are_not_indexed(tmp_path):
+    src = str(tmp_path)
+    write_filing(src, '2023_사업보고서_03_포괄손익계산서_연결_20240301.csv', [['[000001]', '정정전', '제조업']])
+    write_filing(src, '2023_사업보고서_03_포괄손익계산서_연결_20240601.csv', [['[000001]', '정정후', '제조업']])
+
+    index = CompanyIndex(src)
+    assert index.update() == 1
+    assert set(index.names('000001')) == {'정정후'}
+    assert index.resolve('정정전') is None
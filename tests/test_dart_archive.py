@@ -0,0 +1,57 @@
+import gzip
+import types
+import zipfile
+
+from dart_archive import archive_filings, find_archives, iter_archive_filings, member_name
+
+ROWS = [
+    ['재무제표종류', '종목코드', '회사명', '항목코드', '항목명', '당기'],
+    ['손익계산서', '[005930]', '삼성전자', 'ifrs-full_Revenue', '매출액', '1,000'],
+    ['손익계산서', '[005930]', '삼성전자', 'dart_OperatingIncomeLoss', '영업이익', '-10'],
+]
+INCOME = '2024_3분기보고서_02_손익계산서_연결_20250605.txt'
+
+def member_text(rows, newline='\r\n'):
+    return ''.join('\t'.join(row) + newline for row in rows)
+
+def test_zip_members(tmp_path):
+    path = str(tmp_path / 'bulk.zip')
+    with zipfile.ZipFile(path, 'w', zipfile.ZIP_DEFLATED) as zf:
+        zf.writestr('2024/' + INCOME, member_text(ROWS).encode('cp949'))
+        zf.writestr('2024_3분기보고서_01_재무상태표_연결_20250605.txt', member_text(ROWS).encode('cp949'))
+        zf.writestr('readme.pdf', b'%PDF')
+
+    filings = list(iter_archive_filings(path))
+    assert len(filings) == 1
+    filing, size, rows = filings[0]
+    assert filing.filename == INCOME[:-4] + '.csv'
+    assert (filing.year, filing.report_type, filing.consolidated) == (2024, '3분기보고서', True)
+    assert size == len(member_text(ROWS).encode('cp949'))
+    assert list(rows) == ROWS
+
+    # read() can be called again after the archive was listed
+    (_, _, read), = archive_filings(path)
+    assert list(read()) == list(read()) == ROWS
+
+def test_txt_gz_utf8_and_universal_newlines(tmp_path):
+    path = str(tmp_path / INCOME) + '.gz'
+    with gzip.open(path, 'wb') as f:
+        f.write(member_text(ROWS, newline='\n').encode('utf-8'))
+
+    (filing, size, rows), = iter_archive_filings(path)
+    assert filing.statement == '손익계산서' and size is None
+    assert list(rows) == ROWS
+
+def test_cp949_member_names():
+    name = '2024_사업보고서_03_포괄손익계산서_20250320.txt'
+    stored = types.SimpleNamespace(filename='dir/' + name.encode('cp949').decode('cp437'), flag_bits=0)
+    assert member_name(stored) == name
+    flagged = types.SimpleNamespace(filename='dir\\' + name, flag_bits=0x800)
+    assert member_name(flagged) == name
+
+def test_find_archives(tmp_path, capsys):
+    for filename in ('b.zip', 'a.txt.gz', 'c.csv'):
+        (tmp_path / filename).write_bytes(b'')
+    assert find_archives([str(tmp_path), str(tmp_path / 'c.csv')]) == [
+        str(tmp_path / 'a.txt.gz'), str(tmp_path / 'b.zip')]
+    assert 'Not a DART archive' in capsys.readouterr().out
@@ -0,0 +1,130 @@
+import csv
+
+import pytest
+
+import dart_columnar
+from dart_columnar import (
+    ColumnarBuilder, ColumnarFiling, SAMPLE_ROWS, STOCK_CODE_COLUMN, column_type, open_current_filing,
+    parse_float_amount, parse_int_amount,
+)
+from txt_to_csv import _convert
+
+HEADER = ['재무제표종류', '종목코드', '회사명', '항목코드', '항목명', '당기', '전기', '비고']
+ROWS = [
+    ['포괄손익계산서', '[005930]', '삼성전자', 'ifrs-full_Revenue', '매출액', '1,234,567', '-1,000', '가'],
+    ['포괄손익계산서', '[005930]', '삼성전자', 'dart_OperatingIncomeLoss', '영업이익', '', '500', '나'],
+    ['포괄손익계산서', '[null]', '포스코', 'ifrs-full_Revenue', '매출액', '99', '', ''],
+    ['포괄손익계산서', '[005930]', '삼성전자', 'ifrs-full_BasicEarningsLossPerShare', '기본주당이익', '3,000', '2,500', ''],
+    ['포괄손익계산서', '[0008Z0]', '문자코드', 'ifrs-full_Revenue', '매출액', '7', '8', '가'],
+]
+
+def write_txt(path, rows):
+    with open(path, 'w', encoding='cp949', newline='') as f:
+        csv.writer(f, delimiter='\t', lineterminator='\n').writerows([HEADER] + rows)
+
+@pytest.fixture
+def converted(tmp_path):
+    """A .txt filing converted by txt_to_csv with a store: (csv path, cache dir)"""
+    txt = tmp_path / '2024_사업보고서_03_포괄손익계산서_연결_20250314.txt'
+    out = tmp_path / 'csv_output'
+    cache = tmp_path / 'columnar_cache'
+    out.mkdir()
+    write_txt(txt, ROWS)
+    csv_path = out / (txt.stem + '.csv')
+    result = _convert(str(txt), str(csv_path), columnar_dir=str(cache))
+    assert result['ok'], result['error']
+    dart_columnar._indexes.clear()
+    return str(csv_path), str(cache)
+
+def read_csv(path):
+    with open(path, encoding='utf-8-sig', newline='') as f:
+        return list(csv.reader(f))
+
+def test_column_type():
+    assert column_type(['1,234', '', '-5']) == 'int'
+    assert column_type(['1.5', '2']) == 'decimal'
+    assert column_type(['12', 'abc']) == 'text'
+    assert column_type(['', ' ']) == 'int'
+
+def test_round_trip_matches_csv_cells(converted):
+    csv_path, cache = converted
+    header, *rows = read_csv(csv_path)
+
+    with open_current_filing(csv_path, cache) as store:
+        assert store.header == header
+        assert store.n_rows == len(rows)
+        for idx in (header.index('당기'), header.index('전기')):
+            assert store.int_values_at(idx) == [parse_int_amount(row[idx]) for row in rows]
+            assert store.float_values_at(idx) == [parse_float_amount(row[idx]) for row in rows]
+
+        codes, dictionary = store.text_at(header.index('항목명'))
+        assert [dictionary[c] for c in codes] == [row[header.index('항목명')] for row in rows]
+        # Text columns are parsed once per distinct cell
+        assert store.int_values_at(header.index('비고')) == [None] * len(rows)
+        assert store.strings(STOCK_CODE_COLUMN) == ['005930', '005930', '', '005930', '']
+        assert list(store.n_cells()) == [len(row) for row in rows]
+
+def test_store_is_ignored_once_the_csv_changes(converted):
+    csv_path, cache = converted
+    with open(csv_path, 'a', encoding='utf-8') as f:
+        f.write('extra\n')
+    assert open_current_filing(csv_path, cache) is None
+
+def test_no_cache_dir(tmp_path, converted):
+    csv_path, _ = converted
+    assert open_current_filing(csv_path, str(tmp_path / 'missing')) is None
+
+def test_columns_typed_from_the_sample(tmp_path):
+    builder = ColumnarBuilder(['종목코드', '금액'])
+    for i in range(SAMPLE_ROWS):
+        builder.add_row(['[000001]', str(i)])
+    # A non-integer cell after the sample still parses like the regex rules
+    builder.add_row(['[000001]', '(1,000)'])
+    builder.add_row(['[000001]', str(1 << 70)])
+    path = str(tmp_path / 'store.dcol')
+    builder.write(path, 'digest', 'name')
+
+    store = ColumnarFiling(path)
+    try:
+        assert store.int_values_at(1) is None  # an int64 overflow cannot be given exactly
+        floats = store.float_values_at(1)
+        assert floats[:SAMPLE_ROWS] == [float(i) for i in range(SAMPLE_ROWS)]
+        assert floats[SAMPLE_ROWS:] == [parse_float_amount('(1,000)'), float(1 << 70)]
+    finally:
+        store.close()
+
+def test_close_releases_views(converted):
+    csv_path, cache = converted
+    store = open_current_filing(csv_path, cache)
+    codes, _ = store.dictionary('종목코드')
+    store.close()
+    with pytest.raises(ValueError):
+        codes[0]
+
+def test_parsers_read_the_same_facts_from_the_store(converted, monkeypatch):
+    import process_data
+    import process_eps_data
+
+    csv_path, cache = converted
+    filename = csv_path.rsplit('/', 1)[-1]
+    name_to_code = {'포스코': '005490'}
+
+    def facts(with_store):
+        monkeypatch.setattr(process_data, 'open_current_filing',
+                            lambda path: open_current_filing(path, cache) if with_store else None)
+        result = process_data.extract_file_facts(csv_path, filename, name_to_code)
+        return result.error, result.first_seen, result.events
+
+    assert facts(True) == facts(False)
+    assert facts(True)[2]  # the fixture does produce events
+
+    def eps(with_store):
+        monkeypatch.setattr(process_eps_data, 'open_current_filing',
+                            lambda path: open_current_filing(path, cache) if with_store else None)
+        parser = process_eps_data.EPSParser()
+        parser.company_name_to_code = name_to_code
+        parser.process_file(csv_path, filename)
+        return parser.facts, parser.fact_items, parser.company_meta
+
+    assert eps(True) == eps(False)
+    assert eps(True)[0]
@@ -0,0 +1,41 @@
+import os
+import random
+
+import external_sort
+from external_sort import FactRuns
+
+def shuffled_records(rng, n_codes=30, n_records=2000):
+    records = [(f'{rng.randrange(n_codes):06d}', seq, rng.random()) for seq in range(n_records)]
+    rng.shuffle(records)
+    return records
+
+def test_merge_order_matches_sorted_records(tmp_path, monkeypatch):
+    # Small frames so a run file holds several pickle frames
+    monkeypatch.setattr(external_sort, 'BATCH_SIZE', 7)
+    records = shuffled_records(random.Random(0))
+
+    with FactRuns(run_size=150, tmp_dir=str(tmp_path)) as runs:
+        for record in records:
+            runs.add(record)
+        assert runs.records == len(records)
+        assert runs.run_count == 14
+
+        groups = list(runs.groups())
+
+    assert [code for code, _ in groups] == sorted({r[0] for r in records})
+    assert [r for _, group in groups for r in group] == sorted(records, key=lambda r: (r[0], r[1]))
+    assert all(len({r[0] for r in group}) == 1 for _, group in groups)
+
+def test_single_buffer_and_cleanup(tmp_path):
+    runs = FactRuns(run_size=100, tmp_dir=str(tmp_path))
+    runs.add(('000002', 1, 'b'))
+    runs.add(('000001', 0, 'a'))
+    assert runs.run_count == 1
+    assert list(runs.groups()) == [('000001', [('000001', 0, 'a')]), ('000002', [('000002', 1, 'b')])]
+    runs.close()
+    assert not os.path.exists(runs.tmp_dir)
+
+def test_empty(tmp_path):
+    with FactRuns(tmp_dir=str(tmp_path)) as runs:
+        assert runs.run_count == 0
+        assert list(runs.groups()) == []
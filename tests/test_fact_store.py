@@ -0,0 +1,58 @@
+from fact_store import FactStore
+
+PERIODS = ['1Q', '2Q', '3Q_Acc', 'Annual_Current']
+METRICS = ['revenue', 'op_profit']
+
+def test_values_first_wins_and_meta_last_wins():
+    store = FactStore(PERIODS, METRICS)
+    assert store.set_default('000001', 2023, '1Q', 'revenue', 100)
+    assert not store.set_default('000001', 2023, '1Q', 'revenue', 999)
+    store.set_meta('000001', 2023, 'revenue', '매출액', 'ifrs-full_Revenue')
+    store.set_meta('000001', 2023, 'revenue', '수익(매출액)', 'ifrs-full_Revenue')
+
+    assert store.get_value('000001', 2023, '1Q', 'revenue') == 100
+    assert store.year_data('000001', 2023) == {
+        '_meta_revenue_name': '수익(매출액)',
+        '_meta_revenue_code': 'ifrs-full_Revenue',
+        '1Q': {'revenue': 100},
+    }
+
+def test_zero_is_a_value_and_missing_is_none():
+    store = FactStore(PERIODS, METRICS)
+    store.set_default('000001', 2023, '2Q', 'op_profit', 0)
+    assert store.get_value('000001', 2023, '2Q', 'op_profit') == 0
+    assert store.get_value('000001', 2023, '2Q', 'revenue') is None
+    assert store.get_value('000002', 2023, '2Q', 'revenue') is None
+    assert store.year_data('000002', 2023) == {}
+
+def test_values_outside_int64():
+    store = FactStore(PERIODS, METRICS)
+    big = 1 << 70
+    store.set_default('000001', 2023, 'Annual_Current', 'revenue', big)
+    store.set_default('000001', 2023, 'Annual_Current', 'op_profit', -big)
+    assert store.get_value('000001', 2023, 'Annual_Current', 'revenue') == big
+    table = store.period_table()
+    assert table.period_data(store.slot('000001', 2023), 'Annual_Current') == {'revenue': big, 'op_profit': -big}
+
+def test_period_table_rows_are_slots():
+    store = FactStore(PERIODS, METRICS)
+    store.set_default('000001', 2022, '3Q_Acc', 'revenue', 30)
+    store.set_default('000002', 2023, '3Q_Acc', 'revenue', 45)
+    store.set_default('000002', 2023, 'Annual_Current', 'revenue', 70)
+    assert len(store) == 2
+
+    table = store.period_table()
+    table.derive()
+    assert table.period_data(store.slot('000002', 2023), '4Q') == {'revenue': 25}
+    assert table.period_data(store.slot('000001', 2022), '4Q') == {}
+    assert store.slot('000003', 2023) is None
+
+def test_mapping_access_matches_nested_dicts():
+    store = FactStore(PERIODS, METRICS)
+    store.set_default('000001', 2023, '1Q', 'revenue', 100)
+    store.set_default('000001', 2024, '2Q', 'op_profit', -5)
+
+    assert '000001' in store and '000002' not in store
+    assert store['000001'] == {2023: {'1Q': {'revenue': 100}}, 2024: {'2Q': {'op_profit': -5}}}
+    assert store.get('000002', {}) == {}
+    assert sorted(store.years('000001')) == [2023, 2024]
@@ -0,0 +1,84 @@
+import json
+
+import pytest
+
+from fallback_revenue import (
+    FallbackDecisions, StringTable, make_candidate, parse_period_values, record_decision,
+)
+
+def parse_value(text):
+    text = text.replace(',', '').strip()
+    return int(text) if text else None
+
+def candidates(strings, *specs):
+    return [make_candidate(strings, item_code, item_name, item_name, filename, values)
+            for item_code, item_name, filename, values in specs]
+
+GROUP = [
+    ('-표준계정코드 미사용-', '영업수익', '2023_사업보고서.csv', (('Annual_Current', 100),)),
+    ('-표준계정코드 미사용-', '수익', '2023_사업보고서.csv', (('Annual_Current', 120),)),
+]
+
+def test_parse_period_values():
+    row = ['x', '1,000', '', '7']
+    assert parse_period_values(row, {'1Q': 1, '2Q': 2, '3Q': 3, 'Annual': None, 'H1': 9}, parse_value) == \
+        (('1Q', 1000), ('3Q', 7))
+
+def test_queue_then_decision_is_applied(tmp_path):
+    queue_path = str(tmp_path / 'queue.json')
+    decisions_path = str(tmp_path / 'decisions.json')
+    strings = StringTable()
+    group = candidates(strings, *GROUP)
+
+    decisions = FallbackDecisions('annual', decisions_path, queue_path)
+    assert decisions.resolve('000001', 2023, group, strings) is None
+    decisions.enqueue('000001', '가', 2023, group, strings)
+    decisions.save_queue()
+
+    with open(queue_path, encoding='utf-8') as f:
+        (fingerprint, entry), = json.load(f)['annual'].items()
+    assert [c['amounts'] for c in entry['candidates']] == [{'Annual_Current': 100}, {'Annual_Current': 120}]
+
+    chosen = entry['candidates'][1]['fingerprint']
+    record_decision(fingerprint, [chosen], queue_path, decisions_path)
+    with pytest.raises(KeyError):
+        record_decision(fingerprint, ['no-such-candidate'], queue_path, decisions_path)
+
+    decisions = FallbackDecisions('annual', decisions_path, queue_path)
+    selected = decisions.resolve('000001', 2023, list(reversed(group)), strings)
+    assert [strings[c.item_name] for c in selected] == ['수익']
+    assert decisions.applied == 1
+
+def test_new_candidate_requeues_group(tmp_path):
+    queue_path = str(tmp_path / 'queue.json')
+    decisions_path = str(tmp_path / 'decisions.json')
+    strings = StringTable()
+    group = candidates(strings, *GROUP)
+
+    decisions = FallbackDecisions('annual', decisions_path, queue_path)
+    decisions.enqueue('000001', '가', 2023, group, strings)
+    decisions.save_queue()
+    fingerprint, = decisions.queue
+    # Selecting by item code picks that item in every file of the group
+    assert len(record_decision(fingerprint, ['-표준계정코드 미사용-'], queue_path, decisions_path)['items']) == 2
+
+    grown = group + candidates(strings, ('-표준계정코드 미사용-', '매출', '2024_사업보고서.csv', ()))
+    decisions = FallbackDecisions('annual', decisions_path, queue_path)
+    assert decisions.resolve('000001', 2023, grown, strings) is None
+    assert decisions.resolve('000001', 2024, group, strings) is None
+
+def test_save_queue_replaces_only_given_codes(tmp_path):
+    queue_path = str(tmp_path / 'queue.json')
+    decisions_path = str(tmp_path / 'decisions.json')
+    strings = StringTable()
+    group = candidates(strings, *GROUP)
+
+    decisions = FallbackDecisions('quarterly', decisions_path, queue_path)
+    decisions.enqueue('000001', '가', 2023, group, strings)
+    decisions.enqueue('000002', '나', 2023, group, strings)
+    decisions.save_queue()
+
+    decisions = FallbackDecisions('quarterly', decisions_path, queue_path)
+    decisions.save_queue(codes={'000002'})
+    with open(queue_path, encoding='utf-8') as f:
+        assert [e['code'] for e in json.load(f)['quarterly'].values()] == ['000001']
@@ -0,0 +1,83 @@
+import json
+import os
+import random
+
+from json_stream import ShardWriter, _compact_entry, _CompressedSize, compressed_size, write_json_items
+
+def sample_items(n=300, seed=0):
+    rng = random.Random(seed)
+    return [(f'{code:06d}', {'name': f'회사{code}', 'history': [
+        {'year': 2020 + i, 'revenue': rng.randrange(10 ** 12)} for i in range(rng.randrange(1, 8))]})
+        for code in range(n)]
+
+def test_write_json_items_matches_json_dump(tmp_path):
+    items = sample_items(20)
+    path = str(tmp_path / 'out.json')
+    assert write_json_items(path, items) == 20
+    with open(path, encoding='utf-8') as f:
+        assert f.read() == json.dumps(dict(items), ensure_ascii=False, indent=2)
+
+    write_json_items(path, [])
+    with open(path, encoding='utf-8') as f:
+        assert f.read() == '{}'
+
+def test_shards_cut_at_budget(tmp_path):
+    items = sample_items()
+    budget = 2000
+    writer = ShardWriter(str(tmp_path), 'financial_data', budget, source_file='financial_data.json', codec='gzip')
+    for key, value in items:
+        writer.add(key, value)
+    chunks = writer.close()
+    assert len(chunks) > 3
+
+    merged = {}
+    position = 0
+    for i, chunk in enumerate(chunks):
+        path = tmp_path / chunk['file']
+        assert chunk['file'] == f'financial_data_{i:02d}.json'
+        data = path.read_bytes()
+        shard = json.loads(data)
+        keys = list(shard)
+        assert (chunk['start'], chunk['end'], chunk['count']) == (keys[0], keys[-1], len(keys))
+        assert chunk['raw_bytes'] == len(data)
+        assert chunk['compressed_bytes'] == compressed_size(data, 'gzip')
+        assert data == json.dumps(shard, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+
+        # The budget is reached by the shard's last entry, not before it
+        measure = _CompressedSize('gzip')
+        sizes = []
+        for j, key in enumerate(keys):
+            measure.write(('{' if j == 0 else ',') + _compact_entry(key, shard[key]))
+            sizes.append(measure.size)
+        assert all(size < budget for size in sizes[:-1])
+        if i < len(chunks) - 1:
+            assert sizes[-1] >= budget
+
+        assert keys == [key for key, _ in items[position:position + len(keys)]]
+        position += len(keys)
+        merged.update(shard)
+    assert merged == dict(items)
+
+    with open(tmp_path / 'financial_data_index.json', encoding='utf-8') as f:
+        index = json.load(f)
+    assert index['total_companies'] == len(items)
+    assert index['num_chunks'] == len(chunks)
+    assert index['compression'] == 'gzip' and index['budget_bytes'] == budget
+    assert index['chunks'] == chunks
+
+def test_stale_shards_removed(tmp_path):
+    for filename in ('financial_data_07.json', 'financial_data_index.json', 'eps_data_00.json', 'financial_data_note.json'):
+        (tmp_path / filename).write_text('{}')
+
+    writer = ShardWriter(str(tmp_path), 'financial_data', 10 ** 6, codec='gzip')
+    for key, value in sample_items(5):
+        writer.add(key, value)
+    assert [c['file'] for c in writer.close()] == ['financial_data_00.json']
+    assert sorted(os.listdir(tmp_path)) == [
+        'eps_data_00.json', 'financial_data_00.json', 'financial_data_index.json', 'financial_data_note.json']
+
+def test_no_entries(tmp_path):
+    writer = ShardWriter(str(tmp_path), 'eps_data', 1000, codec='gzip')
+    assert writer.close() == []
+    with open(tmp_path / 'eps_data_index.json', encoding='utf-8') as f:
+        assert json.load(f)['num_chunks'] == 0
@@ -0,0 +1,78 @@
+import json
+
+from overrides import OverrideRegistry, load_overrides
+from period_derivation import PeriodTable
+
+ENTRIES = {
+    'code_aliases': {'포스코': '005490'},
+    'names': {'005490': 'POSCO홀딩스'},
+    'item_remaps': [{'code': '035720', 'item_codes': ['ifrs-full_GrossProfit'], 'metric': 'revenue'}],
+    'fixed_values': [
+        {'code': '005490', 'year': 2022, 'period': '4Q', 'metric': 'revenue', 'value': 999, 'statement': '연결'},
+        {'code': '000002', 'year': 2022, 'period': '4Q', 'metric': 'revenue', 'value': 555},
+    ],
+    'components': [{'code': '402340', 'metric': 'revenue', 'component': 'equity_method_profit'}],
+}
+
+def q4_table(values):
+    table = PeriodTable(['revenue', 'equity_method_profit'], len(values))
+    table.set_column('4Q', 'revenue', list(values))
+    return table
+
+def test_lookups():
+    registry = OverrideRegistry(ENTRIES)
+    assert registry.code_alias(' 포스코 ') == '005490'
+    assert registry.code_alias('삼성전자') is None
+    assert registry.remapped_metric('035720', 'ifrs-full_GrossProfit') == 'revenue'
+    assert registry.remapped_metric('005930', 'ifrs-full_GrossProfit') is None
+    assert registry.remapped_item_codes == {'ifrs-full_GrossProfit'}
+    assert registry.has_component('402340', 'equity_method_profit')
+    assert registry.apply_names({'005490': {'name': '포스코'}}) == {'005490': {'name': 'POSCO홀딩스'}}
+
+def test_fix_values_replaces_existing_cells_of_the_statement():
+    registry = OverrideRegistry(ENTRIES)
+    rows = {('005490', 2022): 0, ('000002', 2022): 1}
+    row_of = lambda code, year: rows.get((code, year))
+
+    table = q4_table([10, 20])
+    assert registry.fix_values(table, row_of, lambda code: '연결') == 2
+    assert table.column('4Q', 'revenue') == [999, 555]
+
+    # Declared for 연결: not applied to a company whose data comes from 별도 statements
+    table = q4_table([10, 20])
+    assert registry.fix_values(table, row_of, lambda code: '별도') == 1
+    assert table.column('4Q', 'revenue') == [10, 555]
+
+def test_fix_values_skips_missing_cells_and_rows():
+    registry = OverrideRegistry(ENTRIES)
+    table = q4_table([None, 20])
+    assert registry.fix_values(table, lambda code, year: 0 if code == '005490' else None, lambda code: '연결') == 0
+    assert table.column('4Q', 'revenue') == [None, 20]
+
+def test_add_components_only_where_both_have_values():
+    registry = OverrideRegistry(ENTRIES)
+    table = PeriodTable(['revenue', 'equity_method_profit'], 3)
+    table.set_column('1Q', 'revenue', [100, None, 300])
+    table.set_column('1Q', 'equity_method_profit', [5, 7, None])
+    table.set_column('Annual_Current', 'revenue', [1000, None, None])
+    table.set_column('Annual_Current', 'equity_method_profit', [50, None, None])
+
+    assert registry.add_components(table, '402340') == [('revenue', 'equity_method_profit')]
+    assert table.column('1Q', 'revenue') == [105, None, 300]
+    # Only quarters are adjusted
+    assert table.column('Annual_Current', 'revenue') == [1000, None, None]
+
+    assert registry.add_components(table, '005930') == []
+    assert table.column('1Q', 'revenue') == [105, None, 300]
+
+def test_load_overrides(tmp_path):
+    path = tmp_path / 'overrides.json'
+    assert load_overrides(str(path)).fixed_values == {}
+    path.write_text(json.dumps(ENTRIES, ensure_ascii=False), encoding='utf-8')
+    assert load_overrides(str(path)).fixed_values[('005490', 2022, '4Q', 'revenue')] == (999, '연결')
+
+def test_shipped_overrides():
+    registry = load_overrides()
+    assert registry.code_alias('포스코') == '005490'
+    assert registry.fixed_values[('005490', 2022, '4Q', 'revenue')] == (19247545076289, '연결')
+    assert registry.has_component('402340', 'equity_method_profit')
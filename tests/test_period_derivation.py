@@ -0,0 +1,77 @@
+import random
+
+from period_derivation import (
+    ANNUAL_CURRENT_FIRST, ANNUAL_PREVIOUS_FIRST, PeriodTable, derivation_rules,
+)
+
+METRICS = ['revenue', 'op_profit', 'net_income']
+
+def old_q4(y_data, annual_order):
+    """Q4 as compile_final_data computed it inline before period_derivation.py"""
+    annual_total = y_data.get(annual_order[0])
+    if not annual_total:
+        annual_total = y_data.get(annual_order[1])
+    q3_acc = y_data.get('3Q_Acc')
+    if not (annual_total and q3_acc):
+        return None
+    q4 = {}
+    for m in METRICS:
+        val_ann = annual_total.get(m)
+        val_q3 = q3_acc.get(m)
+        if val_ann is not None and val_q3 is not None:
+            q4[m] = val_ann - val_q3
+    return q4
+
+def random_year_data(rng):
+    y_data = {}
+    for period in ['1Q', '2Q', 'H1_Acc', '3Q', '3Q_Acc', 'Annual_Current', 'Annual_Previous']:
+        if rng.random() < 0.6:
+            values = {m: rng.randint(-1000, 1000) for m in METRICS if rng.random() < 0.8}
+            if values:
+                y_data[period] = values
+    return y_data
+
+def test_q4_matches_old_inline_formula():
+    rng = random.Random(0)
+    year_datas = [random_year_data(rng) for _ in range(500)]
+    for annual_order in (ANNUAL_CURRENT_FIRST, ANNUAL_PREVIOUS_FIRST):
+        table = PeriodTable.from_year_data(year_datas, METRICS)
+        table.derive(derivation_rules(annual_order))
+        for row, y_data in enumerate(year_datas):
+            expected = old_q4(y_data, annual_order)
+            assert table.period_data(row, '4Q') == (expected or {})
+
+def test_2q_and_3q_from_cumulative_columns():
+    rng = random.Random(1)
+    year_datas = [random_year_data(rng) for _ in range(500)]
+    table = PeriodTable.from_year_data(year_datas, METRICS)
+    table.derive()
+    for row, y_data in enumerate(year_datas):
+        for target, acc, prev in (('2Q', 'H1_Acc', '1Q'), ('3Q', '3Q_Acc', 'H1_Acc')):
+            reported = y_data.get(target, {})
+            derived = {
+                m: y_data[acc][m] - y_data[prev][m] for m in METRICS
+                if m not in reported and m in y_data.get(acc, {}) and m in y_data.get(prev, {})
+            }
+            # Reported cells are kept; only the missing ones are derived
+            assert table.period_data(row, target) == {**reported, **derived}
+            assert table.derived_metrics(row, target) == [m for m in METRICS if m in derived]
+
+def test_derived_quarters_are_not_operands():
+    # 3Q is derived from H1_Acc; Q4 must still use the reported 3Q_Acc, not a derived one
+    y_data = {
+        '1Q': {'revenue': 10}, 'H1_Acc': {'revenue': 25},
+        '3Q_Acc': {'revenue': 45}, 'Annual_Current': {'revenue': 70},
+    }
+    table = PeriodTable.from_year_data([y_data], ['revenue'])
+    counts = table.derive()
+    assert counts == {'2Q': 1, '3Q': 1, '4Q': 1}
+    assert [table.period_data(0, p) for p in ('2Q', '3Q', '4Q')] == [
+        {'revenue': 15}, {'revenue': 20}, {'revenue': 25}]
+    assert table.derived_metrics(0, '4Q') == ['revenue']
+    assert table.reported('2Q') == [True]
+
+def test_no_derivation_without_operands():
+    table = PeriodTable.from_year_data([{'Annual_Current': {'revenue': 70}}], ['revenue'])
+    assert table.derive() == {}
+    assert table.period_data(0, '4Q') == {}
@@ -0,0 +1,64 @@
+import csv
+import os
+import time
+
+from row_index import build_row_index, index_path, iter_company_rows, load_row_index
+
+HEADER = ['종목코드', '회사명', '항목코드', '당기']
+ROWS = [
+    ['[000001]', '가', 'ifrs-full_Revenue', '100'],
+    ['[000001]', '가', 'dart_OperatingIncomeLoss', '10'],
+    ['[null]', '포스코', 'ifrs-full_Revenue', '200'],
+    ['[000002]', '나', 'ifrs-full_Revenue', '"30,000"'],
+    ['[000002]', '나', 'ifrs-full_ProfitLoss', '3'],
+    ['[000001]', '가', 'ifrs-full_ProfitLoss', '7'],
+]
+
+def write_csv(path, rows, encoding='utf-8-sig'):
+    with open(path, 'w', encoding=encoding, newline='') as f:
+        csv.writer(f).writerows([HEADER] + rows)
+
+def full_scan(path, encoding='utf-8-sig'):
+    with open(path, 'r', encoding=encoding, newline='') as f:
+        return list(csv.reader(f))
+
+def test_segments_group_contiguous_rows(tmp_path):
+    path = str(tmp_path / 'filing.csv')
+    write_csv(path, ROWS)
+    index = build_row_index(path)
+
+    # 000001 is split by the rows of other companies: two segments, first one two rows
+    assert [count for _, _, count in index['codes']['000001']] == [2, 1]
+    assert [count for _, _, count in index['codes']['000002']] == [2]
+    assert list(index['names']) == ['포스코']
+
+def test_indexed_rows_match_full_scan(tmp_path):
+    path = str(tmp_path / 'filing.csv')
+    write_csv(path, ROWS)
+    header, *rows = full_scan(path)
+
+    selected = list(iter_company_rows(path, codes=['000001'], names=['포스코']))
+    assert selected[0] == header
+    expected = [row for row in rows if row[0] in ('[000001]', '[null]')]
+    assert selected[1:] == expected
+
+    assert list(iter_company_rows(path, codes=['999999']))[1:] == []
+
+def test_cp949_tab_file(tmp_path):
+    path = str(tmp_path / 'filing.txt')
+    with open(path, 'w', encoding='cp949', newline='') as f:
+        f.writelines('\t'.join(row) + '\r\n' for row in [HEADER] + ROWS)
+
+    rows = list(iter_company_rows(path, codes=['000002'], delimiter='\t'))
+    assert rows == [HEADER, ROWS[3], ROWS[4]]
+
+def test_index_rebuilt_when_file_changes(tmp_path):
+    path = str(tmp_path / 'filing.csv')
+    write_csv(path, ROWS)
+    load_row_index(path)
+    assert os.path.exists(index_path(path))
+
+    write_csv(path, ROWS + [['[000003]', '다', 'ifrs-full_Revenue', '1']])
+    later = time.time() + 10
+    os.utime(path, (later, later))
+    assert '000003' in load_row_index(path)['codes']
@@ -0,0 +1,55 @@
+import os
+
+from source_catalog import SourceCatalog, current_filenames, parse_filing
+
+def touch(directory, *filenames):
+    for filename in filenames:
+        open(os.path.join(directory, filename), 'w').close()
+
+def test_parse_filing():
+    filing = parse_filing('2025_3분기보고서_02_손익계산서_연결_20251231.csv')
+    assert filing.year == 2025
+    assert filing.report_type == '3분기보고서'
+    assert filing.statement == '손익계산서'
+    assert filing.consolidated and filing.is_income_statement
+    assert filing.published == '20251231'
+    assert filing.period == '2025_3분기보고서_02_손익계산서_연결'
+
+    separate = parse_filing('2024_사업보고서_03_포괄손익계산서_20250320.txt')
+    assert not separate.consolidated and separate.is_income_statement
+    assert separate.period == '2024_사업보고서_03_포괄손익계산서'
+
+    undated = parse_filing('2024_반기보고서_01_재무상태표_연결.csv')
+    assert undated.published is None and not undated.is_income_statement
+
+    assert parse_filing('company_index.json') is None
+    assert parse_filing('report_2024_a_b.csv') is None
+
+def test_superseded_versions_are_skipped(tmp_path, capsys):
+    src = str(tmp_path)
+    touch(src,
+          '2024_사업보고서_03_포괄손익계산서_연결_20250320.csv',
+          '2024_사업보고서_03_포괄손익계산서_연결_20250514.csv',   # re-issued
+          '2024_사업보고서_03_포괄손익계산서_20250320.csv',        # 별도, a different filing
+          '2025_1분기보고서_02_손익계산서_연결_20250515.csv',
+          '2025_1분기보고서_02_손익계산서_연결_20250515.txt',      # other suffix
+          'notes.csv')
+
+    catalog = SourceCatalog(src)
+    assert catalog.filenames() == [
+        '2024_사업보고서_03_포괄손익계산서_20250320.csv',
+        '2024_사업보고서_03_포괄손익계산서_연결_20250514.csv',
+        '2025_1분기보고서_02_손익계산서_연결_20250515.csv',
+    ]
+    assert catalog.superseded == {
+        '2024_사업보고서_03_포괄손익계산서_연결_20250320.csv': '2024_사업보고서_03_포괄손익계산서_연결_20250514.csv',
+    }
+    assert catalog.unrecognized == ['notes.csv']
+    assert [f.report_type for f in catalog.by_precedence()] == ['사업보고서', '사업보고서', '1분기보고서']
+
+    assert current_filenames(src, reverse=True) == catalog.filenames()[::-1]
+    out = capsys.readouterr().out
+    assert 'Skipping superseded filing 2024_사업보고서_03_포괄손익계산서_연결_20250320.csv' in out
+    assert 'Skipping notes.csv' in out
+
+    assert SourceCatalog(src, suffix='.txt').filenames() == ['2025_1분기보고서_02_손익계산서_연결_20250515.txt']
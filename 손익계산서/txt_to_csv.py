@@ -3,24 +3,172 @@ Universal TSV (Tab-Separated Values) to CSV (Comma-Separated Values) Converter
 Handles multiple encodings and various edge cases
 """
 import os
+import io
 import csv
 import sys
+import json
+import time
+import codecs
+import hashlib
+import concurrent.futures
 
-def detect_encoding(filepath):
-    """Try multiple encodings to find the right one"""
-    encodings = ['cp949', 'utf-8', 'euc-kr', 'utf-16', 'latin-1']
-    
-    for encoding in encodings:
+# dart_columnar lives in the repository root
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from dart_columnar import ColumnarBuilder, save_filing, register_filings, file_sha256, load_index, store_path, CACHE_DIR
+
+ENCODINGS = ['cp949', 'utf-8', 'euc-kr', 'utf-16', 'latin-1']
+
+# Bytes sampled by detect_encoding and read per step while converting
+PREFIX_SIZE = 64 * 1024
+CHUNK_SIZE = 1024 * 1024
+
+def detect_encoding(filepath, prefix_size=PREFIX_SIZE):
+    """Pick the first encoding that decodes the file prefix
+
+    Only the first `prefix_size` bytes are read. A character cut off at the end
+    of the prefix is fine (the decoder is left non-final); if the rest of the
+    file turns out not to match, _convert starts over with the next encoding.
+    """
+    with open(filepath, 'rb') as f:
+        prefix = f.read(prefix_size)
+
+    for encoding in ENCODINGS:
         try:
-            with open(filepath, 'r', encoding=encoding) as f:
-                f.read()
+            codecs.getincrementaldecoder(encoding)().decode(prefix, final=False)
             return encoding
         except UnicodeDecodeError:
             continue
-    
+
     return 'utf-8'  # Fallback
 
-def convert_tsv_to_csv(input_file, output_file=None, encoding=None):
+def candidate_encodings(encoding, candidates=ENCODINGS):
+    """`encoding` first, then the other candidates in their usual order"""
+    return [encoding] + [e for e in candidates if e != encoding]
+
+def iter_text_lines(f, decoder, hasher=None, chunk_size=CHUNK_SIZE):
+    """Yield decoded lines from a binary file with universal newline handling
+
+    Matches iterating a file opened in text mode, but decodes through
+    `decoder` and optionally feeds the raw bytes to `hasher` on the way.
+    """
+    newlines = io.IncrementalNewlineDecoder(None, translate=True)
+    pending = ''
+    while True:
+        chunk = f.read(chunk_size)
+        final = not chunk
+        if hasher is not None and chunk:
+            hasher.update(chunk)
+
+        text = pending + newlines.decode(decoder.decode(chunk, final), final)
+        lines = text.split('\n')
+        pending = lines.pop()
+        for line in lines:
+            yield line + '\n'
+
+        if final:
+            if pending:
+                yield pending
+            return
+
+def _convert_as(input_file, output_file, encoding, columnar_dir=None):
+    """Write output_file decoding input_file as `encoding`; returns (rows, input hasher, columnar builder)"""
+    decoder = codecs.getincrementaldecoder(encoding)()
+    hasher = hashlib.sha256()
+
+    with open(input_file, 'rb') as tsv_file:
+        # Use csv.reader with tab delimiter
+        tsv_reader = csv.reader(iter_text_lines(tsv_file, decoder, hasher), delimiter='\t')
+
+        with open(output_file, 'w', encoding='utf-8-sig', newline='') as csv_file:
+            csv_writer = csv.writer(csv_file, quoting=csv.QUOTE_MINIMAL)
+
+            builder = None
+            rows_written = 0
+            for row in tsv_reader:
+                csv_writer.writerow(row)
+                if columnar_dir is not None:
+                    if builder is None:
+                        builder = ColumnarBuilder(row)
+                    else:
+                        builder.add_row(row)
+                rows_written += 1
+
+    return rows_written, hasher, builder
+
+def _convert(input_file, output_file, encoding=None, columnar_dir=None, register=True):
+    """Convert one file and return a result dict (no printing, safe in a worker process)"""
+    start = time.time()
+    result = {
+        'input': input_file,
+        'output': output_file,
+        'ok': False,
+        'rows': 0,
+        'bytes': os.path.getsize(input_file),
+        'encoding': encoding,
+        'detected': encoding is None,
+        'fallbacks': [],
+        'store': None,
+        'sha256': None,
+        'output_sha256': None,
+        'output_size': None,
+        'error': None,
+    }
+
+    # Detect encoding if not specified
+    if encoding is None:
+        encoding = detect_encoding(input_file)
+        result['encoding'] = encoding
+
+    try:
+        # A file that stops decoding partway is converted again from the start
+        # with the next encoding, so the CSV never mixes two encodings
+        candidates = candidate_encodings(encoding)
+        for attempt, encoding in enumerate(candidates):
+            try:
+                rows_written, hasher, builder = _convert_as(input_file, output_file, encoding, columnar_dir)
+                break
+            except UnicodeDecodeError as e:
+                if attempt == len(candidates) - 1:
+                    raise
+                result['fallbacks'].append((encoding, str(e), candidates[attempt + 1]))
+
+        result['encoding'] = encoding
+        result['rows'] = rows_written
+        result['sha256'] = hasher.hexdigest()
+        result['output_sha256'] = file_sha256(output_file)
+        result['output_size'] = os.path.getsize(output_file)
+
+        if builder is not None:
+            result['store'] = save_filing(builder, input_file, columnar_dir, digest=hasher.hexdigest(),
+                                          register=register, csv_sha256=result['output_sha256'])
+        result['ok'] = True
+
+    except Exception as e:
+        result['error'] = str(e)
+
+    result['seconds'] = time.time() - start
+    return result
+
+def _print_result(result):
+    if result['detected']:
+        detected = result['fallbacks'][0][0] if result['fallbacks'] else result['encoding']
+        print(f"Detected encoding: {detected}")
+    for failed, error, retry in result['fallbacks']:
+        print(f"  Not {failed} ({error}): converting again as {retry}")
+
+    if not result['ok']:
+        print(f"✗ Error converting {result['input']}: {result['error']}")
+        return
+
+    seconds = max(result['seconds'], 1e-9)
+    mb = result['bytes'] / (1024 * 1024)
+    print(f"✓ Converted: {result['input']} → {result['output']}")
+    print(f"  {result['rows']} rows written ({mb:.1f} MB in {result['seconds']:.2f}s, "
+          f"{mb / seconds:.1f} MB/s, {result['rows'] / seconds:,.0f} rows/s)")
+    if result['store']:
+        print(f"  Columnar store: {result['store'][2]}")
+
+def convert_tsv_to_csv(input_file, output_file=None, encoding=None, columnar_dir=None):
     """
     Convert TSV file to CSV
     
@@ -28,40 +176,96 @@ def convert_tsv_to_csv(input_file, output_file=None, encoding=None):
         input_file: Path to input TSV file
         output_file: Path to output CSV file (optional, auto-generated if None)
         encoding: Force specific encoding (optional, auto-detect if None)
+        columnar_dir: Also write a typed columnar store here (optional, see dart_columnar.py)
     """
     # Auto-generate output filename if not provided
     if output_file is None:
         base_name = os.path.splitext(input_file)[0]
         output_file = f"{base_name}.csv"
-    
-    # Detect encoding if not specified
-    if encoding is None:
-        encoding = detect_encoding(input_file)
-        print(f"Detected encoding: {encoding}")
-    
-    # Read TSV and write CSV
-    try:
-        with open(input_file, 'r', encoding=encoding) as tsv_file:
-            # Use csv.reader with tab delimiter
-            tsv_reader = csv.reader(tsv_file, delimiter='\t')
-            
-            with open(output_file, 'w', encoding='utf-8-sig', newline='') as csv_file:
-                csv_writer = csv.writer(csv_file, quoting=csv.QUOTE_MINIMAL)
-                
-                rows_written = 0
-                for row in tsv_reader:
-                    csv_writer.writerow(row)
-                    rows_written += 1
-        
-        print(f"✓ Converted: {input_file} → {output_file}")
-        print(f"  {rows_written} rows written")
+
+    result = _convert(input_file, output_file, encoding, columnar_dir)
+    _print_result(result)
+    return result['ok']
+
+MANIFEST_FILE = '_conversion_manifest.json'
+
+def filing_version(filename):
+    """Split a DART filename into (period key, publication date)
+
+    2025_3분기보고서_02_손익계산서_연결_20251231.txt
+        -> ('2025_3분기보고서_02_손익계산서_연결', '20251231')
+    Files without a trailing 8-digit date get (stem, None).
+    """
+    stem = os.path.splitext(os.path.basename(filename))[0]
+    parts = stem.split('_')
+    if len(parts) > 1 and len(parts[-1]) == 8 and parts[-1].isdigit():
+        return '_'.join(parts[:-1]), parts[-1]
+    return stem, None
+
+def load_manifest(output_dir):
+    manifest_path = os.path.join(output_dir, MANIFEST_FILE)
+    if not os.path.exists(manifest_path):
+        return {}
+    with open(manifest_path, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+def save_manifest(manifest, output_dir):
+    manifest_path = os.path.join(output_dir, MANIFEST_FILE)
+    with open(manifest_path + '.tmp', 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, ensure_ascii=False, indent=2, sort_keys=True)
+    os.replace(manifest_path + '.tmp', manifest_path)
+
+def is_up_to_date(entry, filepath, output_path):
+    """True if the manifest entry still describes this input and its output
+
+    Size + mtime match is trusted without hashing. Otherwise the input is
+    hashed, so a touched-but-identical file is not converted again.
+    """
+    if not entry or not os.path.exists(output_path):
+        return False
+    if os.path.getsize(output_path) != entry.get('output_size'):
+        return False
+
+    stat = os.stat(filepath)
+    if stat.st_size == entry.get('input_size') and stat.st_mtime_ns == entry.get('input_mtime_ns'):
         return True
-        
-    except Exception as e:
-        print(f"✗ Error converting {input_file}: {e}")
+    if stat.st_size != entry.get('input_size'):
         return False
+    if file_sha256(filepath) != entry.get('input_sha256'):
+        return False
+
+    entry['input_mtime_ns'] = stat.st_mtime_ns
+    return True
+
+def flag_superseded(manifest):
+    """Mark older filings of the same period as superseded by the newest one"""
+    newest = {}
+    for name in manifest:
+        period, date = filing_version(name)
+        if date is not None and (period not in newest or date > newest[period][0]):
+            newest[period] = (date, name)
 
-def batch_convert_directory(input_dir, output_dir=None, pattern='*.txt'):
+    superseded = []
+    for name, entry in manifest.items():
+        period, date = filing_version(name)
+        latest = newest.get(period)
+        if latest is not None and latest[1] != name:
+            entry['superseded_by'] = latest[1]
+            superseded.append((name, latest[1]))
+        else:
+            entry.pop('superseded_by', None)
+    return sorted(superseded)
+
+def has_store(store_index, filename, entry, columnar_dir):
+    """True if the columnar store of an up-to-date file exists for its current input"""
+    digest = store_index.get(os.path.splitext(filename)[0])
+    return digest == entry.get('input_sha256') and os.path.exists(store_path(digest, columnar_dir))
+
+def _convert_task(task):
+    input_file, output_file, columnar_dir = task
+    return _convert(input_file, output_file, columnar_dir=columnar_dir, register=False)
+
+def batch_convert_directory(input_dir, output_dir=None, pattern='*.txt', columnar_dir=None, workers=None, force=False):
     """
     Convert all TSV files in a directory
     
@@ -69,6 +273,13 @@ def batch_convert_directory(input_dir, output_dir=None, pattern='*.txt'):
         input_dir: Directory containing TSV files
         output_dir: Output directory (optional, same as input if None)
         pattern: File pattern to match (default: *.txt)
+        columnar_dir: Also write a typed columnar store per file here (optional, see dart_columnar.py;
+            main() passes 'columnar_cache' next to output_dir for --columnar)
+        workers: Number of worker processes (optional, one per CPU if None; 1 = serial)
+        force: Ignore the conversion manifest and convert every file
+
+    Files whose size/mtime (or content hash) and output match the manifest in
+    output_dir are skipped, so a new DART drop only converts the new filings.
     """
     import glob
     
@@ -76,7 +287,7 @@ def batch_convert_directory(input_dir, output_dir=None, pattern='*.txt'):
         output_dir = input_dir
     else:
         os.makedirs(output_dir, exist_ok=True)
-    
+
     # Find all matching files
     search_pattern = os.path.join(input_dir, pattern)
     files = glob.glob(search_pattern)
@@ -85,18 +296,78 @@ def batch_convert_directory(input_dir, output_dir=None, pattern='*.txt'):
         print(f"No files matching '{pattern}' found in {input_dir}")
         return
     
-    print(f"Found {len(files)} files to convert\n")
-    
-    success_count = 0
+    manifest = {} if force else load_manifest(output_dir)
+    store_index = load_index(columnar_dir) if columnar_dir is not None else None
+
+    tasks = []
     for filepath in sorted(files):
         filename = os.path.basename(filepath)
         output_path = os.path.join(output_dir, os.path.splitext(filename)[0] + '.csv')
-        
-        if convert_tsv_to_csv(filepath, output_path):
-            success_count += 1
-        print()  # Empty line between files
-    
-    print(f"Conversion complete: {success_count}/{len(files)} files succeeded")
+        entry = manifest.get(filename)
+        if is_up_to_date(entry, filepath, output_path) and \
+                (store_index is None or has_store(store_index, filename, entry, columnar_dir)):
+            continue
+        tasks.append((filepath, output_path, columnar_dir))
+
+    print(f"Found {len(files)} files, {len(tasks)} new or changed "
+          f"({len(files) - len(tasks)} unchanged, skipped)\n")
+
+    start = time.time()
+    if workers == 1 or len(tasks) <= 1:
+        results = map(_convert_task, tasks)
+        executor = None
+    else:
+        executor = concurrent.futures.ProcessPoolExecutor(max_workers=workers)
+        results = executor.map(_convert_task, tasks)
+
+    success_count = 0
+    total_bytes = 0
+    stores = []
+    try:
+        for result in results:
+            _print_result(result)
+            print()  # Empty line between files
+            if result['ok']:
+                success_count += 1
+                total_bytes += result['bytes']
+                if result['store']:
+                    stores.append(result['store'][:2])
+
+                stat = os.stat(result['input'])
+                manifest[os.path.basename(result['input'])] = {
+                    'input_size': stat.st_size,
+                    'input_mtime_ns': stat.st_mtime_ns,
+                    'input_sha256': result['sha256'],
+                    'output': os.path.basename(result['output']),
+                    'output_size': result['output_size'],
+                    'output_sha256': result['output_sha256'],
+                    'rows': result['rows'],
+                    'encoding': result['encoding'],
+                }
+    finally:
+        if executor is not None:
+            executor.shutdown()
+
+    # Workers only write stores; the index is updated once here
+    if stores:
+        register_filings(stores, columnar_dir)
+
+    # Forget inputs that no longer exist, then flag older versions of re-issued filings
+    present = {os.path.basename(f) for f in files}
+    manifest = {name: entry for name, entry in manifest.items() if name in present}
+    superseded = flag_superseded(manifest)
+    save_manifest(manifest, output_dir)
+
+    if superseded:
+        print(f"WARNING: {len(superseded)} superseded filings (a newer version of the same period exists):")
+        for old, new in superseded:
+            print(f"  {old} → superseded by {new}")
+        print()
+
+    elapsed = max(time.time() - start, 1e-9)
+    print(f"Conversion complete: {success_count}/{len(tasks)} files succeeded")
+    print(f"  {total_bytes / (1024 * 1024):.1f} MB in {elapsed:.1f}s "
+          f"({total_bytes / (1024 * 1024) / elapsed:.1f} MB/s overall)")
 
 def main():
     """
@@ -110,11 +381,14 @@ def main():
         # Convert all files in directory
         python tsv_to_csv.py --dir 손익계산서
         python tsv_to_csv.py --dir 손익계산서 --output csv_output
+        python tsv_to_csv.py --dir 손익계산서 --output csv_output --workers 8
+        python tsv_to_csv.py --dir 손익계산서 --output csv_output --force   # ignore manifest
+        python tsv_to_csv.py --dir 손익계산서 --output csv_output --columnar   # also write columnar stores
     """
     if len(sys.argv) < 2:
         print("Usage:")
         print("  Single file: python tsv_to_csv.py input.txt [output.csv]")
-        print("  Directory:   python tsv_to_csv.py --dir input_folder [--output output_folder]")
+        print("  Directory:   python tsv_to_csv.py --dir input_folder [--output output_folder] [--workers N] [--force] [--columnar]")
         return
     
     if sys.argv[1] == '--dir':
@@ -122,10 +396,22 @@ def main():
         input_dir = sys.argv[2] if len(sys.argv) > 2 else '.'
         output_dir = None
         
+        workers = None
+        
         if len(sys.argv) > 3 and sys.argv[3] == '--output':
             output_dir = sys.argv[4] if len(sys.argv) > 4 else None
+
+        if '--workers' in sys.argv:
+            pos = sys.argv.index('--workers')
+            workers = int(sys.argv[pos + 1]) if len(sys.argv) > pos + 1 else None
         
-        batch_convert_directory(input_dir, output_dir)
+        # Columnar stores (dart_columnar.py) go to columnar_cache next to the output directory
+        columnar_dir = None
+        if '--columnar' in sys.argv:
+            columnar_dir = os.path.join(os.path.dirname(os.path.abspath(output_dir or input_dir)), CACHE_DIR)
+
+        batch_convert_directory(input_dir, output_dir, columnar_dir=columnar_dir, workers=workers,
+                                force='--force' in sys.argv)
     else:
         # Single file mode
         input_file = sys.argv[1]